@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Her üretimde değişen, içeriği etkilemeyen alanlar
+VOLATILE_KEYS = frozenset({'analysis_date', 'timestamp', 'generation_time', 'created_at'})
+
+
+def normalize(value):
+    """Anahtar üretimi için veriyi kararlı hale getir"""
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def content_key(kind, data, version):
+    """(tür, şablon sürümü, normalize veri) için içerik adresi"""
+    payload = json.dumps([kind, version, normalize(data)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache:
+    """İçerik adresli dosya önbelleği (PDF, PNG)
+
+    Dosya adı içerik anahtarını taşır; aynı veri ve şablon sürümü aynı
+    dosyaya düşer, böylece tekrar üretim yerine mevcut dosya kullanılır.
+    Boyut ve yaş bellekte tutulur; toplam boyut sınırı aşılınca en eski
+    kullanılan dosyalar, yaşı max_age'i geçenler ise periyodik olarak silinir.
+    Canlı işlerin referans verdiği (pin'lenmiş) dosyalar silinmez.
+    """
+
+    def __init__(self, directory=os.path.join('reports', 'cache'), max_bytes=256 * 1024 * 1024,
+                 max_age=7 * 86400, sweep_interval=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.entries = {}  # dosya adı -> [boyut, son kullanım]
+        self.pinned = {}  # dosya adı -> referans veren canlı iş sayısı
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                self.entries[entry.name] = [stat.st_size, stat.st_mtime]
+                self.total_bytes += stat.st_size
+        self._last_sweep = 0
+        self.evict()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        """Önbellekteki dosyanın yolu (yoksa None)"""
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is None or not os.path.exists(self.path(name)):
+                if entry is not None:
+                    self._forget(name)
+                self.stats['misses'] += 1
+                return None
+            entry[1] = time.time()
+            self.stats['hits'] += 1
+        return self.path(name)
+
+    def temp_path(self, name):
+        """Üretici bu yola yazar; ardından commit ile yerine taşınır"""
+        return self.path(f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def commit(self, name, temp_path):
+        """Yazılmış geçici dosyayı atomik olarak önbelleğe al"""
+        final_path = self.path(name)
+        os.replace(temp_path, final_path)
+        self._track(name, os.path.getsize(final_path))
+        return final_path
+
+    def put_bytes(self, name, data):
+        temp_path = self.temp_path(name)
+        with open(temp_path, 'wb') as temp_file:
+            temp_file.write(data)
+        return self.commit(name, temp_path)
+
+    def _track(self, name, size):
+        with self._lock:
+            previous = self.entries.get(name)
+            if previous:
+                self.total_bytes -= previous[0]
+            self.entries[name] = [size, time.time()]
+            self.total_bytes += size
+        if self.total_bytes > self.max_bytes or time.time() - self._last_sweep > self.sweep_interval:
+            self.evict()
+
+    def pin(self, name):
+        """Dosyayı tahliyeden koru (referans sayılır)"""
+        with self._lock:
+            self.pinned[name] = self.pinned.get(name, 0) + 1
+
+    def unpin(self, name):
+        with self._lock:
+            count = self.pinned.get(name, 0) - 1
+            if count > 0:
+                self.pinned[name] = count
+            else:
+                self.pinned.pop(name, None)
+
+    def _forget(self, name):
+        size, _ = self.entries.pop(name)
+        self.total_bytes -= size
+
+    def evict(self):
+        """Yaşlı dosyaları ve boyut sınırını aşan en eski dosyaları sil"""
+        with self._lock:
+            now = time.time()
+            self._last_sweep = now
+            victims = [name for name, (_, used) in self.entries.items()
+                       if now - used > self.max_age and name not in self.pinned]
+            if self.total_bytes > self.max_bytes:
+                remaining = self.total_bytes - sum(self.entries[name][0] for name in victims)
+                for name, (size, _) in sorted(self.entries.items(), key=lambda item: item[1][1]):
+                    if remaining <= self.max_bytes:
+                        break
+                    if name not in victims and name not in self.pinned:
+                        victims.append(name)
+                        remaining -= size
+            for name in victims:
+                self._forget(name)
+                try:
+                    os.remove(self.path(name))
+                except OSError:
+                    pass
+            self.stats['evicted'] += len(victims)
+            return len(victims)
+
+    def get_stats(self):
+        return dict(self.stats, files=len(self.entries), total_bytes=self.total_bytes, pinned=len(self.pinned))
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from price_bus import normalize_symbol
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'adj_close', 'dividend', 'split', 'volume')
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+# Eski dosyalarda olmayan kolonlar: düzeltilmiş kapanış = kapanış, kurumsal işlem yok
+_DEFAULTS = {'dividend': 0.0, 'split': 0.0}
+
+
+def _day(value):
+    return np.datetime64(value, 'D') if value is not None else None
+
+
+def _iso(value):
+    return str(np.datetime64(value, 'D'))
+
+
+class BarStore:
+    """Günlük OHLCV barları için yerel kolon bazlı depo
+
+    Her sembol data/bars/<SEMBOL>.npz dosyasında gün (datetime64[D]) ve
+    BAR_COLUMNS kolonları olarak tutulur: ham open/high/low/close/volume,
+    temettü/bölünme düzeltmeli kapanış (adj_close) ve o günün kurumsal
+    işlemleri (dividend, split). index.json her sembol için indirilmiş
+    tarih aralığını (covered_from..covered_to) ve listelenmeden önceki
+    tarihlerin tamamen alınıp alınmadığını (complete_start) saklar;
+    böylece yükleyici sadece eksik aralıkları ister. Yeni barlar aynı
+    gündeki eskilerin yerine geçer. Düzeltme bilgisi olmadan yazılmış
+    (adjusted işaretsiz) semboller baştan indirilir.
+    """
+
+    def __init__(self, root=os.path.join('data', 'bars')):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self._lock = threading.RLock()
+        self.index = self._load_index()  # sembol -> aralık bilgisi
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, encoding='utf-8') as index_file:
+                    return json.load(index_file)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def save_index(self):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as index_file:
+                json.dump(self.index, index_file, indent=1, sort_keys=True)
+            os.replace(temp_path, self.index_path)
+
+    def _path(self, symbol):
+        return os.path.join(self.root, f"{symbol}.npz")
+
+    def _read_arrays(self, symbol):
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in ('day', *BAR_COLUMNS) if name in data.files}
+        for name in BAR_COLUMNS:
+            if name not in arrays:
+                arrays[name] = arrays['close'].copy() if name == 'adj_close' else np.full(len(arrays['day']), _DEFAULTS[name])
+        return arrays
+
+    # Aralıklar
+    def ranges(self, symbol):
+        """{'covered_from', 'covered_to', 'complete_start', 'first_day', 'last_day', 'rows', 'adjusted'} veya None"""
+        return self.index.get(normalize_symbol(symbol))
+
+    def missing_ranges(self, symbol, start=None, end=None):
+        """İndirilmesi gereken [(başlangıç, bitiş)] gün aralıkları; başlangıç None = ilk işlem günü
+
+        İş günü içermeyen aralıklar atlanır.
+        """
+        end = _day(end or date.today())
+        start = _day(start)
+        entry = self.ranges(symbol)
+        if entry is None:
+            missing = [(start, end)]
+        elif not entry.get('adjusted'):
+            # Düzeltme bilgisi olmayan eski kayıt: kapsadığı aralık baştan indirilir (yükleyici replace ile yazar)
+            covered_from = None if entry.get('complete_start') else _day(entry['covered_from'])
+            missing = [(None if start is None or covered_from is None else min(start, covered_from), end)]
+        else:
+            covered_from, covered_to = _day(entry['covered_from']), _day(entry['covered_to'])
+            missing = []
+            if not entry.get('complete_start') and (start is None or start < covered_from):
+                missing.append((start, covered_from - 1))
+            if end > covered_to:
+                missing.append((covered_to + 1, end))  # arada boşluk kalmasın
+        return [
+            (range_start, range_end) for range_start, range_end in missing
+            if range_start is None or (range_start <= range_end and np.busday_count(range_start, range_end + 1) > 0)
+        ]
+
+    # Yazma / okuma
+    def write(self, symbol, bars, fetched_start, fetched_end, save_index=True, replace=False):
+        """İndirilen barları birleştir ve kapsanan aralığı genişlet
+
+        bars: 'day' ve BAR_COLUMNS anahtarlı diziler. fetched_start None ise
+        sembolün tüm geçmişi alınmış sayılır. Bugünün barı seans içinde eksik
+        olabileceği için kapsam en fazla dünkü güne kadar işaretlenir. Toplu
+        yüklemede save_index=False verilip sonda save_index() çağrılır.
+        replace=True eski barları ve kapsamı atar (ör. yeni bir bölünme sonrası
+        tüm geçmişin düzeltmesi değiştiğinde).
+        """
+        symbol = normalize_symbol(symbol)
+        days = np.asarray(bars['day'], dtype='datetime64[D]')
+        with self._lock:
+            existing = None if replace else self._read_arrays(symbol)
+            if existing is not None and len(existing['day']):
+                # Yeni barlar önce: np.unique ilk görüleni tutar
+                merged_days = np.concatenate([days, existing['day']])
+                _, keep = np.unique(merged_days, return_index=True)
+                columns = {
+                    name: np.concatenate([np.asarray(bars[name], dtype=existing[name].dtype), existing[name]])[keep]
+                    for name in BAR_COLUMNS
+                }
+                days = merged_days[keep]
+            else:
+                order = np.argsort(days)
+                days = days[order]
+                columns = {
+                    name: np.asarray(bars[name], dtype=np.int64 if name == 'volume' else np.float64)[order]
+                    for name in BAR_COLUMNS
+                }
+
+            os.makedirs(self.root, exist_ok=True)
+            temp_path = f"{self._path(symbol)}.tmp.npz"
+            np.savez(temp_path, day=days, **columns)
+            os.replace(temp_path, self._path(symbol))
+
+            entry = {} if replace else self.index.get(symbol, {})
+            fetched_to = min(_day(fetched_end), _day(date.today() - timedelta(days=1)))
+            if fetched_start is None:
+                fetched_from = days[0] if len(days) else fetched_to
+                entry['complete_start'] = True
+            else:
+                fetched_from = _day(fetched_start)
+            if 'covered_from' in entry:
+                fetched_from = min(fetched_from, _day(entry['covered_from']))
+                fetched_to = max(fetched_to, _day(entry['covered_to']))
+            entry.update({
+                'covered_from': _iso(fetched_from),
+                'covered_to': _iso(fetched_to),
+                'first_day': _iso(days[0]) if len(days) else None,
+                'last_day': _iso(days[-1]) if len(days) else None,
+                'rows': int(len(days)),
+                'adjusted': True,
+                'updated_at': time.time()
+            })
+            self.index[symbol] = entry
+            if save_index:
+                self.save_index()
+            return entry
+
+    def read(self, symbol, start=None, end=None, adjusted=False):
+        """Sembolün barları (gün indeksli DataFrame); veri yoksa boş DataFrame
+
+        adjusted=True ise open/high/low/close adj_close / close oranıyla
+        ölçeklenir; bölünme ve temettü günlerinde sahte fiyat kırılımı olmaz.
+        """
+        arrays = self._read_arrays(normalize_symbol(symbol))
+        if arrays is None:
+            return pd.DataFrame(columns=list(BAR_COLUMNS))
+        days = arrays['day']
+        lo = np.searchsorted(days, _day(start)) if start is not None else 0
+        hi = np.searchsorted(days, _day(end), side='right') if end is not None else len(days)
+        columns = {name: arrays[name][lo:hi] for name in BAR_COLUMNS}
+        if adjusted:
+            close = columns['close']
+            factor = np.divide(columns['adj_close'], close, out=np.ones_like(close), where=close != 0)
+            for name in PRICE_COLUMNS:
+                columns[name] = columns[name] * factor
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(days[lo:hi], name='date'))
+
+    def symbols(self):
+        return sorted(self.index)
+
+    def get_stats(self):
+        return {
+            'symbols': len(self.index),
+            'rows': sum(entry.get('rows', 0) for entry in self.index.values()),
+            'root': self.root
+        }
+
+
+bar_store = BarStore()
@@ -4,9 +4,17 @@ import json
 from datetime import datetime, timedelta
 import time
 from base_agent import BaseAgent
+from keyword_matcher import KeywordMatcher
+from bar_store import bar_store as default_bar_store
+from job_scheduler import job_scheduler as default_job_scheduler
+
+HISTORY_TOPUP = 'data.history_topup'
+
+# Olumlu görüş işaretleri; tam kelime ('al' 'sinyal' içinde sayılmaz)
+CONSENSUS_MATCHER = KeywordMatcher({'positive': ['al', 'positive', 'güçlü']}, stems=False)
 
 class DataAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, bar_store=None, job_scheduler=None):
         super().__init__(
             name="DataAgent",
             agent_type="data_processor",
@@ -14,8 +22,14 @@ class DataAgent(BaseAgent):
         )
         self.data_cache = {}
         
+        # Günlük bar geçmişi yerel depoda; zamanlanmış iş eksik günleri tamamlar
+        self.bar_store = bar_store or default_bar_store
+        self.job_scheduler = job_scheduler if job_scheduler is not None else default_job_scheduler
+        self.job_scheduler.register_handler(HISTORY_TOPUP, self.run_history_topup)
+        
     def can_handle_task(self, task):
-        data_tasks = ['collect_market_data', 'statistical_analysis', 'combine_agent_data', 'trend_analysis']
+        data_tasks = ['collect_market_data', 'statistical_analysis', 'combine_agent_data', 'trend_analysis',
+                      'load_history', 'get_history']
         return task.get('type') in data_tasks
     
     def process_task(self, task):
@@ -33,6 +47,10 @@ class DataAgent(BaseAgent):
                 result = self.combine_multiple_agent_data(task.get('agent_results'))
             elif task_type == 'trend_analysis':
                 result = self.analyze_data_trends(task.get('historical_data'))
+            elif task_type == 'load_history':
+                result = self.load_history(task.get('symbols'), task.get('start'), task.get('end'))
+            elif task_type == 'get_history':
+                result = self.get_history(task.get('symbol'), task.get('start'), task.get('end'), task.get('adjusted', True))
             else:
                 result = {"error": "Desteklenmeyen görev tipi"}
             
@@ -69,6 +87,7 @@ class DataAgent(BaseAgent):
                     'timestamp': current_time.isoformat(),
                     'market_session': self.get_market_session(current_time),
                     'data_source': price_data.get('source'),
+                    'data_quality': price_data.get('data_quality', 'LIVE'),
                     'price_change': price_data.get('current_price', 0) - price_data.get('previous_close', 0),
                     'price_change_pct': ((price_data.get('current_price', 0) - price_data.get('previous_close', 0)) / price_data.get('previous_close', 1)) * 100
                 }
@@ -103,6 +122,49 @@ class DataAgent(BaseAgent):
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def load_history(self, symbols=None, start=None, end=None):
+        """Sembol evreninin eksik günlük geçmişini toplu indir (varsayılan BIST 30)"""
+        from history_loader import HistoryLoader
+        result = HistoryLoader(bar_store=self.bar_store).load(symbols, start, end)
+        result['success'] = not result['errors']
+        return result
+    
+    def run_history_topup(self, payload):
+        """Zamanlayıcı işi: kapanış sonrası eksik günleri tamamla"""
+        result = self.load_history(payload.get('symbols'))
+        if result['errors'] and not result['updated_symbols']:
+            raise RuntimeError(result['errors'][0])
+        return {'loaded_bars': result['loaded_bars'], 'updated_symbols': len(result['updated_symbols'])}
+    
+    def start_history_topup(self, symbols=None, cron='30 18 * * 1-5'):
+        """Günlük geçmiş tamamlama işi (tek kalıcı iş; tekrar çağrı aynı işi günceller)"""
+        return self.job_scheduler.add_job(
+            HISTORY_TOPUP, {'cron': cron}, {'symbols': symbols},
+            name="Günlük bar geçmişi tamamlama", job_id='HISTORY_TOPUP', catch_up='once'
+        )
+    
+    def get_history(self, symbol, start=None, end=None, adjusted=True):
+        """Yerel bar deposundan günlük geçmiş (varsayılan temettü/bölünme düzeltmeli)"""
+        if not symbol:
+            return {"error": "Sembol gerekli"}
+        
+        bars = self.bar_store.read(symbol, start, end, adjusted=adjusted)
+        if bars.empty:
+            return {"error": f"{symbol} için yerel geçmiş yok (load_history çalıştırın)"}
+        
+        return {
+            "success": True,
+            "symbol": symbol,
+            "ranges": self.bar_store.ranges(symbol),
+            "adjusted": adjusted,
+            "data": [
+                {'date': day.strftime('%Y-%m-%d'), 'open': row.open, 'high': row.high,
+                 'low': row.low, 'close': row.close, 'adj_close': row.adj_close,
+                 'dividend': row.dividend, 'split': row.split, 'volume': int(row.volume)}
+                for day, row in zip(bars.index, bars.itertuples(index=False))
+            ]
+        }
+    
     def get_market_session(self, time):
         """Piyasa seansını belirle"""
         hour = time.hour
@@ -136,6 +198,10 @@ class DataAgent(BaseAgent):
         elif data.get('data_source') == 'MOCK_DATA':
             score -= 15
         
+        # Son geçerli (bayat) veri
+        if data.get('data_quality') == 'STALE':
+            score -= 10
+        
         return max(0, score)
     
     def perform_statistical_analysis(self, data):
@@ -303,8 +369,8 @@ class DataAgent(BaseAgent):
             return {"consensus_level": "Yetersiz Veri", "agreement_pct": 0}
         
         # Basit consensus hesaplama
-        positive_signals = sum(1 for result in agent_results.values() 
-                             if any(word in str(result).lower() for word in ['al', 'positive', 'güçlü']))
+        positive_signals = sum(1 for result in agent_results.values()
+                               if CONSENSUS_MATCHER.contains(str(result)))
         
         total_agents = len(agent_results)
         agreement_pct = (positive_signals / total_agents) * 100
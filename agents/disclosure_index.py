@@ -0,0 +1,349 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from functools import lru_cache
+
+import numpy as np
+
+from keyword_matcher import tokenize
+from price_bus import normalize_symbol
+
+# Katlanmış (ı -> i, â -> a) Türkçe çekim ekleri; uzundan kısaya denenir
+_SUFFIXES = sorted({
+    'lerinden', 'larindan', 'lerinde', 'larinda', 'lerine', 'larina', 'lerini', 'larini', 'lerin', 'larin',
+    'leri', 'lari', 'ler', 'lar',
+    'sinden', 'sindan', 'sinde', 'sinda', 'sine', 'sina', 'sini', 'sinin',
+    'inden', 'indan', 'unden', 'undan', 'inde', 'inda', 'unde', 'unda',
+    'nin', 'nun', 'nün', 'den', 'dan', 'ten', 'tan', 'deki', 'daki', 'teki', 'taki',
+    'ine', 'ina', 'une', 'una', 'ini', 'unu', 'ünü', 'in', 'un', 'ün',
+    'si', 'su', 'sü', 'de', 'da', 'te', 'ta', 'i', 'u', 'ü', 'a', 'e',
+}, key=len, reverse=True)
+_MIN_STEM = 3
+_QUERY_RE = re.compile(r'-?"[^"]*"|\S+')
+
+K1 = 1.2
+B = 0.75
+
+
+@lru_cache(maxsize=200000)
+def stem(word):
+    """Hafif Türkçe kök bulma: en fazla iki ek soyulur, kök en az 3 harf kalır"""
+    if word.isdigit():
+        return word
+    for _ in range(2):
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+                word = word[:-len(suffix)]
+                break
+        else:
+            break
+    return word
+
+
+def analyze(text):
+    """Metin -> kök dizisi (sorgu ve doküman için aynı)"""
+    return [stem(word) for word in tokenize(text or '')]
+
+
+class _Postings:
+    """Terim kayıt listesi: doküman ve konum farkları sıkıştırılmış dizilerde"""
+
+    __slots__ = ('docs', 'tfs', 'positions', 'last_doc')
+
+    def __init__(self):
+        self.docs = array('I')  # doküman numarası farkları
+        self.tfs = array('I')
+        self.positions = array('I')  # doküman içi konum farkları
+        self.last_doc = 0
+
+    def append(self, doc, positions):
+        self.docs.append(doc - self.last_doc)
+        self.last_doc = doc
+        self.tfs.append(len(positions))
+        previous = 0
+        for position in positions:
+            self.positions.append(position - previous)
+            previous = position
+
+
+class DisclosureIndex:
+    """KAP bildirimleri için tam metin ters indeks (BM25)
+
+    Başlık ve içerik Türkçe duyarlı kelimelere ayrılıp köklenir. Her terim
+    için doküman numaraları, frekanslar ve konumlar fark kodlanmış
+    dizilerde tutulur; dokümanlar geldikçe sona eklenir (artımlı). Sorgu:
+    boşlukla ayrılmış terimler VE, 'OR' ile gruplar VEYA, '-terim' DEĞİL,
+    "tırnaklı ifade" sıralı eşleşme. Şirket ve tarih filtreleri doküman
+    dizileri üzerinde maske olarak uygulanır. Çözülmüş kayıt listeleri
+    terim güncellenene kadar önbellekte tutulur.
+    """
+
+    def __init__(self, path=os.path.join('data', 'disclosure_index.npz')):
+        self.path = path
+        self._lock = threading.RLock()
+        self.terms = {}  # kök -> _Postings
+        self.external_ids = []  # doküman numarası -> bildirim id
+        self.doc_by_id = {}
+        self.companies = {}  # şirket kodu -> numara
+        self.doc_company = np.zeros(1024, dtype=np.int32)
+        self.doc_date = np.zeros(1024, dtype=np.float64)
+        self.doc_length = np.zeros(1024, dtype=np.float32)
+        self.total_length = 0
+        self.last_rowid = 0  # depodan senkronize edilen son satır
+        self._decoded = {}  # kök -> (doküman, tf)
+        self._position_keys = {}  # kök -> sıralı (doküman << 32 | konum) anahtarları
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.external_ids)
+
+    # Yazma
+    def _ensure_capacity(self, size):
+        if size <= len(self.doc_date):
+            return
+        capacity = max(size, len(self.doc_date) * 2)
+        self.doc_company = np.resize(self.doc_company, capacity)
+        self.doc_date = np.resize(self.doc_date, capacity)
+        self.doc_length = np.resize(self.doc_length, capacity)
+
+    def add(self, disclosure):
+        """Bildirimi indeksle; aynı id tekrar eklenmez"""
+        external_id = str(disclosure.get('id'))
+        with self._lock:
+            if external_id in self.doc_by_id:
+                return False
+            words = analyze(f"{disclosure.get('title') or ''} {disclosure.get('content') or ''}")
+            doc = len(self.external_ids)
+            self._ensure_capacity(doc + 1)
+            self.external_ids.append(external_id)
+            self.doc_by_id[external_id] = doc
+
+            code = normalize_symbol(disclosure.get('company_code') or '')
+            self.doc_company[doc] = self.companies.setdefault(code, len(self.companies))
+            self.doc_date[doc] = float(disclosure.get('published_at') or time.time())
+            self.doc_length[doc] = len(words)
+            self.total_length += len(words)
+
+            positions = {}
+            for position, word in enumerate(words):
+                positions.setdefault(word, []).append(position)
+            for word, word_positions in positions.items():
+                postings = self.terms.get(word)
+                if postings is None:
+                    postings = self.terms[word] = _Postings()
+                postings.append(doc, word_positions)
+                self._decoded.pop(word, None)
+                self._position_keys.pop(word, None)
+            self.dirty = True
+            return True
+
+    def add_many(self, disclosures):
+        return sum(self.add(disclosure) for disclosure in disclosures)
+
+    def sync(self, store):
+        """Depodaki henüz indekslenmemiş bildirimleri ekle"""
+        added = 0
+        for rowid, record in store.iter_records(self.last_rowid):
+            added += self.add(record)
+            self.last_rowid = rowid
+        return added
+
+    # Okuma
+    def _decode(self, word):
+        decoded = self._decoded.get(word)
+        if decoded is None:
+            postings = self.terms.get(word)
+            if postings is None:
+                return None
+            docs = np.cumsum(np.array(postings.docs, dtype=np.int64))
+            tfs = np.array(postings.tfs, dtype=np.int64)
+            decoded = self._decoded[word] = (docs, tfs)
+        return decoded
+
+    def _keys(self, word):
+        """Terimin tüm geçişleri için sıralı (doküman << 32 | konum) anahtarları"""
+        keys = self._position_keys.get(word)
+        if keys is None:
+            docs, tfs = self._decode(word)
+            running = np.cumsum(np.array(self.terms[word].positions, dtype=np.int64))
+            # Konum farkları her dokümanda sıfırdan başlar: doküman öncesi toplamı çıkar
+            starts = np.cumsum(tfs) - tfs
+            base = np.where(starts > 0, running[np.maximum(starts - 1, 0)], 0)
+            positions = running - np.repeat(base, tfs)
+            keys = self._position_keys[word] = (np.repeat(docs, tfs) << 32) | positions
+        return keys
+
+    def _phrase_docs(self, words):
+        """Kelimeleri art arda içeren dokümanlar (konum anahtarlarının kesişimi)"""
+        if any(word not in self.terms for word in words):
+            return np.zeros(0, dtype=np.int64)
+        keys = self._keys(words[0])
+        for offset, word in enumerate(words[1:], 1):
+            # Konum hiçbir zaman 2^32 - offset'e ulaşmaz; önceki dokümana taşma eşleşmez
+            keys = keys[np.isin(keys, self._keys(word) - offset, assume_unique=True)]
+            if not keys.size:
+                break
+        return np.unique(keys >> 32)
+
+    def _clause_docs(self, clause):
+        kind, words = clause
+        if kind == 'phrase' and len(words) > 1:
+            return self._phrase_docs(words)
+        decoded = self._decode(words[0])
+        return decoded[0] if decoded is not None else np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def parse_query(query):
+        """Sorgu -> VEYA grupları; her grup (pozitif, negatif) cümle listeleri"""
+        groups = [([], [])]
+        for token in _QUERY_RE.findall(query or ''):
+            if token == 'OR':
+                groups.append(([], []))
+                continue
+            negative = token.startswith('-') and len(token) > 1
+            if negative:
+                token = token[1:]
+            words = analyze(token.strip('"'))
+            if not words:
+                continue
+            clause = ('phrase' if token.startswith('"') or len(words) > 1 else 'term', words)
+            groups[-1][1 if negative else 0].append(clause)
+        return [group for group in groups if group[0]]
+
+    def search(self, query, company=None, since=None, until=None, limit=20):
+        """BM25 sıralı sonuçlar: [{'id', 'score', 'company_code', 'published_at'}]"""
+        with self._lock:
+            n_docs = len(self.external_ids)
+            groups = self.parse_query(query)
+            if not n_docs or not groups:
+                return []
+
+            matched = None
+            scoring_words = set()
+            for positives, negatives in groups:
+                docs = None
+                for clause in positives:
+                    clause_docs = self._clause_docs(clause)
+                    docs = clause_docs if docs is None else np.intersect1d(docs, clause_docs, assume_unique=True)
+                    scoring_words.update(clause[1])
+                for clause in negatives:
+                    docs = np.setdiff1d(docs, self._clause_docs(clause), assume_unique=True)
+                matched = docs if matched is None else np.union1d(matched, docs)
+
+            # Filtreler
+            if company:
+                code = self.companies.get(normalize_symbol(company))
+                if code is None:
+                    return []
+                matched = matched[self.doc_company[matched] == code]
+            if since is not None:
+                matched = matched[self.doc_date[matched] >= since]
+            if until is not None:
+                matched = matched[self.doc_date[matched] <= until]
+            if not matched.size:
+                return []
+
+            # BM25
+            scores = np.zeros(matched.size)
+            average_length = self.total_length / n_docs or 1
+            norms = K1 * (1 - B + B * self.doc_length[matched] / average_length)
+            for word in scoring_words:
+                decoded = self._decode(word)
+                if decoded is None:
+                    continue
+                docs, tfs = decoded
+                idf = math.log(1 + (n_docs - docs.size + 0.5) / (docs.size + 0.5))
+                found = np.searchsorted(docs, matched)
+                found = np.minimum(found, docs.size - 1)
+                present = docs[found] == matched
+                tf = np.where(present, tfs[found], 0)
+                scores += idf * tf * (K1 + 1) / (tf + norms)
+
+            top = min(limit, matched.size)
+            order = np.argpartition(-scores, top - 1)[:top]
+            order = order[np.argsort(-scores[order], kind='stable')]
+            codes = {number: code for code, number in self.companies.items()}
+            return [{
+                'id': self.external_ids[matched[index]],
+                'score': round(float(scores[index]), 4),
+                'company_code': codes.get(int(self.doc_company[matched[index]])) or None,
+                'published_at': float(self.doc_date[matched[index]])
+            } for index in order]
+
+    # Kalıcılık
+    def save(self):
+        """İndeksi tek .npz dosyasına yaz (geçici dosya + atomik değiştirme)"""
+        with self._lock:
+            words = list(self.terms)
+            postings = [self.terms[word] for word in words]
+            n_docs = len(self.external_ids)
+            arrays = {
+                'words': np.array(words, dtype=str),
+                'doc_counts': np.array([len(item.docs) for item in postings], dtype=np.int64),
+                'position_counts': np.array([len(item.positions) for item in postings], dtype=np.int64),
+                'docs': np.concatenate([np.array(item.docs, dtype=np.uint32) for item in postings]) if postings else np.zeros(0, np.uint32),
+                'tfs': np.concatenate([np.array(item.tfs, dtype=np.uint32) for item in postings]) if postings else np.zeros(0, np.uint32),
+                'positions': np.concatenate([np.array(item.positions, dtype=np.uint32) for item in postings]) if postings else np.zeros(0, np.uint32),
+                'external_ids': np.array(self.external_ids, dtype=str),
+                'doc_company': self.doc_company[:n_docs],
+                'doc_date': self.doc_date[:n_docs],
+                'doc_length': self.doc_length[:n_docs],
+                'meta': np.array(json.dumps({
+                    'companies': self.companies, 'total_length': self.total_length, 'last_rowid': self.last_rowid
+                }))
+            }
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp.npz"
+            np.savez(temp_path, **arrays)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+    @classmethod
+    def load(cls, path=os.path.join('data', 'disclosure_index.npz')):
+        """Kaydedilmiş indeksi yükle; dosya yoksa boş indeks"""
+        index = cls(path)
+        if not os.path.exists(path):
+            return index
+        data = np.load(path)
+        meta = json.loads(str(data['meta']))
+        index.companies = meta['companies']
+        index.total_length = meta['total_length']
+        index.last_rowid = meta['last_rowid']
+        index.external_ids = data['external_ids'].tolist()
+        index.doc_by_id = {external_id: doc for doc, external_id in enumerate(index.external_ids)}
+        n_docs = len(index.external_ids)
+        index._ensure_capacity(n_docs)
+        index.doc_company[:n_docs] = data['doc_company']
+        index.doc_date[:n_docs] = data['doc_date']
+        index.doc_length[:n_docs] = data['doc_length']
+
+        doc_offsets = np.concatenate(([0], np.cumsum(data['doc_counts'])))
+        position_offsets = np.concatenate(([0], np.cumsum(data['position_counts'])))
+        docs, tfs, positions = data['docs'], data['tfs'], data['positions']
+        for number, word in enumerate(data['words'].tolist()):
+            postings = _Postings()
+            postings.docs = array('I', docs[doc_offsets[number]:doc_offsets[number + 1]].tobytes())
+            postings.tfs = array('I', tfs[doc_offsets[number]:doc_offsets[number + 1]].tobytes())
+            postings.positions = array('I', positions[position_offsets[number]:position_offsets[number + 1]].tobytes())
+            postings.last_doc = int(np.sum(postings.docs, dtype=np.int64)) if len(postings.docs) else 0
+            index.terms[word] = postings
+        return index
+
+    def get_stats(self):
+        with self._lock:
+            posting_bytes = sum(
+                (len(item.docs) + len(item.tfs) + len(item.positions)) * 4 for item in self.terms.values()
+            )
+            return {
+                'documents': len(self.external_ids),
+                'terms': len(self.terms),
+                'companies': len(self.companies),
+                'posting_bytes': posting_bytes,
+                'last_rowid': self.last_rowid
+            }
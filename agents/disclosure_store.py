@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from price_bus import normalize_symbol
+
+_DATE_FORMATS = ('%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+def parse_publish_date(value):
+    """KAP tarih alanı (ISO veya 'gg.aa.yyyy ss:dd') -> epoch; çözülemezse None"""
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        pass
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def disclosure_id(disclosure):
+    """KAP id'si; yoksa (kazıma sonuçları) şirket/başlık/tarihten türetilir"""
+    if disclosure.get('id'):
+        return str(disclosure['id'])
+    key = '|'.join(str(disclosure.get(field) or '') for field in ('company_code', 'company', 'title', 'date'))
+    return 'h_' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+class DisclosureStore:
+    """Kalıcı KAP bildirim deposu (sqlite)
+
+    Bildirimler id ile tekilleştirilir; (şirket kodu, yayın zamanı) ve
+    yayın zamanı üzerindeki indekslerle şirket/tarih sorguları tarama
+    yapmadan okunur. Kaynak başına yüksek su imi (son id / yayın zamanı)
+    tutulur, böylece yoklama sadece yeni bildirimleri ister. Yeni eklenen
+    bildirimler abonelere (ör. arama indeksi) iletilir.
+    """
+
+    def __init__(self, path=os.path.join('data', 'disclosures.db')):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.stats = {'received': 0, 'inserted': 0, 'duplicates': 0}
+
+    def _connect(self):
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS disclosures (
+                    id TEXT PRIMARY KEY,
+                    company_code TEXT,
+                    published_at REAL,
+                    ingested_at REAL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_disclosures_company_date ON disclosures (company_code, published_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_disclosures_date ON disclosures (published_at DESC);
+                CREATE TABLE IF NOT EXISTS cursors (
+                    source TEXT PRIMARY KEY,
+                    last_id TEXT,
+                    last_published REAL,
+                    updated_at REAL
+                );
+            """)
+            self._db.commit()
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def subscribe(self, callback):
+        """callback(yeni bildirim listesi) her başarılı eklemede çağrılır"""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    # Yazma
+    def add_many(self, disclosures):
+        """Bildirimleri ekle; daha önce görülen id'ler atlanır. Yeni eklenenleri döndürür"""
+        now = time.time()
+        rows = {}
+        for disclosure in disclosures:
+            record = dict(disclosure)
+            record['id'] = disclosure_id(record)
+            if record.get('company_code'):
+                record['company_code'] = normalize_symbol(record['company_code'])
+            published_at = parse_publish_date(record.get('date'))
+            record['published_at'] = published_at if published_at is not None else now
+            rows.setdefault(record['id'], record)
+
+        inserted = []
+        with self._lock:
+            db = self._connect()
+            for record in rows.values():
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO disclosures (id, company_code, published_at, ingested_at, data) VALUES (?, ?, ?, ?, ?)",
+                    (record['id'], record.get('company_code') or None, record['published_at'], now,
+                     json.dumps(record, ensure_ascii=False, default=str))
+                )
+                if cursor.rowcount:
+                    inserted.append(record)
+            db.commit()
+            self.stats['received'] += len(disclosures)
+            self.stats['inserted'] += len(inserted)
+            self.stats['duplicates'] += len(disclosures) - len(inserted)
+
+        if inserted:
+            for callback in list(self._subscribers):
+                try:
+                    callback(inserted)
+                except Exception as e:
+                    print(f"Bildirim abonesi hatası: {e}")
+        return inserted
+
+    def get_cursor(self, source):
+        """{'last_id', 'last_published', 'updated_at'} veya None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT last_id, last_published, updated_at FROM cursors WHERE source = ?", (source,)
+            ).fetchone()
+        return dict(zip(('last_id', 'last_published', 'updated_at'), row)) if row else None
+
+    def advance_cursor(self, source, disclosures):
+        """İmleci verilen bildirimlerin en yenisine ilerlet (geri gitmez)"""
+        if not disclosures:
+            return self.get_cursor(source)
+        newest = max(disclosures, key=lambda record: record['published_at'])
+        current = self.get_cursor(source)
+        if current and current['last_published'] is not None and current['last_published'] >= newest['published_at']:
+            return current
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO cursors (source, last_id, last_published, updated_at) VALUES (?, ?, ?, ?)",
+                (source, newest['id'], newest['published_at'], time.time())
+            )
+            db.commit()
+        return self.get_cursor(source)
+
+    # Okuma
+    def _select(self, where, params, limit):
+        query = f"SELECT data FROM disclosures {where} ORDER BY published_at DESC"
+        if limit:
+            query += " LIMIT ?"
+            params = (*params, int(limit))
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def get(self, disclosure_id_value):
+        found = self._select("WHERE id = ?", (str(disclosure_id_value),), 1)
+        return found[0] if found else None
+
+    def get_many(self, ids):
+        """id listesi -> bildirimler (verilen sırada, bulunamayanlar atlanır)"""
+        ids = [str(value) for value in ids]
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for record in self._select(f"WHERE id IN ({placeholders})", tuple(chunk), None):
+                found[record['id']] = record
+        return [found[value] for value in ids if value in found]
+
+    def company_disclosures(self, company_code, since=None, until=None, limit=50):
+        """Şirketin bildirimleri (yeniden eskiye); since/until epoch"""
+        return self._select(
+            "WHERE company_code = ? AND published_at >= ? AND published_at <= ?",
+            (normalize_symbol(company_code), since or 0, until or float('inf')), limit
+        )
+
+    def recent(self, limit=10, since=None):
+        return self._select("WHERE published_at >= ?", (since or 0,), limit)
+
+    def iter_records(self, after_rowid=0, batch_size=1000):
+        """Ekleme sırasıyla (rowid, bildirim) çiftleri; indeks senkronu için"""
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT rowid, data FROM disclosures WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (after_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for rowid, data in rows:
+                yield rowid, json.loads(data)
+            after_rowid = rows[-1][0]
+
+    def count(self, company_code=None):
+        with self._lock:
+            db = self._connect()
+            if company_code:
+                row = db.execute("SELECT COUNT(*) FROM disclosures WHERE company_code = ?",
+                                 (normalize_symbol(company_code),)).fetchone()
+            else:
+                row = db.execute("SELECT COUNT(*) FROM disclosures").fetchone()
+        return row[0]
+
+    def get_stats(self):
+        return dict(self.stats, stored=self.count())
+
+
+disclosure_store = DisclosureStore()
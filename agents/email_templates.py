@@ -0,0 +1,311 @@
+import hashlib
+import html
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.mime.base import MIMEBase
+from email import encoders
+from email.policy import SMTP
+from email.utils import formatdate, make_msgid
+from string import Template
+
+# Dil bazlı sabit metinler; şablonlar derlenirken yerleştirilir
+LOCALE_LABELS = {
+    'tr': {
+        'report_title': 'Multi-Agent AI Analiz Raporu',
+        'subtitle': 'Finansal Analiz Raporu',
+        'confidence': 'Güven',
+        'details': 'Analiz Detayları',
+        'symbol_code': 'Hisse Kodu',
+        'analysis_time': 'Analiz Zamanı',
+        'recommendation': 'Öneri',
+        'confidence_level': 'Güven Seviyesi',
+        'agent_analyses': 'AI Agent Analizleri',
+        'positive': 'Pozitif',
+        'strong': 'Güçlü',
+        'uptrend': 'Yükseliş',
+        'risk_title': 'Risk Uyarısı',
+        'risk_text': 'Bu rapor yatırım danışmanlığı değildir. Yatırım kararlarınızı almadan önce uzmanlardan görüş alınız. Geçmiş performans gelecekteki sonuçları garanti etmez.',
+        'footer': 'Multi-Agent Finans AI Sistemi tarafından oluşturulmuştur',
+        'footer_tags': '🤖 7 Uzman AI Agent • 📊 Gerçek Zamanlı Analiz • 🎯 Akıllı Kararlar',
+        'daily_title': 'Multi-Agent Finans AI Sistemi - Günlük Rapor',
+        'greeting': 'Merhaba,',
+        'daily_intro': 'Bugünün piyasa analiz raporunu ekte bulabilirsiniz.',
+        'highlights': 'Günün Öne Çıkanları:',
+        'top_symbol': 'En çok analiz edilen hisse',
+        'system_status': 'Sistem durumu: Aktif ve stabil',
+        'agent_performance': 'Agent performansı: %95 başarı oranı',
+        'see_pdf': 'Detaylı analiz için ekteki PDF raporunu inceleyiniz.',
+        'closing': 'İyi günler,'
+    },
+    'en': {
+        'report_title': 'Multi-Agent AI Analysis Report',
+        'subtitle': 'Financial Analysis Report',
+        'confidence': 'Confidence',
+        'details': 'Analysis Details',
+        'symbol_code': 'Ticker',
+        'analysis_time': 'Analysis Time',
+        'recommendation': 'Recommendation',
+        'confidence_level': 'Confidence Level',
+        'agent_analyses': 'AI Agent Analyses',
+        'positive': 'Positive',
+        'strong': 'Strong',
+        'uptrend': 'Uptrend',
+        'risk_title': 'Risk Disclaimer',
+        'risk_text': 'This report is not investment advice. Consult a professional before making investment decisions. Past performance does not guarantee future results.',
+        'footer': 'Generated by the Multi-Agent Finance AI System',
+        'footer_tags': '🤖 7 Expert AI Agents • 📊 Real-Time Analysis • 🎯 Smart Decisions',
+        'daily_title': 'Multi-Agent Finance AI System - Daily Report',
+        'greeting': 'Hello,',
+        'daily_intro': "Today's market analysis report is attached.",
+        'highlights': 'Highlights of the Day:',
+        'top_symbol': 'Most analysed ticker',
+        'system_status': 'System status: Active and stable',
+        'agent_performance': 'Agent performance: 95% success rate',
+        'see_pdf': 'See the attached PDF report for the detailed analysis.',
+        'closing': 'Best regards,'
+    }
+}
+
+ANALYSIS_EMAIL = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>${L_report_title}</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
+
+            <!-- Header -->
+            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; border-radius: 10px; text-align: center; margin-bottom: 30px;">
+                <h1 style="margin: 0; font-size: 28px;">🤖 Multi-Agent AI Sistemi</h1>
+                <p style="margin: 10px 0 0 0; opacity: 0.9;">${L_subtitle}</p>
+            </div>
+
+            <!-- Ana Sonuç -->
+            <div style="background: ${color}; color: white; padding: 25px; border-radius: 10px; text-align: center; margin-bottom: 25px;">
+                <h2 style="margin: 0; font-size: 24px;">${icon} ${symbol}</h2>
+                <h1 style="margin: 15px 0 5px 0; font-size: 32px;">${recommendation}</h1>
+                <p style="margin: 0; font-size: 18px; opacity: 0.9;">${L_confidence}: %${confidence}</p>
+            </div>
+
+            <!-- Detaylar -->
+            <div style="background: #f8f9fa; padding: 25px; border-radius: 10px; margin-bottom: 25px;">
+                <h3 style="color: #1890ff; margin-top: 0;">📊 ${L_details}</h3>
+                <table style="width: 100%; border-collapse: collapse;">
+                    <tr>
+                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;"><strong>${L_symbol_code}:</strong></td>
+                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0; text-align: right;">${symbol}</td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;"><strong>${L_analysis_time}:</strong></td>
+                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0; text-align: right;">${analysis_time}</td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;"><strong>${L_recommendation}:</strong></td>
+                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0; text-align: right; color: ${color}; font-weight: bold;">${recommendation}</td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 8px 0;"><strong>${L_confidence_level}:</strong></td>
+                        <td style="padding: 8px 0; text-align: right;"><strong>%${confidence}</strong></td>
+                    </tr>
+                </table>
+            </div>
+
+            <!-- Agent Analizleri -->
+            <div style="background: #fff; border: 1px solid #e0e0e0; padding: 25px; border-radius: 10px; margin-bottom: 25px;">
+                <h3 style="color: #1890ff; margin-top: 0;">🤖 ${L_agent_analyses}</h3>
+                <div style="display: flex; justify-content: space-between; flex-wrap: wrap; gap: 15px;">
+                    <div style="flex: 1; min-width: 120px; text-align: center; padding: 15px; background: #f0f9ff; border-radius: 8px;">
+                        <div style="font-size: 24px;">📰</div>
+                        <div style="font-weight: bold; margin: 5px 0;">News Agent</div>
+                        <div style="color: #52c41a;">✅ ${L_positive}</div>
+                    </div>
+                    <div style="flex: 1; min-width: 120px; text-align: center; padding: 15px; background: #f0f9ff; border-radius: 8px;">
+                        <div style="font-size: 24px;">💰</div>
+                        <div style="font-weight: bold; margin: 5px 0;">Financial</div>
+                        <div style="color: #1890ff;">📊 ${L_strong}</div>
+                    </div>
+                    <div style="flex: 1; min-width: 120px; text-align: center; padding: 15px; background: #f0f9ff; border-radius: 8px;">
+                        <div style="font-size: 24px;">📈</div>
+                        <div style="font-weight: bold; margin: 5px 0;">Technical</div>
+                        <div style="color: #52c41a;">⬆️ ${L_uptrend}</div>
+                    </div>
+                </div>
+            </div>
+
+            <!-- Risk Uyarısı -->
+            <div style="background: #fff2e8; border-left: 4px solid #faad14; padding: 20px; margin-bottom: 25px; border-radius: 0 8px 8px 0;">
+                <h4 style="color: #d48806; margin-top: 0;">⚠️ ${L_risk_title}</h4>
+                <p style="margin-bottom: 0; color: #8c5e00;">${L_risk_text}</p>
+            </div>
+
+            <!-- Footer -->
+            <div style="text-align: center; padding: 20px; color: #666; font-size: 14px; border-top: 1px solid #e0e0e0;">
+                <p style="margin: 0 0 10px 0;">${L_footer}</p>
+                <p style="margin: 0; font-size: 12px;">${L_footer_tags}</p>
+            </div>
+
+        </body>
+        </html>
+        """
+
+DAILY_REPORT_EMAIL = """
+        <html>
+        <body>
+        <h2>🤖 ${L_daily_title}</h2>
+        <p>${L_greeting}</p>
+        <p>${L_daily_intro}</p>
+
+        <h3>📊 ${L_highlights}</h3>
+        <ul>
+        <li>${L_top_symbol}: ${top_symbol}</li>
+        <li>${L_system_status}</li>
+        <li>${L_agent_performance}</li>
+        </ul>
+
+        <p>${L_see_pdf}</p>
+
+        <p>${L_closing}<br/>
+        Multi-Agent AI Sistemi</p>
+        </body>
+        </html>
+        """
+
+TEMPLATES = {
+    'analysis_email': ANALYSIS_EMAIL,
+    'daily_report_email': DAILY_REPORT_EMAIL
+}
+
+
+def content_id(data):
+    """Veri içeriğinden kararlı kimlik (analiz id'si yoksa önbellek anahtarı)"""
+    payload = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class TemplateRenderer:
+    """Önceden derlenmiş şablonlar ve LRU render önbelleği
+
+    Her (şablon, dil) çifti açılışta bir kez derlenir: dil metinleri
+    yerleştirilir, geriye sadece veri alanları kalır. Render sonuçları
+    (şablon, analiz id, dil) anahtarıyla önbelleklenir; aynı analizi alan
+    tüm alıcılar aynı HTML'i paylaşır.
+    """
+
+    def __init__(self, cache_size=256, default_locale='tr'):
+        self.cache_size = cache_size
+        self.default_locale = default_locale
+        self._compiled = {}
+        for name, source in TEMPLATES.items():
+            for locale, labels in LOCALE_LABELS.items():
+                localized = Template(source).safe_substitute({f'L_{key}': value for key, value in labels.items()})
+                self._compiled[(name, locale)] = Template(localized)
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, template_name, context, cache_id=None, locale=None):
+        locale = locale if locale in LOCALE_LABELS else self.default_locale
+        key = (template_name, cache_id or content_id(context), locale)
+
+        with self._lock:
+            rendered = self._cache.get(key)
+            if rendered is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return rendered
+
+        values = {name: html.escape(str(value)) for name, value in context.items()}
+        rendered = self._compiled[(template_name, locale)].substitute(values)
+
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = rendered
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rendered
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'cached': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+def analysis_email_context(analysis_result):
+    """Analiz e-postası şablon alanları"""
+    recommendation = analysis_result.get('recommendation', 'BEKLE')
+    timestamp = analysis_result.get('timestamp', datetime.now().isoformat())
+
+    # Renk seçimi
+    if 'AL' in recommendation:
+        color, icon = '#52c41a', '📈'
+    elif 'SAT' in recommendation:
+        color, icon = '#f5222d', '📉'
+    else:
+        color, icon = '#faad14', '⏳'
+
+    analysis_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00') if timestamp.endswith('Z') else timestamp)
+    return {
+        'symbol': analysis_result.get('symbol', 'UNKNOWN'),
+        'recommendation': recommendation,
+        'confidence': analysis_result.get('confidence', 50),
+        'analysis_time': analysis_time.strftime('%d.%m.%Y %H:%M'),
+        'color': color,
+        'icon': icon
+    }
+
+
+class PreparedEmail:
+    """Bir kez kodlanmış MIME gövdesi
+
+    HTML ve ekler tek sefer base64/quoted-printable kodlanır; her alıcı için
+    sadece From/To/Subject/Date/Message-ID başlıkları öne eklenir.
+    """
+
+    def __init__(self, html_content, pdf_path=None):
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+
+        # PDF eki varsa ekle
+        if pdf_path:
+            with open(pdf_path, 'rb') as attachment:
+                part = MIMEBase('application', 'octet-stream')
+                part.set_payload(attachment.read())
+            encoders.encode_base64(part)
+            part.add_header('Content-Disposition', f'attachment; filename= {os.path.basename(pdf_path)}')
+            msg.attach(part)
+
+        self.body = msg.as_bytes(policy=SMTP)
+        self._subjects = {}
+
+    def for_recipients(self, sender, recipients, subject):
+        encoded_subject = self._subjects.get(subject)
+        if encoded_subject is None:
+            # Uzun konular katlanır; devam satırları SMTP'nin beklediği CRLF ile ayrılmalı
+            encoded_subject = self._subjects[subject] = Header(subject, 'utf-8').encode(linesep='\r\n')
+
+        headers = (
+            f"From: {sender}\r\n"
+            f"To: {', '.join(recipients)}\r\n"
+            f"Subject: {encoded_subject}\r\n"
+            f"Date: {formatdate(localtime=True)}\r\n"
+            f"Message-ID: {make_msgid(domain=sender.rpartition('@')[2] or None)}\r\n"
+        )
+        return headers.encode('utf-8') + self.body
+
+
+# Paylaşılan render önbelleği
+template_renderer = TemplateRenderer()
@@ -0,0 +1,272 @@
+import asyncio
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# BIST pay piyasası seansı (10:00-18:00) için yarım saatlik tipik hacim profili
+# (açılış ve kapanışta yoğunlaşan U şekli); toplam 1'e normalize edilir
+SESSION_START_MINUTE = 10 * 60
+SESSION_END_MINUTE = 18 * 60
+INTRADAY_VOLUME_PROFILE = np.array([
+    0.105, 0.075, 0.062, 0.056, 0.052, 0.049, 0.047, 0.045,
+    0.046, 0.048, 0.052, 0.056, 0.062, 0.071, 0.080, 0.094
+])
+INTRADAY_VOLUME_PROFILE = INTRADAY_VOLUME_PROFILE / INTRADAY_VOLUME_PROFILE.sum()
+PROFILE_BUCKET_MINUTES = 30
+
+# Dakika başına hacim payı
+_MINUTE_PROFILE = np.repeat(INTRADAY_VOLUME_PROFILE / PROFILE_BUCKET_MINUTES, PROFILE_BUCKET_MINUTES)
+_CUMULATIVE_SHARE = np.concatenate([[0.0], np.cumsum(_MINUTE_PROFILE)])
+
+
+def _cumulative_share(session_minute):
+    """Seans başından verilen dakikaya kadar gerçekleşen hacim payı"""
+    minute = min(max(session_minute, 0.0), len(_MINUTE_PROFILE))
+    whole = int(minute)
+    partial = _MINUTE_PROFILE[whole] * (minute - whole) if whole < len(_MINUTE_PROFILE) else 0.0
+    return _CUMULATIVE_SHARE[whole] + partial
+
+
+def session_volume_share(start, end):
+    """[start, end) aralığına düşen günlük hacim payı (gün sınırlarını aşabilir)"""
+    share = 0.0
+    while start < end:
+        day_start = datetime.combine(start.date(), datetime.min.time())
+        segment_end = min(end, day_start + timedelta(days=1))
+        share += (_cumulative_share((segment_end - day_start).total_seconds() / 60 - SESSION_START_MINUTE) -
+                  _cumulative_share((start - day_start).total_seconds() / 60 - SESSION_START_MINUTE))
+        start = segment_end
+    return share
+
+
+def next_session_open(moment):
+    """moment seans içindeyse kendisi, değilse bir sonraki iş günü seans açılışı"""
+    minute = moment.hour * 60 + moment.minute
+    if moment.weekday() < 5 and SESSION_START_MINUTE <= minute < SESSION_END_MINUTE:
+        return moment
+    day = moment.date() if moment.weekday() < 5 and minute < SESSION_START_MINUTE else moment.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return datetime.combine(day, datetime.min.time()) + timedelta(minutes=SESSION_START_MINUTE)
+
+
+def session_window(start, duration_minutes):
+    """(açılışa kadar bekleme, yürütme süresi) saniye: seans dışında bir sonraki açılıştan
+    başlar, süre o seansın kapanışını aşmaz"""
+    opens_at = next_session_open(start)
+    closes_at = datetime.combine(opens_at.date(), datetime.min.time()) + timedelta(minutes=SESSION_END_MINUTE)
+    window = min(duration_minutes * 60, (closes_at - opens_at).total_seconds())
+    return (opens_at - start).total_seconds(), window
+
+
+def cap_schedule(schedule, max_child, interval):
+    """max_child'ı aşan dilimleri kendi aralığına yayılmış ek alt emirlere böl"""
+    capped = []
+    for offset, quantity in schedule:
+        parts = int(np.ceil(quantity / max_child))
+        if parts <= 1:
+            capped.append((offset, quantity))
+            continue
+        for i, part in enumerate(allocate_quantity(quantity, np.ones(parts))):
+            capped.append((offset + i * interval / parts, int(part)))
+    return capped
+
+
+def allocate_quantity(quantity, weights):
+    """Tamsayı lotları ağırlıklara göre dağıt (en büyük kalan yöntemi)"""
+    weights = np.asarray(weights, dtype=float)
+    if weights.sum() <= 0:
+        weights = np.ones(len(weights))
+    raw = quantity * weights / weights.sum()
+    allocation = np.floor(raw).astype(int)
+    shortfall = int(quantity - allocation.sum())
+    if shortfall:
+        allocation[np.argsort(raw - allocation)[::-1][:shortfall]] += 1
+    return allocation
+
+
+def twap_schedule(quantity, duration_minutes, slices, start=None):
+    """Eşit zaman aralıklarında eşit miktar: [(saniye ofseti, miktar)]
+
+    Dilimler session_window içinde kalır: seans dışında verilen emir bir
+    sonraki açılışta başlar, kapanışı aşan süre kapanışa kadar kısaltılır.
+    """
+    delay, window = session_window(start or datetime.now(), duration_minutes)
+    interval = window / slices
+    allocation = allocate_quantity(quantity, np.ones(slices))
+    return [(delay + i * interval, int(qty)) for i, qty in enumerate(allocation) if qty > 0]
+
+
+def vwap_schedule(quantity, duration_minutes, slices, start=None):
+    """Gün içi hacim profiline orantılı dilimleme
+
+    Pencere TWAP ile aynı şekilde seansa sıkıştırılır; profil payı yoksa TWAP'a döner.
+    """
+    start = start or datetime.now()
+    delay, window = session_window(start, duration_minutes)
+    interval = window / slices
+    opens_at = start + timedelta(seconds=delay)
+    shares = np.array([
+        session_volume_share(opens_at + timedelta(seconds=i * interval), opens_at + timedelta(seconds=(i + 1) * interval))
+        for i in range(slices)
+    ])
+    if shares.sum() <= 0:
+        return twap_schedule(quantity, duration_minutes, slices, start)
+
+    allocation = allocate_quantity(quantity, shares)
+    return [(delay + i * interval, int(qty)) for i, qty in enumerate(allocation) if qty > 0]
+
+
+def pov_schedule(quantity, daily_volume, participation_rate=0.1, interval_minutes=5, start=None,
+                 max_duration_minutes=8 * 60):
+    """Beklenen piyasa hacminin sabit yüzdesi kadar dilimle
+
+    Her aralıkta beklenen hacim = günlük hacim x profil payı. Seans dışında
+    verilen emir bir sonraki seans açılışından başlar. Süre içinde katılım
+    oranını aşmadan planlanamayan miktar dilimlere eklenmez; çağıran
+    planlanan toplamı kontrol etmelidir.
+    """
+    start = start or datetime.now()
+    interval = interval_minutes * 60
+    schedule = []
+    remaining = quantity
+    elapsed = (next_session_open(start) - start).total_seconds()
+    deadline = elapsed + max_duration_minutes * 60
+    while remaining > 0 and elapsed < deadline:
+        slice_start = start + timedelta(seconds=elapsed)
+        expected = daily_volume * session_volume_share(slice_start, slice_start + timedelta(seconds=interval))
+        child = min(remaining, int(expected * participation_rate))
+        if child > 0:
+            schedule.append((elapsed, child))
+            remaining -= child
+        elapsed += interval
+    return schedule
+
+
+class ExecutionScheduler:
+    """Ana emirleri zamanlanmış alt emirlerle yürüten asenkron zamanlayıcı
+
+    Tek bir arka plan thread'inde asyncio döngüsü çalışır; her ana emir bir
+    coroutine'dir ve alt emirler zamanı gelince executor'a verilir. Böylece
+    çok sayıda ana emir emir başına thread açmadan yürütülebilir.
+    time_scale < 1 simülasyonlarda zamanı hızlandırır.
+    """
+
+    def __init__(self, executor, time_scale=1.0):
+        self.executor = executor  # child_params -> sonuç sözlüğü
+        self.time_scale = time_scale
+        self.parents = {}
+        self._ids = itertools.count(1)
+        self._tasks = {}
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="ExecutionScheduler", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, parent_params, schedule, strategy):
+        """Ana emri kaydet ve alt emirleri zamanlamaya başla"""
+        parent_id = f"PRN_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(self._ids):06d}"
+        self.parents[parent_id] = {
+            'parent_id': parent_id,
+            'symbol': parent_params['symbol'],
+            'action': parent_params['action'],
+            'quantity': parent_params['quantity'],
+            'strategy': strategy,
+            'status': 'WORKING',
+            'created_at': datetime.now(),
+            'filled_quantity': 0,
+            'filled_value': 0.0,
+            'children': [
+                {'offset_seconds': offset, 'quantity': quantity, 'status': 'SCHEDULED'}
+                for offset, quantity in schedule
+            ]
+        }
+        self._tasks[parent_id] = asyncio.run_coroutine_threadsafe(
+            self._work_parent(parent_id, parent_params), self.loop
+        )
+        return parent_id
+
+    async def _work_parent(self, parent_id, parent_params):
+        parent = self.parents[parent_id]
+        start = self.loop.time()
+
+        try:
+            for child in parent['children']:
+                delay = start + child['offset_seconds'] * self.time_scale - self.loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Defter fsync'i döngüyü bloklamasın; diğer ana emirler beklemeden devam eder
+                await self.loop.run_in_executor(None, self._execute_child, parent, parent_params, child)
+        except asyncio.CancelledError:
+            for child in parent['children']:
+                if child['status'] == 'SCHEDULED':
+                    child['status'] = 'CANCELLED'
+        finally:
+            if parent['status'] != 'CANCELLED':
+                parent['status'] = 'COMPLETED' if parent['filled_quantity'] == parent['quantity'] else 'PARTIAL'
+            parent['completed_at'] = datetime.now()
+            self._tasks.pop(parent_id, None)
+
+    def _execute_child(self, parent, parent_params, child):
+        child_params = dict(parent_params, quantity=child['quantity'])
+        try:
+            result = self.executor(child_params)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        if result.get('success'):
+            summary = result['execution_summary']
+            filled = summary['quantity']  # likidite yetmezse kısmi gerçekleşme
+            child.update(status='FILLED' if filled == child['quantity'] else 'PARTIAL', trade_id=result['trade_id'],
+                         executed_price=summary['executed_price'], filled_quantity=filled)
+            parent['filled_quantity'] += filled
+            parent['filled_value'] += filled * summary['executed_price']
+        else:
+            child.update(status='FAILED', error=result.get('error'))
+
+    def cancel(self, parent_id):
+        parent = self.parents.get(parent_id)
+        if parent is None or parent['status'] != 'WORKING':
+            return False
+        parent['status'] = 'CANCELLED'
+        future = self._tasks.get(parent_id)
+        if future:
+            future.cancel()  # bekleyen alt emirler gönderilmez
+        return True
+
+    def get_status(self, parent_id):
+        parent = self.parents.get(parent_id)
+        if parent is None:
+            return None
+        filled = parent['filled_quantity']
+        return {
+            'parent_id': parent_id,
+            'symbol': parent['symbol'],
+            'action': parent['action'],
+            'strategy': parent['strategy'],
+            'status': parent['status'],
+            'quantity': parent['quantity'],
+            'filled_quantity': filled,
+            'avg_price': round(parent['filled_value'] / filled, 4) if filled else None,
+            'children_done': sum(1 for child in parent['children'] if child['status'] != 'SCHEDULED'),
+            'children_total': len(parent['children'])
+        }
+
+    def active_count(self):
+        return len(self._tasks)
+
+    def shutdown(self, timeout=5):
+        for parent_id in list(self._tasks):
+            self.cancel(parent_id)
+        deadline = time.time() + timeout
+        while self._tasks and time.time() < deadline:
+            time.sleep(0.01)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=timeout)
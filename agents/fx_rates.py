@@ -0,0 +1,277 @@
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta
+
+import requests
+
+# Sabit tarihli resmi tatiller (ay, gün)
+FIXED_HOLIDAYS = {(1, 1), (4, 23), (5, 1), (5, 19), (7, 15), (8, 30), (10, 29)}
+
+# Dini bayramlar (Ramazan + Kurban); listede olmayan yıllarda 404 geri çekilmesi ve
+# 'missing' önbelleği devreye girer
+RELIGIOUS_HOLIDAYS = {
+    '2024-04-10', '2024-04-11', '2024-04-12',
+    '2024-06-16', '2024-06-17', '2024-06-18', '2024-06-19',
+    '2025-03-30', '2025-03-31', '2025-04-01',
+    '2025-06-06', '2025-06-07', '2025-06-08', '2025-06-09',
+    '2026-03-20', '2026-03-21', '2026-03-22',
+    '2026-05-27', '2026-05-28', '2026-05-29', '2026-05-30',
+}
+
+RATE_FIELDS = ('forex_buying', 'forex_selling', 'banknote_buying', 'banknote_selling')
+_XML_FIELDS = ('ForexBuying', 'ForexSelling', 'BanknoteBuying', 'BanknoteSelling')
+
+
+def to_date(value):
+    """date, datetime, epoch veya ISO metin -> date (None: bugün)"""
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).date()
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).date()
+
+
+def is_business_day(day):
+    """TCMB kur bülteni yayımlanan gün mü (hafta sonu ve resmi tatiller hariç)"""
+    return day.weekday() < 5 and (day.month, day.day) not in FIXED_HOLIDAYS and day.isoformat() not in RELIGIOUS_HOLIDAYS
+
+
+def previous_business_days(day, max_days):
+    """day ve öncesindeki iş günleri (yeniden eskiye), en fazla max_days takvim günü geriye"""
+    for offset in range(max_days + 1):
+        candidate = day - timedelta(days=offset)
+        if is_business_day(candidate):
+            yield candidate
+
+
+def parse_tcmb_xml(xml_content):
+    """TCMB günlük kur XML'i -> {döviz: {'unit', 'forex_buying', ...}}"""
+    root = ET.fromstring(xml_content)
+    rates = {}
+    for currency in root.findall('Currency'):
+        code = currency.get('CurrencyCode')
+        values = {}
+        for field, tag in zip(RATE_FIELDS, _XML_FIELDS):
+            text = (currency.findtext(tag) or '').strip()
+            values[field] = float(text) if text else None
+        if code and values['forex_selling'] is not None:
+            values['unit'] = int((currency.findtext('Unit') or '1').strip() or 1)
+            rates[code] = values
+    return rates
+
+
+class FxRateService:
+    """TCMB kurları: iş günü çözümleme, kalıcı günlük önbellek ve kur geçmişi
+
+    İstenen tarih için en son yayımlanmış bülten, tatil/hafta sonu takvimi
+    üzerinden geriye doğru sınırlı sayıda istekle bulunur. Ayrıştırılan her
+    günlük bülten sqlite'a kalıcı yazılır; geçmiş günler bir kez indirilir,
+    yayımlanmadığı anlaşılan geçmiş günler de 'missing' olarak saklanır.
+    Henüz yayımlanmamış bugünün bülteni kısa süre (negative_ttl) tekrar
+    istenmez. Ağ yoksa önbellekteki en yakın önceki gün kullanılır.
+    """
+
+    def __init__(self, path=os.path.join('data', 'fx_rates.db'), base_url="https://www.tcmb.gov.tr/kurlar",
+                 max_lookback_days=10, max_requests=4, timeout=5, negative_ttl=600):
+        self.path = path
+        self.base_url = base_url
+        self.max_lookback_days = max_lookback_days
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self._db = None
+        self._lock = threading.Lock()
+        self._recent_misses = {}  # gün -> zaman (bugün ve sonrası için geçici)
+        self.session = requests.Session()
+        self.stats = {'requests': 0, 'downloaded': 0, 'missing': 0, 'cache_hits': 0, 'errors': 0}
+
+    def _connect(self):
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS fx_days (
+                    day TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    fetched_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS fx_rates (
+                    day TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    unit INTEGER NOT NULL,
+                    forex_buying REAL,
+                    forex_selling REAL,
+                    banknote_buying REAL,
+                    banknote_selling REAL,
+                    PRIMARY KEY (currency, day)
+                ) WITHOUT ROWID;
+            """)
+            self._db.commit()
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Günlük bültenler
+    def _day_status(self, day):
+        with self._lock:
+            row = self._connect().execute("SELECT status FROM fx_days WHERE day = ?", (day.isoformat(),)).fetchone()
+        return row[0] if row else None
+
+    def _store_day(self, day, status, rates=None):
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO fx_days (day, status, fetched_at) VALUES (?, ?, ?)",
+                       (day.isoformat(), status, time.time()))
+            if rates:
+                db.executemany(
+                    "INSERT OR REPLACE INTO fx_rates (day, currency, unit, forex_buying, forex_selling, "
+                    "banknote_buying, banknote_selling) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(day.isoformat(), code, values['unit'], *(values[field] for field in RATE_FIELDS))
+                     for code, values in rates.items()]
+                )
+            db.commit()
+
+    def fetch_day(self, day):
+        """Günün bültenini indir ve sakla; yayımlanmamışsa False (ağ hatası istisna fırlatır)"""
+        url = f"{self.base_url}/{day.strftime('%Y%m')}/{day.strftime('%d%m%Y')}.xml"
+        self.stats['requests'] += 1
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            self.stats['missing'] += 1
+            if day < date.today():
+                self._store_day(day, 'missing')  # geçmiş gün: bir daha istenmez
+            else:
+                self._recent_misses[day] = time.time()
+            return False
+        response.raise_for_status()
+        rates = parse_tcmb_xml(response.content)
+        if not rates:
+            raise ValueError(f"Boş kur bülteni: {url}")
+        self._store_day(day, 'ok', rates)
+        self.stats['downloaded'] += 1
+        return True
+
+    def resolve_day(self, on=None):
+        """on tarihinde geçerli olan (en son yayımlanmış) bülten günü -> (gün, bayat mı)"""
+        on = to_date(on)
+        requests_left = self.max_requests
+        for day in previous_business_days(on, self.max_lookback_days):
+            status = self._day_status(day)
+            if status == 'ok':
+                self.stats['cache_hits'] += 1
+                return day, False
+            if status == 'missing':
+                continue
+            missed_at = self._recent_misses.get(day)
+            if missed_at and time.time() - missed_at < self.negative_ttl:
+                continue
+            if requests_left <= 0:
+                break
+            requests_left -= 1
+            try:
+                if self.fetch_day(day):
+                    return day, False
+            except (requests.RequestException, ET.ParseError, ValueError) as e:
+                self.stats['errors'] += 1
+                print(f"TCMB kur hatası ({day}): {e}")
+                break
+
+        # Ağ yok veya geri çekilme sınırı doldu: önbellekteki en yakın önceki gün
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT day FROM fx_days WHERE status = 'ok' AND day <= ? ORDER BY day DESC LIMIT 1", (on.isoformat(),)
+            ).fetchone()
+        return (date.fromisoformat(row[0]), True) if row else (None, True)
+
+    # Kurlar
+    def get_rates(self, on=None, field='forex_selling'):
+        """on tarihindeki TCMB kurları {'USD_TRY': ...} (birim başına)"""
+        day, stale = self.resolve_day(on)
+        if day is None:
+            return {'success': False, 'error': 'TCMB kur bülteni bulunamadı'}
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT currency, unit, {field} FROM fx_rates WHERE day = ?", (day.isoformat(),)
+            ).fetchall()
+        return {
+            'success': True,
+            'date': day.isoformat(),
+            'rates': {f"{code}_TRY": value / unit for code, unit, value in rows if value is not None},
+            'source': 'TCMB',
+            'stale': stale
+        }
+
+    def get_rate(self, currency, on=None, field='forex_selling'):
+        """1 birim dövizin TL karşılığı; bulunamazsa None"""
+        currency = currency.upper()
+        if currency == 'TRY':
+            return 1.0
+        day, _ = self.resolve_day(on)
+        if day is None:
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT unit, {field} FROM fx_rates WHERE currency = ? AND day <= ? AND {field} IS NOT NULL "
+                "ORDER BY day DESC LIMIT 1",
+                (currency, day.isoformat())
+            ).fetchone()
+        return row[1] / row[0] if row else None
+
+    def convert(self, amount, from_currency, to_currency='TRY', on=None):
+        """Tutarı on tarihindeki TCMB kuru ile çevir (TL üzerinden çapraz)"""
+        from_rate = self.get_rate(from_currency, on)
+        to_rate = self.get_rate(to_currency, on)
+        if from_rate is None or to_rate is None:
+            return None
+        return amount * from_rate / to_rate
+
+    def backfill(self, start, end=None):
+        """[start, end] aralığındaki eksik iş günlerini indir"""
+        start, end = to_date(start), to_date(end)
+        result = {'downloaded': 0, 'missing': 0, 'cached': 0, 'errors': []}
+        day = start
+        while day <= end:
+            if is_business_day(day):
+                if self._day_status(day):
+                    result['cached'] += 1
+                else:
+                    try:
+                        result['downloaded' if self.fetch_day(day) else 'missing'] += 1
+                    except (requests.RequestException, ET.ParseError, ValueError) as e:
+                        result['errors'].append(f"{day}: {e}")
+            day += timedelta(days=1)
+        return result
+
+    def history(self, currency, start=None, end=None, field='forex_selling'):
+        """Yerel geçmişteki günlük kurlar [(gün, kur)] (eskiden yeniye)"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT day, unit, {field} FROM fx_rates WHERE currency = ? AND day >= ? AND day <= ? "
+                f"AND {field} IS NOT NULL ORDER BY day",
+                (currency.upper(), to_date(start).isoformat() if start else '', to_date(end).isoformat())
+            ).fetchall()
+        return [(day, value / unit) for day, unit, value in rows]
+
+    def get_stats(self):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*), MIN(day), MAX(day) FROM fx_days WHERE status = 'ok'"
+            ).fetchone()
+        return dict(self.stats, cached_days=row[0], first_day=row[1], last_day=row[2])
+
+
+fx_rates = FxRateService()
@@ -0,0 +1,167 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from bar_store import bar_store as default_bar_store
+from price_bus import normalize_symbol
+
+# BIST 30 (varsayılan sembol evreni)
+BIST30 = [
+    'AKBNK', 'ALARK', 'ARCLK', 'ASELS', 'BIMAS', 'EKGYO', 'ENKAI', 'EREGL', 'FROTO', 'GARAN',
+    'GUBRF', 'HEKTS', 'ISCTR', 'KCHOL', 'KOZAA', 'KOZAL', 'KRDMD', 'MGROS', 'ODAS', 'PETKM',
+    'PGSUS', 'SAHOL', 'SASA', 'SISE', 'TCELL', 'THYAO', 'TOASO', 'TUPRS', 'YKBNK', 'XU100'
+]
+
+
+def yahoo_ticker(symbol):
+    """Depo sembolü -> Yahoo sembolü (BIST için .IS eki)"""
+    return symbol if any(mark in symbol for mark in '.^=') else f"{symbol}.IS"
+
+
+def frame_to_bars(frame):
+    """yfinance DataFrame'i (Open/High/Low/Close/Adj Close/Volume + Dividends/Stock Splits) -> depo dizileri"""
+    frame = frame.dropna(subset=['Close'])
+    index = frame.index.tz_localize(None) if getattr(frame.index, 'tz', None) is not None else frame.index
+    adj_close = frame['Adj Close'].fillna(frame['Close']) if 'Adj Close' in frame.columns else frame['Close']
+
+    def action(name):
+        return frame[name].fillna(0).to_numpy(dtype=np.float64) if name in frame.columns else np.zeros(len(frame))
+
+    return {
+        'day': index.values.astype('datetime64[D]'),
+        'open': frame['Open'].to_numpy(dtype=np.float64),
+        'high': frame['High'].to_numpy(dtype=np.float64),
+        'low': frame['Low'].to_numpy(dtype=np.float64),
+        'close': frame['Close'].to_numpy(dtype=np.float64),
+        'adj_close': adj_close.to_numpy(dtype=np.float64),
+        'dividend': action('Dividends'),
+        'split': action('Stock Splits'),
+        'volume': frame['Volume'].fillna(0).to_numpy(dtype=np.int64)
+    }
+
+
+def has_corporate_actions(bars, after=None):
+    """Barlarda (after gününden sonra) temettü veya bölünme var mı"""
+    actions = (bars['dividend'] != 0) | ((bars['split'] != 0) & (bars['split'] != 1))
+    if after is not None:
+        actions &= bars['day'] > np.datetime64(after, 'D')
+    return bool(actions.any())
+
+
+def download_yahoo(tickers, start, end):
+    """Tek yfinance çağrısıyla birden çok sembolün günlük barları -> {ticker: DataFrame}
+
+    start None ise tüm geçmiş (period='max') istenir; end dahildir. Barlar ham
+    (auto_adjust=False) gelir; düzeltme Adj Close ve temettü/bölünme
+    kolonlarıyla birlikte saklanır (bkz. BarStore.read(adjusted=True)).
+    """
+    import yfinance as yf
+
+    options = {'interval': '1d', 'group_by': 'ticker', 'auto_adjust': False, 'actions': True,
+               'threads': True, 'progress': False}
+    if start is None:
+        frame = yf.download(tickers, period='max', **options)
+    else:
+        frame = yf.download(tickers, start=str(start), end=str(np.datetime64(end, 'D') + 1), **options)
+    if frame is None or frame.empty:
+        return {}
+
+    frames = {}
+    for ticker in tickers:
+        if isinstance(frame.columns, pd.MultiIndex):
+            if ticker not in frame.columns.get_level_values(0):
+                continue
+            frames[ticker] = frame[ticker]
+        else:
+            frames[ticker] = frame
+    return frames
+
+
+class HistoryLoader:
+    """Sembol evreni için toplu günlük geçmiş yükleyici
+
+    Her sembolün bar deposundaki eksik aralıkları bulunur; aynı aralığa
+    ihtiyaç duyan semboller batch_size'lık gruplar halinde tek istekte
+    indirilir ve gruplar paralel çalışır. İlk çalışmada tüm geçmiş, sonraki
+    çalışmalarda sadece son kapsanan günden sonrası çekilir. Yeni günlerde
+    temettü veya bölünme varsa eski barların düzeltmesi de değiştiği için o
+    sembolün kapsanan geçmişi baştan indirilip değiştirilir.
+    """
+
+    def __init__(self, bar_store=None, batch_size=40, max_workers=4, downloader=None):
+        self.bar_store = bar_store or default_bar_store
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.downloader = downloader or download_yahoo
+
+    def plan(self, symbols, start=None, end=None):
+        """{(başlangıç, bitiş): [sembol, ...]} eksik aralık grupları"""
+        groups = defaultdict(list)
+        for symbol in dict.fromkeys(normalize_symbol(symbol) for symbol in symbols):
+            for missing in self.bar_store.missing_ranges(symbol, start, end):
+                groups[missing].append(symbol)
+        return dict(groups)
+
+    def _load_batch(self, symbols, range_start, range_end):
+        tickers = [yahoo_ticker(symbol) for symbol in symbols]
+        frames = self.downloader(tickers, range_start, range_end)
+        loaded, empty, readjusted = {}, [], []
+        for symbol, ticker in zip(symbols, tickers):
+            frame = frames.get(ticker)
+            bars = frame_to_bars(frame) if frame is not None and not frame.empty else None
+            if bars is None or not len(bars['day']):
+                empty.append(symbol)  # kapsam işaretlenmez, sonraki çalışmada tekrar denenir
+                continue
+
+            entry = self.bar_store.ranges(symbol)
+            write_start = range_start
+            replace = entry is not None and not entry.get('adjusted')  # missing_ranges tüm kapsamı istedi
+            if entry is not None and not replace and has_corporate_actions(bars, after=entry.get('last_day')):
+                # Yeni kurumsal işlem: saklı barların düzeltmesi eskidi, kapsanan geçmiş yeniden alınır
+                write_start = None if entry.get('complete_start') else entry['covered_from']
+                frame = self.downloader([ticker], write_start, range_end).get(ticker)
+                if frame is None or frame.empty:
+                    empty.append(symbol)
+                    continue
+                bars, replace = frame_to_bars(frame), True
+                readjusted.append(symbol)
+            self.bar_store.write(symbol, bars, write_start, range_end, save_index=False, replace=replace)
+            loaded[symbol] = len(bars['day'])
+        return loaded, empty, readjusted
+
+    def load(self, symbols=None, start=None, end=None):
+        """Eksik aralıkları indirip depoya yaz; özet döndür"""
+        started = time.time()
+        plan = self.plan(symbols or BIST30, start, end)
+        batches = [
+            (group[offset:offset + self.batch_size], range_start, range_end)
+            for (range_start, range_end), group in plan.items()
+            for offset in range(0, len(group), self.batch_size)
+        ]
+
+        result = {'requests': len(batches), 'loaded_bars': 0, 'updated_symbols': [], 'empty_symbols': [],
+                  'readjusted_symbols': [], 'errors': []}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._load_batch, *batch): batch for batch in batches}
+            for future in as_completed(futures):
+                symbols_in_batch, range_start, range_end = futures[future]
+                try:
+                    loaded, empty, readjusted = future.result()
+                except Exception as e:
+                    result['errors'].append(f"{','.join(symbols_in_batch)} {range_start}..{range_end}: {e}")
+                    continue
+                result['loaded_bars'] += sum(loaded.values())
+                result['updated_symbols'].extend(loaded)
+                result['empty_symbols'].extend(empty)
+                result['readjusted_symbols'].extend(readjusted)
+                result['requests'] += len(readjusted)
+        if batches:
+            self.bar_store.save_index()
+
+        result['updated_symbols'] = sorted(set(result['updated_symbols']))
+        result['empty_symbols'] = sorted(set(result['empty_symbols']) - set(result['updated_symbols']))
+        result['duration'] = round(time.time() - started, 3)
+        return result
@@ -0,0 +1,443 @@
+import heapq
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+WEEKDAYS = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6}
+
+
+class CronExpression:
+    """Beş alanlı cron ifadesi: dakika saat ay_günü ay hafta_günü
+
+    '*', liste (1,15), aralık (1-5) ve adım (*/10, 9-17/2) desteklenir.
+    Hafta günü cron gibi 0 (veya 7) = Pazar'dır. Ay günü ve hafta günü
+    birlikte kısıtlanırsa cron'daki gibi ikisinden biri yeterlidir.
+    """
+
+    FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron ifadesi 5 alan içermeli: {expression}")
+        self.expression = expression
+
+        values = {}
+        for text, (name, low, high) in zip(parts, self.FIELDS):
+            values[name] = self._parse_field(text, low, high)
+        values['weekday'] = {day % 7 for day in values['weekday']}
+
+        self.minutes = sorted(values['minute'])
+        self.hours = sorted(values['hour'])
+        self.days = values['day']
+        self.months = values['month']
+        self.weekdays = values['weekday']
+        self.day_restricted = parts[2] != '*'
+        self.weekday_restricted = parts[4] != '*'
+
+    @staticmethod
+    def _parse_field(text, low, high):
+        result = set()
+        for item in text.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                step = int(step_text)
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(value) for value in item.split('-', 1))
+            else:
+                start = int(item)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Geçersiz cron alanı: {text}")
+            result.update(range(start, end + 1, step))
+        return result
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        """moment'tan sonraki ilk çalışma zamanı"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            hour = next((hour for hour in self.hours if hour >= candidate.hour), None)
+            if hour is None:
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if hour != candidate.hour:
+                candidate = candidate.replace(hour=hour, minute=0)
+            minute = next((minute for minute in self.minutes if minute >= candidate.minute), None)
+            if minute is None:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            return candidate.replace(minute=minute)
+        raise ValueError(f"Cron ifadesi hiç eşleşmiyor: {self.expression}")
+
+
+def compile_schedule(spec):
+    """Zamanlama tanımını sonraki çalışma zamanını veren fonksiyona çevir
+
+    spec: {'cron': '0 9 * * 1-5'} veya {'frequency': 'daily' / 'weekly' /
+    'monthly' / 'hourly', 'time': 'HH:MM', 'weekday': 'monday', 'day': 1}
+    veya {'interval_seconds': 300} veya tek seferlik {'run_at': ISO zaman}.
+    Dönen fonksiyon epoch saniyesi alır, sonraki epoch'u (yoksa None) döndürür.
+    """
+    if spec.get('run_at'):
+        run_at = datetime.fromisoformat(spec['run_at']).timestamp()
+        return lambda after: run_at if run_at > after else None
+
+    if spec.get('interval_seconds'):
+        interval = float(spec['interval_seconds'])
+        if interval <= 0:
+            raise ValueError("interval_seconds pozitif olmalı")
+        return lambda after: after + interval
+
+    expression = spec.get('cron')
+    if not expression:
+        frequency = spec.get('frequency', 'daily')
+        hour, minute = (int(value) for value in spec.get('time', '09:00').split(':'))
+        if frequency == 'hourly':
+            expression = f"{minute} * * * *"
+        elif frequency == 'daily':
+            expression = f"{minute} {hour} * * *"
+        elif frequency == 'weekly':
+            weekday = spec.get('weekday', 'monday')
+            weekday = WEEKDAYS[weekday.lower()] if isinstance(weekday, str) else int(weekday)
+            expression = f"{minute} {hour} * * {(weekday + 1) % 7}"
+        elif frequency == 'monthly':
+            expression = f"{minute} {hour} {int(spec.get('day', 1))} * *"
+        else:
+            raise ValueError(f"Desteklenmeyen sıklık: {frequency}")
+
+    cron = CronExpression(expression)
+    return lambda after: cron.next_after(datetime.fromtimestamp(after)).timestamp()
+
+
+def next_run_time(spec, after=None):
+    """Tanımın bir sonraki çalışma zamanı (datetime)"""
+    next_ts = compile_schedule(spec)(after or time.time())
+    return datetime.fromtimestamp(next_ts) if next_ts else None
+
+
+class JobScheduler:
+    """Kalıcı, heap tabanlı iş zamanlayıcı
+
+    İşler sqlite tablosunda tutulur; bellekte sonraki çalışma zamanına göre
+    bir min-heap vardır. Tek bir bekleyici thread, Condition üzerinde en
+    yakın işin zamanına kadar uyur (yoklama yok); yeni bir iş daha erkene
+    düşerse uyandırılır. Zamanı gelen işler sınırlı bir thread havuzuna
+    verilir. İşler closure değil isimli handler'a bağlanır, böylece yeniden
+    başlatmada geri yüklenebilir. Kaçırılan çalışmalar iş bazında 'once'
+    (bir kez çalıştır), 'all' (hepsini, en fazla max_catch_up) veya 'skip'
+    politikasıyla telafi edilir; jitter aynı ana düşen işleri dağıtır.
+    """
+
+    def __init__(self, path=os.path.join('data', 'jobs.db'), max_workers=4, max_catch_up=24):
+        self.path = path
+        self.max_workers = max_workers
+        self.max_catch_up = max_catch_up
+
+        self.handlers = {}  # handler adı -> fonksiyon(payload)
+        self.jobs = {}  # job_id -> iş
+        self._heap = []  # (çalışma zamanı, job_id, sürüm)
+        self._cond = threading.Condition()
+        self._running = set()
+        self._db = None
+        self._thread = None
+        self._executor = None
+        self._stopping = False
+        self.stats = {'runs': 0, 'failures': 0, 'missed': 0, 'overlap_skipped': 0}
+
+    def register_handler(self, name, func):
+        self.handlers[name] = func
+
+    # Başlatma / kapanış
+    def _open(self):
+        """Veritabanını aç ve işleri yükle (bekleyici thread başlatılmaz)"""
+        with self._cond:
+            if self._db is not None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    next_run REAL
+                )
+            """)
+            self._db.commit()
+            self._load()
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._open()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            self._stopping = False
+            self._thread = threading.Thread(target=self._wait_loop, name="JobScheduler", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        now = time.time()
+        for (data,) in self._db.execute("SELECT data FROM jobs"):
+            job = json.loads(data)
+            job['version'] = 0
+            job['catch_up_runs'] = 0
+            job['next_fn'] = compile_schedule(job['schedule'])
+            self.jobs[job['job_id']] = job
+
+            if job['status'] != 'active' or job['next_run'] is None or job['next_run'] > now:
+                self._push(job)
+                continue
+
+            # Kaçırılan çalışma
+            self.stats['missed'] += 1
+            if job['catch_up'] == 'skip':
+                job['next_run'] = job['next_fn'](now)
+                if job['next_run'] is None:
+                    job['status'] = 'completed'
+                self._save(job)
+            self._push(job)
+        self._db.commit()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            thread = self._thread
+            if thread is not None:
+                self._stopping = True
+                self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+            self._executor.shutdown(wait=wait)
+        with self._cond:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            # Yeniden açılışta işler veritabanından tekrar yüklenir
+            self.jobs.clear()
+            self._heap.clear()
+            self._thread = None
+            self._executor = None
+
+    # Kalıcılık
+    def _save(self, job):
+        data = {key: value for key, value in job.items() if key not in ('version', 'catch_up_runs', 'next_fn')}
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, data, next_run) VALUES (?, ?, ?)",
+            (job['job_id'], json.dumps(data, ensure_ascii=False), job['next_run'])
+        )
+
+    # Heap
+    def _push(self, job):
+        job['version'] += 1
+        if job['status'] != 'active' or job['next_run'] is None:
+            return
+        fire_at = job['next_run'] + (random.uniform(0, job['jitter']) if job['jitter'] else 0)
+        heapq.heappush(self._heap, (fire_at, job['job_id'], job['version']))
+        if self._heap[0][1] == job['job_id']:
+            self._cond.notify()  # bekleyici daha erken uyanmalı
+
+    def _wait_loop(self):
+        with self._cond:
+            while not self._stopping:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                fire_at, job_id, version = self._heap[0]
+                job = self.jobs.get(job_id)
+                if job is None or job['version'] != version:
+                    heapq.heappop(self._heap)  # iptal edilmiş veya yeniden planlanmış
+                    continue
+
+                delay = fire_at - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                if job_id in self._running:
+                    # Önceki çalışma sürüyor; üst üste bindirme, sonrakine geç
+                    self.stats['overlap_skipped'] += 1
+                    self._reschedule(job, time.time())
+                    continue
+
+                self._running.add(job_id)
+                self._executor.submit(self._run, job, job['next_run'])
+
+    def _run(self, job, scheduled):
+        handler = self.handlers.get(job['handler'])
+        error = None
+        started = time.time()
+        try:
+            if handler is None:
+                raise LookupError(f"Handler kayıtlı değil: {job['handler']}")
+            handler(job['payload'])
+        except Exception as e:
+            error = str(e)
+
+        with self._cond:
+            self._running.discard(job['job_id'])
+            self.stats['runs'] += 1
+            if error:
+                self.stats['failures'] += 1
+            if self.jobs.get(job['job_id']) is not job:
+                return  # çalışırken silindi
+
+            job['last_run'] = started
+            job['last_duration'] = round(time.time() - started, 3)
+            job['last_error'] = error
+            job['run_count'] += 1
+            if error:
+                job['fail_count'] += 1
+
+            now = time.time()
+            after = now
+            if job['catch_up'] == 'all' and job['catch_up_runs'] < self.max_catch_up:
+                # Kaçırılan her periyodu sırayla çalıştır
+                after = scheduled
+                job['catch_up_runs'] += 1
+            self._reschedule(job, after)
+            if job['next_run'] is not None and job['next_run'] > now:
+                job['catch_up_runs'] = 0
+
+    def _reschedule(self, job, after):
+        job['next_run'] = job['next_fn'](after)
+        if job['next_run'] is None:
+            job['status'] = 'completed'
+        self._save(job)
+        self._db.commit()
+        self._push(job)
+
+    # İş yönetimi
+    def add_job(self, handler, schedule, payload=None, name=None, job_id=None, jitter=0, catch_up='once',
+                prefix='JOB'):
+        """İş ekle (veya aynı job_id ile güncelle); işin özetini döndür"""
+        if catch_up not in ('once', 'all', 'skip'):
+            raise ValueError(f"Geçersiz telafi politikası: {catch_up}")
+        next_fn = compile_schedule(schedule)
+        next_run = next_fn(time.time())
+        if next_run is None:
+            raise ValueError("Zamanlama geçmişte kalıyor")
+
+        self.start()
+        with self._cond:
+            job_id = job_id or f"{prefix}_{uuid.uuid4().hex[:12].upper()}"
+            previous = self.jobs.get(job_id)
+            job = {
+                'job_id': job_id,
+                'name': name or handler,
+                'handler': handler,
+                'payload': payload or {},
+                'schedule': schedule,
+                'jitter': float(jitter),
+                'catch_up': catch_up,
+                'status': 'active',
+                'next_run': next_run,
+                'last_run': None,
+                'last_duration': None,
+                'last_error': None,
+                'run_count': previous['run_count'] if previous else 0,
+                'fail_count': previous['fail_count'] if previous else 0,
+                'created_at': previous['created_at'] if previous else datetime.now().isoformat(),
+                'version': previous['version'] if previous else 0,
+                'catch_up_runs': 0,
+                'next_fn': next_fn
+            }
+            self.jobs[job_id] = job
+            self._save(job)
+            self._db.commit()
+            self._push(job)
+            return self._public(job)
+
+    def remove_job(self, job_id):
+        self._open()
+        with self._cond:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._db.commit()
+            return True
+
+    def _set_status(self, job_id, status):
+        self.start()
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] == 'completed':
+                return None
+            job['status'] = status
+            if status == 'active' and job['next_run'] < time.time():
+                job['next_run'] = job['next_fn'](time.time())
+            self._save(job)
+            self._db.commit()
+            self._push(job)
+            return self._public(job)
+
+    def pause_job(self, job_id):
+        return self._set_status(job_id, 'paused')
+
+    def resume_job(self, job_id):
+        return self._set_status(job_id, 'active')
+
+    # Sorgular
+    @staticmethod
+    def _public(job):
+        result = {key: value for key, value in job.items() if key not in ('version', 'catch_up_runs', 'next_fn')}
+        for key in ('next_run', 'last_run'):
+            if result[key] is not None:
+                result[key] = datetime.fromtimestamp(result[key]).isoformat()
+        return result
+
+    def get_job(self, job_id):
+        self._open()
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def list_jobs(self, handler=None):
+        self._open()
+        with self._cond:
+            return [self._public(job) for job in self.jobs.values() if handler is None or job['handler'] == handler]
+
+    def get_stats(self):
+        with self._cond:
+            return dict(
+                self.stats,
+                jobs=len(self.jobs),
+                active=sum(1 for job in self.jobs.values() if job['status'] == 'active'),
+                running=len(self._running),
+                next_run=datetime.fromtimestamp(self._heap[0][0]).isoformat() if self._heap else None
+            )
+
+    def __len__(self):
+        return len(self.jobs)
+
+
+job_scheduler = JobScheduler()
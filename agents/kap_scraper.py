@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urljoin
+
+import aiohttp
+import lxml.etree
+import lxml.html
+
+from disclosure_store import disclosure_id
+
+_ID_RE = re.compile(r'(\d+)/?$')
+
+# Bildirim detay sayfasında gövde için denenen alanlar (ilk dolu olan)
+BODY_XPATHS = (
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' disclosure-body ')]",
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' modal-info ')]",
+    "//div[@id='disclosureContent']",
+    "//article",
+)
+
+
+def _text(element):
+    return ' '.join(' '.join(element.itertext()).split()) if element is not None else ''
+
+
+def _cell(row, css_class):
+    found = row.xpath(f".//td[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]")
+    return found[0] if found else None
+
+
+def parse_listing(html, base_url):
+    """Bildirim listesi sayfası -> [{'id', 'title', 'company', 'company_code', 'date', 'url'}]"""
+    document = lxml.html.fromstring(html)
+    disclosures = []
+    for row in document.xpath("//tr[contains(concat(' ', normalize-space(@class), ' '), ' disclosure-row ')]"):
+        title = _cell(row, 'disclosure-title')
+        company = _cell(row, 'disclosure-company')
+        if title is None or company is None:
+            continue
+        links = row.xpath('.//a/@href')
+        url = urljoin(base_url, links[0]) if links else None
+        found = _ID_RE.search(url) if url else None
+        disclosure = {
+            'id': row.get('data-id') or (found.group(1) if found else None),
+            'title': _text(title),
+            'company': _text(company),
+            'company_code': _text(_cell(row, 'disclosure-code')) or None,
+            'disclosure_type': _text(_cell(row, 'disclosure-type')) or 'unknown',
+            'date': _text(_cell(row, 'disclosure-date')),
+            'url': url
+        }
+        disclosure['id'] = disclosure['id'] or disclosure_id(disclosure)
+        disclosures.append(disclosure)
+    return disclosures
+
+
+def parse_detail(html):
+    """Bildirim detay sayfası -> tam gövde metni"""
+    document = lxml.html.fromstring(html)
+    for xpath in BODY_XPATHS:
+        found = document.xpath(xpath)
+        if found:
+            text = _text(found[0])
+            if text:
+                return text
+    body = document.find('body')
+    return _text(body if body is not None else document)
+
+
+class KapScraper:
+    """KAP liste ve detay sayfaları için asenkron kazıma hattı
+
+    Liste sayfaları ve bildirim detayları sınırlı eşzamanlılıkla (tek
+    aiohttp oturumu + semafor) çekilir, lxml ile ayrıştırılır. Depoda
+    zaten olan bildirimlerin detayı istenmez; liste sayfalarının ETag /
+    Last-Modified değerleri saklanır ve koşullu isteklerle değişmemiş
+    sayfalar (304) tekrar indirilmez. Tamamlanan bildirimler parça parça sink'e
+    (ör. bildirim deposu) akıtılır. base_url ile yerel fikstürlere
+    yönlendirilebilir.
+    """
+
+    def __init__(self, base_url="https://www.kap.org.tr", listing_path="/tr/bildirimler?page={page}",
+                 concurrency=8, timeout=15, validators_path=os.path.join('data', 'kap_http_cache.json'),
+                 max_validators=5000):
+        self.base_url = base_url
+        self.listing_path = listing_path
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.validators_path = validators_path
+        self.max_validators = max_validators
+        self._lock = threading.Lock()
+        self.validators = self._load_validators()  # url -> {'etag', 'last_modified'}
+        self.stats = {'requests': 0, 'not_modified': 0, 'downloaded_bytes': 0, 'errors': 0}
+
+    # Koşullu istek doğrulayıcıları
+    def _load_validators(self):
+        if self.validators_path and os.path.exists(self.validators_path):
+            try:
+                with open(self.validators_path, encoding='utf-8') as validators_file:
+                    return json.load(validators_file)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _save_validators(self):
+        if not self.validators_path:
+            return
+        with self._lock:
+            if len(self.validators) > self.max_validators:
+                for url in list(self.validators)[:len(self.validators) - self.max_validators]:
+                    del self.validators[url]
+            directory = os.path.dirname(self.validators_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.validators_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as validators_file:
+                json.dump(self.validators, validators_file)
+            os.replace(temp_path, self.validators_path)
+
+    async def _fetch(self, session, semaphore, url, conditional=True):
+        """Sayfayı metin olarak getir; değişmemişse (304) None döner"""
+        headers = {}
+        validator = self.validators.get(url) if conditional else None
+        if validator:
+            if validator.get('etag'):
+                headers['If-None-Match'] = validator['etag']
+            if validator.get('last_modified'):
+                headers['If-Modified-Since'] = validator['last_modified']
+
+        async with semaphore:
+            self.stats['requests'] += 1
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    self.stats['not_modified'] += 1
+                    return None
+                response.raise_for_status()
+                body = await response.read()
+                charset = response.charset or 'utf-8'
+
+        self.stats['downloaded_bytes'] += len(body)
+        if conditional and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            with self._lock:
+                self.validators.pop(url, None)  # en son kullanılan sona
+                self.validators[url] = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }
+        return body.decode(charset, errors='replace')
+
+    async def _detail(self, session, semaphore, disclosure):
+        try:
+            # Yayımlanan bildirim değişmez; bilinenler zaten atlandığı için koşulsuz
+            body = await self._fetch(session, semaphore, disclosure['url'], conditional=False)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats['errors'] += 1
+            return disclosure, f"{disclosure['url']}: {e}"
+        try:
+            disclosure['content'] = parse_detail(body)
+        except (lxml.etree.ParserError, ValueError) as e:
+            # Bozuk/boş detay sayfası sadece bu bildirimi düşürür
+            self.stats['errors'] += 1
+            return disclosure, f"{disclosure['url']}: ayrıştırılamadı ({e})"
+        return disclosure, None
+
+    async def scrape_async(self, pages=1, limit=None, known_ids=None, sink=None, chunk_size=20):
+        """Liste sayfalarını ve yeni bildirimlerin detaylarını çek
+
+        known_ids(id listesi) -> bilinen id kümesi; bunların detayı istenmez.
+        sink(bildirim listesi) tamamlanan detaylarla parça parça çağrılır.
+        """
+        result = {'listed': 0, 'skipped_known': 0, 'fetched': 0, 'not_modified_pages': 0, 'errors': [], 'disclosures': []}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector, headers=headers) as session:
+            listing_urls = [urljoin(self.base_url, self.listing_path.format(page=page)) for page in range(1, pages + 1)]
+            pages_html = await asyncio.gather(
+                *(self._fetch(session, semaphore, url) for url in listing_urls), return_exceptions=True
+            )
+
+            listed = []
+            for url, html in zip(listing_urls, pages_html):
+                if isinstance(html, Exception):
+                    self.stats['errors'] += 1
+                    result['errors'].append(f"{url}: {html}")
+                elif html is None:
+                    result['not_modified_pages'] += 1
+                else:
+                    try:
+                        listed.extend(parse_listing(html, self.base_url))
+                    except (lxml.etree.ParserError, ValueError) as e:
+                        self.stats['errors'] += 1
+                        result['errors'].append(f"{url}: ayrıştırılamadı ({e})")
+            listed = list({item['id']: item for item in reversed(listed)}.values())[::-1]  # sayfalar arası tekrarlar
+            if limit:
+                listed = listed[:limit]
+            result['listed'] = len(listed)
+
+            known = known_ids([item['id'] for item in listed]) if known_ids and listed else set()
+            pending = [item for item in listed if item['id'] not in known]
+            result['skipped_known'] = len(listed) - len(pending)
+
+            chunk = []
+            tasks = [
+                asyncio.ensure_future(self._detail(session, semaphore, item)) if item.get('url')
+                else asyncio.ensure_future(asyncio.sleep(0, result=(item, None)))
+                for item in pending
+            ]
+            for finished in asyncio.as_completed(tasks):
+                disclosure, error = await finished
+                if error:
+                    result['errors'].append(error)
+                    continue
+                disclosure.setdefault('content', disclosure['title'])
+                disclosure['source'] = 'KAP_SCRAPING'
+                result['fetched'] += 1
+                result['disclosures'].append(disclosure)
+                chunk.append(disclosure)
+                if sink and len(chunk) >= chunk_size:
+                    sink(chunk)
+                    chunk = []
+            if sink and chunk:
+                sink(chunk)
+
+        if any(error for error in result['errors']):
+            # Eksik detaylar bir sonraki çalışmada tekrar denensin: liste sayfaları 304 almasın
+            with self._lock:
+                for url in listing_urls:
+                    self.validators.pop(url, None)
+
+        self._save_validators()
+        return result
+
+    def scrape(self, pages=1, limit=None, known_ids=None, sink=None):
+        """Senkron giriş noktası (kendi olay döngüsünü açar)"""
+        started = time.time()
+        result = asyncio.run(self.scrape_async(pages, limit, known_ids, sink))
+        result['duration'] = round(time.time() - started, 3)
+        return result
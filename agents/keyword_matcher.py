@@ -0,0 +1,132 @@
+import re
+from collections import Counter
+
+# Türkçe büyük/küçük harf: 'İ' -> 'i', 'I' -> 'ı'. Eşleştirmede i/ı ve
+# şapkalı harfler ayrıştırılmaz (RISK = risk, kâr = kar).
+_FOLD_TABLE = str.maketrans({'İ': 'i', 'I': 'i', 'ı': 'i', 'â': 'a', 'Â': 'a', 'î': 'i', 'Î': 'i', 'û': 'u', 'Û': 'u'})
+_TOKEN_RE = re.compile(r'\w+')
+
+# Kısa kökler (kâr -> 'kar') başka kelimelerin başında da geçer (karşı, kartel);
+# bu uzunluğa kadar kökler sadece tam kelime veya bilinen bir ekle eşleşir
+SHORT_STEM_LENGTH = 3
+# Katlanmış biçimde (ı -> i) yaygın çekim ekleri
+TURKISH_SUFFIXES = frozenset({
+    'a', 'e', 'i', 'u', 'ü', 'ya', 'ye', 'yi', 'yu', 'yü', 'na', 'ne', 'ni', 'nu', 'nü',
+    'in', 'un', 'ün', 'nin', 'nun', 'nün', 'da', 'de', 'ta', 'te', 'dan', 'den', 'tan', 'ten',
+    'nda', 'nde', 'ndan', 'nden', 'la', 'le', 'yla', 'yle', 'lar', 'ler', 'lari', 'leri',
+    'larin', 'lerin', 'lara', 'lere', 'larda', 'lerde', 'lardan', 'lerden', 'li', 'lu', 'lü',
+    'siz', 'suz', 'süz', 'si', 'su', 'sü', 'dir', 'dur', 'dür', 'tir', 'tur', 'tür',
+    'imiz', 'umuz', 'ümüz', 'iniz', 'unuz', 'ünüz', 'ki'
+})
+
+
+def turkish_casefold(text):
+    """Türkçe duyarlı küçük harfe çevirme (eşleştirme için)"""
+    return text.translate(_FOLD_TABLE).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(turkish_casefold(text))
+
+
+def stem_matches(stem, word):
+    """Kök kelimenin başında mı; kısa köklerde kalan kısım bilinen bir ek olmalı"""
+    if not word.startswith(stem):
+        return False
+    return len(stem) > SHORT_STEM_LENGTH or len(word) == len(stem) or word[len(stem):] in TURKISH_SUFFIXES
+
+
+class KeywordMatcher:
+    """Derlenmiş çok sınıflı anahtar kelime eşleştirici
+
+    Metin tek geçişte kelimelere ayrılır; her kelime sözlükte aranır.
+    stems=True iken anahtar kelime kelimenin başında eşleşir ve Türkçe
+    ekleri kabul eder (düşüş -> düşüşe, düşüşün); sadece kelime başından
+    bakıldığı için 'al' 'sinyal' içinde bulunmaz. SHORT_STEM_LENGTH'e kadar
+    kısa kökler sadece tam kelime veya bilinen bir ekle eşleşir ('kar' ->
+    'karı', 'karlı' evet; 'karşı', 'kartel' hayır). stems=False iken tam
+    kelime gerekir. Çok kelimeli ifadeler (ör. 'kar payı') desteklenir.
+    Maliyet metin uzunluğuyla doğrusal, sözlük boyutundan bağımsızdır
+    (kelime başına en fazla farklı anahtar uzunluğu kadar sözlük araması).
+    """
+
+    def __init__(self, lexicon, stems=True):
+        self.stems = stems
+        self.classes = list(lexicon)
+        self.single = {}  # katlanmış kelime -> sınıf
+        self.phrases = {}  # ilk kelime -> [(kelime demeti, sınıf)]
+        for label, keywords in lexicon.items():
+            for keyword in keywords:
+                words = tuple(tokenize(keyword))
+                if len(words) == 1:
+                    self.single.setdefault(words[0], label)
+                elif words:
+                    self.phrases.setdefault(words[0], []).append((words, label))
+        for candidates in self.phrases.values():
+            candidates.sort(key=lambda item: -len(item[0]))  # en uzun ifade önce
+        self.word_lengths = sorted({len(word) for word in self.single}, reverse=True)
+        self.phrase_lengths = sorted({len(word) for word in self.phrases}, reverse=True)
+        self._word_cache = {}  # kelime -> sınıf (veya None); kelime dağarcığı sınırlı olduğundan
+        self.cache_size = 200000
+
+    def _lookup(self, table, lengths, word):
+        """Tam kelime veya (stems) kelime başı ile eşleşen en uzun kayıt"""
+        if not self.stems:
+            return table.get(word)
+        for length in lengths:
+            if length <= len(word):
+                found = table.get(word[:length])
+                if found is not None and stem_matches(word[:length], word):
+                    return found
+        return None
+
+    def _word_matches(self, pattern, word):
+        return stem_matches(pattern, word) if self.stems else word == pattern
+
+    def iter_matches(self, text):
+        """(eşleşen kelime, sınıf) çiftleri"""
+        if not text:
+            return
+        words = tokenize(text)
+        index = 0
+        while index < len(words):
+            word = words[index]
+            phrase_match = None
+            for phrase, label in (self.phrases and self._lookup(self.phrases, self.phrase_lengths, word)) or ():
+                end = index + len(phrase)
+                if end <= len(words) and all(self._word_matches(part, words[index + offset])
+                                             for offset, part in enumerate(phrase[1:], 1)):
+                    phrase_match = (end, label)
+                    break
+            if phrase_match:
+                end, label = phrase_match
+                yield ' '.join(words[index:end]), label
+                index = end
+                continue
+
+            try:
+                label = self._word_cache[word]
+            except KeyError:
+                label = self._lookup(self.single, self.word_lengths, word)
+                if len(self._word_cache) < self.cache_size:
+                    self._word_cache[word] = label
+            if label is not None:
+                yield word, label
+            index += 1
+
+    def count(self, text):
+        """Sınıf bazında eşleşme sayıları (tüm sınıflar, sıfır dahil)"""
+        counts = dict.fromkeys(self.classes, 0)
+        for _, label in self.iter_matches(text):
+            counts[label] += 1
+        return counts
+
+    def matched_keywords(self, text):
+        return Counter(word for word, _ in self.iter_matches(text))
+
+    def score(self, text, weights):
+        """Sınıf ağırlıklarıyla toplam skor"""
+        return sum(weights.get(label, 0) for _, label in self.iter_matches(text))
+
+    def contains(self, text, label=None):
+        return any(label is None or matched == label for _, matched in self.iter_matches(text))
@@ -4,25 +4,39 @@ import re
 from datetime import datetime, timedelta
 import time
 from base_agent import BaseAgent
+from keyword_matcher import KeywordMatcher
+from disclosure_store import disclosure_store as default_disclosure_store, disclosure_id, parse_publish_date
+from disclosure_index import DisclosureIndex
+from job_scheduler import job_scheduler as default_job_scheduler
+
+KAP_SOURCE = 'kap'
+KAP_POLL = 'news.kap_poll'
 
 class NewsAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, disclosure_store=None, job_scheduler=None):
         super().__init__(
             name="NewsAgent",
             agent_type="news_analyzer",
             capabilities=["kap_news", "sentiment_analysis", "news_categorization"]
         )
         self.kap_base_url = "https://www.kap.org.tr"
-        self.news_cache = []
+        self.connector = None  # ilk kullanımda oluşturulur
+        # Bildirimler kalıcı, indeksli depoda tutulur; yoklama sadece yenileri ister
+        self.disclosure_store = disclosure_store or default_disclosure_store
+        self.job_scheduler = job_scheduler if job_scheduler is not None else default_job_scheduler
+        self.job_scheduler.register_handler(KAP_POLL, self.run_kap_poll)
+        self.disclosure_index = None  # tam metin arama; ilk aramada yüklenir
+        self.index_saved_at = 0
         self.sentiment_keywords = {
             'positive': ['artış', 'yükseliş', 'başarı', 'kâr', 'büyüme', 'gelişme', 'iyileştirme', 'pozitif', 'arttı', 'yükseldi', 'kazanç', 'getiri'],
             'negative': ['düşüş', 'azalış', 'zarar', 'risk', 'sorun', 'olumsuz', 'negatif', 'kriz', 'düştü', 'azaldı', 'kayıp', 'tehdit'],
             'neutral': ['açıklama', 'duyuru', 'bilgilendirme', 'toplantı', 'karar', 'onay', 'imza', 'sözleşme']
         }
+        self.keyword_matcher = KeywordMatcher(self.sentiment_keywords)
     
     def can_handle_task(self, task):
         """Bu agent hangi görevleri yapabilir?"""
-        news_tasks = ['get_kap_news', 'analyze_sentiment', 'categorize_news', 'company_news']
+        news_tasks = ['get_kap_news', 'analyze_sentiment', 'categorize_news', 'company_news', 'ingest_kap_news', 'search_news', 'scrape_kap_news']
         return task.get('type') in news_tasks
     
     def process_task(self, task):
@@ -38,7 +52,14 @@ class NewsAgent(BaseAgent):
             elif task_type == 'analyze_sentiment':
                 result = self.analyze_news_sentiment(task.get('news_text'))
             elif task_type == 'company_news':
-                result = self.get_company_news(task.get('company_code'))
+                result = self.get_company_news(task.get('company_code'), task.get('limit', 50))
+            elif task_type == 'ingest_kap_news':
+                result = self.ingest_kap_disclosures(task.get('limit', 100))
+            elif task_type == 'scrape_kap_news':
+                result = self.scrape_kap_disclosures(task.get('pages', 1), task.get('limit'))
+            elif task_type == 'search_news':
+                result = self.search_news(task.get('query'), task.get('company_code'),
+                                          task.get('since'), task.get('until'), task.get('limit', 20))
             else:
                 result = {"error": "Desteklenmeyen görev tipi"}
             
@@ -52,48 +73,165 @@ class NewsAgent(BaseAgent):
         self.status = "idle"
         return result
     
+    def get_connector(self):
+        if self.connector is None:
+            from real_data_connector import RealDataConnector
+            self.connector = RealDataConnector()
+        return self.connector
+    
+    def ingest_kap_disclosures(self, limit=100):
+        """KAP'tan imleçten sonraki bildirimleri al, tekilleştirip depoya yaz"""
+        cursor = self.disclosure_store.get_cursor(KAP_SOURCE)
+        since = cursor['last_published'] if cursor else None
+        
+        kap_data = self.get_connector().get_kap_disclosures(limit, since=since, known_ids=self.known_disclosure_ids)
+        if not kap_data.get('success'):
+            return {"success": False, "error": "KAP veri alımı başarısız"}
+        if kap_data.get('data_quality') == 'MOCK':
+            # Mock bildirimler kalıcı depoya yazılmaz
+            return {"success": False, "error": "KAP kaynaklarına ulaşılamadı", "routing": kap_data.get('routing')}
+        
+        inserted = self.store_disclosures(kap_data.get('disclosures', []), kap_data.get('source', 'UNKNOWN'))
+        cursor = self.disclosure_store.advance_cursor(KAP_SOURCE, inserted)
+        
+        return {
+            "success": True,
+            "fetched": len(kap_data.get('disclosures', [])),
+            "new_count": len(inserted),
+            "new": inserted,
+            "cursor": cursor,
+            "data_source": kap_data.get('source'),
+            "data_quality": kap_data.get('data_quality')
+        }
+    
+    def known_disclosure_ids(self, ids):
+        return {record['id'] for record in self.disclosure_store.get_many(ids)}
+    
+    def store_disclosures(self, disclosures, data_source):
+        """Yeni bildirimlere sentiment ekleyip depoya yaz; eklenenleri döndür"""
+        known = self.known_disclosure_ids([disclosure_id(d) for d in disclosures])
+        
+        # Sentiment sadece yeni bildirimler için hesaplanır
+        processed_news = []
+        for disclosure in disclosures:
+            if disclosure_id(disclosure) in known:
+                continue
+            news_item = {
+                'id': disclosure.get('id'),
+                'title': disclosure.get('title'),
+                'company': disclosure.get('company'),
+                'company_code': disclosure.get('company_code'),
+                'content': disclosure.get('content'),
+                'date': disclosure.get('date'),
+                'disclosure_type': disclosure.get('disclosure_type', 'unknown'),
+                'sentiment': self.analyze_news_sentiment(disclosure.get('content', '')),
+                'url': disclosure.get('url'),
+                'data_source': data_source
+            }
+            processed_news.append(news_item)
+        
+        return self.disclosure_store.add_many(processed_news)
+    
+    def scrape_kap_disclosures(self, pages=1, limit=None):
+        """KAP sayfalarını paralel kazı; yeni bildirimler tamamlandıkça depoya akar"""
+        from kap_scraper import KapScraper
+        inserted = []
+        result = KapScraper(base_url=self.kap_base_url).scrape(
+            pages=pages, limit=limit, known_ids=self.known_disclosure_ids,
+            sink=lambda chunk: inserted.extend(self.store_disclosures(chunk, 'KAP_SCRAPING'))
+        )
+        return {
+            "success": not result['errors'] or bool(result['fetched']),
+            "listed": result['listed'],
+            "skipped_known": result['skipped_known'],
+            "not_modified_pages": result['not_modified_pages'],
+            "new_count": len(inserted),
+            "errors": result['errors'][:10],
+            "duration": result['duration']
+        }
+    
+    def run_kap_poll(self, payload):
+        """Zamanlayıcı işi: KAP delta yoklaması"""
+        result = self.ingest_kap_disclosures(payload.get('limit', 100))
+        if not result.get('success'):
+            raise RuntimeError(result.get('error'))
+        
+        # İndeks diske seyrek yazılır; kaydedilmeyen kısım açılışta depodan tamamlanır
+        if self.disclosure_index is not None and self.disclosure_index.dirty and time.time() - self.index_saved_at > 900:
+            self.save_disclosure_index()
+        return {'new_count': result['new_count']}
+    
+    def start_kap_polling(self, interval_seconds=60, limit=100):
+        """KAP'ı periyodik yokla (tek kalıcı iş; tekrar çağrı aynı işi günceller)"""
+        return self.job_scheduler.add_job(
+            KAP_POLL, {'interval_seconds': interval_seconds}, {'limit': limit},
+            name="KAP bildirim yoklaması", job_id='KAP_POLL', catch_up='skip'
+        )
+    
+    def get_disclosure_index(self):
+        """Kayıtlı indeksi yükle, depoyla senkronla ve yeni bildirimlere abone ol"""
+        if self.disclosure_index is None:
+            index = DisclosureIndex.load()
+            index.sync(self.disclosure_store)
+            self.disclosure_store.subscribe(lambda _: index.sync(self.disclosure_store))
+            self.disclosure_index = index
+        return self.disclosure_index
+    
+    def save_disclosure_index(self):
+        if self.disclosure_index is not None:
+            self.disclosure_index.save()
+            self.index_saved_at = time.time()
+    
+    def search_news(self, query, company_code=None, since=None, until=None, limit=20):
+        """Bildirimlerde tam metin arama (BM25; VE/OR/-DEĞİL/"ifade", şirket ve tarih filtresi)"""
+        if not query:
+            return {"error": "Arama sorgusu gerekli"}
+        
+        index = self.get_disclosure_index()
+        start = time.perf_counter()
+        hits = index.search(query, company=company_code, since=parse_publish_date(since),
+                            until=parse_publish_date(until), limit=limit)
+        search_ms = (time.perf_counter() - start) * 1000
+        
+        records = {record['id']: record for record in self.disclosure_store.get_many([hit['id'] for hit in hits])}
+        results = []
+        for hit in hits:
+            record = records.get(hit['id'], {})
+            results.append({
+                'id': hit['id'],
+                'score': hit['score'],
+                'title': record.get('title'),
+                'company_code': hit['company_code'],
+                'date': record.get('date'),
+                'url': record.get('url'),
+                'sentiment': record.get('sentiment')
+            })
+        
+        return {
+            "query": query,
+            "result_count": len(results),
+            "results": results,
+            "search_time_ms": round(search_ms, 2),
+            "indexed_documents": len(index)
+        }
+    
     def get_recent_kap_news(self, limit=10):
-        """KAP'dan gerçek haberleri al"""
+        """KAP'tan yeni bildirimleri al ve depodan en son haberleri döndür"""
         try:
-            # RealDataConnector kullan
-            from real_data_connector import RealDataConnector
-            connector = RealDataConnector()
+            ingest = self.ingest_kap_disclosures(max(limit, 100))
+            processed_news = self.disclosure_store.recent(limit)
             
-            # Gerçek KAP verilerini al
-            kap_data = connector.get_kap_disclosures(limit)
+            if not ingest.get('success') and not processed_news:
+                return {"success": False, "error": ingest.get('error', "KAP veri alımı başarısız")}
             
-            if kap_data.get('success'):
-                processed_news = []
-                
-                for disclosure in kap_data.get('disclosures', []):
-                    # Sentiment analizi ekle
-                    sentiment = self.analyze_news_sentiment(disclosure.get('content', ''))
-                    
-                    news_item = {
-                        'id': disclosure.get('id'),
-                        'title': disclosure.get('title'),
-                        'company': disclosure.get('company'),
-                        'company_code': disclosure.get('company_code'),
-                        'content': disclosure.get('content'),
-                        'date': disclosure.get('date'),
-                        'disclosure_type': disclosure.get('disclosure_type', 'unknown'),
-                        'sentiment': sentiment,
-                        'url': disclosure.get('url'),
-                        'data_source': kap_data.get('source', 'UNKNOWN')
-                    }
-                    processed_news.append(news_item)
-                
-                self.news_cache.extend(processed_news)
-                
-                return {
-                    "success": True,
-                    "news_count": len(processed_news),
-                    "news": processed_news,
-                    "data_source": kap_data.get('source'),
-                    "timestamp": datetime.now().isoformat()
-                }
-            else:
-                return {"success": False, "error": "KAP veri alımı başarısız"}
+            return {
+                "success": True,
+                "news_count": len(processed_news),
+                "new_count": ingest.get('new_count', 0),
+                "news": processed_news,
+                "data_source": ingest.get('data_source', 'DISCLOSURE_STORE'),
+                "timestamp": datetime.now().isoformat()
+            }
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -103,10 +241,10 @@ class NewsAgent(BaseAgent):
         if not text:
             return {"sentiment": "neutral", "confidence": 0.0}
         
-        text_lower = text.lower()
-        positive_count = sum(1 for word in self.sentiment_keywords['positive'] if word in text_lower)
-        negative_count = sum(1 for word in self.sentiment_keywords['negative'] if word in text_lower)
-        neutral_count = sum(1 for word in self.sentiment_keywords['neutral'] if word in text_lower)
+        counts = self.keyword_matcher.count(text)
+        positive_count = counts['positive']
+        negative_count = counts['negative']
+        neutral_count = counts['neutral']
         
         total_words = positive_count + negative_count + neutral_count
         
@@ -131,9 +269,11 @@ class NewsAgent(BaseAgent):
             "neutral_signals": neutral_count
         }
     
-    def get_company_news(self, company_code):
-        """Belirli şirketin haberlerini al"""
-        company_news = [news for news in self.news_cache if news.get('company_code') == company_code]
+    def get_company_news(self, company_code, limit=50):
+        """Belirli şirketin haberlerini al (şirket/tarih indeksinden)"""
+        if not company_code:
+            return {"error": "company_code gerekli"}
+        company_news = self.disclosure_store.company_disclosures(company_code, limit=limit)
         
         return {
             "company_code": company_code,
@@ -1,43 +1,60 @@
-import smtplib
-import requests
+import hashlib
 import json
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-import schedule
-import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 from base_agent import BaseAgent
+from price_alerts import PriceAlertBook
+from price_bus import price_bus as default_price_bus
+from notification_dispatcher import NotificationDispatcher
+from subscriber_registry import SubscriberRegistry
+from email_templates import template_renderer, analysis_email_context, content_id, PreparedEmail
+from job_scheduler import job_scheduler as default_job_scheduler, next_run_time
+
+SCHEDULED_NOTIFICATION = 'notification.scheduled'
 
 class NotificationAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, price_bus=None, subscribers_path=None, job_scheduler=None):
         super().__init__(
             name="NotificationAgent",
             agent_type="notification_manager",
             capabilities=["email_notifications", "telegram_bot", "scheduled_alerts", "real_time_notifications"]
         )
         self.email_config = {
-            'smtp_server': 'smtp.gmail.com',
-            'smtp_port': 587,
+            'smtp_server': os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+            'smtp_port': int(os.getenv('SMTP_PORT', '587')),
+            'use_tls': os.getenv('SMTP_USE_TLS', 'true').lower() == 'true',  # STARTTLS
             'sender_email': os.getenv('SENDER_EMAIL', 'your_email@gmail.com'),
             'sender_password': os.getenv('SENDER_PASSWORD', 'your_app_password'),
             'enabled': False  # Güvenlik için varsayılan kapalı
         }
         self.telegram_config = {
             'bot_token': os.getenv('TELEGRAM_BOT_TOKEN', ''),
+            'api_base': os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org'),
             'enabled': False  # Varsayılan kapalı
         }
-        self.subscribers = []
+        self.subscribers = SubscriberRegistry(subscribers_path) if subscribers_path else SubscriberRegistry()
         self.notification_history = []
-        self.scheduled_tasks = []
+        
+        # Zamanlanmış bildirimler kalıcı iş zamanlayıcısında tutulur
+        self.job_scheduler = job_scheduler if job_scheduler is not None else default_job_scheduler
+        self.job_scheduler.register_handler(SCHEDULED_NOTIFICATION, self.run_scheduled_notification)
+        self.analysis_provider = None  # sembol -> analiz sonucu (API tarafından bağlanır)
+        
+        # Asenkron teslim hattı (ilk gönderimde başlar)
+        self.dispatcher = None
+        
+        # Kalıcı fiyat uyarıları; fiyat kanalındaki her kotasyonla değerlendirilir
+        self.price_alerts = PriceAlertBook(on_alert=self.deliver_price_alerts)
+        self.price_bus = price_bus or default_price_bus
+        self.price_bus.subscribe(self.price_alerts.on_quotes)
         
     def can_handle_task(self, task):
         notification_tasks = [
             'send_email', 'send_telegram', 'schedule_alert', 
-            'subscribe_user', 'broadcast_analysis', 'price_alert'
+            'subscribe_user', 'unsubscribe_user', 'broadcast_analysis', 'price_alert',
+            'create_price_alert', 'remove_price_alert', 'list_price_alerts', 'delivery_status',
+            'cancel_schedule'
         ]
         return task.get('type') in notification_tasks
     
@@ -56,10 +73,22 @@ class NotificationAgent(BaseAgent):
                 result = self.schedule_notification(task.get('schedule_config'))
             elif task_type == 'subscribe_user':
                 result = self.subscribe_user(task.get('user_data'))
+            elif task_type == 'unsubscribe_user':
+                result = self.unsubscribe_user(task.get('user_data'))
             elif task_type == 'broadcast_analysis':
                 result = self.broadcast_analysis_result(task.get('analysis_data'))
             elif task_type == 'price_alert':
                 result = self.send_price_alert(task.get('alert_data'))
+            elif task_type == 'create_price_alert':
+                result = self.create_price_alert(task.get('alert_data'))
+            elif task_type == 'remove_price_alert':
+                result = self.remove_price_alert(task.get('alert_id'))
+            elif task_type == 'list_price_alerts':
+                result = self.list_price_alerts(task.get('user_id'))
+            elif task_type == 'delivery_status':
+                result = self.get_delivery_status(task.get('batch_id'))
+            elif task_type == 'cancel_schedule':
+                result = self.cancel_scheduled_notification(task.get('schedule_id'))
             else:
                 result = {"error": "Desteklenmeyen görev tipi"}
             
@@ -97,30 +126,18 @@ class NotificationAgent(BaseAgent):
         try:
             # E-mail içeriği oluştur
             html_content = self.create_email_template(email_data.get('analysis_result'))
+            message_bytes = self.build_email_message(
+                email_data['to'], email_data['subject'], html_content, email_data.get('pdf_attachment')
+            )
             
-            # MIME message oluştur
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.email_config['sender_email']
-            msg['To'] = ', '.join(email_data['to'])
-            msg['Subject'] = email_data['subject']
-            
-            # HTML content ekle
-            html_part = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(html_part)
-            
-            # PDF eki varsa ekle
-            if email_data.get('pdf_attachment'):
-                self.attach_pdf(msg, email_data['pdf_attachment'])
-            
-            # E-mail gönder (Demo mode)
+            # Teslim hattına kuyruğa al (havuzdaki SMTP bağlantısı ile gönderilir)
+            batch_id = None
             if self.email_config['enabled'] and self.email_config['sender_password']:
-                server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
-                server.starttls()
-                server.login(self.email_config['sender_email'], self.email_config['sender_password'])
-                server.send_message(msg)
-                server.quit()
-                
-                delivery_status = "delivered"
+                batch_id = self.get_dispatcher().submit(
+                    [{'channel': 'email', 'to': email_data['to'], 'body': message_bytes}],
+                    label=email_data['subject']
+                )
+                delivery_status = "queued"
             else:
                 delivery_status = "demo_mode"
             
@@ -140,6 +157,7 @@ class NotificationAgent(BaseAgent):
                 "message": f"E-mail {len(email_data['to'])} alıcıya gönderildi",
                 "recipients": email_data['to'],
                 "delivery_status": delivery_status,
+                "batch_id": batch_id,
                 "notification_id": len(self.notification_history)
             }
             
@@ -149,125 +167,14 @@ class NotificationAgent(BaseAgent):
                 "error": f"E-mail gönderim hatası: {str(e)}"
             }
     
-    def create_email_template(self, analysis_result):
-        """Profesyonel e-mail şablonu"""
-        symbol = analysis_result.get('symbol', 'UNKNOWN')
-        recommendation = analysis_result.get('recommendation', 'BEKLE')
-        confidence = analysis_result.get('confidence', 50)
-        timestamp = analysis_result.get('timestamp', datetime.now().isoformat())
-        
-        # Renk seçimi
-        if 'AL' in recommendation:
-            color = '#52c41a'
-            icon = '📈'
-        elif 'SAT' in recommendation:
-            color = '#f5222d' 
-            icon = '📉'
-        else:
-            color = '#faad14'
-            icon = '⏳'
-        
-        html_template = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Multi-Agent AI Analiz Raporu</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-            
-            <!-- Header -->
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; border-radius: 10px; text-align: center; margin-bottom: 30px;">
-                <h1 style="margin: 0; font-size: 28px;">🤖 Multi-Agent AI Sistemi</h1>
-                <p style="margin: 10px 0 0 0; opacity: 0.9;">Finansal Analiz Raporu</p>
-            </div>
-            
-            <!-- Ana Sonuç -->
-            <div style="background: {color}; color: white; padding: 25px; border-radius: 10px; text-align: center; margin-bottom: 25px;">
-                <h2 style="margin: 0; font-size: 24px;">{icon} {symbol}</h2>
-                <h1 style="margin: 15px 0 5px 0; font-size: 32px;">{recommendation}</h1>
-                <p style="margin: 0; font-size: 18px; opacity: 0.9;">Güven: %{confidence}</p>
-            </div>
-            
-            <!-- Detaylar -->
-            <div style="background: #f8f9fa; padding: 25px; border-radius: 10px; margin-bottom: 25px;">
-                <h3 style="color: #1890ff; margin-top: 0;">📊 Analiz Detayları</h3>
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr>
-                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;"><strong>Hisse Kodu:</strong></td>
-                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0; text-align: right;">{symbol}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;"><strong>Analiz Zamanı:</strong></td>
-                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0; text-align: right;">{datetime.fromisoformat(timestamp.replace('Z', '+00:00') if timestamp.endswith('Z') else timestamp).strftime('%d.%m.%Y %H:%M')}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0;"><strong>Öneri:</strong></td>
-                        <td style="padding: 8px 0; border-bottom: 1px solid #e0e0e0; text-align: right; color: {color}; font-weight: bold;">{recommendation}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 8px 0;"><strong>Güven Seviyesi:</strong></td>
-                        <td style="padding: 8px 0; text-align: right;"><strong>%{confidence}</strong></td>
-                    </tr>
-                </table>
-            </div>
-            
-            <!-- Agent Analizleri -->
-            <div style="background: #fff; border: 1px solid #e0e0e0; padding: 25px; border-radius: 10px; margin-bottom: 25px;">
-                <h3 style="color: #1890ff; margin-top: 0;">🤖 AI Agent Analizleri</h3>
-                <div style="display: flex; justify-content: space-between; flex-wrap: wrap; gap: 15px;">
-                    <div style="flex: 1; min-width: 120px; text-align: center; padding: 15px; background: #f0f9ff; border-radius: 8px;">
-                        <div style="font-size: 24px;">📰</div>
-                        <div style="font-weight: bold; margin: 5px 0;">News Agent</div>
-                        <div style="color: #52c41a;">✅ Pozitif</div>
-                    </div>
-                    <div style="flex: 1; min-width: 120px; text-align: center; padding: 15px; background: #f0f9ff; border-radius: 8px;">
-                        <div style="font-size: 24px;">💰</div>
-                        <div style="font-weight: bold; margin: 5px 0;">Financial</div>
-                        <div style="color: #1890ff;">📊 Güçlü</div>
-                    </div>
-                    <div style="flex: 1; min-width: 120px; text-align: center; padding: 15px; background: #f0f9ff; border-radius: 8px;">
-                        <div style="font-size: 24px;">📈</div>
-                        <div style="font-weight: bold; margin: 5px 0;">Technical</div>
-                        <div style="color: #52c41a;">⬆️ Yükseliş</div>
-                    </div>
-                </div>
-            </div>
-            
-            <!-- Risk Uyarısı -->
-            <div style="background: #fff2e8; border-left: 4px solid #faad14; padding: 20px; margin-bottom: 25px; border-radius: 0 8px 8px 0;">
-                <h4 style="color: #d48806; margin-top: 0;">⚠️ Risk Uyarısı</h4>
-                <p style="margin-bottom: 0; color: #8c5e00;">Bu rapor yatırım danışmanlığı değildir. Yatırım kararlarınızı almadan önce uzmanlardan görüş alınız. Geçmiş performans gelecekteki sonuçları garanti etmez.</p>
-            </div>
-            
-            <!-- Footer -->
-            <div style="text-align: center; padding: 20px; color: #666; font-size: 14px; border-top: 1px solid #e0e0e0;">
-                <p style="margin: 0 0 10px 0;">Multi-Agent Finans AI Sistemi tarafından oluşturulmuştur</p>
-                <p style="margin: 0; font-size: 12px;">🤖 7 Uzman AI Agent • 📊 Gerçek Zamanlı Analiz • 🎯 Akıllı Kararlar</p>
-            </div>
-            
-        </body>
-        </html>
-        """
-        
-        return html_template
+    def create_email_template(self, analysis_result, locale=None):
+        """Profesyonel e-mail şablonu (derlenmiş şablon + render önbelleği)"""
+        cache_id = analysis_result.get('analysis_id') or content_id(analysis_result)
+        return template_renderer.render('analysis_email', analysis_email_context(analysis_result), cache_id, locale)
     
-    def attach_pdf(self, msg, pdf_path):
-        """PDF dosyasını e-mail'e ekle"""
-        try:
-            with open(pdf_path, "rb") as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
-                
-            encoders.encode_base64(part)
-            part.add_header(
-                'Content-Disposition',
-                f'attachment; filename= {os.path.basename(pdf_path)}'
-            )
-            msg.attach(part)
-        except Exception as e:
-            print(f"PDF ekleme hatası: {e}")
+    def build_email_message(self, recipients, subject, html_content, pdf_path=None):
+        """Gönderime hazır MIME mesajı (bytes)"""
+        return PreparedEmail(html_content, pdf_path).for_recipients(self.email_config['sender_email'], recipients, subject)
     
     def send_telegram_message(self, telegram_data):
         """Telegram bot üzerinden mesaj gönder"""
@@ -289,53 +196,22 @@ class NotificationAgent(BaseAgent):
             }
         
         try:
-            # Telegram mesaj formatı
-            analysis = telegram_data.get('analysis_result', {})
-            symbol = analysis.get('symbol', 'UNKNOWN')
-            recommendation = analysis.get('recommendation', 'BEKLE')
-            confidence = analysis.get('confidence', 50)
-            
-            # Emoji seçimi
-            if 'AL' in recommendation:
-                emoji = '🚀'
-            elif 'SAT' in recommendation:
-                emoji = '📉'
-            else:
-                emoji = '⏳'
-            
-            message = f"""
-{emoji} *Multi-Agent AI Analiz*
-
-📊 *Hisse:* `{symbol}`
-🎯 *Öneri:* *{recommendation}*
-📈 *Güven:* %{confidence}
-
-🤖 *7 AI Agent* koordineli analiz sonucu
-⏰ *Zaman:* {datetime.now().strftime('%H:%M')}
-
-_Bu analiz yatırım tavsiyesi değildir._
-            """
+            message = self.create_telegram_message(telegram_data.get('analysis_result', {}))
             
-            # API çağrısı (demo mode)
-            url = f"https://api.telegram.org/bot{self.telegram_config['bot_token']}/sendMessage"
-            payload = {
+            # Teslim hattına kuyruğa al (tek HTTP oturumu, hız sınırlı)
+            batch_id = self.get_dispatcher().submit([{
+                'channel': 'telegram',
                 'chat_id': telegram_data['chat_id'],
                 'text': message,
                 'parse_mode': 'Markdown'
-            }
-            
-            # Demo mode için simüle et
-            if self.telegram_config['enabled']:
-                response = requests.post(url, json=payload, timeout=10)
-                delivery_status = "delivered" if response.status_code == 200 else "failed"
-            else:
-                delivery_status = "demo_mode"
+            }], label='telegram')
             
             return {
                 "success": True,
-                "message": "Telegram mesajı gönderildi",
+                "message": "Telegram mesajı kuyruğa alındı",
                 "chat_id": telegram_data['chat_id'],
-                "delivery_status": delivery_status
+                "delivery_status": "queued",
+                "batch_id": batch_id
             }
             
         except Exception as e:
@@ -344,11 +220,38 @@ _Bu analiz yatırım tavsiyesi değildir._
                 "error": f"Telegram gönderim hatası: {str(e)}"
             }
     
+    def create_telegram_message(self, analysis):
+        """Telegram mesaj formatı"""
+        symbol = analysis.get('symbol', 'UNKNOWN')
+        recommendation = analysis.get('recommendation', 'BEKLE')
+        confidence = analysis.get('confidence', 50)
+        
+        # Emoji seçimi
+        if 'AL' in recommendation:
+            emoji = '🚀'
+        elif 'SAT' in recommendation:
+            emoji = '📉'
+        else:
+            emoji = '⏳'
+        
+        return f"""
+{emoji} *Multi-Agent AI Analiz*
+
+📊 *Hisse:* `{symbol}`
+🎯 *Öneri:* *{recommendation}*
+📈 *Güven:* %{confidence}
+
+🤖 *7 AI Agent* koordineli analiz sonucu
+⏰ *Zaman:* {datetime.now().strftime('%H:%M')}
+
+_Bu analiz yatırım tavsiyesi değildir._
+            """
+    
     def schedule_notification(self, schedule_config):
-        """Otomatik bildirim planla"""
+        """Otomatik bildirim planla (kalıcı iş olarak)"""
         if not schedule_config:
             schedule_config = {
-                'frequency': 'daily',  # daily, weekly, monthly
+                'frequency': 'daily',  # daily, weekly, monthly, hourly veya cron
                 'time': '09:00',
                 'notification_type': 'email',
                 'recipients': ['admin@company.com'],
@@ -356,67 +259,77 @@ _Bu analiz yatırım tavsiyesi değildir._
                 'enabled': True
             }
         
-        schedule_id = f"SCH_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        schedule_spec = {key: schedule_config[key] for key in
+                         ('frequency', 'time', 'weekday', 'day', 'cron', 'interval_seconds', 'run_at')
+                         if key in schedule_config}
         
-        # Schedule'a görev ekle
-        def send_scheduled_notification():
-            print(f"⏰ Zamanlanmış bildirim çalışıyor: {schedule_id}")
-            # Burada analiz yapılıp bildirim gönderilir
-            
-        frequency = schedule_config.get('frequency', 'daily')
-        time_str = schedule_config.get('time', '09:00')
-        
-        if frequency == 'daily':
-            schedule.every().day.at(time_str).do(send_scheduled_notification)
-        elif frequency == 'weekly':
-            schedule.every().monday.at(time_str).do(send_scheduled_notification)
-        elif frequency == 'monthly':
-            schedule.every().month.at(time_str).do(send_scheduled_notification)
-        
-        # Kaydet
-        self.scheduled_tasks.append({
-            'id': schedule_id,
-            'config': schedule_config,
-            'created_at': datetime.now().isoformat(),
-            'status': 'active'
-        })
+        # Aynı zamanlama tekrar istenirse yeni iş eklenmez, mevcut iş güncellenir
+        job_id = schedule_config.get('schedule_id')
+        if not job_id:
+            identity = {key: value for key, value in schedule_config.items() if key not in ('enabled', 'schedule_id')}
+            digest = hashlib.sha1(json.dumps(identity, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+            job_id = f"SCH_{digest[:12].upper()}"
+        try:
+            job = self.job_scheduler.add_job(
+                SCHEDULED_NOTIFICATION,
+                schedule_spec or {'frequency': 'daily', 'time': '09:00'},
+                payload=schedule_config,
+                name=f"{schedule_config.get('frequency', 'cron')} bildirim",
+                job_id=job_id,
+                jitter=schedule_config.get('jitter_seconds', 0),
+                catch_up=schedule_config.get('catch_up', 'once'),
+                prefix='SCH'
+            )
+        except (ValueError, KeyError) as e:
+            return {"error": f"Geçersiz zamanlama: {e}"}
+        
+        if not schedule_config.get('enabled', True):
+            job = self.job_scheduler.pause_job(job['job_id'])
         
         return {
             "success": True,
-            "schedule_id": schedule_id,
-            "message": f"{frequency} bildirim planlandı",
-            "next_run": self.calculate_next_run(schedule_config)
+            "schedule_id": job['job_id'],
+            "message": f"{job['name']} planlandı",
+            "status": job['status'],
+            "next_run": job['next_run']
         }
     
+    def cancel_scheduled_notification(self, schedule_id):
+        if not self.job_scheduler.remove_job(schedule_id):
+            return {"error": f"Zamanlama bulunamadı: {schedule_id}"}
+        return {"success": True, "schedule_id": schedule_id}
+    
+    @property
+    def scheduled_tasks(self):
+        """Bu agent'ın zamanlanmış bildirim işleri"""
+        return self.job_scheduler.list_jobs(handler=SCHEDULED_NOTIFICATION)
+    
+    def run_scheduled_notification(self, config):
+        """Zamanı gelen bildirimi gönder (zamanlayıcı işçisinde çalışır)"""
+        recipients = config.get('recipients', [])
+        notification_type = config.get('notification_type', 'email')
+        
+        for symbol in config.get('symbols', []):
+            if self.analysis_provider:
+                analysis = self.analysis_provider(symbol)
+            else:
+                analysis = {'symbol': symbol, 'current_price': self.price_bus.last_price(symbol)}
+            analysis.setdefault('timestamp', datetime.now().isoformat())
+            
+            if notification_type == 'telegram':
+                for chat_id in recipients:
+                    self.send_telegram_message({'chat_id': chat_id, 'analysis_result': analysis})
+            else:
+                self.send_email_notification({
+                    'to': recipients,
+                    'subject': f"{symbol} Zamanlanmış Analiz Raporu",
+                    'analysis_result': analysis
+                })
+        print(f"⏰ Zamanlanmış bildirim gönderildi: {config.get('symbols')}")
+    
     def calculate_next_run(self, config):
         """Sonraki çalışma zamanını hesapla"""
-        frequency = config.get('frequency', 'daily')
-        time_str = config.get('time', '09:00')
-        
-        now = datetime.now()
-        hour, minute = map(int, time_str.split(':'))
-        
-        if frequency == 'daily':
-            next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            if next_run <= now:
-                next_run += timedelta(days=1)
-        elif frequency == 'weekly':
-            days_ahead = 0 - now.weekday()  # Pazartesi
-            if days_ahead <= 0:
-                days_ahead += 7
-            next_run = now + timedelta(days=days_ahead)
-            next_run = next_run.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        else:  # monthly
-            if now.day <= 1:
-                next_run = now.replace(day=1, hour=hour, minute=minute, second=0, microsecond=0)
-            else:
-                # Gelecek ay
-                if now.month == 12:
-                    next_run = now.replace(year=now.year+1, month=1, day=1, hour=hour, minute=minute)
-                else:
-                    next_run = now.replace(month=now.month+1, day=1, hour=hour, minute=minute)
-        
-        return next_run.isoformat()
+        return next_run_time(config).isoformat()
     
     def subscribe_user(self, user_data):
         """Kullanıcı aboneliği ekle"""
@@ -432,25 +345,35 @@ _Bu analiz yatırım tavsiyesi değildir._
                 }
             }
         
-        # Mevcut aboneyi kontrol et
-        existing = next((sub for sub in self.subscribers if sub['email'] == user_data['email']), None)
-        
-        if existing:
-            # Güncelle
-            existing.update(user_data)
-            existing['updated_at'] = datetime.now().isoformat()
-            message = "Abonelik güncellendi"
-        else:
-            # Yeni ekle
-            user_data['subscribed_at'] = datetime.now().isoformat()
-            user_data['id'] = len(self.subscribers) + 1
-            self.subscribers.append(user_data)
-            message = "Yeni abonelik eklendi"
+        # Mevcut abone e-posta/telegram indeksinden bulunur (O(1))
+        try:
+            subscriber, created = self.subscribers.subscribe(user_data)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        message = "Yeni abonelik eklendi" if created else "Abonelik güncellendi"
         
         return {
             "success": True,
             "message": message,
-            "subscriber_id": user_data.get('id'),
+            "subscriber_id": subscriber['id'],
+            "total_subscribers": len(self.subscribers)
+        }
+    
+    def unsubscribe_user(self, user_data):
+        """Kullanıcı aboneliğini kaldır"""
+        user_data = user_data or {}
+        removed = self.subscribers.unsubscribe(
+            email=user_data.get('email'),
+            telegram_id=user_data.get('telegram_id'),
+            subscriber_id=user_data.get('id')
+        )
+        if removed is None:
+            return {"success": False, "error": "Abone bulunamadı"}
+        
+        return {
+            "success": True,
+            "message": "Abonelik kaldırıldı",
+            "subscriber_id": removed['id'],
             "total_subscribers": len(self.subscribers)
         }
     
@@ -471,50 +394,73 @@ _Bu analiz yatırım tavsiyesi değildir._
                 "sent_count": 0
             }
         
-        sent_count = 0
         errors = []
-        
-        for subscriber in self.subscribers:
+        messages = []
+        symbol = analysis_data.get('symbol')
+        subject = f'{symbol} Analiz Sonucu - {analysis_data.get("recommendation")}'
+        email_enabled = self.email_config['enabled'] and self.email_config['sender_password']
+        telegram_enabled = self.telegram_config['enabled'] and self.telegram_config['bot_token']
+        
+        # İçerik broadcast başına (dil başına) bir kez render edilip kodlanır
+        prepared_emails = {}
+        telegram_text = self.create_telegram_message(analysis_data) if telegram_enabled else None
+        
+        # Sadece sembolü takip eden aboneler (sembol indeksi)
+        for subscriber in self.subscribers.subscribers_for_symbol(symbol):
             try:
                 preferences = subscriber.get('preferences', {})
-                symbol = analysis_data.get('symbol')
                 
-                # Sembol filtrelemesi
-                if symbol not in preferences.get('symbols', []):
-                    continue
-                
-                # E-mail gönder
-                if preferences.get('email_enabled', True) and subscriber.get('email'):
-                    email_task = {
+                # E-mail
+                if email_enabled and preferences.get('email_enabled', True) and subscriber.get('email'):
+                    locale = preferences.get('locale', 'tr')
+                    prepared = prepared_emails.get(locale)
+                    if prepared is None:
+                        prepared = prepared_emails[locale] = PreparedEmail(self.create_email_template(analysis_data, locale))
+                    
+                    # Sadece alıcıya özel başlıklar değişir
+                    messages.append({
+                        'channel': 'email',
                         'to': [subscriber['email']],
-                        'subject': f'{symbol} Analiz Sonucu - {analysis_data.get("recommendation")}',
-                        'analysis_result': analysis_data
-                    }
-                    email_result = self.send_email_notification(email_task)
-                    if email_result.get('success'):
-                        sent_count += 1
+                        'body': prepared.for_recipients(self.email_config['sender_email'], [subscriber['email']], subject)
+                    })
                 
-                # Telegram gönder
-                if preferences.get('telegram_enabled', False) and subscriber.get('telegram_id'):
-                    telegram_task = {
+                # Telegram
+                if telegram_enabled and preferences.get('telegram_enabled', False) and subscriber.get('telegram_id'):
+                    messages.append({
+                        'channel': 'telegram',
                         'chat_id': subscriber['telegram_id'],
-                        'analysis_result': analysis_data
-                    }
-                    telegram_result = self.send_telegram_message(telegram_task)
-                    if telegram_result.get('success'):
-                        sent_count += 1
+                        'text': telegram_text,
+                        'parse_mode': 'Markdown'
+                    })
                         
             except Exception as e:
                 errors.append(f"Abone {subscriber.get('email', 'unknown')}: {str(e)}")
         
+        # Teslim arka planda yapılır; API isteği beklemez
+        batch_id = self.get_dispatcher().submit(messages, label=subject) if messages else None
+        
         return {
             "success": True,
-            "message": f"Broadcast tamamlandı",
-            "sent_count": sent_count,
+            "message": "Broadcast kuyruğa alındı" if batch_id else "Broadcast tamamlandı",
+            "sent_count": len(messages),
+            "batch_id": batch_id,
+            "delivery_status": "queued" if batch_id else None,
             "total_subscribers": len(self.subscribers),
             "errors": errors if errors else None
         }
     
+    def get_dispatcher(self):
+        if self.dispatcher is None:
+            self.dispatcher = NotificationDispatcher(self.email_config, self.telegram_config)
+        return self.dispatcher
+    
+    def get_delivery_status(self, batch_id):
+        """Kuyruğa alınan gönderimin durumu"""
+        status = self.dispatcher.get_batch_status(batch_id) if self.dispatcher else None
+        if status is None:
+            return {"error": f"Gönderim bulunamadı: {batch_id}"}
+        return status
+    
     def send_price_alert(self, alert_data):
         """Fiyat uyarısı gönder"""
         if not alert_data:
@@ -578,6 +524,115 @@ _Bu analiz yatırım tavsiyesi değildir._
             "notifications_sent": notifications_sent
         }
     
+    def send_trade_trigger_alert(self, event):
+        """Tetiklenen stop-loss / kâr al emrini sembolü takip eden abonelere gönder
+
+        event: TradingAgent.handle_fired_triggers olayı. Alıcılar abone
+        kaydının sembol indeksinden bulunur; mesajlar teslim hattına tek
+        parti olarak verilir.
+        """
+        symbol = event['symbol']
+        label = 'Stop-loss' if event['trigger_type'] == 'STOP_LOSS' else 'Kâr al'
+        if event.get('order_success'):
+            outcome = f"✅ Satış emri gerçekleşti ({event.get('trade_id')})"
+        else:
+            outcome = f"❌ Satış emri gerçekleşmedi: {event.get('error') or 'bilinmeyen hata'}"
+        message = (f"{'⚠️' if event['trigger_type'] == 'STOP_LOSS' else '🎯'} {symbol} {label} seviyesi "
+                   f"{event['level']} TL tetiklendi\n💰 Fiyat: {event['trigger_price']} TL\n{outcome}")
+        subject = f'{label} Tetiklendi: {symbol}'
+        
+        email_enabled = self.email_config['enabled'] and self.email_config['sender_password']
+        telegram_enabled = self.telegram_config['enabled'] and self.telegram_config['bot_token']
+        prepared = None
+        messages = []
+        for subscriber in self.subscribers.subscribers_for_symbol(symbol):
+            preferences = subscriber.get('preferences', {})
+            if email_enabled and preferences.get('email_enabled', True) and subscriber.get('email'):
+                if prepared is None:
+                    prepared = PreparedEmail(self.create_email_template({
+                        'symbol': symbol,
+                        'recommendation': label.upper(),
+                        'confidence': 100,
+                        'price_info': message
+                    }))
+                messages.append({
+                    'channel': 'email',
+                    'to': [subscriber['email']],
+                    'body': prepared.for_recipients(self.email_config['sender_email'], [subscriber['email']], subject)
+                })
+            if telegram_enabled and preferences.get('telegram_enabled', False) and subscriber.get('telegram_id'):
+                messages.append({'channel': 'telegram', 'chat_id': subscriber['telegram_id'], 'text': message})
+        
+        batch_id = self.get_dispatcher().submit(messages, label=subject) if messages else None
+        self.notification_history.append({
+            'type': 'trade_trigger',
+            'trigger_id': event['trigger_id'],
+            'symbol': symbol,
+            'sent_at': datetime.now().isoformat(),
+            'notifications_sent': len(messages),
+            'batch_id': batch_id
+        })
+        return {"success": True, "notifications_sent": len(messages), "batch_id": batch_id}
+    
+    def create_price_alert(self, alert_data):
+        """Kalıcı fiyat uyarısı kur (above, below, percent_move, cross_ma)"""
+        if not alert_data:
+            alert_data = {
+                'user_id': 'investor@example.com',
+                'symbol': 'THYAO',
+                'alert_type': 'above',
+                'value': 95.00,
+                'user_preferences': {
+                    'email': 'investor@example.com'
+                }
+            }
+        
+        if alert_data.get('history'):
+            self.price_alerts.seed_closes(alert_data['symbol'], alert_data['history'])
+        
+        return self.price_alerts.add_alert(
+            alert_data['user_id'],
+            alert_data['symbol'],
+            alert_data.get('alert_type', 'above'),
+            alert_data['value'],
+            direction=alert_data.get('direction'),
+            reference_price=alert_data.get('reference_price') or self.price_bus.last_price(alert_data['symbol']),
+            repeat=alert_data.get('repeat', True),
+            contact=alert_data.get('user_preferences')
+        )
+    
+    def remove_price_alert(self, alert_id):
+        if not self.price_alerts.remove_alert(alert_id):
+            return {"error": f"Uyarı bulunamadı: {alert_id}"}
+        return {"success": True, "alert_id": alert_id}
+    
+    def list_price_alerts(self, user_id):
+        alerts = self.price_alerts.list_alerts(user_id)
+        return {
+            "user_id": user_id,
+            "alerts": alerts,
+            "total": len(alerts)
+        }
+    
+    def deliver_price_alerts(self, events):
+        """Tetiklenen kalıcı uyarıları kullanıcıya gönder"""
+        for event in events:
+            result = self.send_price_alert({
+                'symbol': event['symbol'],
+                'current_price': event['price'],
+                'trigger_price': event['level'],
+                'alert_type': event['direction'],
+                'user_preferences': event['contact']
+            })
+            self.notification_history.append({
+                'type': 'price_alert',
+                'alert_id': event['alert_id'],
+                'user_id': event['user_id'],
+                'symbol': event['symbol'],
+                'sent_at': event['fired_at'],
+                'notifications_sent': result.get('notifications_sent', 0)
+            })
+    
     def get_notification_stats(self):
         """Bildirim istatistikleri"""
         email_count = len([n for n in self.notification_history if n['type'] == 'email'])
@@ -589,23 +644,27 @@ _Bu analiz yatırım tavsiyesi değildir._
             "telegram_notifications": telegram_count,
             "active_subscribers": len(self.subscribers),
             "scheduled_tasks": len(self.scheduled_tasks),
+            "price_alerts": self.price_alerts.get_stats(),
+            "template_cache": template_renderer.get_stats(),
+            "delivery": self.dispatcher.get_stats() if self.dispatcher else None,
             "last_notification": self.notification_history[-1] if self.notification_history else None
         }
     
     def start_scheduler(self):
         """Zamanlanmış görevleri başlat"""
-        def run_scheduler():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Her dakika kontrol et
-        
-        scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-        scheduler_thread.start()
+        self.job_scheduler.start()
         print("📅 Bildirim zamanlayıcısı başlatıldı")
 
 # Test fonksiyonu
 if __name__ == "__main__":
-    agent = NotificationAgent()
+    import shutil
+    import tempfile
+    from job_scheduler import JobScheduler
+    
+    # Demo kalıcı zamanlayıcıyı ve abone kaydını kirletmesin
+    demo_dir = tempfile.mkdtemp(prefix='notification_demo_')
+    agent = NotificationAgent(subscribers_path=os.path.join(demo_dir, 'subscribers.jsonl'),
+                              job_scheduler=JobScheduler(path=os.path.join(demo_dir, 'jobs.db')))
     
     # Test 1: E-mail bildirimi
     email_task = {"type": "send_email", "email_data": None}
@@ -625,4 +684,8 @@ if __name__ == "__main__":
     # İstatistikler
     print("İstatistikler:", agent.get_notification_stats())
     
-    print("Agent Durumu:", agent.get_status())
\ No newline at end of file
+    print("Agent Durumu:", agent.get_status())
+    
+    agent.job_scheduler.shutdown()
+    agent.subscribers.close()
+    shutil.rmtree(demo_dir, ignore_errors=True)
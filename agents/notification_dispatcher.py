@@ -0,0 +1,341 @@
+import asyncio
+import itertools
+import queue
+import random
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import aiohttp
+
+
+class PermanentDeliveryError(Exception):
+    """Tekrar denenmeyecek teslim hatası (geçersiz alıcı, hatalı istek vb.)"""
+
+
+class SMTPConnectionPool:
+    """Kimliği doğrulanmış SMTP bağlantılarını yeniden kullanan havuz
+
+    Her mesaj için bağlan/STARTTLS/login/quit yapmak yerine bağlantılar
+    açık tutulur; uzun süre boşta kalanlar NOOP ile kontrol edilir.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, use_ssl=False,
+                 size=4, timeout=30, idle_check=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.size = size
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connections_opened = 0
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls(context=ssl.create_default_context())
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return server
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            server, last_used = self._idle.get_nowait()
+            if time.time() - last_used > self.idle_check and server.noop()[0] != 250:
+                raise smtplib.SMTPServerDisconnected()
+            return server
+        except queue.Empty:
+            pass
+        except (smtplib.SMTPException, OSError):
+            self._quietly_close(server)
+
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server, broken=False):
+        if broken:
+            self._quietly_close(server)
+        else:
+            self._idle.put((server, time.time()))
+        self._slots.release()
+
+    @staticmethod
+    def _quietly_close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def send(self, sender, recipients, message_bytes):
+        if callable(message_bytes):
+            message_bytes = message_bytes()  # gönderim thread'inde oluştur
+        server = self._acquire()
+        try:
+            refused = server.sendmail(sender, recipients, message_bytes)
+        except smtplib.SMTPRecipientsRefused as e:
+            self._release(server)
+            raise PermanentDeliveryError(f"Alıcı reddedildi: {list(e.recipients)}")
+        except smtplib.SMTPResponseException as e:
+            self._release(server)
+            if 500 <= e.smtp_code < 600:
+                raise PermanentDeliveryError(f"SMTP {e.smtp_code}: {e.smtp_error}")
+            raise
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._release(server, broken=True)
+            raise
+        self._release(server)
+        return refused
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quietly_close(server)
+
+
+class AsyncRateLimiter:
+    """Token bucket: saniyede en fazla rate işlem"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """Kuyruklu, asenkron bildirim teslim hattı
+
+    Tek bir arka plan thread'inde asyncio döngüsü çalışır. Mesajlar
+    kuyruğa alınır ve sınırlı sayıda işçi tarafından gönderilir: e-postalar
+    havuzdaki kalıcı SMTP bağlantıları üzerinden (bloklayan smtplib
+    çağrıları havuz boyutunda bir thread havuzunda), Telegram mesajları tek
+    bir aiohttp oturumu üzerinden. Telegram'ın genel ve sohbet başı hız
+    sınırlarına uyulur; geçici hatalar üstel bekleme ile tekrar denenir.
+    """
+
+    def __init__(self, email_config, telegram_config, max_concurrency=32, smtp_pool_size=8,
+                 telegram_rate=25, telegram_chat_interval=1.0, max_retries=3, backoff_base=0.5):
+        self.email_config = email_config
+        self.telegram_config = telegram_config
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.telegram_rate = telegram_rate
+        self.telegram_chat_interval = telegram_chat_interval  # aynı sohbete iki mesaj arası (saniye)
+
+        self.smtp_pool = SMTPConnectionPool(
+            email_config['smtp_server'],
+            email_config['smtp_port'],
+            email_config.get('sender_email'),
+            email_config.get('sender_password'),
+            use_tls=email_config.get('use_tls', True),
+            use_ssl=email_config.get('use_ssl', False),
+            size=smtp_pool_size
+        )
+        self._smtp_executor = ThreadPoolExecutor(max_workers=smtp_pool_size, thread_name_prefix="smtp")
+
+        self._ids = itertools.count(1)
+        self.batches = {}
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'retried': 0}
+
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="NotificationDispatcher", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._queue = asyncio.Queue()
+        self._telegram_limiter = AsyncRateLimiter(self.telegram_rate)
+        self._chat_next_slot = {}
+        self._session = None
+        self._workers = [self.loop.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        self._ready.set()
+        self.loop.run_forever()
+
+    # Kuyruğa alma (herhangi bir thread'den çağrılabilir)
+    def submit(self, messages, label=None):
+        """Mesajları kuyruğa al; beklemeden batch id döndür
+
+        messages: [{'channel': 'email', 'to': [...], 'body': bytes veya bytes döndüren callable}] veya
+                  [{'channel': 'telegram', 'chat_id': ..., 'text': ..., 'parse_mode': ...}]
+        """
+        batch_id = f"NTF_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(self._ids):06d}"
+        self.batches[batch_id] = {
+            'batch_id': batch_id,
+            'label': label,
+            'total': len(messages),
+            'sent': 0,
+            'failed': 0,
+            'errors': [],
+            'created_at': datetime.now().isoformat(),
+            'started': time.time(),
+            'duration': None
+        }
+        self.stats['queued'] += len(messages)
+        self.loop.call_soon_threadsafe(self._enqueue, batch_id, messages)
+        return batch_id
+
+    def _enqueue(self, batch_id, messages):
+        for message in messages:
+            self._queue.put_nowait((batch_id, message, 0))
+
+    async def _worker(self):
+        while True:
+            batch_id, message, attempt = await self._queue.get()
+            retrying = False
+            try:
+                await self._deliver(message)
+                self._finish(batch_id, success=True)
+            except PermanentDeliveryError as e:
+                self._finish(batch_id, success=False, error=str(e))
+            except Exception as e:
+                if attempt < self.max_retries:
+                    retrying = True
+                    self.stats['retried'] += 1
+                    self.loop.create_task(self._retry_later(batch_id, message, attempt + 1))
+                else:
+                    self._finish(batch_id, success=False, error=str(e))
+            finally:
+                if not retrying:
+                    self._queue.task_done()
+
+    async def _retry_later(self, batch_id, message, attempt):
+        """Üstel bekleme sonrası tekrar kuyruğa al; işçiyi bekletmez"""
+        await asyncio.sleep(self.backoff_base * (2 ** (attempt - 1)) * (1 + random.random() * 0.25))
+        self._queue.put_nowait((batch_id, message, attempt))
+        self._queue.task_done()  # önceki denemenin kaydı
+
+    def _finish(self, batch_id, success, error=None):
+        batch = self.batches[batch_id]
+        if success:
+            batch['sent'] += 1
+            self.stats['sent'] += 1
+        else:
+            batch['failed'] += 1
+            self.stats['failed'] += 1
+            if len(batch['errors']) < 20:
+                batch['errors'].append(error)
+        if batch['sent'] + batch['failed'] == batch['total']:
+            batch['duration'] = round(time.time() - batch['started'], 3)
+
+    async def _deliver(self, message):
+        if message['channel'] == 'email':
+            await self.loop.run_in_executor(
+                self._smtp_executor, self.smtp_pool.send,
+                self.email_config['sender_email'], message['to'], message['body']
+            )
+        elif message['channel'] == 'telegram':
+            await self._send_telegram(message)
+        else:
+            raise PermanentDeliveryError(f"Bilinmeyen kanal: {message['channel']}")
+
+    async def _send_telegram(self, message):
+        # Aynı sohbete art arda mesajlar arasında bekle
+        chat_id = message['chat_id']
+        now = self.loop.time()
+        slot = max(now, self._chat_next_slot.get(chat_id, 0))
+        self._chat_next_slot[chat_id] = slot + self.telegram_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        await self._telegram_limiter.acquire()
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+
+        api_base = self.telegram_config.get('api_base', 'https://api.telegram.org')
+        url = f"{api_base}/bot{self.telegram_config['bot_token']}/sendMessage"
+        payload = {'chat_id': chat_id, 'text': message['text']}
+        if message.get('parse_mode'):
+            payload['parse_mode'] = message['parse_mode']
+
+        async with self._session.post(url, json=payload) as response:
+            if response.status == 200:
+                return
+            if response.status == 429:
+                # Telegram'ın istediği kadar bekle, sonra tekrar dene
+                data = await response.json(content_type=None)
+                retry_after = data.get('parameters', {}).get('retry_after', 1)
+                await asyncio.sleep(retry_after)
+                raise RuntimeError(f"Telegram hız sınırı ({retry_after}s)")
+            if 400 <= response.status < 500:
+                raise PermanentDeliveryError(f"Telegram {response.status}: {await response.text()}")
+            raise RuntimeError(f"Telegram {response.status}")
+
+    # Durum
+    def get_batch_status(self, batch_id):
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        done = batch['sent'] + batch['failed']
+        return {
+            'batch_id': batch_id,
+            'label': batch['label'],
+            'status': 'completed' if done == batch['total'] else 'in_progress',
+            'total': batch['total'],
+            'sent': batch['sent'],
+            'failed': batch['failed'],
+            'pending': batch['total'] - done,
+            'duration_seconds': batch['duration'],
+            'errors': batch['errors'] or None
+        }
+
+    def get_stats(self):
+        return dict(self.stats, pending=self._queue.qsize(), smtp_connections_opened=self.smtp_pool.connections_opened)
+
+    def drain(self, timeout=30):
+        """Kuyruk boşalana kadar bekle (test ve kapanış için)"""
+        future = asyncio.run_coroutine_threadsafe(self._queue.join(), self.loop)
+        try:
+            future.result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def shutdown(self, timeout=10):
+        self.drain(timeout)
+
+        async def _close():
+            for worker in self._workers:
+                worker.cancel()
+            if self._session is not None:
+                await self._session.close()
+
+        asyncio.run_coroutine_threadsafe(_close(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._smtp_executor.shutdown(wait=False)
+        self.smtp_pool.close()
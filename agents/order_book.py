@@ -0,0 +1,415 @@
+import heapq
+import itertools
+from collections import deque
+
+BUY = 'BUY'
+SELL = 'SELL'
+
+DEFAULT_DAILY_VOLUME = 1000000  # Hacim bilinmiyorsa varsayılan günlük lot
+SYNTHETIC_OWNER = 'synthetic'
+
+
+def tick_size(price):
+    """BIST fiyat adımı tablosu"""
+    if price < 20:
+        return 0.01
+    if price < 50:
+        return 0.02
+    if price < 100:
+        return 0.05
+    if price < 250:
+        return 0.1
+    if price < 500:
+        return 0.25
+    if price < 1000:
+        return 0.5
+    if price < 2500:
+        return 1.0
+    return 2.5
+
+
+class Order:
+    __slots__ = ('order_id', 'side', 'tick', 'quantity', 'owner')
+
+    def __init__(self, order_id, side, tick, quantity, owner):
+        self.order_id = order_id
+        self.side = side
+        self.tick = tick
+        self.quantity = quantity
+        self.owner = owner
+
+
+class OrderBook:
+    """Tek sembol için limit emir defteri (fiyat-zaman önceliği)
+
+    Fiyatlar tamsayı tick olarak tutulur. Her fiyat seviyesi FIFO bir
+    deque'dur; en iyi alış/satış seviyeleri min-heap ile bulunur (alışlar
+    negatif tick). Boşalan seviyeler ve iptal edilen emirler heap'ten tembel
+    olarak (lazy deletion) atılır, böylece her olay O(log seviye) maliyetlidir.
+    """
+
+    def __init__(self, symbol, tick=0.01):
+        self.symbol = symbol
+        self.tick = tick
+        self._ids = itertools.count(1)
+
+        self.bid_heap = []  # -tick
+        self.ask_heap = []  # tick
+        self.bid_levels = {}  # tick -> deque[Order]
+        self.ask_levels = {}
+        self.bid_depth = {}  # tick -> seviyedeki toplam miktar
+        self.ask_depth = {}
+        self.orders = {}  # order_id -> Order (defterde bekleyenler)
+
+        # Tetiklenmeyi bekleyen stop emirleri: (tetik tick, sıra, emir)
+        self.buy_stops = []  # fiyat >= tetik olunca
+        self.sell_stops = []  # fiyat <= tetik olunca (-tick ile)
+        self.stop_orders = {}  # order_id -> Order (tetik bekleyenler)
+
+        self.last_tick = None
+        self.traded_volume = 0
+
+    # Fiyat dönüşümleri
+    def to_tick(self, price):
+        return int(round(price / self.tick))
+
+    def to_price(self, tick):
+        return round(tick * self.tick, 6)
+
+    # Defter durumu
+    def best_bid_tick(self):
+        heap = self.bid_heap
+        while heap and -heap[0] not in self.bid_levels:
+            heapq.heappop(heap)
+        return -heap[0] if heap else None
+
+    def best_ask_tick(self):
+        heap = self.ask_heap
+        while heap and heap[0] not in self.ask_levels:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def best_bid(self):
+        tick = self.best_bid_tick()
+        return self.to_price(tick) if tick is not None else None
+
+    def best_ask(self):
+        tick = self.best_ask_tick()
+        return self.to_price(tick) if tick is not None else None
+
+    def mid_price(self):
+        bid, ask = self.best_bid_tick(), self.best_ask_tick()
+        if bid is None or ask is None:
+            tick = bid if ask is None else ask
+            return self.to_price(tick) if tick is not None else None
+        return (bid + ask) / 2 * self.tick
+
+    def last_price(self):
+        return self.to_price(self.last_tick) if self.last_tick is not None else None
+
+    def depth(self, levels=5):
+        """İlk N seviyenin fiyat ve miktarları"""
+        bids = heapq.nlargest(levels, self.bid_depth)
+        asks = heapq.nsmallest(levels, self.ask_depth)
+        return {
+            'bids': [(self.to_price(tick), self.bid_depth[tick]) for tick in bids],
+            'asks': [(self.to_price(tick), self.ask_depth[tick]) for tick in asks]
+        }
+
+    def side_quantity(self, side):
+        return sum((self.bid_depth if side == BUY else self.ask_depth).values())
+
+    # Emir girişi
+    def submit(self, side, quantity, order_type='LIMIT', price=None, stop_price=None, owner=None):
+        """Emri işle; gerçekleşmeleri ve kalan miktarı döndür
+
+        LIMIT: eşleşmeyen kısım deftere yazılır.
+        MARKET: karşı taraftaki likidite kadar gerçekleşir, kalanı iptal olur.
+        STOP: son işlem fiyatı tetik seviyesine gelince MARKET (fiyat
+        verilmişse LIMIT) olarak deftere girer.
+        """
+        if order_type == 'STOP' and (stop_price is None or stop_price <= 0):
+            return {'order_id': None, 'status': 'REJECTED', 'filled': 0, 'remaining': quantity, 'fills': [],
+                    'error': 'STOP emri için geçerli stop_price gerekli'}
+        if order_type == 'LIMIT' and (price is None or price <= 0):
+            return {'order_id': None, 'status': 'REJECTED', 'filled': 0, 'remaining': quantity, 'fills': [],
+                    'error': 'LIMIT emri için geçerli fiyat gerekli'}
+
+        order_id = next(self._ids)
+        fills = []
+
+        if order_type == 'STOP':
+            trigger = self.to_tick(stop_price)
+            if self._stop_triggered(side, trigger):
+                order_type = 'LIMIT' if price is not None else 'MARKET'
+            else:
+                order = Order(order_id, side, self.to_tick(price) if price is not None else None, quantity, owner)
+                if side == BUY:
+                    heapq.heappush(self.buy_stops, (trigger, order_id, order))
+                else:
+                    heapq.heappush(self.sell_stops, (-trigger, order_id, order))
+                self.stop_orders[order_id] = order
+                return {'order_id': order_id, 'status': 'PENDING', 'filled': 0, 'remaining': quantity, 'fills': fills}
+
+        limit_tick = self.to_tick(price) if order_type == 'LIMIT' else None
+        remaining = self._match(side, quantity, limit_tick, fills)
+
+        if remaining and order_type == 'LIMIT':
+            self._rest(Order(order_id, side, limit_tick, remaining, owner))
+            status = 'PARTIAL' if fills else 'OPEN'
+        elif remaining:
+            status = 'PARTIAL' if fills else 'REJECTED'  # MARKET kalanı iptal
+        else:
+            status = 'FILLED'
+
+        if fills:
+            self._trigger_stops(fills)
+
+        return {
+            'order_id': order_id,
+            'status': status,
+            'filled': quantity - remaining,
+            'remaining': remaining,
+            'fills': fills
+        }
+
+    def cancel(self, order_id):
+        stop_order = self.stop_orders.pop(order_id, None)
+        if stop_order is not None:
+            stop_order.quantity = 0  # stop heap'inde tembel silinir
+            return True
+
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+
+        depth = self.bid_depth if order.side == BUY else self.ask_depth
+        levels = self.bid_levels if order.side == BUY else self.ask_levels
+        depth[order.tick] -= order.quantity
+        order.quantity = 0  # deque içinde tembel silinir
+        if depth[order.tick] <= 0:
+            del depth[order.tick]
+            del levels[order.tick]
+        return True
+
+    def _rest(self, order):
+        if order.side == BUY:
+            levels, depth, heap, key = self.bid_levels, self.bid_depth, self.bid_heap, -order.tick
+        else:
+            levels, depth, heap, key = self.ask_levels, self.ask_depth, self.ask_heap, order.tick
+
+        level = levels.get(order.tick)
+        if level is None:
+            level = levels[order.tick] = deque()
+            depth[order.tick] = 0
+            heapq.heappush(heap, key)
+        level.append(order)
+        depth[order.tick] += order.quantity
+        self.orders[order.order_id] = order
+
+    def _match(self, side, quantity, limit_tick, fills):
+        """Karşı tarafı fiyat-zaman önceliğiyle tüket; kalan miktarı döndür"""
+        if side == BUY:
+            levels, depth, best = self.ask_levels, self.ask_depth, self.best_ask_tick
+            crosses = (lambda tick: True) if limit_tick is None else (lambda tick: tick <= limit_tick)
+        else:
+            levels, depth, best = self.bid_levels, self.bid_depth, self.best_bid_tick
+            crosses = (lambda tick: True) if limit_tick is None else (lambda tick: tick >= limit_tick)
+
+        orders = self.orders
+        start_quantity = quantity
+        while quantity > 0:
+            tick = best()
+            if tick is None or not crosses(tick):
+                break
+
+            level = levels[tick]
+            while quantity > 0 and level:
+                maker = level[0]
+                if maker.quantity <= 0:  # iptal edilmiş
+                    level.popleft()
+                    continue
+
+                traded = maker.quantity if maker.quantity < quantity else quantity
+                maker.quantity -= traded
+                quantity -= traded
+                depth[tick] -= traded
+                fills.append((maker.order_id, tick, traded))
+                if maker.quantity == 0:
+                    level.popleft()
+                    del orders[maker.order_id]
+
+            if depth[tick] <= 0:
+                del levels[tick]
+                del depth[tick]
+
+            self.last_tick = tick
+
+        self.traded_volume += start_quantity - quantity
+        return quantity
+
+    # Stop emirleri
+    def _stop_triggered(self, side, trigger):
+        if self.last_tick is None:
+            return False
+        return self.last_tick >= trigger if side == BUY else self.last_tick <= trigger
+
+    def _trigger_stops(self, fills):
+        """Son işlem fiyatına göre tetiklenen stop emirlerini devreye al"""
+        triggered = []
+        while self.buy_stops and self.buy_stops[0][0] <= self.last_tick:
+            triggered.append(heapq.heappop(self.buy_stops)[2])
+        while self.sell_stops and -self.sell_stops[0][0] >= self.last_tick:
+            triggered.append(heapq.heappop(self.sell_stops)[2])
+
+        for order in triggered:
+            if self.stop_orders.pop(order.order_id, None) is None:  # iptal edilmiş
+                continue
+            order_type = 'LIMIT' if order.tick is not None else 'MARKET'
+            price = self.to_price(order.tick) if order.tick is not None else None
+            result = self.submit(order.side, order.quantity, order_type, price, owner=order.owner)
+            fills.extend(result['fills'])
+
+    # Sentetik derinlik
+    def seed_synthetic_depth(self, mid_price, daily_volume=DEFAULT_DAILY_VOLUME, levels=20,
+                             touch_fraction=0.002, level_growth=0.15, orders_per_level=3, spread_ticks=1):
+        """Geçmiş hacimden türetilmiş sentetik derinlik oluştur
+
+        En iyi seviyedeki miktar günlük hacmin touch_fraction kadarıdır ve
+        kotasyondan uzaklaştıkça level_growth oranında artar.
+        """
+        for order_id in [oid for oid, order in self.orders.items() if order.owner == SYNTHETIC_OWNER]:
+            self.cancel(order_id)
+
+        mid_tick = self.to_tick(mid_price)
+        best_bid = mid_tick - spread_ticks // 2 - (spread_ticks % 2)
+        best_ask = best_bid + spread_ticks
+        if best_bid <= 0:
+            best_bid, best_ask = 1, 1 + spread_ticks
+
+        touch_quantity = max(daily_volume * touch_fraction, 1)
+        for level in range(levels):
+            level_quantity = int(touch_quantity * (1 + level_growth * level))
+            order_quantity = max(level_quantity // orders_per_level, 1)
+            for _ in range(orders_per_level):
+                if best_bid - level > 0:
+                    self._rest(Order(next(self._ids), BUY, best_bid - level, order_quantity, SYNTHETIC_OWNER))
+                self._rest(Order(next(self._ids), SELL, best_ask + level, order_quantity, SYNTHETIC_OWNER))
+
+        return {'best_bid': self.to_price(best_bid), 'best_ask': self.to_price(best_ask), 'levels': levels}
+
+    def sweep_cost(self, side, quantity):
+        """Defteri değiştirmeden piyasa emrinin ortalama fiyatını hesapla"""
+        if side == BUY:
+            ticks = sorted(self.ask_depth)
+            depth = self.ask_depth
+        else:
+            ticks = sorted(self.bid_depth, reverse=True)
+            depth = self.bid_depth
+
+        remaining = quantity
+        notional = 0.0
+        worst_tick = None
+        for tick in ticks:
+            if remaining <= 0:
+                break
+            traded = min(depth[tick], remaining)
+            notional += traded * tick
+            remaining -= traded
+            worst_tick = tick
+
+        filled = quantity - remaining
+        return {
+            'filled': filled,
+            'remaining': remaining,
+            'avg_price': notional / filled * self.tick if filled else None,
+            'worst_price': self.to_price(worst_tick) if worst_tick is not None else None
+        }
+
+
+class MatchingEngine:
+    """Sembol başına emir defterlerini yöneten eşleştirme motoru"""
+
+    def __init__(self, reseed_drift=0.02, min_depth_ratio=0.5):
+        self.books = {}
+        self.daily_volumes = {}  # sembol -> geçmiş ortalama günlük hacim
+        self.reseed_drift = reseed_drift  # referans fiyattan bu kadar uzaklaşınca yeniden tohumla
+        self.min_depth_ratio = min_depth_ratio  # sentetik derinlik bu orana düşünce yenile
+        self._seeded_depth = {}
+
+    def set_daily_volume(self, symbol, daily_volume):
+        if daily_volume and daily_volume > 0:
+            self.daily_volumes[symbol] = daily_volume
+
+    def get_book(self, symbol, reference_price=None):
+        """Sembolün defterini al; gerekirse sentetik derinlikle oluştur/yenile"""
+        book = self.books.get(symbol)
+        if book is None:
+            if reference_price is None:
+                return None
+            book = OrderBook(symbol, tick_size(reference_price))
+            self.books[symbol] = book
+            self._seed(book, reference_price)
+            return book
+
+        if reference_price is not None:
+            mid = book.mid_price()
+            depleted = min(book.side_quantity(BUY), book.side_quantity(SELL)) < \
+                self._seeded_depth.get(symbol, 0) * self.min_depth_ratio
+            if mid is None or abs(mid - reference_price) / reference_price > self.reseed_drift or depleted:
+                self._seed(book, reference_price)
+        return book
+
+    def _seed(self, book, reference_price):
+        book.seed_synthetic_depth(reference_price, self.daily_volumes.get(book.symbol, DEFAULT_DAILY_VOLUME))
+        self._seeded_depth[book.symbol] = min(book.side_quantity(BUY), book.side_quantity(SELL))
+
+    def submit_order(self, symbol, side, quantity, order_type='LIMIT', price=None, stop_price=None,
+                     owner=None, reference_price=None):
+        book = self.get_book(symbol, reference_price or price or stop_price)
+        if book is None:
+            return {"error": f"{symbol} için emir defteri yok"}
+        return book.submit(side, quantity, order_type, price, stop_price, owner)
+
+    def cancel_order(self, symbol, order_id):
+        book = self.books.get(symbol)
+        return book.cancel(order_id) if book else False
+
+    def execute_market(self, symbol, side, quantity, reference_price):
+        """Piyasa emrini defterde gerçekleştir; gerçekleşen miktar ve ortalama fiyatı döndür
+
+        Yenilenen derinlik de yetmezse kalan miktar iptal olur (remaining);
+        hiç gerçekleşme yoksa avg_price None döner.
+        """
+        book = self.get_book(symbol, reference_price)
+        result = book.submit(side, quantity, 'MARKET')
+        fills = result['fills']
+
+        # Likidite yetmediyse defteri yenileyip kalan miktarı tamamla
+        if result['remaining']:
+            self._seed(book, book.last_price() or reference_price)
+            fills = fills + book.submit(side, result['remaining'], 'MARKET')['fills']
+
+        filled = sum(fill[2] for fill in fills)
+        return {
+            'avg_price': sum(fill[1] * fill[2] for fill in fills) / filled * book.tick if filled else None,
+            'filled': filled,
+            'remaining': quantity - filled,
+            'fills': len(fills),
+            'levels_consumed': len({fill[1] for fill in fills})
+        }
+
+    def estimate_slippage(self, symbol, side, quantity, reference_price):
+        """Defteri değiştirmeden tahmini kayma (yüzde) ve ortalama fiyat"""
+        book = self.get_book(symbol, reference_price)
+        sweep = book.sweep_cost(side, quantity)
+        if not sweep['filled']:
+            return {'slippage_pct': None, 'avg_price': None, 'fillable': 0}
+
+        slippage = (sweep['avg_price'] - reference_price) / reference_price * 100
+        return {
+            'slippage_pct': slippage if side == BUY else -slippage,
+            'avg_price': sweep['avg_price'],
+            'worst_price': sweep['worst_price'],
+            'fillable': sweep['filled']
+        }
@@ -3,20 +3,38 @@ import pandas as pd
 from datetime import datetime, timedelta
 import time
 from base_agent import BaseAgent
+from fx_rates import fx_rates as default_fx_rates
+from rebalancing_engine import batch_rebalance, compact_actions
+from position_store import PositionStore
+from price_bus import price_bus as default_price_bus
+from valuation_log import ValuationLog
 
 class PersonalPortfolioAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, price_bus=None, fx_rates=None):
         super().__init__(
             name="PersonalPortfolioAgent",
             agent_type="personal_portfolio_tracker",
             capabilities=["portfolio_tracking", "performance_analysis", "profit_loss_calculation", "personal_recommendations"]
         )
-        self.user_portfolios = {}  # Kullanıcı portföylerini sakla
+        self.user_portfolios = {}  # Kullanıcı portföy meta bilgileri
+        self.position_store = PositionStore()  # Pozisyonlar dizi tabanlı depoda
+        self.performance_cache = {}  # user_id -> (portföy durum versiyonu, detaylar)
+        self.valuation_log = ValuationLog()  # Kullanıcı başına değerleme geçmişi
+        self.snapshot_interval = 300  # Gün içi anlık görüntü aralığı (saniye)
+        self.last_snapshot_at = 0
+        
+        # Piyasa kotasyonları (her para biriminde) fiyat kanalından tüm portföylere yayılır
+        self.price_bus = price_bus or default_price_bus
+        self.price_bus.subscribe(self.on_market_quotes, currency=None)
+        
+        # Döviz cinsi pozisyonlar TCMB kurlarıyla TL'ye çevrilir
+        self.fx_rates = fx_rates or default_fx_rates
         
     def can_handle_task(self, task):
         portfolio_tasks = [
             'add_portfolio_position', 'update_portfolio', 'calculate_portfolio_performance',
-            'analyze_personal_portfolio', 'generate_personal_recommendations', 'track_profit_loss'
+            'analyze_personal_portfolio', 'generate_personal_recommendations', 'track_profit_loss',
+            'batch_rebalance_suggestions', 'update_market_prices', 'update_fx_rates'
         ]
         return task.get('type') in portfolio_tasks
     
@@ -30,7 +48,10 @@ class PersonalPortfolioAgent(BaseAgent):
             if task_type == 'add_portfolio_position':
                 result = self.add_portfolio_position(task.get('user_id'), task.get('position_data'))
             elif task_type == 'update_portfolio':
-                result = self.update_portfolio_prices(task.get('user_id'), task.get('current_prices'))
+                result = self.update_portfolio_prices(task.get('user_id'), task.get('current_prices'),
+                                                      task.get('currency') or 'TRY')
+            elif task_type == 'update_market_prices':
+                result = self.update_market_prices(task.get('current_prices'), task.get('currency') or 'TRY')
             elif task_type == 'calculate_portfolio_performance':
                 result = self.calculate_portfolio_performance(task.get('user_id'))
             elif task_type == 'analyze_personal_portfolio':
@@ -39,6 +60,10 @@ class PersonalPortfolioAgent(BaseAgent):
                 result = self.generate_personal_recommendations(task.get('user_id'), task.get('market_analysis'))
             elif task_type == 'track_profit_loss':
                 result = self.track_profit_loss(task.get('user_id'))
+            elif task_type == 'batch_rebalance_suggestions':
+                result = self.suggest_rebalancing_batch(task.get('user_ids'))
+            elif task_type == 'update_fx_rates':
+                result = self.update_fx_rates(task.get('rates'))
             else:
                 result = {"error": "Desteklenmeyen görev tipi"}
             
@@ -65,44 +90,55 @@ class PersonalPortfolioAgent(BaseAgent):
         
         if user_id not in self.user_portfolios:
             self.user_portfolios[user_id] = {
-                'positions': [],
-                'created_date': datetime.now(),
-                'last_updated': datetime.now()
+                'created_date': datetime.now()
             }
         
+        # Döviz cinsi pozisyon: maliyet alış günündeki, değer güncel TCMB kuruyla
+        currency = position_data.get('currency', 'TRY').upper()
+        purchase_date = position_data.get('purchase_date', datetime.now().isoformat())
+        cost_rate = fx_rate = 1.0
+        if currency != 'TRY':
+            cost_rate = self.fx_rates.get_rate(currency, on=purchase_date)
+            fx_rate = self.fx_rates.get_rate(currency)
+            if cost_rate is None or fx_rate is None:
+                return {"error": f"{currency} için TCMB kuru bulunamadı"}
+        
         # Pozisyon bilgilerini hazırla
         position = {
             'id': f"{user_id}_{position_data['symbol']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
             'symbol': position_data['symbol'],
             'quantity': position_data['quantity'],
             'purchase_price': position_data['purchase_price'],
-            'purchase_date': position_data.get('purchase_date', datetime.now().isoformat()),
+            'purchase_date': purchase_date,
             'asset_type': position_data.get('asset_type', 'stock'),
+            'currency': currency,
             'current_price': position_data['purchase_price'],  # Başlangıçta alış fiyatı
-            'total_cost': position_data['quantity'] * position_data['purchase_price'],
-            'current_value': position_data['quantity'] * position_data['purchase_price'],
-            'unrealized_pnl': 0,
-            'unrealized_pnl_pct': 0,
+            'total_cost': position_data['quantity'] * position_data['purchase_price'] * cost_rate,
+            'current_value': position_data['quantity'] * position_data['purchase_price'] * fx_rate,
             'status': 'active'
         }
+        position['unrealized_pnl'] = position['current_value'] - position['total_cost']
+        position['unrealized_pnl_pct'] = position['unrealized_pnl'] / position['total_cost'] * 100 if position['total_cost'] else 0
+        
+        # Aynı sembol aynı dövizde varsa depo ortalama maliyetle birleştirir (O(1))
+        self.position_store.add_position(
+            user_id,
+            position['symbol'],
+            position['quantity'],
+            position['purchase_price'],
+            meta={
+                'id': position['id'],
+                'purchase_date': position['purchase_date'],
+                'asset_type': position['asset_type']
+            },
+            currency=currency,
+            cost_rate=cost_rate,
+            fx_rate=fx_rate
+        )
         
-        # Aynı sembolden varsa birleştir veya yeni pozisyon ekle
-        existing_position = self.find_existing_position(user_id, position_data['symbol'])
-        
-        if existing_position:
-            # Mevcut pozisyonu güncelle (average down/up)
-            updated_position = self.merge_positions(existing_position, position)
-            # Eski pozisyonu kaldır, yeniyi ekle
-            self.user_portfolios[user_id]['positions'] = [
-                p for p in self.user_portfolios[user_id]['positions'] 
-                if p['symbol'] != position_data['symbol']
-            ]
-            self.user_portfolios[user_id]['positions'].append(updated_position)
-        else:
-            # Yeni pozisyon ekle
-            self.user_portfolios[user_id]['positions'].append(position)
-        
-        self.user_portfolios[user_id]['last_updated'] = datetime.now()
+        # Yeni sermaye girişi nakit akışı olarak kaydedilir (TWR için)
+        _, current_value = self.position_store.user_totals(user_id)
+        self.valuation_log.record(user_id, current_value, flow=position['total_cost'])
         
         return {
             "success": True,
@@ -111,96 +147,168 @@ class PersonalPortfolioAgent(BaseAgent):
             "message": f"{position_data['symbol']} pozisyonu portföye eklendi"
         }
     
-    def update_portfolio_prices(self, user_id, current_prices):
-        """Portföydeki pozisyonların güncel fiyatlarını güncelle"""
+    def update_portfolio_prices(self, user_id, current_prices, currency='TRY'):
+        """Portföydeki pozisyonların güncel fiyatlarını güncelle (fiyatlar currency cinsinden)"""
         if user_id not in self.user_portfolios:
             return {"error": "Kullanıcı portföyü bulunamadı"}
         
+        store = self.position_store
+        if current_prices:
+            # Kullanıcının satırları üzerinde vektörel fiyat güncellemesi
+            updated_rows = store.update_prices(current_prices, user_id, currency.upper())
+        else:
+            # Fiyat kanalındaki son bilinen kotasyonlar, her satırın kendi para biriminde
+            rows = store.rows_for_user(user_id)
+            row_currencies = store.row_currency[rows]
+            updated = []
+            for row_currency in map(str, np.unique(row_currencies)):
+                symbol_ids = store.row_symbol[rows[row_currencies == row_currency]]
+                quotes = self.price_bus.last_prices((store.symbols[symbol_id] for symbol_id in symbol_ids), row_currency)
+                if quotes:
+                    updated.append(store.update_prices(quotes, user_id, row_currency))
+            if not updated:
+                return {"error": "Portföydeki semboller için güncel fiyat bulunamadı"}
+            updated_rows = np.concatenate(updated)
+        
+        total_unrealized_pnl = float(
+            (self.position_store.current_values(updated_rows) - self.position_store.total_cost[updated_rows]).sum()
+        )
+        self.valuation_log.record(user_id, self.position_store.user_totals(user_id)[1])
+        
+        return {
+            "success": True,
+            "updated_positions": len(self.position_store.rows_for_user(user_id)),
+            "total_unrealized_pnl": total_unrealized_pnl,
+            "portfolio_summary": self.get_portfolio_summary(user_id)
+        }
+    
+    def update_market_prices(self, current_prices, currency='TRY'):
+        """Piyasa geneli fiyat tick'ini (currency cinsinden) tüm portföylere tek geçişte uygula"""
         if not current_prices:
-            # Mock current prices
-            current_prices = {
-                'THYAO': 92.30,
-                'AKBNK': 46.80,
-                'BIMAS': 188.50
-            }
+            return {"error": "Fiyat verisi bulunamadı"}
         
-        updated_positions = []
-        total_unrealized_pnl = 0
+        updated_rows = self.position_store.update_prices(current_prices, currency=currency.upper())
+        affected_users = np.unique(self.position_store.row_user[updated_rows])
+        self.snapshot_valuations()
         
-        for position in self.user_portfolios[user_id]['positions']:
-            symbol = position['symbol']
-            
-            if symbol in current_prices:
-                # Güncel fiyatı güncelle
-                position['current_price'] = current_prices[symbol]
-                position['current_value'] = position['quantity'] * current_prices[symbol]
-                position['unrealized_pnl'] = position['current_value'] - position['total_cost']
-                position['unrealized_pnl_pct'] = (position['unrealized_pnl'] / position['total_cost']) * 100
-                
-                total_unrealized_pnl += position['unrealized_pnl']
-            
-            updated_positions.append(position)
+        return {
+            "success": True,
+            "updated_positions": len(updated_rows),
+            "affected_portfolios": len(affected_users),
+            "symbols": list(current_prices.keys()),
+            "currency": currency.upper()
+        }
+    
+    def update_fx_rates(self, rates=None):
+        """Döviz cinsi pozisyonları güncel kurlarla yeniden değerle ({'USD': 41.2} veya TCMB)"""
+        currencies = list(self.position_store.currency_rows)
+        if not currencies:
+            return {"success": True, "updated_positions": 0, "rates": {}}
+        
+        if not rates:
+            rates = {currency: self.fx_rates.get_rate(currency) for currency in currencies}
+        rates = {currency.upper(): rate for currency, rate in rates.items() if rate is not None}
+        if not rates:
+            return {"error": "Güncel döviz kuru bulunamadı"}
         
-        self.user_portfolios[user_id]['positions'] = updated_positions
-        self.user_portfolios[user_id]['last_updated'] = datetime.now()
+        updated_rows = self.position_store.update_fx_rates(rates)
+        self.snapshot_valuations()
         
         return {
             "success": True,
-            "updated_positions": len(updated_positions),
-            "total_unrealized_pnl": total_unrealized_pnl,
-            "portfolio_summary": self.get_portfolio_summary(user_id)
+            "updated_positions": len(updated_rows),
+            "affected_portfolios": len(np.unique(self.position_store.row_user[updated_rows])),
+            "rates": rates
         }
     
+    def on_market_quotes(self, quotes, currency='TRY'):
+        """Fiyat kanalı aboneliği: yeni kotasyonları aynı para biriminde tutan portföylere uygula"""
+        self.position_store.update_prices(quotes, currency=currency)
+        self.snapshot_valuations()
+    
+    def snapshot_valuations(self, force=False):
+        """Tüm portföylerin değerini periyodik olarak değerleme günlüğüne yaz"""
+        now = time.time()
+        new_day = datetime.fromtimestamp(now).date() != datetime.fromtimestamp(self.last_snapshot_at).date()
+        if not force and not new_day and now - self.last_snapshot_at < self.snapshot_interval:
+            return
+        
+        store = self.position_store
+        self.valuation_log.record_many(store.users, store.user_value[:len(store.users)], now)
+        if new_day:
+            self.valuation_log.compact(now)
+        self.last_snapshot_at = now
+    
     def calculate_portfolio_performance(self, user_id):
-        """Portföy performansını hesapla"""
+        """Portföy performansını hesapla
+
+        Toplamlar depodaki artımlı kullanıcı toplamlarından O(1) okunur.
+        Pozisyon bazlı detaylar (en iyi/kötü, sektör, volatilite) portföyün
+        durum versiyonu (pozisyon veya fiyat değişimi) değişince yeniden
+        hesaplanır; böylece toplamlarla her zaman aynı fiyatları yansıtır.
+        """
         if user_id not in self.user_portfolios:
             return {"error": "Kullanıcı portföyü bulunamadı"}
         
-        portfolio = self.user_portfolios[user_id]
-        positions = portfolio['positions']
-        
-        # Toplam değerler
-        total_cost = sum(pos['total_cost'] for pos in positions)
-        total_current_value = sum(pos['current_value'] for pos in positions)
+        # Toplam değerler (artımlı kullanıcı toplamları)
+        total_cost, total_current_value = self.position_store.user_totals(user_id)
         total_unrealized_pnl = total_current_value - total_cost
         total_pnl_pct = (total_unrealized_pnl / total_cost * 100) if total_cost > 0 else 0
         
-        # En iyi ve en kötü performans gösteren pozisyonlar
-        best_performer = max(positions, key=lambda x: x['unrealized_pnl_pct']) if positions else None
-        worst_performer = min(positions, key=lambda x: x['unrealized_pnl_pct']) if positions else None
-        
-        # Sektör dağılımı (basit)
-        sector_allocation = self.calculate_sector_allocation(positions)
-        
-        # Risk metrikleri
-        portfolio_volatility = self.estimate_portfolio_volatility(positions)
+        details = self.get_performance_details(user_id)
         
         return {
             "portfolio_performance": {
-                "total_positions": len(positions),
+                "total_positions": self.position_store.user_position_count(user_id),
                 "total_invested": total_cost,
                 "current_portfolio_value": total_current_value,
                 "total_unrealized_pnl": total_unrealized_pnl,
                 "total_return_pct": round(total_pnl_pct, 2),
-                "best_performer": {
-                    "symbol": best_performer['symbol'],
-                    "return_pct": round(best_performer['unrealized_pnl_pct'], 2),
-                    "profit": best_performer['unrealized_pnl']
-                } if best_performer else None,
-                "worst_performer": {
-                    "symbol": worst_performer['symbol'],
-                    "return_pct": round(worst_performer['unrealized_pnl_pct'], 2),
-                    "loss": worst_performer['unrealized_pnl']
-                } if worst_performer else None,
-                "sector_allocation": sector_allocation,
+                "best_performer": dict(details['best_performer']) if details['best_performer'] else None,
+                "worst_performer": dict(details['worst_performer']) if details['worst_performer'] else None,
+                "sector_allocation": dict(details['sector_allocation']),
                 "risk_metrics": {
-                    "estimated_volatility": portfolio_volatility,
-                    "risk_level": self.assess_portfolio_risk_level(total_pnl_pct, portfolio_volatility),
-                    "diversification_score": self.calculate_portfolio_diversification(positions)
+                    "estimated_volatility": details['volatility'],
+                    "risk_level": self.assess_portfolio_risk_level(total_pnl_pct, details['volatility']),
+                    "diversification_score": details['diversification_score']
                 }
             },
-            "last_updated": portfolio['last_updated'].isoformat()
+            "last_updated": self.get_last_updated(user_id).isoformat()
+        }
+    
+    def get_performance_details(self, user_id):
+        """Pozisyon bazlı performans detayları (durum versiyonuna göre önbellekli)"""
+        version = self.position_store.user_state_version(user_id)
+        cached = self.performance_cache.get(user_id)
+        if cached and cached[0] == version:
+            return cached[1]
+        
+        positions = self.get_positions(user_id)
+        
+        # En iyi ve en kötü performans gösteren pozisyonlar
+        best_performer = max(positions, key=lambda x: x['unrealized_pnl_pct']) if positions else None
+        worst_performer = min(positions, key=lambda x: x['unrealized_pnl_pct']) if positions else None
+        
+        details = {
+            "best_performer": {
+                "symbol": best_performer['symbol'],
+                "return_pct": round(best_performer['unrealized_pnl_pct'], 2),
+                "profit": best_performer['unrealized_pnl']
+            } if best_performer else None,
+            "worst_performer": {
+                "symbol": worst_performer['symbol'],
+                "return_pct": round(worst_performer['unrealized_pnl_pct'], 2),
+                "loss": worst_performer['unrealized_pnl']
+            } if worst_performer else None,
+            # Sektör dağılımı (basit)
+            "sector_allocation": self.calculate_sector_allocation(positions),
+            # Risk metrikleri
+            "volatility": self.estimate_portfolio_volatility(positions),
+            "diversification_score": self.calculate_portfolio_diversification(positions)
         }
+        
+        self.performance_cache[user_id] = (version, details)
+        return details
     
     def analyze_personal_portfolio(self, user_id, market_data=None):
         """Kişisel portföy analizi ve öneriler"""
@@ -209,7 +317,7 @@ class PersonalPortfolioAgent(BaseAgent):
         
         # Mevcut performansı al
         performance = self.calculate_portfolio_performance(user_id)
-        positions = self.user_portfolios[user_id]['positions']
+        positions = self.get_positions(user_id)
         
         # Her pozisyon için detaylı analiz
         position_analysis = []
@@ -239,7 +347,7 @@ class PersonalPortfolioAgent(BaseAgent):
         if user_id not in self.user_portfolios:
             return {"error": "Kullanıcı portföyü bulunamadı"}
         
-        positions = self.user_portfolios[user_id]['positions']
+        positions = self.get_positions(user_id)
         
         # Her pozisyon için BUY/SELL/HOLD önerisi
         position_recommendations = []
@@ -294,14 +402,19 @@ class PersonalPortfolioAgent(BaseAgent):
         if user_id not in self.user_portfolios:
             return {"error": "Kullanıcı portföyü bulunamadı"}
         
-        positions = self.user_portfolios[user_id]['positions']
+        positions = self.get_positions(user_id)
         
-        # Günlük, haftalık, aylık P&L (simulated)
+        # Günlük, haftalık, aylık, YTD P&L (değerleme günlüğünden)
+        windows = self.valuation_log.pnl_windows(user_id, self.position_store.user_totals(user_id)[1])
         pnl_tracking = {
-            "daily_pnl": self.calculate_daily_pnl(positions),
-            "weekly_pnl": self.calculate_weekly_pnl(positions),
-            "monthly_pnl": self.calculate_monthly_pnl(positions),
-            "inception_to_date": self.calculate_total_pnl(positions)
+            "daily_pnl": self.calculate_daily_pnl(windows),
+            "weekly_pnl": self.calculate_weekly_pnl(windows),
+            "monthly_pnl": self.calculate_monthly_pnl(windows),
+            "ytd_pnl": windows['ytd']['pnl'],
+            "inception_to_date": self.calculate_total_pnl(positions),
+            "time_weighted_return_pct": {
+                name: round(stats['time_weighted_return_pct'], 2) for name, stats in windows.items()
+            }
         }
         
         # En karlı ve zararlı pozisyonlar
@@ -322,43 +435,26 @@ class PersonalPortfolioAgent(BaseAgent):
         }
     
     # Yardımcı metodlar
-    def find_existing_position(self, user_id, symbol):
-        """Aynı sembolden mevcut pozisyon var mı kontrol et"""
-        if user_id not in self.user_portfolios:
-            return None
-        
-        for position in self.user_portfolios[user_id]['positions']:
-            if position['symbol'] == symbol and position['status'] == 'active':
-                return position
-        return None
+    def get_positions(self, user_id):
+        """Kullanıcının pozisyonlarını sözlük listesi olarak döndür"""
+        return [self.position_store.position_dict(row) for row in self.position_store.rows_for_user(user_id)]
     
-    def merge_positions(self, existing, new):
-        """İki pozisyonu birleştir (average cost)"""
-        total_quantity = existing['quantity'] + new['quantity']
-        total_cost = existing['total_cost'] + new['total_cost']
-        average_price = total_cost / total_quantity
-        
-        merged = existing.copy()
-        merged['quantity'] = total_quantity
-        merged['purchase_price'] = average_price
-        merged['total_cost'] = total_cost
-        merged['current_value'] = total_quantity * existing['current_price']
-        merged['unrealized_pnl'] = merged['current_value'] - total_cost
-        merged['unrealized_pnl_pct'] = (merged['unrealized_pnl'] / total_cost) * 100
-        
-        return merged
+    def get_last_updated(self, user_id):
+        """Portföyün son güncellenme zamanı"""
+        user_idx = self.position_store.get_user_index(user_id)
+        if user_idx is None:
+            return self.user_portfolios[user_id]['created_date']
+        return datetime.fromtimestamp(self.position_store.user_updated_at[user_idx])
     
     def get_portfolio_summary(self, user_id):
         """Portföy özeti"""
         if user_id not in self.user_portfolios:
             return {}
         
-        positions = self.user_portfolios[user_id]['positions']
-        total_cost = sum(pos['total_cost'] for pos in positions)
-        total_value = sum(pos['current_value'] for pos in positions)
+        total_cost, total_value = self.position_store.user_totals(user_id)
         
         return {
-            "total_positions": len(positions),
+            "total_positions": len(self.position_store.rows_for_user(user_id)),
             "total_invested": total_cost,
             "current_value": total_value,
             "unrealized_pnl": total_value - total_cost,
@@ -480,6 +576,53 @@ class PersonalPortfolioAgent(BaseAgent):
             "reason": "Pozisyon ağırlıkları dengesizleşti" if rebalancing_needed else "Denge uygun"
         }
     
+    def suggest_rebalancing_batch(self, user_ids=None):
+        """Tüm kullanıcılar için eşit ağırlıklı rebalancing önerileri (tek geçiş)"""
+        if not user_ids:
+            user_ids = list(self.user_portfolios.keys())
+        user_ids = [user_id for user_id in user_ids if user_id in self.user_portfolios]
+        
+        if not user_ids:
+            return {"error": "Kullanıcı portföyü bulunamadı"}
+        
+        # Kullanıcı x sembol değer matrisi (depo kolonlarından tek geçişte)
+        store = self.position_store
+        matrix_row = np.full(len(store.users), -1)
+        for row, user_id in enumerate(user_ids):
+            user_idx = store.get_user_index(user_id)
+            if user_idx is not None:
+                matrix_row[user_idx] = row
+        
+        position_rows = matrix_row[store.row_user[:store.size]]
+        selected = position_rows >= 0
+        values = np.zeros((len(user_ids), len(store.symbols)))
+        np.add.at(
+            values,
+            (position_rows[selected], store.row_symbol[:store.size][selected]),
+            store.current_values()[selected]
+        )
+        
+        # Eşit ağırlık hedefi: sadece tutulan semboller
+        held = values > 0
+        position_counts = held.sum(axis=1)
+        targets = np.where(held, 100 / np.maximum(position_counts, 1)[:, None], 0.0)
+        
+        batch_result = batch_rebalance(values, targets, drift_threshold=10, active_mask=position_counts >= 3)
+        actions = compact_actions(batch_result, user_ids, store.symbols, targets)
+        transaction_costs = batch_result['transaction_costs']
+        
+        return {
+            "users_processed": len(user_ids),
+            "users_needing_rebalance": len(actions),
+            "suggestions": {
+                user_id: {
+                    "actions": actions[user_id],
+                    "estimated_transaction_cost": float(transaction_costs[row])
+                }
+                for row, user_id in enumerate(user_ids) if user_id in actions
+            }
+        }
+    
     def analyze_tax_optimization(self, positions):
         """Vergi optimizasyonu analizi"""
         profitable_positions = [pos for pos in positions if pos['unrealized_pnl'] > 0]
@@ -538,14 +681,14 @@ class PersonalPortfolioAgent(BaseAgent):
         }
     
     # Yardımcı hesaplama metodları
-    def calculate_daily_pnl(self, positions):
-        return sum(pos['unrealized_pnl'] * 0.1 for pos in positions)  # Mock daily change
+    def calculate_daily_pnl(self, windows):
+        return windows['daily']['pnl']  # Dünkü kapanıştan bu yana
     
-    def calculate_weekly_pnl(self, positions):
-        return sum(pos['unrealized_pnl'] * 0.7 for pos in positions)  # Mock weekly change
+    def calculate_weekly_pnl(self, windows):
+        return windows['weekly']['pnl']  # 7 gün önceki kapanıştan bu yana
     
-    def calculate_monthly_pnl(self, positions):
-        return sum(pos['unrealized_pnl'] for pos in positions)  # Current unrealized
+    def calculate_monthly_pnl(self, windows):
+        return windows['monthly']['pnl']  # 30 gün önceki kapanıştan bu yana
     
     def calculate_total_pnl(self, positions):
         return sum(pos['unrealized_pnl'] for pos in positions)
@@ -3,13 +3,14 @@ import pandas as pd
 from datetime import datetime, timedelta
 import time
 from base_agent import BaseAgent
+from rebalancing_engine import batch_rebalance, compact_actions, DRIFT_THRESHOLD, COMMISSION_RATE
 
 class PortfolioManagementAgent(BaseAgent):
     def __init__(self):
         super().__init__(
             name="PortfolioManagementAgent",
             agent_type="portfolio_optimizer",
-            capabilities=["portfolio_optimization", "asset_allocation", "rebalancing", "diversification_analysis"]
+            capabilities=["portfolio_optimization", "asset_allocation", "rebalancing", "batch_rebalancing", "diversification_analysis"]
         )
         self.portfolio_templates = {
             'conservative': {'bonds': 60, 'stocks': 30, 'cash': 10},
@@ -20,7 +21,7 @@ class PortfolioManagementAgent(BaseAgent):
     def can_handle_task(self, task):
         portfolio_tasks = [
             'optimize_portfolio', 'asset_allocation', 'rebalance_portfolio', 
-            'analyze_diversification', 'generate_portfolio_recommendation'
+            'analyze_diversification', 'generate_portfolio_recommendation', 'batch_rebalance'
         ]
         return task.get('type') in portfolio_tasks
     
@@ -37,6 +38,8 @@ class PortfolioManagementAgent(BaseAgent):
                 result = self.calculate_asset_allocation(task.get('risk_tolerance'), task.get('investment_amount'))
             elif task_type == 'rebalance_portfolio':
                 result = self.rebalance_portfolio(task.get('current_portfolio'), task.get('target_allocation'))
+            elif task_type == 'batch_rebalance':
+                result = self.batch_rebalance_portfolios(task.get('batch_data'))
             elif task_type == 'analyze_diversification':
                 result = self.analyze_diversification(task.get('portfolio_holdings'))
             elif task_type == 'generate_portfolio_recommendation':
@@ -213,6 +216,44 @@ class PortfolioManagementAgent(BaseAgent):
             "recommended_frequency": "quarterly"
         }
     
+    def batch_rebalance_portfolios(self, batch_data):
+        """Çok sayıda portföy için toplu dengeleme (kullanıcı x varlık matrisi)"""
+        if not batch_data:
+            batch_data = {
+                'user_ids': ['user_1', 'user_2'],
+                'assets': ['stocks', 'bonds', 'cash'],
+                'current_values': [[60000, 30000, 10000], [20000, 70000, 10000]],
+                'target_allocation': [60, 25, 15]
+            }
+        
+        user_ids = batch_data['user_ids']
+        assets = batch_data['assets']
+        current_values = np.asarray(batch_data['current_values'], dtype=float)
+        target_allocation = np.asarray(batch_data['target_allocation'], dtype=float)
+        
+        if current_values.shape != (len(user_ids), len(assets)):
+            return {"error": f"Değer matrisi boyutu hatalı: {current_values.shape}, beklenen ({len(user_ids)}, {len(assets)})"}
+        
+        batch_result = batch_rebalance(
+            current_values,
+            target_allocation,
+            drift_threshold=batch_data.get('drift_threshold', DRIFT_THRESHOLD),
+            commission_rate=batch_data.get('commission_rate', COMMISSION_RATE)
+        )
+        actions = compact_actions(batch_result, user_ids, assets, target_allocation)
+        
+        transaction_costs = batch_result['transaction_costs']
+        needing = np.nonzero(batch_result['rebalancing_needed'])[0]
+        
+        return {
+            "users_processed": len(user_ids),
+            "users_needing_rebalance": int(len(needing)),
+            "actions_by_user": actions,
+            "transaction_costs": {user_ids[i]: float(transaction_costs[i]) for i in needing.tolist()},
+            "total_transaction_cost": float(transaction_costs.sum()),
+            "total_portfolio_value": float(batch_result['total_values'].sum())
+        }
+    
     def analyze_diversification(self, portfolio_holdings):
         """Portföy çeşitlendirme analizi"""
         if not portfolio_holdings:
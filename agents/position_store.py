@@ -0,0 +1,275 @@
+import numpy as np
+import threading
+import time
+
+from price_bus import normalize_symbol
+
+
+class PositionStore:
+    """Kişisel portföy pozisyonları için dizi tabanlı (structure-of-arrays) depo
+
+    Her pozisyon bir satırdır; kolonlar numpy dizilerinde tutulur. Kullanıcı
+    başına (sembol, döviz) -> satır haritası ile pozisyon araması O(1), fiyat
+    güncellemeleri ise tek bir vektörel gather/multiply işlemidir. Sembol ->
+    satır ters indeksi ve kullanıcı başına artımlı maliyet/değer toplamları
+    sayesinde bir sembolün tick'i sadece o sembolü tutan portföylere dokunur.
+    Döviz cinsi pozisyonlarda fiyat kendi para biriminde, maliyet ve değer
+    ise satırın kuru (fx_rate) ile TL cinsinden tutulur; bir kotasyon sadece
+    kendi para birimindeki satırlara uygulanır.
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self._lock = threading.RLock()
+        self.symbol_ids = {}  # sembol -> sembol id
+        self.symbols = []  # sembol id -> sembol
+        self.symbol_rows = []  # sembol id -> o sembolü tutan satırlar (ters indeks)
+        self._symbol_rows_cache = {}
+        self.user_index = {}  # user_id -> kullanıcı indeksi
+        self.users = []  # kullanıcı indeksi -> user_id
+        self.user_rows = []  # kullanıcı indeksi -> {(sembol id, döviz): satır}
+        self.user_updated_at = np.zeros(16)
+        self.user_cost = np.zeros(16)  # artımlı toplam maliyet
+        self.user_value = np.zeros(16)  # artımlı güncel değer
+        self.user_version = np.zeros(16, dtype=np.int64)  # her değişiklikte artar
+        self.user_structure_version = np.zeros(16, dtype=np.int64)  # sadece pozisyon eklenince artar
+        self.market_prices = np.full(16, np.nan)  # sembol id -> son piyasa fiyatı
+        self.currency_rows = {}  # döviz -> o dövizdeki satırlar (TRY hariç)
+
+        self.size = 0
+        self.row_user = np.zeros(initial_capacity, dtype=np.int32)
+        self.row_symbol = np.zeros(initial_capacity, dtype=np.int32)
+        self.quantity = np.zeros(initial_capacity)
+        self.total_cost = np.zeros(initial_capacity)  # TL, alış tarihindeki kurla
+        self.native_cost = np.zeros(initial_capacity)  # pozisyonun kendi para biriminde
+        self.last_price = np.zeros(initial_capacity)
+        self.fx_rate = np.ones(initial_capacity)  # 1 birim döviz = fx_rate TL (güncel)
+        self.row_currency = np.full(initial_capacity, 'TRY', dtype='<U8')  # fiyatın para birimi
+        self.row_meta = []  # satır -> id, alış tarihi, varlık tipi
+
+    # Kimlik haritaları
+    def get_symbol_id(self, symbol):
+        symbol = normalize_symbol(symbol)  # fiyat kanalı ile aynı anahtar
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbol_ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+            self.symbol_rows.append([])
+            if symbol_id >= len(self.market_prices):
+                grown = np.full(len(self.market_prices) * 2, np.nan)
+                grown[:len(self.market_prices)] = self.market_prices
+                self.market_prices = grown
+        return symbol_id
+
+    def get_user_index(self, user_id, create=False):
+        user_idx = self.user_index.get(user_id)
+        if user_idx is None and create:
+            user_idx = len(self.users)
+            self.user_index[user_id] = user_idx
+            self.users.append(user_id)
+            self.user_rows.append({})
+            if user_idx >= len(self.user_updated_at):
+                for column in ('user_updated_at', 'user_cost', 'user_value', 'user_version', 'user_structure_version'):
+                    old = getattr(self, column)
+                    setattr(self, column, np.concatenate([old, np.zeros(len(old), dtype=old.dtype)]))
+            self.user_updated_at[user_idx] = time.time()
+        return user_idx
+
+    def _ensure_capacity(self):
+        if self.size < len(self.quantity):
+            return
+        new_capacity = len(self.quantity) * 2
+        for column in ('row_user', 'row_symbol', 'quantity', 'total_cost', 'native_cost', 'last_price', 'fx_rate',
+                       'row_currency'):
+            old = getattr(self, column)
+            grown = np.ones(new_capacity, dtype=old.dtype) if column == 'fx_rate' else np.zeros(new_capacity, dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, column, grown)
+
+    # Pozisyon işlemleri
+    def add_position(self, user_id, symbol, quantity, price, meta=None, currency='TRY', cost_rate=1.0, fx_rate=None):
+        """Pozisyon ekle; aynı sembol aynı dövizde varsa ortalama maliyetle birleştir
+
+        cost_rate alış tarihindeki, fx_rate güncel döviz kurudur (TRY için 1).
+        Farklı dövizdeki aynı sembol ayrı satırdır (fiyatları farklı birimde).
+        """
+        fx_rate = cost_rate if fx_rate is None else fx_rate
+        with self._lock:
+            user_idx = self.get_user_index(user_id, create=True)
+            symbol_id = self.get_symbol_id(symbol)
+            rows = self.user_rows[user_idx]
+
+            key = (symbol_id, currency)
+            row = rows.get(key)
+            merged = row is not None
+            if merged:
+                self.quantity[row] += quantity
+                self.total_cost[row] += quantity * price * cost_rate
+                self.native_cost[row] += quantity * price
+            else:
+                self._ensure_capacity()
+                row = self.size
+                self.size += 1
+                self.row_user[row] = user_idx
+                self.row_symbol[row] = symbol_id
+                self.quantity[row] = quantity
+                self.total_cost[row] = quantity * price * cost_rate
+                self.native_cost[row] = quantity * price
+                self.last_price[row] = price
+                self.fx_rate[row] = fx_rate
+                self.row_currency[row] = currency
+                self.row_meta.append(dict(meta or {}, currency=currency))
+                rows[key] = row
+                self.symbol_rows[symbol_id].append(row)
+                self._symbol_rows_cache.pop(symbol_id, None)
+                if currency != 'TRY':
+                    self.currency_rows.setdefault(currency, []).append(row)
+
+            self.user_cost[user_idx] += quantity * price * cost_rate
+            self.user_value[user_idx] += quantity * self.last_price[row] * self.fx_rate[row]
+            self.user_version[user_idx] += 1
+            self.user_structure_version[user_idx] += 1
+            self.user_updated_at[user_idx] = time.time()
+            return row, merged
+
+    def find_row(self, user_id, symbol, currency='TRY'):
+        user_idx = self.user_index.get(user_id)
+        symbol_id = self.symbol_ids.get(normalize_symbol(symbol))
+        if user_idx is None or symbol_id is None:
+            return None
+        return self.user_rows[user_idx].get((symbol_id, currency))
+
+    def rows_for_user(self, user_id):
+        user_idx = self.user_index.get(user_id)
+        if user_idx is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.fromiter(self.user_rows[user_idx].values(), dtype=np.int64)
+
+    def rows_for_symbol(self, symbol_id):
+        """Sembolü tutan satırlar (ters indeks)"""
+        rows = self._symbol_rows_cache.get(symbol_id)
+        if rows is None:
+            rows = np.array(self.symbol_rows[symbol_id], dtype=np.int64)
+            self._symbol_rows_cache[symbol_id] = rows
+        return rows
+
+    def update_prices(self, prices, user_id=None, currency='TRY'):
+        """Fiyatları uygula; user_id verilmezse sembolü tutan tüm portföyler güncellenir
+
+        Fiyatlar currency cinsindendir ve sadece o para birimindeki satırlara
+        uygulanır. Kullanıcı toplamları değer farkı kadar artımlı güncellenir.
+        Güncellenen satır indekslerini döndürür.
+        """
+        prices = {normalize_symbol(symbol): price for symbol, price in prices.items()}
+        with self._lock:
+            symbol_ids = [self.symbol_ids[symbol] for symbol in prices if symbol in self.symbol_ids]
+            if not symbol_ids:
+                return np.zeros(0, dtype=np.int64)
+
+            price_vector = np.full(len(self.symbols), np.nan)
+            price_vector[symbol_ids] = [prices[self.symbols[symbol_id]] for symbol_id in symbol_ids]
+
+            if user_id is None:
+                if currency == 'TRY':
+                    self.market_prices[symbol_ids] = price_vector[symbol_ids]
+                rows = np.concatenate([self.rows_for_symbol(symbol_id) for symbol_id in symbol_ids])
+            else:
+                rows = self.rows_for_user(user_id)
+
+            new_prices = price_vector[self.row_symbol[rows]]
+            priced = ~np.isnan(new_prices) & (self.row_currency[rows] == currency)
+            updated = rows[priced]
+            new_prices = new_prices[priced]
+
+            value_delta = self.quantity[updated] * (new_prices - self.last_price[updated]) * self.fx_rate[updated]
+            self.last_price[updated] = new_prices
+
+            users = self.row_user[updated]
+            np.add.at(self.user_value, users, value_delta)
+            affected = np.unique(users)
+            self.user_version[affected] += 1
+            self.user_updated_at[affected] = time.time()
+            return updated
+
+    def update_fx_rates(self, rates):
+        """Güncel döviz kurlarını ({döviz: TL kuru}) döviz cinsi satırlara uygula"""
+        with self._lock:
+            updated = []
+            for currency, rate in rates.items():
+                rows = np.array(self.currency_rows.get(currency, ()), dtype=np.int64)
+                if not len(rows) or rate is None:
+                    continue
+                value_delta = self.quantity[rows] * self.last_price[rows] * (rate - self.fx_rate[rows])
+                self.fx_rate[rows] = rate
+                np.add.at(self.user_value, self.row_user[rows], value_delta)
+                updated.append(rows)
+            if not updated:
+                return np.zeros(0, dtype=np.int64)
+
+            updated = np.concatenate(updated)
+            affected = np.unique(self.row_user[updated])
+            self.user_version[affected] += 1
+            self.user_updated_at[affected] = time.time()
+            return updated
+
+    # Toplamlar
+    def current_values(self, rows=None):
+        """Satırların TL cinsinden güncel değeri"""
+        if rows is None:
+            rows = slice(0, self.size)
+        return self.quantity[rows] * self.last_price[rows] * self.fx_rate[rows]
+
+    def user_totals(self, user_id):
+        """Kullanıcının (toplam maliyet, güncel değer) toplamları - O(1) okuma"""
+        user_idx = self.user_index.get(user_id)
+        if user_idx is None:
+            return 0.0, 0.0
+        return float(self.user_cost[user_idx]), float(self.user_value[user_idx])
+
+    def user_state_version(self, user_id):
+        user_idx = self.user_index.get(user_id)
+        return int(self.user_version[user_idx]) if user_idx is not None else -1
+
+    def user_structure_state(self, user_id):
+        """Pozisyon kümesinin versiyonu (fiyat tick'leri değiştirmez)"""
+        user_idx = self.user_index.get(user_id)
+        return int(self.user_structure_version[user_idx]) if user_idx is not None else -1
+
+    def user_position_count(self, user_id):
+        user_idx = self.user_index.get(user_id)
+        return len(self.user_rows[user_idx]) if user_idx is not None else 0
+
+    def totals_by_user(self):
+        """Tüm kullanıcılar için maliyet ve değer toplamları (bincount ile tek geçiş)"""
+        n_users = len(self.users)
+        user_of_row = self.row_user[:self.size]
+        costs = np.bincount(user_of_row, weights=self.total_cost[:self.size], minlength=n_users)
+        values = np.bincount(user_of_row, weights=self.current_values(), minlength=n_users)
+        return costs, values
+
+    def position_dict(self, row):
+        """Satırı eski pozisyon sözlüğü formatına çevir"""
+        quantity = float(self.quantity[row])
+        total_cost = float(self.total_cost[row])
+        current_price = float(self.last_price[row])
+        fx_rate = float(self.fx_rate[row])
+        current_value = quantity * current_price * fx_rate
+        unrealized_pnl = current_value - total_cost
+        meta = self.row_meta[row]
+
+        return {
+            'id': meta.get('id'),
+            'symbol': self.symbols[self.row_symbol[row]],
+            'quantity': quantity,
+            'purchase_price': float(self.native_cost[row]) / quantity if quantity else 0,
+            'purchase_date': meta.get('purchase_date'),
+            'asset_type': meta.get('asset_type', 'stock'),
+            'currency': meta.get('currency', 'TRY'),
+            'fx_rate': fx_rate,
+            'current_price': current_price,
+            'total_cost': total_cost,
+            'current_value': current_value,
+            'unrealized_pnl': unrealized_pnl,
+            'unrealized_pnl_pct': (unrealized_pnl / total_cost) * 100 if total_cost else 0,
+            'status': 'active'
+        }
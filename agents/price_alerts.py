@@ -0,0 +1,302 @@
+import bisect
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from price_bus import normalize_symbol
+
+UP = 'above'
+DOWN = 'below'
+
+
+class _SymbolAlerts:
+    """Tek sembolün eşik listeleri
+
+    up: fiyat >= seviye olunca geçilen kayıtlar (artan sıralı)
+    down: fiyat <= seviye olunca geçilen kayıtlar (artan sıralı)
+    Kayıtlar (seviye, alert_id, olay) şeklindedir; olay 'fire' (uyarıyı
+    tetikle) veya 'rearm' (histerezis sonrası yeniden kur) olabilir.
+    """
+
+    __slots__ = ('up', 'down', 'closes', 'bucket', 'last_price', 'ma_groups')
+
+    def __init__(self):
+        self.up = []
+        self.down = []
+        self.closes = deque(maxlen=1)  # tamamlanmış periyot kapanışları
+        self.bucket = None
+        self.last_price = None
+        self.ma_groups = {}  # (pencere, yön) -> {'alerts': set, 'side': son işaret}
+
+
+class PriceAlertBook:
+    """Sembol bazlı indeksli fiyat uyarıları
+
+    Eşik uyarıları sembol başına sıralı listelerde tutulur; bir kotasyon
+    bisect ile sadece geçilen aralığı bulur (O(log n + k)). Yüzde hareket
+    uyarıları kayıtta mutlak eşiğe çevrilir. Hareketli ortalama kesişimleri
+    (pencere, yön) bazında gruplanır; böylece tick başına maliyet uyarı
+    sayısından değil grup sayısından etkilenir. Aynı uyarı iki kez kurulmaz,
+    tetiklenen uyarı fiyat histerezis bandının dışına çıkmadan yeniden
+    çalışmaz ve kullanıcı başına bildirim sayısı sınırlanır; sınıra takılan
+    eşik uyarısı kurulu kalır ve sonraki kotasyonda yeniden denenir.
+    """
+
+    def __init__(self, on_alert=None, hysteresis_pct=0.5, rate_limit=10, rate_window=60, ma_interval=86400):
+        self.on_alert = on_alert  # tetiklenen olay listesi ile çağrılır
+        self.hysteresis = hysteresis_pct / 100
+        self.rate_limit = rate_limit  # rate_window saniyede kullanıcı başına en fazla bildirim
+        self.rate_window = rate_window
+        self.ma_interval = ma_interval  # MA kapanış periyodu (varsayılan günlük)
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.alerts = {}  # alert_id -> uyarı
+        self.user_alerts = {}  # user_id -> {alert_id}
+        self.dedup_index = {}  # tekillik anahtarı -> alert_id
+        self.symbols = {}  # sembol -> _SymbolAlerts
+        self.user_sent = {}  # user_id -> gönderim zamanları
+        self.stats = {'fired': 0, 'rate_limited': 0}
+
+    def _book(self, symbol):
+        book = self.symbols.get(symbol)
+        if book is None:
+            book = self.symbols[symbol] = _SymbolAlerts()
+        return book
+
+    # Kayıt
+    def add_alert(self, user_id, symbol, alert_type, value, direction=None, reference_price=None,
+                  repeat=True, contact=None):
+        """Uyarı kur
+
+        alert_type: 'above' / 'below' (value = fiyat), 'percent_move'
+        (value = yüzde; direction verilmezse iki yön), 'cross_ma'
+        (value = pencere; direction = 'above' / 'below').
+        """
+        symbol = normalize_symbol(symbol)
+        with self._lock:
+            book = self._book(symbol)
+
+            if alert_type in (UP, DOWN):
+                legs = [(alert_type, float(value))]
+            elif alert_type == 'percent_move':
+                base = reference_price or book.last_price
+                if not base:
+                    return {"error": f"{symbol} için referans fiyat yok"}
+                pct = abs(float(value)) / 100
+                directions = [direction] if direction else [UP, DOWN]
+                legs = [(leg, base * (1 + pct) if leg == UP else base * (1 - pct)) for leg in directions]
+            elif alert_type == 'cross_ma':
+                window = int(value)
+                if window < 2 or direction not in (UP, DOWN):
+                    return {"error": "Geçersiz MA penceresi veya yönü"}
+                legs = [(direction, window)]
+            else:
+                return {"error": f"Desteklenmeyen uyarı tipi: {alert_type}"}
+
+            created = []
+            for leg_direction, level in legs:
+                key = (user_id, symbol, alert_type, leg_direction, round(level, 4))
+                existing = self.dedup_index.get(key)
+                if existing is not None:
+                    created.append(existing)
+                    continue
+
+                alert_id = next(self._ids)
+                alert = {
+                    'alert_id': alert_id,
+                    'user_id': user_id,
+                    'symbol': symbol,
+                    'alert_type': alert_type,
+                    'direction': leg_direction,
+                    'level': level,
+                    'repeat': repeat,
+                    'contact': contact or {},
+                    'armed': True,
+                    'created_at': datetime.now().isoformat(),
+                    'fire_count': 0,
+                    'key': key
+                }
+                self.alerts[alert_id] = alert
+                self.dedup_index[key] = alert_id
+                self.user_alerts.setdefault(user_id, set()).add(alert_id)
+
+                if alert_type == 'cross_ma':
+                    self._add_ma_alert(book, alert)
+                else:
+                    self._insert(book, leg_direction, level, alert_id, 'fire')
+                created.append(alert_id)
+
+        return {"success": True, "alert_ids": created, "levels": [round(level, 4) for _, level in legs]}
+
+    def _add_ma_alert(self, book, alert):
+        window = alert['level']
+        if window > book.closes.maxlen:
+            book.closes = deque(book.closes, maxlen=window)
+        group = book.ma_groups.setdefault((window, alert['direction']), {'alerts': set(), 'side': None})
+        group['alerts'].add(alert['alert_id'])
+
+    def _insert(self, book, direction, level, alert_id, event):
+        bisect.insort(book.up if direction == UP else book.down, (level, alert_id, event))
+
+    def remove_alert(self, alert_id):
+        with self._lock:
+            alert = self.alerts.pop(alert_id, None)
+            if alert is None:
+                return False
+            self.dedup_index.pop(alert['key'], None)
+            self.user_alerts.get(alert['user_id'], set()).discard(alert_id)
+
+            book = self.symbols[alert['symbol']]
+            if alert['alert_type'] == 'cross_ma':
+                book.ma_groups[(alert['level'], alert['direction'])]['alerts'].discard(alert_id)
+            else:
+                # Listelerden sil (fire veya rearm kaydı olabilir)
+                for entries in (book.up, book.down):
+                    index = bisect.bisect_left(entries, (alert['level'] * (1 - self.hysteresis) - 1e-9,))
+                    while index < len(entries) and entries[index][0] <= alert['level'] * (1 + self.hysteresis) + 1e-9:
+                        if entries[index][1] == alert_id:
+                            del entries[index]
+                        else:
+                            index += 1
+        return True
+
+    def list_alerts(self, user_id):
+        return [self._public(self.alerts[alert_id]) for alert_id in sorted(self.user_alerts.get(user_id, ()))]
+
+    @staticmethod
+    def _public(alert):
+        return {key: value for key, value in alert.items() if key not in ('key', 'contact')}
+
+    # Değerlendirme
+    def on_price(self, symbol, price, ts=None):
+        """Kotasyonu değerlendir; tetiklenen olayları döndür"""
+        ts = ts or time.time()
+        symbol = normalize_symbol(symbol)
+        fired = []
+        with self._lock:
+            book = self.symbols.get(symbol)
+            if book is None:
+                return fired
+
+            # fiyat >= seviye: sıralı listenin başından price'a kadar
+            cut = bisect.bisect_right(book.up, (price, float('inf')))
+            if cut:
+                crossed, book.up[:cut] = book.up[:cut], []
+                for level, alert_id, event in crossed:
+                    self._cross(book, alert_id, event, price, ts, fired)
+
+            # fiyat <= seviye: sıralı listenin sonundan price'a kadar
+            cut = bisect.bisect_left(book.down, (price,))
+            if cut < len(book.down):
+                crossed, book.down[cut:] = book.down[cut:], []
+                for level, alert_id, event in crossed:
+                    self._cross(book, alert_id, event, price, ts, fired)
+
+            if book.ma_groups:
+                self._check_ma(book, price, ts, fired)
+            book.last_price = price
+        return fired
+
+    def _cross(self, book, alert_id, event, price, ts, fired):
+        alert = self.alerts.get(alert_id)
+        if alert is None:
+            return
+
+        if event == 'rearm':
+            alert['armed'] = True
+            self._insert(book, alert['direction'], alert['level'], alert_id, 'fire')
+            return
+
+        if not self._emit(alert, price, alert['level'], ts, fired):
+            # Oran sınırına takıldı: uyarı kurulu kalır, sonraki kotasyonda tekrar denenir
+            self._insert(book, alert['direction'], alert['level'], alert_id, 'fire')
+            return
+
+        alert['armed'] = False
+        if alert['repeat'] and alert_id in self.alerts:
+            # Histerezis: fiyat bandın dışına dönmeden yeniden tetiklenmez
+            if alert['direction'] == UP:
+                self._insert(book, DOWN, alert['level'] * (1 - self.hysteresis), alert_id, 'rearm')
+            else:
+                self._insert(book, UP, alert['level'] * (1 + self.hysteresis), alert_id, 'rearm')
+
+    def _check_ma(self, book, price, ts, fired):
+        bucket = int(ts // self.ma_interval)
+        if book.bucket is not None and bucket != book.bucket and book.last_price is not None:
+            book.closes.append(book.last_price)  # önceki periyodun kapanışı
+        book.bucket = bucket
+
+        closes = list(book.closes)
+        for (window, direction), group in book.ma_groups.items():
+            if len(closes) < window or not group['alerts']:
+                continue
+            moving_average = sum(closes[-window:]) / window
+            side = UP if price > moving_average else DOWN if price < moving_average else group['side']
+            if group['side'] is not None and side != group['side'] and side == direction:
+                for alert_id in list(group['alerts']):
+                    self._emit(self.alerts[alert_id], price, moving_average, ts, fired)
+            group['side'] = side
+
+    def seed_closes(self, symbol, closes):
+        """Geçmiş kapanışlarla MA serisini doldur"""
+        with self._lock:
+            book = self._book(normalize_symbol(symbol))
+            if len(closes) > book.closes.maxlen:
+                book.closes = deque(book.closes, maxlen=len(closes))
+            book.closes.extend(closes)
+
+    def _emit(self, alert, price, level, ts, fired):
+        """Olayı listeye ekle; kullanıcının oran sınırı doluysa False (uyarıya dokunulmaz)"""
+        # Kullanıcı başına oran sınırı (kayan pencere)
+        sent = self.user_sent.setdefault(alert['user_id'], deque())
+        while sent and sent[0] <= ts - self.rate_window:
+            sent.popleft()
+        if len(sent) >= self.rate_limit:
+            self.stats['rate_limited'] += 1
+            return False
+        sent.append(ts)
+
+        alert['fire_count'] += 1
+        alert['last_fired'] = ts
+        self.stats['fired'] += 1
+        if not alert['repeat'] and alert['alert_type'] != 'cross_ma':
+            self._drop(alert)
+
+        fired.append({
+            'alert_id': alert['alert_id'],
+            'user_id': alert['user_id'],
+            'symbol': alert['symbol'],
+            'alert_type': alert['alert_type'],
+            'direction': alert['direction'],
+            'level': round(level, 4),
+            'price': price,
+            'contact': alert['contact'],
+            'fired_at': datetime.fromtimestamp(ts).isoformat()
+        })
+        return True
+
+    def _drop(self, alert):
+        self.alerts.pop(alert['alert_id'], None)
+        self.dedup_index.pop(alert['key'], None)
+        self.user_alerts.get(alert['user_id'], set()).discard(alert['alert_id'])
+
+    def on_quotes(self, quotes):
+        """Fiyat kanalı aboneliği: {sembol: fiyat}"""
+        fired = []
+        for symbol, price in quotes.items():
+            fired.extend(self.on_price(symbol, price))
+        if fired and self.on_alert:
+            self.on_alert(fired)
+        return fired
+
+    def get_stats(self):
+        return {
+            'active_alerts': len(self.alerts),
+            'symbols': len(self.symbols),
+            'users': sum(1 for alerts in self.user_alerts.values() if alerts),
+            'fired': self.stats['fired'],
+            'rate_limited': self.stats['rate_limited']
+        }
@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class PriceBus:
+    """Sunucu tarafı fiyat yayın kanalı
+
+    Veri bağlayıcılarından gelen kotasyonlar buraya yayınlanır; abone olan
+    agent'lar ({sembol: fiyat}) sözlüğü ile senkron olarak çağrılır.
+    Her yayın tek bir kotasyon para biriminde yapılır (varsayılan TRY);
+    aboneler sadece kendi para birimlerindeki kotasyonları alır.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []  # (callback, para birimi)
+        self._last_quotes = {}  # (sembol, para birimi) -> (fiyat, zaman, kaynak)
+
+    def subscribe(self, callback, currency='TRY'):
+        """currency=None: tüm para birimleri, callback(quotes, currency) ile çağrılır"""
+        with self._lock:
+            if all(existing != callback for existing, _ in self._subscribers):
+                self._subscribers.append((callback, currency))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] != callback]
+
+    def publish(self, symbol, price, source=None, currency='TRY'):
+        return self.publish_many({symbol: price}, source, currency)
+
+    def publish_many(self, prices, source=None, currency='TRY'):
+        """Aynı para birimindeki birden fazla kotasyonu tek seferde yayınla"""
+        now = time.time()
+        currency = (currency or 'TRY').upper()
+        quotes = {}
+        with self._lock:
+            for symbol, price in prices.items():
+                if price is None or price <= 0:
+                    continue
+                symbol = normalize_symbol(symbol)
+                quotes[symbol] = float(price)
+                self._last_quotes[(symbol, currency)] = (float(price), now, source)
+            subscribers = list(self._subscribers)
+
+        if quotes:
+            for callback, subscribed in subscribers:
+                try:
+                    if subscribed is None:
+                        callback(quotes, currency)
+                    elif subscribed == currency:
+                        callback(quotes)
+                except Exception as e:
+                    print(f"Fiyat yayını hatası: {e}")
+        return len(quotes)
+
+    def last_price(self, symbol, currency='TRY'):
+        quote = self._last_quotes.get((normalize_symbol(symbol), currency))
+        return quote[0] if quote else None
+
+    def last_prices(self, symbols=None, currency='TRY'):
+        with self._lock:
+            if symbols is None:
+                return {symbol: quote[0] for (symbol, quoted), quote in self._last_quotes.items() if quoted == currency}
+            return {
+                symbol: self._last_quotes[(symbol, currency)][0]
+                for symbol in map(normalize_symbol, symbols) if (symbol, currency) in self._last_quotes
+            }
+
+    def get_quote(self, symbol, currency='TRY'):
+        quote = self._last_quotes.get((normalize_symbol(symbol), currency))
+        if not quote:
+            return None
+        return {
+            'symbol': normalize_symbol(symbol),
+            'price': quote[0],
+            'currency': currency,
+            'timestamp': quote[1],
+            'source': quote[2]
+        }
+
+
+def normalize_symbol(symbol):
+    """BIST sembollerini '.IS' eki olmadan büyük harfle tut"""
+    symbol = symbol.upper()
+    return symbol[:-3] if symbol.endswith('.IS') else symbol
+
+
+# Paylaşılan varsayılan fiyat kanalı
+price_bus = PriceBus()
@@ -2,104 +2,113 @@ import requests
 import json
 from datetime import datetime, timedelta
 import time
-from bs4 import BeautifulSoup
 import pandas as pd
+from price_bus import price_bus as default_price_bus
+from source_router import SourceError, source_router as default_source_router
+from fx_rates import fx_rates as default_fx_rates
+from disclosure_store import parse_publish_date
+
+# Tek HTTP denemesinin üst sınırı; yönlendirici hedge ile daha erken alternatife geçer
+SOURCE_TIMEOUT = 5
+# Delta yoklamasında imlece ulaşmak için en fazla istenecek sayfa
+KAP_MAX_PAGES = 20
 
 class RealDataConnector:
-    def __init__(self):
+    def __init__(self, price_bus=None, source_router=None, fx_rates=None):
         self.kap_base_url = "https://www.kap.org.tr"
+        self.price_bus = price_bus or default_price_bus
+        self.source_router = source_router or default_source_router
+        self.fx_rates = fx_rates or default_fx_rates
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
     
-    def get_kap_disclosures(self, limit=10):
-        """KAP'tan gerçek duyuruları al"""
-        try:
-            # KAP disclosure endpoint (public API)
-            url = f"{self.kap_base_url}/tr/api/disclosures"
+    def _get_json(self, url, **kwargs):
+        response = self.session.get(url, timeout=SOURCE_TIMEOUT, **kwargs)
+        if response.status_code != 200:
+            raise SourceError(f"HTTP {response.status_code}: {url}")
+        return response.json()
+
+    def get_kap_disclosures(self, limit=10, since=None, known_ids=None):
+        """KAP'tan gerçek duyuruları al (since: epoch, sadece o andan itibaren)
+        
+        known_ids(id listesi) -> bilinen id kümesi; API'de sayfalamayı durdurur,
+        kazımada bunların detayı indirilmez.
+        API ve kazıma yönlendirici üzerinden denenir; ikisi de yoksa son geçerli
+        sonuç, o da yoksa mock veri döner (data_quality alanına bakınız).
+        """
+        return self.source_router.route('kap_disclosures', [
+            ('KAP_REAL_API', lambda: self.fetch_kap_api(limit, since, known_ids)),
+            ('KAP_SCRAPING', lambda: self.fallback_kap_scraping(limit, known_ids))
+        ], fallback=lambda: self.get_mock_disclosures(limit))
             
-            params = {
-                'size': limit,
-                'fromDate': (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'),
-                'toDate': datetime.now().strftime('%Y-%m-%d')
+    def fetch_kap_api(self, limit=10, since=None, known_ids=None):
+        """KAP disclosure endpoint (public API)
+
+        since verilirse (delta yoklaması) limit sayfa boyutudur: yeniden eskiye
+        sayfalar, since'tan eski ya da tamamı bilinen bir bildirime ulaşılana
+        kadar (en fazla KAP_MAX_PAGES) istenir; since'tan eski bildirimler
+        dönmez. since yoksa son limit bildirim alınır.
+        """
+        url = f"{self.kap_base_url}/tr/api/disclosures"
+
+        from_date = datetime.fromtimestamp(since) if since else datetime.now() - timedelta(days=30)
+        params = {
+            'size': limit,
+            'fromDate': from_date.strftime('%Y-%m-%d'),
+            'toDate': datetime.now().strftime('%Y-%m-%d')
+        }
+
+        items = []
+        for page in range(KAP_MAX_PAGES if since else 1):
+            page_items = self._get_json(url, params=dict(params, page=page)).get('disclosures', [])
+            fresh = [
+                item for item in page_items
+                if (parse_publish_date(item.get('publishDate')) or float('inf')) >= since
+            ] if since else page_items
+            items.extend(fresh)
+            if len(page_items) < limit or len(fresh) < len(page_items):
+                break  # son sayfa veya imlecin gerisine inildi
+            if known_ids and known_ids([str(item['id']) for item in page_items if item.get('id')]):
+                break  # sayfada daha önce alınmış bildirim var: imlece ulaşıldı
+
+        disclosures = []
+        for item in items:
+            disclosure = {
+                'id': item.get('id'),
+                'title': item.get('title', ''),
+                'company': item.get('companyName', ''),
+                'company_code': item.get('stockCode', ''),
+                'disclosure_type': item.get('disclosureType', ''),
+                'date': item.get('publishDate', ''),
+                'content': item.get('summary', ''),
+                'url': f"{self.kap_base_url}/tr/disclosure/{item.get('id')}"
             }
+            disclosures.append(disclosure)
             
-            response = self.session.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                disclosures = []
-                
-                for item in data.get('disclosures', []):
-                    disclosure = {
-                        'id': item.get('id'),
-                        'title': item.get('title', ''),
-                        'company': item.get('companyName', ''),
-                        'company_code': item.get('stockCode', ''),
-                        'disclosure_type': item.get('disclosureType', ''),
-                        'date': item.get('publishDate', ''),
-                        'content': item.get('summary', ''),
-                        'url': f"{self.kap_base_url}/tr/disclosure/{item.get('id')}"
-                    }
-                    disclosures.append(disclosure)
-                
-                return {
-                    'success': True,
-                    'count': len(disclosures),
-                    'disclosures': disclosures,
-                    'source': 'KAP_REAL_API'
-                }
-            else:
-                return self.fallback_kap_scraping(limit)
-                
-        except Exception as e:
-            print(f"KAP API hatası: {e}")
-            return self.fallback_kap_scraping(limit)
+        return {
+            'success': True,
+            'count': len(disclosures),
+            'disclosures': disclosures,
+            'source': 'KAP_REAL_API'
+        }
     
-    def fallback_kap_scraping(self, limit=10):
-        """KAP web scraping alternatif"""
-        try:
-            url = f"{self.kap_base_url}/tr/bildirimler"
-            response = self.session.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # KAP'ın disclosure list'ini bul
-                disclosure_rows = soup.find_all('tr', class_='disclosure-row')[:limit]
-                
-                disclosures = []
-                for row in disclosure_rows:
-                    try:
-                        title_elem = row.find('td', class_='disclosure-title')
-                        company_elem = row.find('td', class_='disclosure-company')
-                        date_elem = row.find('td', class_='disclosure-date')
-                        
-                        if title_elem and company_elem:
-                            disclosure = {
-                                'title': title_elem.get_text(strip=True),
-                                'company': company_elem.get_text(strip=True),
-                                'date': date_elem.get_text(strip=True) if date_elem else '',
-                                'content': title_elem.get_text(strip=True),
-                                'source': 'KAP_SCRAPING'
-                            }
-                            disclosures.append(disclosure)
-                    except:
-                        continue
-                
-                return {
-                    'success': True,
-                    'count': len(disclosures),
-                    'disclosures': disclosures,
-                    'source': 'KAP_SCRAPING'
-                }
-            
-        except Exception as e:
-            print(f"KAP scraping hatası: {e}")
+    def fallback_kap_scraping(self, limit=10, known_ids=None):
+        """KAP web scraping alternatif (liste + detay sayfaları, paralel)"""
+        from kap_scraper import KapScraper
+        result = KapScraper(base_url=self.kap_base_url, timeout=SOURCE_TIMEOUT * 2).scrape(
+            pages=1, limit=limit, known_ids=known_ids
+        )
             
-        # Son çare: mock data
-        return self.get_mock_disclosures(limit)
+        if not result['disclosures'] and result['errors']:
+            raise SourceError(result['errors'][0])
+        return {
+            'success': True,
+            'count': len(result['disclosures']),
+            'disclosures': result['disclosures'],
+            'source': 'KAP_SCRAPING'
+        }
     
     def get_mock_disclosures(self, limit=10):
         """Mock veri (gerçek veri alınamazsa)"""
@@ -127,38 +136,41 @@ class RealDataConnector:
         }
     
     def get_stock_price_data(self, symbol):
-        """Hisse fiyat verisi (Yahoo Finance alternatif)"""
-        try:
-            # Yahoo Finance API (ücretsiz)
-            if not symbol.endswith('.IS'):
-                symbol = f"{symbol}.IS"  # BIST için .IS eki
+        """Hisse fiyat verisi (Yahoo Finance, iki uç nokta arasında hedge'li)"""
+        if not symbol.endswith('.IS'):
+            symbol = f"{symbol}.IS"  # BIST için .IS eki
             
-            url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
-            response = self.session.get(url, timeout=10)
+        result = self.source_router.route(f"price:{symbol}", [
+            ('YAHOO_FINANCE', lambda: self.fetch_yahoo_quote(symbol, 'query1')),
+            ('YAHOO_FINANCE_Q2', lambda: self.fetch_yahoo_quote(symbol, 'query2'))
+        ], fallback=lambda: self.get_mock_price(symbol))
             
-            if response.status_code == 200:
-                data = response.json()
-                result = data.get('chart', {}).get('result', [])
+        # Sadece canlı kotasyon portföylere yayılır
+        if result.get('data_quality') == 'LIVE' and result.get('current_price'):
+            self.price_bus.publish(symbol, result['current_price'], source='YAHOO_FINANCE',
+                                   currency=result.get('currency') or 'TRY')
+        return result
                 
-                if result:
-                    stock_data = result[0]
-                    meta = stock_data.get('meta', {})
+    def fetch_yahoo_quote(self, symbol, host='query1'):
+        """Yahoo Finance API (ücretsiz)"""
+        data = self._get_json(f"https://{host}.finance.yahoo.com/v8/finance/chart/{symbol}")
+        result = data.get('chart', {}).get('result', [])
+        if not result or not result[0].get('meta', {}).get('regularMarketPrice'):
+            raise SourceError(f"Kotasyon yok: {symbol}")
                     
-                    return {
-                        'success': True,
-                        'symbol': symbol,
-                        'current_price': meta.get('regularMarketPrice'),
-                        'previous_close': meta.get('previousClose'),
-                        'volume': meta.get('regularMarketVolume'),
-                        'market_cap': meta.get('marketCap'),
-                        'currency': meta.get('currency'),
-                        'source': 'YAHOO_FINANCE'
-                    }
-            
-        except Exception as e:
-            print(f"Yahoo Finance hatası: {e}")
-        
-        # Mock data fallback
+        meta = result[0]['meta']
+        return {
+            'success': True,
+            'symbol': symbol,
+            'current_price': meta.get('regularMarketPrice'),
+            'previous_close': meta.get('previousClose'),
+            'volume': meta.get('regularMarketVolume'),
+            'market_cap': meta.get('marketCap'),
+            'currency': meta.get('currency'),
+            'source': 'YAHOO_FINANCE'
+        }
+                    
+    def get_mock_price(self, symbol):
         return {
             'success': True,
             'symbol': symbol,
@@ -169,28 +181,38 @@ class RealDataConnector:
         }
     
     def get_exchange_rates(self):
-        """Döviz kurları (TCMB veya Exchange API)"""
-        try:
-            # Fixer.io veya benzeri ücretsiz API
-            url = "https://api.exchangerate-api.com/v4/latest/USD"
-            response = self.session.get(url, timeout=10)
+        """Döviz kurları (Exchange API veya TCMB)"""
+        return self.source_router.route('exchange_rates', [
+            ('EXCHANGE_API', self.fetch_exchange_api_rates),
+            ('TCMB', self.fetch_tcmb_rates)
+        ], fallback=self.get_mock_rates)
             
-            if response.status_code == 200:
-                data = response.json()
+    def fetch_exchange_api_rates(self):
+        data = self._get_json("https://api.exchangerate-api.com/v4/latest/USD")
+        rates = data.get('rates', {})
+        if not rates.get('TRY'):
+            raise SourceError("TRY kuru yok")
                 
-                return {
-                    'success': True,
-                    'rates': {
-                        'USD_TRY': data.get('rates', {}).get('TRY', 30.0),
-                        'EUR_TRY': data.get('rates', {}).get('TRY', 30.0) * 1.1,
-                        'GBP_TRY': data.get('rates', {}).get('TRY', 30.0) * 1.25
-                    },
-                    'source': 'EXCHANGE_API'
-                }
-        except Exception as e:
-            print(f"Döviz API hatası: {e}")
+        # USD bazlı kurlardan çapraz kur
+        usd_try = rates['TRY']
+        return {
+            'success': True,
+            'rates': {
+                'USD_TRY': usd_try,
+                'EUR_TRY': usd_try / rates['EUR'] if rates.get('EUR') else usd_try * 1.1,
+                'GBP_TRY': usd_try / rates['GBP'] if rates.get('GBP') else usd_try * 1.25
+            },
+            'source': 'EXCHANGE_API'
+        }
         
-        # Mock rates
+    def fetch_tcmb_rates(self):
+        """TCMB günlük bülteni (kalıcı önbellekli kur servisi üzerinden)"""
+        result = self.fx_rates.get_rates()
+        if not result.get('success') or result.get('stale'):
+            raise SourceError(result.get('error', 'TCMB bülteni güncel değil'))
+        return result
+
+    def get_mock_rates(self):
         return {
             'success': True,
             'rates': {
@@ -215,4 +237,7 @@ if __name__ == "__main__":
     
     print("\nDöviz Kurları Test:")
     forex_data = connector.get_exchange_rates()
-    print(json.dumps(forex_data, indent=2))
\ No newline at end of file
+    print(json.dumps(forex_data, indent=2))
+
+    print("\nVeri Kaynakları:")
+    print(json.dumps(connector.source_router.get_stats(), indent=2))
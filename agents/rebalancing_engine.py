@@ -0,0 +1,68 @@
+import numpy as np
+
+COMMISSION_RATE = 0.001  # %0.1 komisyon
+DRIFT_THRESHOLD = 5  # %5'ten fazla sapma varsa rebalance
+HIGH_PRIORITY_DRIFT = 10  # %10 üzeri sapma yüksek öncelikli
+
+
+def batch_rebalance(current_values, target_weights, drift_threshold=DRIFT_THRESHOLD,
+                    commission_rate=COMMISSION_RATE, active_mask=None):
+    """Tüm portföyleri tek vektörel geçişte dengele
+
+    current_values: (kullanıcı x varlık) güncel değer matrisi
+    target_weights: (kullanıcı x varlık) veya (varlık,) hedef yüzde matrisi
+    active_mask: dengelemeye dahil edilecek kullanıcılar (opsiyonel)
+    """
+    values = np.atleast_2d(np.asarray(current_values, dtype=float))
+    targets = np.broadcast_to(np.asarray(target_weights, dtype=float), values.shape)
+
+    totals = values.sum(axis=1)
+    safe_totals = np.where(totals > 0, totals, 1.0)
+
+    current_pct = values / safe_totals[:, None] * 100
+    drift = targets - current_pct
+
+    eligible = totals > 0
+    if active_mask is not None:
+        eligible &= np.asarray(active_mask, dtype=bool)
+
+    needs_action = (np.abs(drift) > drift_threshold) & eligible[:, None]
+    trade_amounts = np.where(needs_action, drift / 100 * totals[:, None], 0.0)
+    transaction_costs = np.abs(trade_amounts).sum(axis=1) * commission_rate
+
+    return {
+        'total_values': totals,
+        'current_pct': current_pct,
+        'drift': drift,
+        'needs_action': needs_action,
+        'trade_amounts': trade_amounts,
+        'transaction_costs': transaction_costs,
+        'rebalancing_needed': needs_action.any(axis=1)
+    }
+
+
+def compact_actions(batch_result, user_ids, asset_names, targets=None):
+    """Vektörel sonucu kullanıcı bazlı kısa aksiyon listelerine çevir"""
+    drift = batch_result['drift']
+    amounts = batch_result['trade_amounts']
+    current_pct = batch_result['current_pct']
+    if targets is None:
+        targets = current_pct + drift
+    else:
+        targets = np.broadcast_to(np.asarray(targets, dtype=float), drift.shape)
+
+    actions = {}
+    rows, cols = np.nonzero(batch_result['needs_action'])
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        difference = drift[row, col]
+        actions.setdefault(user_ids[row], []).append({
+            'asset': asset_names[col],
+            'current_percentage': round(float(current_pct[row, col]), 1),
+            'target_percentage': round(float(targets[row, col]), 1),
+            'difference': round(float(difference), 1),
+            'action': 'BUY' if difference > 0 else 'SELL',
+            'amount': abs(float(amounts[row, col])),
+            'priority': 'HIGH' if abs(difference) > HIGH_PRIORITY_DRIFT else 'MEDIUM'
+        })
+
+    return actions
@@ -0,0 +1,546 @@
+import base64
+import io
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.style
+from matplotlib.figure import Figure
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+from artifact_cache import ArtifactCache, content_key
+
+REPORTS_DIR = 'reports'
+
+# Şablon değişince sürüm artırılır; eski önbellek dosyaları kullanılmaz
+PDF_TEMPLATE_VERSION = 'analysis-pdf-2'
+CHART_TEMPLATE_VERSION = 'agent-chart-1'
+
+MOCK_REPORT_DATA = {
+    'symbol': 'THYAO',
+    'recommendation': 'GÜÇLÜ AL',
+    'confidence': 85,
+    'financial_score': 78,
+    'technical_score': 82,
+    'news_sentiment': 'Pozitif',
+    'target_price': 105.50,
+    'current_price': 91.50,
+    'stop_loss': 85.40,
+    'risk_level': 'Orta',
+    'agent_analysis': {
+        'financial_agent': {'score': 78, 'status': 'Güçlü'},
+        'technical_agent': {'score': 82, 'status': 'Pozitif'},
+        'news_agent': {'score': 75, 'status': 'İyi'},
+        'data_agent': {'score': 80, 'status': 'Stabil'}
+    }
+}
+
+
+def analysis_date_label(report_data):
+    """Raporda gösterilen analiz tarihi ('%d.%m.%Y %H:%M'); önbellek anahtarına da girer"""
+    value = report_data.get('analysis_date')
+    if not value:
+        return '-'
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value.strip()
+    return value.strftime('%d.%m.%Y %H:%M')
+
+
+def render_pdf_report(report_data, report_type='analysis', output_dir=REPORTS_DIR, filename=None):
+    """PDF rapor oluştur (işçi süreçte veya doğrudan çağrılabilir)
+
+    Duvar saati kullanılmaz: tarih report_data['analysis_date']'ten gelir,
+    böylece aynı içerik anahtarı her zaman aynı PDF'i üretir.
+    """
+    if not report_data:
+        # Mock data ile test raporu
+        report_data = MOCK_REPORT_DATA
+    analysis_date = analysis_date_label(report_data)
+    
+    # Dosya adı ve path
+    if not filename:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"analiz_raporu_{report_data.get('symbol', 'STOCK')}_{timestamp}.pdf"
+    filepath = os.path.join(output_dir, filename)
+    
+    # Reports klasörü oluştur
+    os.makedirs(output_dir, exist_ok=True)
+    
+    try:
+        # PDF oluştur - basit encoding
+        doc = SimpleDocTemplate(filepath, pagesize=A4, invariant=True)  # PDF meta verisine de saat yazılmaz
+        styles = getSampleStyleSheet()
+        story = []
+        
+        # Başlık
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=30,
+            alignment=1,  # Center
+            textColor=colors.darkblue
+        )
+        
+        story.append(Paragraph("Multi-Agent Finans AI Sistemi", title_style))
+        story.append(Paragraph(f"{report_data.get('symbol')} Hisse Analiz Raporu", title_style))
+        story.append(Spacer(1, 20))
+        
+        # Genel Bilgiler
+        info_data = [
+            ['Hisse Kodu:', report_data.get('symbol')],
+            ['Analiz Tarihi:', analysis_date],
+            ['Mevcut Fiyat:', f"TL {report_data.get('current_price')}"],
+            ['Hedef Fiyat:', f"TL {report_data.get('target_price')}"],
+            ['Onerilen Islem:', report_data.get('recommendation')],
+            ['Guven Seviyesi:', f"{report_data.get('confidence')} %"]
+        ]
+        
+        info_table = Table(info_data, colWidths=[2*inch, 2*inch])
+        info_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        
+        story.append(Paragraph("Genel Bilgiler", styles['Heading2']))
+        story.append(info_table)
+        story.append(Spacer(1, 20))
+        
+        # Agent Analizleri
+        story.append(Paragraph("Agent Analizleri", styles['Heading2']))
+        
+        agent_data = [['Agent', 'Skor', 'Durum', 'Degerlendirme']]
+        for agent_name, analysis in report_data.get('agent_analysis', {}).items():
+            agent_display = agent_name.replace('_agent', '').title()
+            score = analysis.get('score', 0)
+            status = analysis.get('status', 'Bilinmiyor')
+            evaluation = get_score_evaluation(score)
+            agent_data.append([agent_display, f"{score}/100", status, evaluation])
+        
+        agent_table = Table(agent_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1.5*inch])
+        agent_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        
+        story.append(agent_table)
+        story.append(Spacer(1, 20))
+        
+        # Risk Yönetimi
+        story.append(Paragraph("Risk Yonetimi", styles['Heading2']))
+        risk_content = f"""
+        <para>
+        • <b>Risk Seviyesi:</b> {report_data.get('risk_level', 'Orta')}<br/>
+        • <b>Stop Loss:</b> TL {report_data.get('stop_loss', 0)}<br/>
+        • <b>Beklenen Getiri:</b> {((report_data.get('target_price', 100) / report_data.get('current_price', 100) - 1) * 100):.1f} %<br/>
+        • <b>Risk/Getiri Orani:</b> {calculate_risk_reward_ratio(report_data)}<br/>
+        </para>
+        """
+        story.append(Paragraph(risk_content, styles['Normal']))
+        story.append(Spacer(1, 20))
+        
+        # Sonuç ve Öneriler
+        story.append(Paragraph("Sonuc ve Oneriler", styles['Heading2']))
+        conclusion = generate_conclusion(report_data)
+        story.append(Paragraph(conclusion, styles['Normal']))
+        story.append(Spacer(1, 20))
+        
+        # Footer
+        footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            alignment=1,
+            textColor=colors.grey
+        )
+        story.append(Paragraph(f"Bu rapor Multi-Agent AI Sistemi tarafindan {analysis_date} tarihli analizden olusturulmustur.", footer_style))
+        story.append(Paragraph("Bu rapor yatirim danismanligi degildir. Yatirim kararlarinizi almadan once uzmanlardan gorus aliniz.", footer_style))
+        
+        # PDF'i oluştur
+        doc.build(story)
+        
+        return {
+            "success": True,
+            "report_path": filepath,
+            "filename": filename,
+            "file_size": os.path.getsize(filepath),
+            "pages": 1,
+            "report_type": report_type,
+            "generation_time": datetime.now().isoformat(),
+            "download_url": f"/reports/download/{filename}"
+        }
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"PDF oluşturma hatası: {str(e)}",
+            "filename": filename
+        }
+
+
+def get_score_evaluation(score):
+    """Skora göre değerlendirme - Türkçe karakter yok"""
+    if score >= 85:
+        return "Mukemmel"
+    elif score >= 70:
+        return "Iyi"
+    elif score >= 55:
+        return "Orta"
+    elif score >= 40:
+        return "Zayif"
+    else:
+        return "Kotu"
+
+
+def calculate_risk_reward_ratio(data):
+    """Risk/getiri oranını hesapla"""
+    current = data.get('current_price', 100)
+    target = data.get('target_price', 100)
+    stop_loss = data.get('stop_loss', current * 0.9)
+    
+    potential_gain = target - current
+    potential_loss = current - stop_loss
+    
+    if potential_loss > 0:
+        ratio = potential_gain / potential_loss
+        return f"1:{ratio:.1f}"
+    return "1:1"
+
+
+def generate_conclusion(data):
+    """Sonuç metni oluştur - Türkçe karakter sorunları için basit metin"""
+    recommendation = data.get('recommendation', 'BEKLE')
+    confidence = data.get('confidence', 50)
+    symbol = data.get('symbol', 'HISSE')
+    
+    if recommendation in ['GUCLU AL', 'AL']:
+        conclusion = f"""
+        <para>
+        <b>{symbol}</b> hissesi icin yapilan coklu-agent analizinde <b>{recommendation}</b> onerisi cikmistir. 
+        %{confidence} guven seviyesi ile bu hissenin kisa-orta vadede pozitif performans gosterecegi degerlendirilmektedir.
+        <br/><br/>
+        <b>Onemli Noktalar:</b><br/>
+        • Finansal ve teknik gostergeler pozitif sinyal veriyor<br/>
+        • Piyasa duyarliligi olumlu<br/>
+        • Risk yonetimi kurallarina dikkat edilmeli<br/>
+        • Pozisyon buyuklugu risk toleransina uygun olmali
+        </para>
+        """
+    elif recommendation in ['SAT', 'GUCLU SAT']:
+        conclusion = f"""
+        <para>
+        <b>{symbol}</b> hissesi icin yapilan analiz sonucunda <b>{recommendation}</b> onerisi verilmistir.
+        Mevcut piyasa kosullari ve teknik gostergeler negatif sinyal vermektedir.
+        <br/><br/>
+        <b>Dikkat Edilmesi Gerekenler:</b><br/>
+        • Mevcut pozisyonlar gozden gecirilmeli<br/>
+        • Stop loss seviyeleri guncellenmeli<br/>
+        • Piyasa gelismeleri yakindan takip edilmeli
+        </para>
+        """
+    else:
+        conclusion = f"""
+        <para>
+        <b>{symbol}</b> hissesi icin yapilan analiz sonucunda <b>BEKLE</b> onerisi verilmistir.
+        Mevcut piyasa kosullarinda net bir yon belirsizligi bulunmaktadir.
+        <br/><br/>
+        <b>Oneriler:</b><br/>
+        • Piyasa gelismeleri yakindan izlenmeli<br/>
+        • Teknik seviyelerdeki kirilimlar takip edilmeli<br/>
+        • Yeni verilerin analizi beklenmelidir
+        </para>
+        """
+    
+    return conclusion
+
+
+def render_chart_png(chart_data=None, dpi=150):
+    """Agent skor grafiği (PNG bytes)
+
+    pyplot durum makinesi yerine doğrudan Figure + Agg kullanılır; böylece
+    aynı süreçte paralel çağrılar birbirinin figürüne dokunmaz.
+    """
+    chart_data = chart_data or {}
+    labels = chart_data.get('labels', ['Financial', 'Technical', 'News', 'Data'])
+    scores = chart_data.get('scores', [78, 82, 75, 80])
+    colors_list = chart_data.get('colors', ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728'])
+    
+    with matplotlib.style.context('seaborn-v0_8'):
+        figure = Figure(figsize=(10, 6))
+        axes = figure.add_subplot()
+        axes.bar(labels, scores, color=colors_list[:len(labels)], alpha=0.8)
+        axes.set_title(chart_data.get('title', 'Agent Analiz Skorları'), fontsize=16, fontweight='bold')
+        axes.set_ylabel('Skor (0-100)', fontsize=12)
+        axes.set_xlabel('AI Agent\'lar', fontsize=12)
+        axes.set_ylim(0, 100)
+        
+        # Skor değerlerini bar'ların üstüne yaz
+        for i, score in enumerate(scores):
+            axes.text(i, score + 2, str(score), ha='center', fontweight='bold')
+        
+        img_buffer = io.BytesIO()
+        figure.savefig(img_buffer, format='png', dpi=chart_data.get('dpi', dpi), bbox_inches='tight')
+    return img_buffer.getvalue()
+
+
+def render_chart(chart_data=None, dpi=150):
+    """Agent skor grafiği (PNG, base64)"""
+    try:
+        return {
+            "success": True,
+            "chart_base64": base64.b64encode(render_chart_png(chart_data, dpi)).decode(),
+            "chart_type": "agent_scores",
+            "format": "png"
+        }
+        
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Grafik oluşturma hatası: {str(e)}"
+        }
+
+
+def warm_worker():
+    """İşçi süreci ısıt: font, stil ve reportlab önbellekleri ilk işten önce yüklensin"""
+    matplotlib.rcParams['font.family'] = ['DejaVu Sans']
+    getSampleStyleSheet()
+    render_chart_png({'dpi': 10})
+
+
+def pdf_artifact_name(report_data, report_type='analysis'):
+    """Rapor verisinin içerik adresli dosya adı"""
+    report_data = report_data or MOCK_REPORT_DATA
+    # analysis_date VOLATILE_KEYS ile atılır; PDF'te görünen hali anahtara ayrıca girer
+    key = content_key('pdf', [report_type, report_data, analysis_date_label(report_data)], PDF_TEMPLATE_VERSION)
+    return f"analiz_raporu_{report_data.get('symbol', 'STOCK')}_{key[:20]}.pdf"
+
+
+def chart_artifact_name(chart_data, dpi=150):
+    chart_data = chart_data or {}
+    key = content_key('chart', [chart_data.get('dpi', dpi), chart_data], CHART_TEMPLATE_VERSION)
+    return f"grafik_{key[:20]}.png"
+
+
+class ReportRenderService:
+    """Süreç havuzunda, içerik adresli önbellekle rapor üretimi
+
+    PDF ve grafik üretimi CPU yoğun ve GIL'i tutar; bu yüzden işler
+    önceden ısıtılmış işçi süreçlerine (çekirdek sayısı kadar) dağıtılır.
+    submit hemen iş kimliği döndürür; durum ve dosya iş kimliğiyle sorgulanır.
+    Aynı veri ve şablon sürümü için dosya önbellekteyse yeniden üretilmez,
+    aynı rapor zaten üretiliyorsa mevcut iş kimliği döner. Havuz ilk işte
+    başlar; 'spawn' kullanılır çünkü ana süreçte çalışan thread'ler fork ile
+    güvenli kopyalanamaz.
+    """
+
+    def __init__(self, max_workers=None, cache=None, max_jobs=1000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache or ArtifactCache()
+        self.max_jobs = max_jobs
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._pool = None
+        self.jobs = OrderedDict()  # job_id -> iş durumu (en eskiler atılır)
+        self.inflight = {}  # dosya adı -> üretimdeki iş kimliği
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=warm_worker
+                )
+            return self._pool
+
+    def _new_job(self, kind, symbol):
+        job_id = f"RPT_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(self._ids):04d}"
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'symbol': symbol,
+            'status': 'queued',
+            'submitted_at': datetime.now().isoformat(),
+            'started': time.time(),
+            'duration': None,
+            'result': None,
+            'error': None
+        }
+        return job
+
+    def _register_job(self, job, name):
+        """İş kaydını görünür yap (kilit altında çağrılır)
+
+        İşin dosyası kayıt yaşadıkça önbellekten silinmez; kayıt atılınca bırakılır.
+        """
+        job['artifact'] = name
+        self.cache.pin(name)
+        self.jobs[job['job_id']] = job
+        while len(self.jobs) > self.max_jobs:
+            _, dropped = self.jobs.popitem(last=False)
+            self.cache.unpin(dropped['artifact'])
+
+    def _cached_pdf_result(self, name, path, report_type):
+        return {
+            "success": True,
+            "report_path": path,
+            "filename": name,
+            "file_size": os.path.getsize(path),
+            "pages": 1,
+            "report_type": report_type,
+            "cached": True,
+            "download_url": f"/reports/download/{name}"
+        }
+
+    def _finish_pdf(self, name, temp_path, result):
+        """Üretilen geçici dosyayı önbelleğe taşı ve sonucu düzelt"""
+        if result.get('success'):
+            path = self.cache.commit(name, temp_path)
+            result.update(report_path=path, filename=name, cached=False,
+                          download_url=f"/reports/download/{name}")
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+        return result
+
+    def render_pdf(self, report_data, report_type='analysis'):
+        """PDF'i bu süreçte üret (önbellekte varsa yeniden üretmeden)"""
+        name = pdf_artifact_name(report_data, report_type)
+        path = self.cache.get(name)
+        if path:
+            return self._cached_pdf_result(name, path, report_type)
+        temp_path = self.cache.temp_path(name)
+        result = render_pdf_report(report_data, report_type, os.path.dirname(temp_path), os.path.basename(temp_path))
+        return self._finish_pdf(name, temp_path, result)
+
+    def render_chart(self, chart_data=None):
+        """Grafiği üret veya önbellekteki PNG'yi kullan"""
+        name = chart_artifact_name(chart_data)
+        try:
+            path = self.cache.get(name)
+            cached = path is not None
+            if cached:
+                with open(path, 'rb') as chart_file:
+                    png = chart_file.read()
+            else:
+                png = render_chart_png(chart_data)
+                self.cache.put_bytes(name, png)
+        except Exception as e:
+            return {"success": False, "error": f"Grafik oluşturma hatası: {str(e)}"}
+        return {
+            "success": True,
+            "chart_base64": base64.b64encode(png).decode(),
+            "chart_type": "agent_scores",
+            "format": "png",
+            "cached": cached,
+            "chart_url": f"/reports/download/{name}"
+        }
+
+    def submit_pdf(self, report_data, report_type='analysis'):
+        """PDF işini kuyruğa al; iş kimliğini döndür"""
+        symbol = (report_data or MOCK_REPORT_DATA).get('symbol', 'STOCK')
+        name = pdf_artifact_name(report_data, report_type)
+        # Kontrol ve kayıt tek kilit altında: aynı rapor iki kez kuyruğa girmez,
+        # iş de 'future' alanı hazır olmadan görünmez
+        with self._lock:
+            if name in self.inflight:
+                return self.inflight[name]  # aynı rapor zaten üretiliyor
+
+            job = self._new_job('pdf', symbol)
+            path = self.cache.get(name)
+            if path:
+                job.update(status='completed', duration=0.0, result=self._cached_pdf_result(name, path, report_type))
+                self._register_job(job, name)
+                return job['job_id']
+
+            temp_path = self.cache.temp_path(name)
+            future = self._get_pool().submit(
+                render_pdf_report, report_data, report_type, os.path.dirname(temp_path), os.path.basename(temp_path)
+            )
+            job['future'] = future
+            job['finished'] = threading.Event()  # done callback'i durumu yazınca
+            self.inflight[name] = job['job_id']
+            self._register_job(job, name)
+
+        def done(finished):
+            job['duration'] = round(time.time() - job['started'], 3)
+            try:
+                result = self._finish_pdf(name, temp_path, finished.result())
+                job['result'] = result
+                job['status'] = 'completed' if result.get('success') else 'failed'
+                job['error'] = result.get('error')
+            except Exception as e:  # işçi süreç çöktü veya havuz kapandı
+                job['status'], job['error'] = 'failed', str(e)
+            finally:
+                # Dosya önbelleğe taşındıktan sonra bırakılır; arada gelen istek yeniden üretmez
+                with self._lock:
+                    self.inflight.pop(name, None)
+                job['finished'].set()
+
+        future.add_done_callback(done)
+        return job['job_id']
+
+    def submit_batch(self, reports, report_type='analysis'):
+        """Birden fazla raporu aynı anda kuyruğa al (tüm çekirdekler kullanılır)"""
+        return [self.submit_pdf(report_data, report_type) for report_data in reports]
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        status = {key: value for key, value in job.items() if key not in ('future', 'finished', 'started', 'artifact')}
+        if job['status'] == 'queued' and job['future'].running():
+            status['status'] = 'running'
+        return status
+
+    def wait(self, job_ids, timeout=None):
+        """İşler bitene (durumları yazılana) kadar bekle; durumlarını döndür"""
+        deadline = time.time() + timeout if timeout is not None else None
+        for job_id in job_ids:
+            finished = self.jobs.get(job_id, {}).get('finished')
+            if finished is not None:
+                finished.wait(max(deadline - time.time(), 0) if deadline is not None else None)
+        return [self.get_job(job_id) for job_id in job_ids]
+
+    def get_stats(self):
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {
+            'workers': self.max_workers,
+            'pool_started': self._pool is not None,
+            'jobs': counts,
+            'cache': self.cache.get_stats()
+        }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=not wait)
+                self._pool = None
@@ -1,14 +1,25 @@
 import requests
+import hashlib
+import os
 import re
 import json
 from datetime import datetime, timedelta
+import threading
 import time
 import numpy as np
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from base_agent import BaseAgent
+from keyword_matcher import KeywordMatcher
+from sentiment_batch import group_by_symbol, distribution_buckets, distribution_dict
+from sentiment_model import DEFAULT_MODEL_PATH, LexiconBackend, SentimentPredictor, load_backend
+from sentiment_stream import sentiment_stream as default_sentiment_stream, WINDOWS
+
+STREAMED_ID_LIMIT = 200000  # akışa eklenmiş (sembol, doküman id) hatırlama sınırı
+
+SENTIMENT_WEIGHTS = {'very_positive': 0.8, 'positive': 0.4, 'neutral': 0, 'negative': -0.4, 'very_negative': -0.8}
 
 class SentimentAnalysisAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, sentiment_stream=None):
         super().__init__(
             name="SentimentAnalysisAgent",
             agent_type="sentiment_analyzer",
@@ -22,11 +33,17 @@ class SentimentAnalysisAgent(BaseAgent):
             'negative': ['kötü', 'düşüş', 'zarar', 'kayıp', 'satış', 'risk', 'sorun', 'endişe'],
             'very_negative': ['felaket', 'çöküş', 'panik', 'korku', 'kaos', 'alarm', 'kriz']
         }
+        self.keyword_matcher = KeywordMatcher(self.sentiment_keywords)
+        self.sentiment_model = None  # ilk kullanımda yüklenir
+        self.sentiment_stream = sentiment_stream or default_sentiment_stream
+        self._streamed_ids = OrderedDict()  # (sembol, id) -> None; aynı doküman iki kez sayılmaz
+        self._stream_lock = threading.Lock()
         
     def can_handle_task(self, task):
         sentiment_tasks = [
             'analyze_social_sentiment', 'analyze_news_sentiment', 'calculate_fear_greed_index',
-            'get_market_sentiment', 'track_sentiment_trends', 'sentiment_based_signals'
+            'get_market_sentiment', 'track_sentiment_trends', 'sentiment_based_signals',
+            'analyze_sentiment_batch', 'sentiment_model_status', 'ingest_social_posts'
         ]
         return task.get('type') in sentiment_tasks
     
@@ -49,6 +66,12 @@ class SentimentAnalysisAgent(BaseAgent):
                 result = self.track_sentiment_trends(task.get('symbol'), task.get('timeframe'))
             elif task_type == 'sentiment_based_signals':
                 result = self.generate_sentiment_based_signals(task.get('symbol'))
+            elif task_type == 'ingest_social_posts':
+                result = self.ingest_social_posts(task.get('symbol'), task.get('platform') or 'twitter')
+            elif task_type == 'analyze_sentiment_batch':
+                result = self.analyze_sentiment_batch(task.get('documents'))
+            elif task_type == 'sentiment_model_status':
+                result = {"sentiment_model": self.get_sentiment_model().get_stats()}
             else:
                 result = {"error": "Desteklenmeyen görev tipi"}
             
@@ -71,24 +94,10 @@ class SentimentAnalysisAgent(BaseAgent):
             # Mock social media data (gerçek uygulamada Twitter/Reddit API)
             social_posts = self.get_mock_social_data(symbol, platform)
             
-            sentiment_scores = []
-            sentiment_distribution = {'very_positive': 0, 'positive': 0, 'neutral': 0, 'negative': 0, 'very_negative': 0}
-            
-            for post in social_posts:
-                score = self.calculate_text_sentiment(post['text'])
-                sentiment_scores.append(score)
-                
-                # Kategorize sentiment
-                if score >= 0.6:
-                    sentiment_distribution['very_positive'] += 1
-                elif score >= 0.2:
-                    sentiment_distribution['positive'] += 1
-                elif score >= -0.2:
-                    sentiment_distribution['neutral'] += 1
-                elif score >= -0.6:
-                    sentiment_distribution['negative'] += 1
-                else:
-                    sentiment_distribution['very_negative'] += 1
+            # Tüm postlar tek seferde puanlanır; sorgu akışa yazmaz (bkz. ingest_social_posts)
+            scores = self.score_texts([post['text'] for post in social_posts])
+            sentiment_distribution = distribution_dict(np.bincount(distribution_buckets(scores), minlength=5))
+            sentiment_scores = scores.tolist()
             
             # Overall sentiment
             overall_sentiment = np.mean(sentiment_scores) if sentiment_scores else 0
@@ -110,7 +119,7 @@ class SentimentAnalysisAgent(BaseAgent):
                     "total_mentions": len(social_posts),
                     "volume_trend": volume_trend,
                     "influential_posts": self.get_influential_posts(social_posts),
-                    "sentiment_momentum": self.calculate_sentiment_momentum(sentiment_scores),
+                    "sentiment_momentum": self.calculate_sentiment_momentum(symbol),
                     "reliability_score": self.calculate_reliability_score(len(social_posts), sentiment_strength)
                 }
             }
@@ -128,23 +137,17 @@ class SentimentAnalysisAgent(BaseAgent):
                 {"title": "Piyasalarda genel belirsizlik devam ediyor", "content": "Yatırımcılar temkinli yaklaşım sergiliyor"}
             ]
         
-        news_sentiments = []
-        sentiment_timeline = []
+        # Başlık ve içerik skorları toplu hesaplanır (başlık daha önemli)
+        title_scores = self.score_texts([news.get('title', '') for news in news_data])
+        content_scores = self.score_texts([news.get('content', '') for news in news_data])
+        news_sentiments = (title_scores * 0.7 + content_scores * 0.3).tolist()
+        self.stream_documents(news_data, news_sentiments, time_key='date', id_key=('id', 'url'))
         
-        for news in news_data:
-            # Title ve content sentiment
-            title_sentiment = self.calculate_text_sentiment(news.get('title', ''))
-            content_sentiment = self.calculate_text_sentiment(news.get('content', ''))
-            
-            # Weighted average (title daha önemli)
-            combined_sentiment = (title_sentiment * 0.7) + (content_sentiment * 0.3)
-            
-            news_sentiments.append(combined_sentiment)
-            sentiment_timeline.append({
-                "timestamp": news.get('date', datetime.now().isoformat()),
-                "sentiment": combined_sentiment,
-                "title": news.get('title', '')[:50] + "..."
-            })
+        sentiment_timeline = [{
+            "timestamp": news.get('date', datetime.now().isoformat()),
+            "sentiment": sentiment,
+            "title": news.get('title', '')[:50] + "..."
+        } for news, sentiment in zip(news_data, news_sentiments)]
         
         # Overall news sentiment
         overall_news_sentiment = np.mean(news_sentiments) if news_sentiments else 0
@@ -239,93 +242,192 @@ class SentimentAnalysisAgent(BaseAgent):
         }
     
     def get_overall_market_sentiment(self, symbols=None):
-        """Genel piyasa sentiment"""
+        """Genel piyasa sentiment (tüm sembollerin postları tek geçişte)"""
         if not symbols:
             symbols = ['THYAO', 'AKBNK', 'BIMAS', 'ASELS', 'KCHOL']
         
-        symbol_sentiments = {}
-        overall_scores = []
-        
+        texts, post_symbols, timestamps = [], [], []
         for symbol in symbols:
-            # Her sembol için sentiment analizi
-            social_result = self.analyze_social_media_sentiment(symbol)
-            
-            if not social_result.get('error'):
-                sentiment_score = social_result['social_sentiment_analysis']['overall_sentiment']
-                symbol_sentiments[symbol] = {
-                    'sentiment_score': sentiment_score,
-                    'sentiment_label': self.get_sentiment_label(sentiment_score),
-                    'mention_volume': social_result['social_sentiment_analysis']['total_mentions']
-                }
-                overall_scores.append(sentiment_score)
+            for post in self.get_mock_social_data(symbol, 'twitter'):
+                texts.append(post['text'])
+                post_symbols.append(symbol)
+                timestamps.append(post['timestamp'])
+        
+        # Sorgu: akan istatistiklere yazılmaz
+        result = self.analyze_sentiment_batch({'texts': texts, 'symbols': post_symbols, 'timestamps': timestamps},
+                                              stream=False)
+        if result.get('error'):
+            return result
+        return {"market_sentiment": result['batch_sentiment']['market_sentiment']}
+    
+    def analyze_sentiment_batch(self, documents, stream=True):
+        """Toplu sentiment: [{'symbol', 'text'}] veya {'symbols': [...], 'texts': [...]}
+        
+        Dokümanlar sentiment modeli ile tek batch'te puanlanır, sembol bazında
+        istatistikler gruplanmış NumPy indirgemeleriyle (bincount) hesaplanır.
+        stream=True ise skorlar (id'si daha önce görülmemiş dokümanlar) akışa
+        eklenir.
+        """
+        if isinstance(documents, dict):
+            texts, symbols = documents.get('texts', []), documents.get('symbols', [])
+            timestamps, ids = documents.get('timestamps'), documents.get('ids')
+        else:
+            texts = [document.get('text', '') for document in documents or []]
+            symbols = [document.get('symbol', 'UNKNOWN') for document in documents or []]
+            timestamps = [document.get('timestamp') for document in documents or []]
+            ids = [document.get('id') for document in documents or []]
         
-        # Market-wide sentiment
-        market_sentiment = np.mean(overall_scores) if overall_scores else 0
-        sentiment_dispersion = np.std(overall_scores) if overall_scores else 0
+        if not texts:
+            return {"error": "Doküman listesi boş"}
+        if len(texts) != len(symbols):
+            return {"error": "texts ve symbols aynı uzunlukta olmalı"}
         
-        # Sector analysis
-        sector_sentiment = self.analyze_sector_sentiment(symbol_sentiments)
+        scores = self.score_texts(texts)
+        unique_symbols, stats = group_by_symbol(symbols, scores)
+        if stream:
+            self.stream_scores(symbols, scores, timestamps, ids)
+        
+        symbol_sentiments = {}
+        for index, symbol in enumerate(unique_symbols):
+            sentiment_score = float(stats['mean'][index])
+            symbol_sentiments[symbol] = {
+                'sentiment_score': round(sentiment_score, 3),
+                'sentiment_label': self.get_sentiment_label(sentiment_score),
+                'mention_volume': int(stats['count'][index]),
+                'sentiment_std': round(float(stats['std'][index]), 3),
+                'sentiment_strength': round(float(min(1, (stats['abs_mean'][index] + stats['std'][index]) / 2)), 3),
+                'sentiment_distribution': distribution_dict(stats['distribution'][index])
+            }
         
         return {
-            "market_sentiment": {
-                "overall_market_sentiment": round(market_sentiment, 3),
-                "sentiment_label": self.get_sentiment_label(market_sentiment),
-                "sentiment_dispersion": round(sentiment_dispersion, 3),
-                "market_consensus": "Strong" if sentiment_dispersion < 0.3 else "Moderate" if sentiment_dispersion < 0.6 else "Weak",
+            "batch_sentiment": {
+                "documents": len(texts),
+                "symbols": len(unique_symbols),
+                "model": self.get_sentiment_model().backend.name,
                 "symbol_sentiments": symbol_sentiments,
-                "sector_sentiment": sector_sentiment,
-                "market_mood": self.determine_market_mood(market_sentiment, sentiment_dispersion),
-                "sentiment_extremes": self.identify_sentiment_extremes(symbol_sentiments)
+                "market_sentiment": self.summarize_market_sentiment(symbol_sentiments)
             }
         }
     
+    def stream_scores(self, symbols, scores, timestamps=None, ids=None):
+        """Puanlanmış dokümanları sembol bazında akan istatistiklere ekle
+        
+        ids verilirse aynı (sembol, id) ikinci kez eklenmez; eklenen sayısını döndürür.
+        """
+        grouped = defaultdict(lambda: ([], []))
+        with self._stream_lock:
+            for index, (symbol, score) in enumerate(zip(symbols, scores)):
+                if not symbol or symbol == 'UNKNOWN':
+                    continue
+                document_id = ids[index] if ids else None
+                if document_id is not None:
+                    if (symbol, document_id) in self._streamed_ids:
+                        continue
+                    self._streamed_ids[(symbol, document_id)] = None
+                    if len(self._streamed_ids) > STREAMED_ID_LIMIT:
+                        self._streamed_ids.popitem(last=False)
+                grouped[symbol][0].append(score)
+                grouped[symbol][1].append(timestamps[index] if timestamps else None)
+        
+        for symbol, (symbol_scores, symbol_timestamps) in grouped.items():
+            try:
+                self.sentiment_stream.add_many(symbol, symbol_scores, symbol_timestamps)
+            except (TypeError, ValueError) as e:
+                print(f"Sentiment akışı hatası ({symbol}): {e}")
+        return sum(len(symbol_scores) for symbol_scores, _ in grouped.values())
+    
+    def stream_documents(self, documents, scores, time_key='timestamp', id_key=('id',)):
+        """Sembol alanı olan dokümanları (ör. haberler) akışa ekle; id_key ilk dolu alan kimlik olur"""
+        ids = [next((document[key] for key in id_key if document.get(key)), None) for document in documents]
+        return self.stream_scores([document.get('symbol') for document in documents], scores,
+                                  [document.get(time_key) for document in documents], ids)
+    
+    def ingest_social_posts(self, symbol, platform='twitter'):
+        """Sosyal medya postlarını kendi zaman damgaları ve id'leriyle akışa al"""
+        posts = self.get_mock_social_data(symbol, platform)
+        scores = self.score_texts([post['text'] for post in posts])
+        added = self.stream_documents([dict(post, symbol=symbol, id=self.post_key(platform, post)) for post in posts],
+                                      scores)
+        return {"symbol": symbol, "platform": platform, "fetched": len(posts), "ingested": added}
+    
+    @staticmethod
+    def post_key(platform, post):
+        """Postun kalıcı kimliği: kaynak id'leri çağrılar arası tekrar edebilir, içerik ve zaman etmez"""
+        raw = f"{platform}|{post.get('author', '')}|{post.get('timestamp', '')}|{post.get('text', '')}"
+        return f"{platform}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]}"
+    
+    def summarize_market_sentiment(self, symbol_sentiments):
+        """Sembol skorlarından piyasa geneli özet"""
+        overall_scores = np.array([data['sentiment_score'] for data in symbol_sentiments.values()])
+        
+        # Market-wide sentiment
+        market_sentiment = float(np.mean(overall_scores)) if overall_scores.size else 0
+        sentiment_dispersion = float(np.std(overall_scores)) if overall_scores.size else 0
+        
+        return {
+            "overall_market_sentiment": round(market_sentiment, 3),
+            "sentiment_label": self.get_sentiment_label(market_sentiment),
+            "sentiment_dispersion": round(sentiment_dispersion, 3),
+            "market_consensus": "Strong" if sentiment_dispersion < 0.3 else "Moderate" if sentiment_dispersion < 0.6 else "Weak",
+            "symbol_sentiments": symbol_sentiments,
+            "sector_sentiment": self.analyze_sector_sentiment(symbol_sentiments),
+            "market_mood": self.determine_market_mood(market_sentiment, sentiment_dispersion),
+            "sentiment_extremes": self.identify_sentiment_extremes(symbol_sentiments)
+        }
+    
     def track_sentiment_trends(self, symbol, timeframe='7d'):
-        """Sentiment trend takibi"""
+        """Sentiment trend takibi (akan pencere istatistiklerinden)"""
         if not symbol:
             symbol = 'THYAO'
+        if timeframe not in WINDOWS:
+            timeframe = '7d'
         
-        # Mock historical sentiment data
-        days = 7 if timeframe == '7d' else 30 if timeframe == '30d' else 1
-        
-        sentiment_history = []
-        base_sentiment = 0.1  # Starting sentiment
+        # Akışta veri yoksa boş sonuç; veri toplama ingest_social_posts'un işi
+        window_stats = self.sentiment_stream.get_stats(symbol)
+        if window_stats is None:
+            return {
+                "sentiment_trends": {
+                    "symbol": symbol,
+                    "timeframe": timeframe,
+                    "data_available": False,
+                    "message": "Bu sembol için akışta sentiment verisi yok",
+                    "sentiment_history": [],
+                    "window_stats": {}
+                }
+            }
         
-        for i in range(days):
-            date = datetime.now() - timedelta(days=days-i-1)
-            
-            # Realistic sentiment evolution
-            daily_change = np.random.normal(0, 0.1)  # Daily random walk
-            base_sentiment += daily_change
-            base_sentiment = max(-1, min(1, base_sentiment))  # Clamp between -1 and 1
-            
-            sentiment_history.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'sentiment': round(base_sentiment, 3),
-                'volume': np.random.randint(50, 200)  # Mock mention volume
-            })
+        current = window_stats.get(timeframe, {})
+        buckets = self.sentiment_stream.get_history(symbol, timeframe)
+        sentiment_history = [{
+            'date': datetime.fromtimestamp(bucket['start']).isoformat(timespec='minutes'),
+            'sentiment': bucket['sentiment'],
+            'volume': bucket['volume']
+        } for bucket in buckets if bucket['volume']]
         
-        # Trend analysis
+        # Trend analysis (kova ortalamaları; kova sayısı pencere başına sabit)
         sentiment_values = [h['sentiment'] for h in sentiment_history]
         trend = self.calculate_sentiment_trend(sentiment_values)
-        volatility = np.std(sentiment_values)
         
         return {
             "sentiment_trends": {
                 "symbol": symbol,
                 "timeframe": timeframe,
+                "data_available": True,
                 "sentiment_history": sentiment_history,
+                "window_stats": window_stats,
                 "trend_analysis": {
                     "direction": trend['direction'],
                     "strength": trend['strength'],
                     "slope": trend['slope'],
-                    "volatility": round(volatility, 3)
+                    "volatility": current.get('std', 0)
                 },
                 "key_levels": {
-                    "highest_sentiment": max(sentiment_values),
-                    "lowest_sentiment": min(sentiment_values),
-                    "current_vs_average": round(sentiment_values[-1] - np.mean(sentiment_values), 3)
+                    "highest_sentiment": max(sentiment_values) if sentiment_values else 0,
+                    "lowest_sentiment": min(sentiment_values) if sentiment_values else 0,
+                    "current_vs_average": round(sentiment_values[-1] - current.get('mean', 0), 3) if sentiment_values else 0
                 },
-                "momentum": self.calculate_sentiment_momentum(sentiment_values[-5:])  # Last 5 days
+                "momentum": self.calculate_sentiment_momentum(symbol, timeframe),
+                "volume_zscore": current.get('volume_zscore', 0)
             }
         }
     
@@ -477,29 +579,25 @@ class SentimentAnalysisAgent(BaseAgent):
         
         return posts
     
+    def get_sentiment_model(self):
+        """Yerel sentiment modeli (SENTIMENT_MODEL_PATH); yoksa anahtar kelime sözlüğü"""
+        if self.sentiment_model is None:
+            backend = load_backend(os.getenv('SENTIMENT_MODEL_PATH', DEFAULT_MODEL_PATH), self.keyword_matcher, SENTIMENT_WEIGHTS)
+            fallback = None if isinstance(backend, LexiconBackend) else LexiconBackend(self.keyword_matcher, SENTIMENT_WEIGHTS)
+            self.sentiment_model = SentimentPredictor(backend, fallback=fallback)
+        return self.sentiment_model
+    
+    def score_texts(self, texts):
+        """Metin listesi için skor dizisi (önbellekli, tek batch)"""
+        return self.get_sentiment_model().predict_many(list(texts))
+    
     def calculate_text_sentiment(self, text):
         """Metin sentiment skoru hesapla"""
         if not text:
             return 0
         
-        text_lower = text.lower()
-        score = 0
-        
-        # Keyword-based scoring
-        for sentiment, keywords in self.sentiment_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    if sentiment == 'very_positive':
-                        score += 0.8
-                    elif sentiment == 'positive':
-                        score += 0.4
-                    elif sentiment == 'negative':
-                        score -= 0.4
-                    elif sentiment == 'very_negative':
-                        score -= 0.8
-        
-        # Normalize score
-        return max(-1, min(1, score))
+        # Tekil istekler modelde dinamik batch'e katılır; skor [-1, 1]
+        return self.get_sentiment_model().predict(text)
     
     def get_sentiment_label(self, score):
         """Sentiment skorunu label'a çevir"""
@@ -547,16 +645,10 @@ class SentimentAnalysisAgent(BaseAgent):
         
         return sorted_posts[:3]  # Top 3
     
-    def calculate_sentiment_momentum(self, sentiment_scores):
-        """Sentiment momentum hesapla"""
-        if len(sentiment_scores) < 3:
-            return 0
-        
-        recent_avg = np.mean(sentiment_scores[-3:])
-        older_avg = np.mean(sentiment_scores[:-3]) if len(sentiment_scores) > 3 else np.mean(sentiment_scores)
-        
-        momentum = recent_avg - older_avg
-        return round(momentum, 3)
+    def calculate_sentiment_momentum(self, symbol, window='1d'):
+        """Sentiment momentum: pencere EWMA'sı - pencere ortalaması"""
+        stats = self.sentiment_stream.get_stats(symbol, window)
+        return round(stats['momentum'], 3) if stats else 0
     
     def calculate_reliability_score(self, mention_count, sentiment_strength):
         """Güvenilirlik skoru"""
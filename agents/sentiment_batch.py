@@ -0,0 +1,78 @@
+import numpy as np
+
+# Skor dağılımı sınırları: <-0.6, [-0.6, -0.2), [-0.2, 0.2), [0.2, 0.6), >=0.6
+DISTRIBUTION_BINS = np.array([-0.6, -0.2, 0.2, 0.6])
+DISTRIBUTION_LABELS = ['very_negative', 'negative', 'neutral', 'positive', 'very_positive']
+
+
+def class_count_matrix(matcher, texts):
+    """(doküman x sınıf) eşleşme sayıları; tüm dokümanlar tek geçişte"""
+    class_index = {label: index for index, label in enumerate(matcher.classes)}
+    n_classes = len(matcher.classes)
+    cells = []
+    for row, text in enumerate(texts):
+        base = row * n_classes
+        for _, label in matcher.iter_matches(text):
+            cells.append(base + class_index[label])
+    flat = np.bincount(np.asarray(cells, dtype=np.int64), minlength=len(texts) * n_classes)
+    return flat.reshape(len(texts), n_classes)
+
+
+def score_documents(matcher, texts, weights):
+    """Doküman skorları: sınıf sayıları x sınıf ağırlıkları, [-1, 1] aralığına kırpılmış"""
+    if len(texts) == 0:
+        return np.zeros(0)
+    counts = class_count_matrix(matcher, texts)
+    weight_vector = np.array([weights.get(label, 0) for label in matcher.classes], dtype=float)
+    return np.clip(counts @ weight_vector, -1, 1)
+
+
+def distribution_buckets(scores):
+    return np.digitize(scores, DISTRIBUTION_BINS)
+
+
+def grouped_stats(group_ids, scores, n_groups):
+    """Grup bazında (bincount) adet, ortalama, std, |ortalama| ve dağılım
+
+    np.std ile aynı şekilde popülasyon standart sapması kullanılır.
+    """
+    counts = np.bincount(group_ids, minlength=n_groups)
+    safe_counts = np.maximum(counts, 1)
+    means = np.bincount(group_ids, weights=scores, minlength=n_groups) / safe_counts
+    squares = np.bincount(group_ids, weights=scores * scores, minlength=n_groups) / safe_counts
+    stds = np.sqrt(np.maximum(squares - means * means, 0))
+    abs_means = np.bincount(group_ids, weights=np.abs(scores), minlength=n_groups) / safe_counts
+
+    n_buckets = len(DISTRIBUTION_LABELS)
+    distribution = np.bincount(
+        group_ids * n_buckets + distribution_buckets(scores), minlength=n_groups * n_buckets
+    ).reshape(n_groups, n_buckets)
+
+    return {
+        'count': counts,
+        'mean': means,
+        'std': stds,
+        'abs_mean': abs_means,
+        'distribution': distribution
+    }
+
+
+def aggregate_by_symbol(matcher, texts, symbols, weights):
+    """Düz doküman dizisini puanla ve sembol bazında topla
+
+    Dönen: (sembol listesi, doküman skorları, grup istatistikleri)
+    """
+    scores = score_documents(matcher, texts, weights)
+    unique_symbols, stats = group_by_symbol(symbols, scores)
+    return unique_symbols, scores, stats
+
+
+def group_by_symbol(symbols, scores):
+    """Hazır skorları sembol bazında topla: (sembol listesi, grup istatistikleri)"""
+    unique_symbols, group_ids = np.unique(np.asarray(symbols, dtype=str), return_inverse=True)
+    return [str(symbol) for symbol in unique_symbols], grouped_stats(group_ids, np.asarray(scores, dtype=float), len(unique_symbols))
+
+
+def distribution_dict(row):
+    """Dağılım satırı -> {etiket: adet} (çok olumludan çok olumsuza)"""
+    return {label: int(row[index]) for index, label in reversed(list(enumerate(DISTRIBUTION_LABELS)))}
@@ -0,0 +1,281 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from keyword_matcher import tokenize
+from sentiment_batch import score_documents
+
+DEFAULT_MODEL_PATH = os.path.join('models', 'sentiment_ngram.npz')
+
+
+def hashed_features(texts, n_features, ngram=2):
+    """Metinleri hash'lenmiş kelime n-gram indekslerine çevir
+
+    Dönen (indices, offsets): dokümanın özellikleri indices[offsets[i]:offsets[i+1]].
+    crc32 kullanılır; Python hash()'inin aksine süreçten sürece kararlıdır.
+    """
+    indices = []
+    offsets = [0]
+    for text in texts:
+        words = tokenize(text or '')
+        for n in range(1, ngram + 1):
+            for start in range(len(words) - n + 1):
+                indices.append(zlib.crc32(' '.join(words[start:start + n]).encode('utf-8')) % n_features)
+        offsets.append(len(indices))
+    return np.asarray(indices, dtype=np.int64), np.asarray(offsets, dtype=np.int64)
+
+
+class LexiconBackend:
+    """Anahtar kelime tabanlı skor (model yoksa geri dönüş)"""
+
+    name = 'lexicon'
+    batched = False  # toplamanın faydası yok, doğrudan çağrılır
+
+    def __init__(self, matcher, weights):
+        self.matcher = matcher
+        self.weights = weights
+
+    def predict_batch(self, texts):
+        return score_documents(self.matcher, texts, self.weights)
+
+
+class HashedNgramModel:
+    """Hash'lenmiş kelime n-gram doğrusal modeli (çevrimdışı eğitilir)
+
+    Skor tanh(Σ w[özellik] / √n + b) ile [-1, 1] aralığındadır. Tahmin,
+    tüm batch için tek bir np.add.reduceat ile yapılır.
+    """
+
+    name = 'hashed_ngram'
+    batched = True
+
+    def __init__(self, weights, bias=0.0, ngram=2):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.ngram = ngram
+        self.n_features = len(self.weights)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['weights'], float(data['bias']), int(data['ngram']))
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, ngram=self.ngram)
+
+    def _logits(self, indices, offsets):
+        lengths = np.diff(offsets)
+        sums = np.zeros(len(lengths), dtype=np.float64)
+        non_empty = lengths > 0
+        if indices.size:
+            sums[non_empty] = np.add.reduceat(self.weights[indices], offsets[:-1][non_empty])
+        return sums / np.sqrt(np.maximum(lengths, 1)) + self.bias
+
+    def predict_batch(self, texts):
+        indices, offsets = hashed_features(texts, self.n_features, self.ngram)
+        return np.tanh(self._logits(indices, offsets))
+
+    @classmethod
+    def fit(cls, texts, targets, n_features=2 ** 18, ngram=2, epochs=5, learning_rate=0.5, l2=1e-6, batch_size=256):
+        """Mini-batch gradyan inişi ile eğit; hedefler [-1, 1] (ör. -1 / 0 / 1)"""
+        model = cls(np.zeros(n_features, dtype=np.float32), 0.0, ngram)
+        targets = np.asarray(targets, dtype=np.float64)
+        indices, offsets = hashed_features(texts, n_features, ngram)
+        lengths = np.diff(offsets)
+        order = np.arange(len(targets))
+        rng = np.random.default_rng(0)
+
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                batch_offsets = np.concatenate([[0], np.cumsum(lengths[batch])])
+                batch_indices = np.concatenate([indices[offsets[i]:offsets[i + 1]] for i in batch]) \
+                    if len(batch) else np.zeros(0, dtype=np.int64)
+                predictions = np.tanh(model._logits(batch_indices, batch_offsets))
+
+                # Kare hata gradyanı, tanh türevi ile
+                gradient = (predictions - targets[batch]) * (1 - predictions ** 2)
+                scale = gradient / np.sqrt(np.maximum(lengths[batch], 1))
+                feature_gradient = np.bincount(
+                    batch_indices, weights=np.repeat(scale, lengths[batch]), minlength=n_features
+                )
+                model.weights -= (learning_rate * (feature_gradient / len(batch) + l2 * model.weights)).astype(np.float32)
+                model.bias -= learning_rate * float(gradient.mean())
+        return model
+
+
+class TorchScriptNgramModel:
+    """TorchScript'e aktarılmış n-gram modeli (ör. EmbeddingBag + doğrusal katman)
+
+    Modül forward(indices, offsets) -> [-1, 1] skor tensörü almalıdır;
+    özellikler HashedNgramModel ile aynı şekilde üretilir. torch sadece bu
+    arka uç seçildiğinde yüklenir.
+    """
+
+    name = 'torchscript_ngram'
+    batched = True
+
+    def __init__(self, path, n_features=2 ** 18, ngram=2):
+        import torch
+        self.torch = torch
+        torch.set_num_threads(1)  # çekirdek başına verim; paralellik süreç/istek düzeyinde
+        self.module = torch.jit.load(path, map_location='cpu').eval()
+        self.n_features = n_features
+        self.ngram = ngram
+
+    def predict_batch(self, texts):
+        indices, offsets = hashed_features(texts, self.n_features, self.ngram)
+        with self.torch.inference_mode():
+            output = self.module(self.torch.from_numpy(indices), self.torch.from_numpy(offsets[:-1]))
+        return np.clip(output.reshape(-1).numpy().astype(np.float64), -1, 1)
+
+
+def load_backend(path, matcher, weights):
+    """Model dosyasını yükle; yoksa veya yüklenemezse sözlüğe dön"""
+    fallback = LexiconBackend(matcher, weights)
+    if not path or not os.path.exists(path):
+        return fallback
+    try:
+        if path.endswith(('.pt', '.ts')):
+            return TorchScriptNgramModel(path)
+        return HashedNgramModel.load(path)
+    except Exception as e:
+        print(f"Sentiment modeli yüklenemedi ({path}): {e}; sözlük kullanılacak")
+        return fallback
+
+
+class SentimentPredictor:
+    """Önbellekli ve dinamik batch'li tahmin
+
+    Tekil istekler kuyruğa alınır; arka plan thread'i max_wait_ms kadar
+    (veya max_batch dolana kadar) toplar ve tek bir ileri geçiş yapar.
+    Toplu çağrılar (predict_many) zaten batch olduğundan doğrudan çalışır.
+    Sonuçlar metin hash'ine göre LRU önbellekte tutulur. Model hata verirse
+    sözlük arka ucuna düşülür.
+    """
+
+    def __init__(self, backend, fallback=None, max_batch=256, max_wait_ms=5, cache_size=100000):
+        self.backend = backend
+        self.fallback = fallback
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self.stats = {'cache_hits': 0, 'predicted': 0, 'batches': 0, 'fallbacks': 0}
+
+    @staticmethod
+    def _key(text):
+        return hashlib.blake2b((text or '').encode('utf-8'), digest_size=12).digest()
+
+    def _run_backend(self, texts):
+        try:
+            scores = self.backend.predict_batch(texts)
+        except Exception:
+            if self.fallback is None:
+                raise
+            self.stats['fallbacks'] += 1
+            scores = self.fallback.predict_batch(texts)
+        self.stats['predicted'] += len(texts)
+        self.stats['batches'] += 1
+        return np.asarray(scores, dtype=np.float64)
+
+    def _store(self, keys, scores):
+        with self._cache_lock:
+            for key, score in zip(keys, scores):
+                self.cache[key] = float(score)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _lookup(self, keys):
+        """Önbellekteki skorlar; eksikler None"""
+        found = []
+        with self._cache_lock:
+            for key in keys:
+                score = self.cache.get(key)
+                if score is not None:
+                    self.cache.move_to_end(key)
+                found.append(score)
+        return found
+
+    def predict_many(self, texts):
+        """Metin listesi için skor dizisi (önbellek + tek batch)"""
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = {}
+        for index, score in enumerate(found):
+            if score is None:
+                missing.setdefault(keys[index], index)  # aynı metin bir kez tahmin edilir
+        self.stats['cache_hits'] += len(texts) - sum(1 for score in found if score is None)
+
+        scores = np.array([score if score is not None else np.nan for score in found], dtype=np.float64)
+        if missing:
+            positions = list(missing.values())
+            predicted = self._run_backend([texts[index] for index in positions])
+            self._store(list(missing), predicted)
+            lookup = dict(zip(missing, predicted))
+            for index, score in enumerate(found):
+                if score is None:
+                    scores[index] = lookup[keys[index]]
+        return scores
+
+    def predict(self, text):
+        """Tekil tahmin; model batch'ten faydalanıyorsa dinamik batch'e katılır"""
+        key = self._key(text)
+        cached = self._lookup([key])[0]
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            return cached
+        if not self.backend.batched:
+            return float(self.predict_many([text])[0])
+
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((key, text, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._cache_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._batch_loop, name="SentimentBatcher", daemon=True)
+                    self._thread.start()
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                scores = self._run_backend([text for _, text, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._store([key for key, _, _ in batch], scores)
+            for (_, _, future), score in zip(batch, scores):
+                future.set_result(float(score))
+
+    def get_stats(self):
+        return dict(self.stats, backend=self.backend.name, cached=len(self.cache))
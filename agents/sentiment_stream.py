@@ -0,0 +1,228 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from price_bus import normalize_symbol
+
+# Pencere -> (uzunluk, kova genişliği) saniye cinsinden
+WINDOWS = {
+    '1h': (3600, 60),
+    '1d': (86400, 3600),
+    '7d': (7 * 86400, 6 * 3600),
+    '30d': (30 * 86400, 86400),
+}
+
+
+def to_epoch(value):
+    """Zaman damgası (epoch, datetime veya ISO metin) -> epoch saniye"""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+
+class _WindowRing:
+    """Zaman kovalarından oluşan halka tampon
+
+    Her kova adet, skor toplamı ve kare toplamı tutar; pencere toplamları
+    ekleme ve kova düşürme sırasında artımlı güncellenir. EWMA, olay
+    zamanına göre üstel olarak söner (yarı ömür = pencere / 4).
+    """
+
+    __slots__ = ('bucket_size', 'size', 'counts', 'sums', 'squares', 'head',
+                 'count', 'total', 'total_squares', 'count_squares',
+                 'decay_tau', 'ewma_value', 'ewma_weight', 'ewma_time')
+
+    def __init__(self, window, bucket_size):
+        self.bucket_size = bucket_size
+        self.size = window // bucket_size
+        self.counts = [0] * self.size
+        self.sums = [0.0] * self.size
+        self.squares = [0.0] * self.size
+        self.head = None  # en yeni kovanın mutlak numarası
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.count_squares = 0  # Σ kova adedi², hacim z-skoru için
+        self.decay_tau = window / 4 / math.log(2)
+        self.ewma_value = 0.0
+        self.ewma_weight = 0.0
+        self.ewma_time = None
+
+    def advance(self, bucket):
+        """Pencereyi ileri kaydır; düşen kovaları toplamlardan çıkar"""
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        for step in range(1, min(bucket - self.head, self.size) + 1):
+            slot = (self.head + step) % self.size
+            count = self.counts[slot]
+            if count:
+                self.count -= count
+                self.count_squares -= count * count
+                self.total -= self.sums[slot]
+                self.total_squares -= self.squares[slot]
+                self.counts[slot] = 0
+                self.sums[slot] = 0.0
+                self.squares[slot] = 0.0
+        self.head = bucket
+
+    def add(self, timestamp, score):
+        bucket = int(timestamp // self.bucket_size)
+        self.advance(bucket)
+        if bucket <= self.head - self.size:
+            return False  # pencereden eski
+
+        slot = bucket % self.size
+        count = self.counts[slot]
+        self.count_squares += 2 * count + 1
+        self.counts[slot] = count + 1
+        self.sums[slot] += score
+        self.squares[slot] += score * score
+        self.count += 1
+        self.total += score
+        self.total_squares += score * score
+
+        # Zamana göre sönümlenen EWMA; geç gelen olay kendi yaşı kadar sönük eklenir
+        if self.ewma_time is None or timestamp >= self.ewma_time:
+            if self.ewma_time is not None:
+                decay = math.exp(-(timestamp - self.ewma_time) / self.decay_tau)
+                self.ewma_value *= decay
+                self.ewma_weight *= decay
+            self.ewma_time = timestamp
+            weight = 1.0
+        else:
+            weight = math.exp(-(self.ewma_time - timestamp) / self.decay_tau)
+        self.ewma_value += weight * score
+        self.ewma_weight += weight
+        return True
+
+    def volume_zscore(self, now):
+        """Güncel kova hacminin (süreye göre oranlanmış) diğer kovalara göre z-skoru"""
+        if self.size < 2 or self.head is None:
+            return 0.0
+        current = self.counts[self.head % self.size]
+        others = self.size - 1
+        other_mean = (self.count - current) / others
+        other_var = (self.count_squares - current * current) / others - other_mean * other_mean
+        if other_var <= 0:
+            return 0.0
+        elapsed = (now - self.head * self.bucket_size) / self.bucket_size
+        projected = current / min(1.0, max(elapsed, 0.1))
+        return (projected - other_mean) / math.sqrt(other_var)
+
+    def snapshot(self, now):
+        self.advance(int(now // self.bucket_size))
+        mean = self.total / self.count if self.count else 0.0
+        variance = self.total_squares / self.count - mean * mean if self.count else 0.0
+        ewma = self.ewma_value / self.ewma_weight if self.ewma_weight else mean
+        return {
+            'count': self.count,
+            'mean': round(mean, 4),
+            'std': round(math.sqrt(max(variance, 0.0)), 4),
+            'ewma': round(ewma, 4),
+            'momentum': round(ewma - mean, 4) if self.count else 0.0,
+            'volume_zscore': round(self.volume_zscore(now), 3)
+        }
+
+    def history(self, now):
+        """Kova geçmişi (eskiden yeniye); boş kovalar None skorla döner"""
+        self.advance(int(now // self.bucket_size))
+        if self.head is None:
+            return []
+        rows = []
+        for bucket in range(self.head - self.size + 1, self.head + 1):
+            slot = bucket % self.size
+            count = self.counts[slot]
+            rows.append({
+                'start': bucket * self.bucket_size,
+                'volume': count,
+                'sentiment': round(self.sums[slot] / count, 4) if count else None
+            })
+        return rows
+
+
+class SentimentStream:
+    """Sembol bazında akan sentiment istatistikleri
+
+    Puanlanmış post ve haberler add/add_many ile akar; 1h/1d/7d/30d
+    pencereleri için adet, ortalama, std, EWMA, momentum ve hacim z-skoru
+    artımlı tutulur. Sorgular gönderi sayısından bağımsızdır; sembol başına
+    bellek kova sayısı ile sınırlıdır. En uzun süredir güncellenmeyen
+    semboller max_symbols aşılınca bırakılır.
+    """
+
+    def __init__(self, windows=None, max_symbols=5000):
+        self.windows = dict(windows or WINDOWS)
+        self.max_symbols = max_symbols
+        self._lock = threading.Lock()
+        self._symbols = OrderedDict()  # sembol -> {pencere: _WindowRing}
+        self.stats = {'events': 0, 'dropped': 0, 'evicted_symbols': 0}
+
+    def _rings(self, symbol, create=False):
+        rings = self._symbols.get(symbol)
+        if rings is None and create:
+            rings = {name: _WindowRing(window, bucket) for name, (window, bucket) in self.windows.items()}
+            self._symbols[symbol] = rings
+            if len(self._symbols) > self.max_symbols:
+                self._symbols.popitem(last=False)
+                self.stats['evicted_symbols'] += 1
+        elif rings is not None and create:
+            self._symbols.move_to_end(symbol)
+        return rings
+
+    def add(self, symbol, score, timestamp=None):
+        return self.add_many(symbol, [score], [timestamp])
+
+    def add_many(self, symbol, scores, timestamps=None):
+        """Bir sembol için skorları ekle; timestamps yoksa şimdiki zaman"""
+        symbol = normalize_symbol(symbol)
+        if timestamps is None:
+            timestamps = [None] * len(scores)
+        events = sorted(zip((to_epoch(value) for value in timestamps), (float(score) for score in scores)))
+        accepted = 0
+        with self._lock:
+            rings = self._rings(symbol, create=True)
+            for timestamp, score in events:
+                kept = False
+                for ring in rings.values():
+                    kept = ring.add(timestamp, score) or kept
+                accepted += kept
+            self.stats['events'] += accepted
+            self.stats['dropped'] += len(events) - accepted
+        return accepted
+
+    def get_stats(self, symbol, window=None, now=None):
+        """Pencere istatistikleri ({pencere: {...}}, ya da tek pencere); veri yoksa None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rings = self._rings(normalize_symbol(symbol))
+            if rings is None:
+                return None
+            if window is not None:
+                return rings[window].snapshot(now)
+            return {name: ring.snapshot(now) for name, ring in rings.items()}
+
+    def get_history(self, symbol, window='7d', now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rings = self._rings(normalize_symbol(symbol))
+            return rings[window].history(now) if rings else []
+
+    def symbols(self):
+        with self._lock:
+            return list(self._symbols)
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, symbols=len(self._symbols))
+
+
+sentiment_stream = SentimentStream()
@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+
+class SourceError(Exception):
+    """Kaynak geçerli veri döndürmedi (HTTP hatası, boş yanıt vb.)"""
+
+
+class CircuitBreaker:
+    """Kaynak başına devre kesici
+
+    Art arda failure_threshold hata sonrası açılır ve reset_timeout boyunca
+    kaynağa istek gönderilmez. Süre dolunca tek bir deneme isteğine izin
+    verilir (yarı açık); başarılıysa kapanır, değilse süre iki katına
+    çıkarak (max_reset_timeout'a kadar) tekrar açılır.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, max_reset_timeout=600):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open':
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class SourceRouter:
+    """Devre kesicili, hedge'li veri kaynağı yönlendirici
+
+    route(anahtar, [(kaynak adı, fonksiyon), ...]) kaynakları sırayla dener:
+    devresi açık kaynaklar atlanır, birincil kaynak kendi p95 gecikmesi
+    içinde yanıt vermezse sıradaki kaynak paralel olarak ateşlenir ve ilk
+    başarılı yanıt kullanılır. Başarılı sonuçlar anahtar bazında son
+    geçerli veri olarak saklanır; tüm kaynaklar başarısızsa önce bu veri
+    (data_quality='STALE'), o da yoksa mock veri (data_quality='MOCK')
+    döner. Kaynak durumu süreç genelinde paylaşılır (modül tekil nesnesi).
+    """
+
+    def __init__(self, timeout=8.0, default_hedge_delay=1.0, min_hedge_delay=0.05, latency_window=100,
+                 max_workers=16, max_cached=2000, failure_threshold=3, reset_timeout=30):
+        self.timeout = timeout
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latency_window = latency_window
+        self.max_cached = max_cached
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="source")
+        self._lock = threading.Lock()
+        self.breakers = {}
+        self.latencies = {}  # kaynak -> son başarılı gecikmeler (s)
+        self.source_stats = {}
+        self.last_good = OrderedDict()  # anahtar -> (sonuç, zaman)
+        self.stats = {'live': 0, 'stale': 0, 'mock': 0, 'hedged': 0, 'failed': 0}
+
+    def _source(self, name):
+        with self._lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.latencies[name] = deque(maxlen=self.latency_window)
+                self.source_stats[name] = {'success': 0, 'failure': 0, 'skipped_open': 0, 'last_error': None}
+            return self.breakers[name]
+
+    def hedge_delay(self, name):
+        """Kaynağın p95 gecikmesi (yeterli örnek yoksa varsayılan)"""
+        samples = self.latencies.get(name)
+        if not samples or len(samples) < 5:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, float(np.percentile(samples, 95)))
+
+    def _run(self, name, func):
+        breaker = self._source(name)
+        started = time.monotonic()
+        try:
+            result = func()
+            if not result or (isinstance(result, dict) and result.get('success') is False):
+                raise SourceError(result.get('error', 'Boş yanıt') if isinstance(result, dict) else 'Boş yanıt')
+        except Exception as e:
+            breaker.record_failure()
+            with self._lock:
+                self.source_stats[name]['failure'] += 1
+                self.source_stats[name]['last_error'] = str(e)[:200]
+            raise
+        breaker.record_success()
+        with self._lock:
+            self.latencies[name].append(time.monotonic() - started)
+            self.source_stats[name]['success'] += 1
+        return result
+
+    def route(self, key, sources, fallback=None, timeout=None):
+        """İlk başarılı kaynağın sonucu; routing bilgisi ve data_quality eklenir"""
+        started = time.monotonic()
+        deadline = started + (timeout or self.timeout)
+        candidates = []
+        errors = {}
+        for name, func in sources:
+            if self._source(name).allow():
+                candidates.append((name, func))
+            else:
+                errors[name] = 'Devre açık'
+                with self._lock:
+                    self.source_stats[name]['skipped_open'] += 1
+
+        pending = {}
+        launched = 0
+        while launched < len(candidates) or pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if launched < len(candidates) and not pending:
+                name, func = candidates[launched]
+                pending[self._executor.submit(self._run, name, func)] = name
+                launched += 1
+
+            # Son ateşlenen kaynağın p95'i kadar bekle; sonra sıradakini hedge olarak ateşle
+            last_name = candidates[launched - 1][0]
+            wait_for = deadline - now
+            if launched < len(candidates):
+                wait_for = min(wait_for, self.hedge_delay(last_name))
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors[name] = str(e)[:200]
+                    continue
+                return self._live(key, name, result, started, hedged=launched > 1)
+
+            if not done and launched < len(candidates):
+                name, func = candidates[launched]
+                pending[self._executor.submit(self._run, name, func)] = name
+                launched += 1
+                with self._lock:
+                    self.stats['hedged'] += 1
+
+        for future, name in pending.items():
+            errors.setdefault(name, 'Zaman aşımı')
+        return self._degraded(key, errors, fallback, started)
+
+    def _live(self, key, name, result, started, hedged):
+        result = dict(result)
+        result['data_quality'] = 'LIVE'
+        result['routing'] = {
+            'source': name,
+            'latency_ms': round((time.monotonic() - started) * 1000, 1),
+            'hedged': hedged
+        }
+        with self._lock:
+            self.stats['live'] += 1
+            self.last_good[key] = (result, time.time())
+            self.last_good.move_to_end(key)
+            while len(self.last_good) > self.max_cached:
+                self.last_good.popitem(last=False)
+        return result
+
+    def _degraded(self, key, errors, fallback, started):
+        routing = {'errors': errors, 'latency_ms': round((time.monotonic() - started) * 1000, 1)}
+        with self._lock:
+            cached = self.last_good.get(key)
+        if cached:
+            result, stored_at = cached
+            result = dict(result)
+            result['data_quality'] = 'STALE'
+            result['routing'] = dict(routing, source=result['routing']['source'], age_seconds=round(time.time() - stored_at, 1))
+            with self._lock:
+                self.stats['stale'] += 1
+            return result
+        if fallback is not None:
+            result = dict(fallback())
+            result['data_quality'] = 'MOCK'
+            result['routing'] = dict(routing, source='mock')
+            with self._lock:
+                self.stats['mock'] += 1
+            return result
+        with self._lock:
+            self.stats['failed'] += 1
+        return {'success': False, 'error': 'Tüm veri kaynakları başarısız', 'data_quality': 'UNAVAILABLE', 'routing': routing}
+
+    def get_stats(self):
+        with self._lock:
+            sources = {
+                name: dict(
+                    self.source_stats[name],
+                    state=breaker.state,
+                    p95_ms=round(self.hedge_delay(name) * 1000, 1) if len(self.latencies[name]) >= 5 else None
+                )
+                for name, breaker in self.breakers.items()
+            }
+            return dict(self.stats, cached_keys=len(self.last_good), sources=sources)
+
+
+source_router = SourceRouter()
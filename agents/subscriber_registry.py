@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class SubscriberRegistry:
+    """İndeksli ve kalıcı abone kaydı
+
+    Aboneler id ile tutulur; e-posta ve telegram id'den aboneye, sembolden
+    abone id kümesine indeksler kayıt/güncelleme/silme sırasında güncellenir.
+    Böylece abonelik O(1), bir broadcast ise sadece ilgili abonelere dokunur.
+    Değişiklikler JSON satırları olarak dosyaya eklenir (upsert/delete);
+    açılışta yeniden oynatılır ve dosya gereğinden büyükse sıkıştırılır.
+    """
+
+    def __init__(self, path=os.path.join('data', 'subscribers.jsonl')):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.by_id = {}
+        self.email_index = {}  # e-posta -> id
+        self.telegram_index = {}  # telegram id -> id
+        self.symbol_index = {}  # sembol -> {id}
+        self.next_id = 1
+        self._log_lines = 0
+
+        self._load()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    # Kalıcılık
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # yarım kalmış satır
+                self._log_lines += 1
+                if entry.get('op') == 'delete':
+                    self._unindex(self.by_id.pop(entry['id'], None))
+                else:
+                    subscriber = entry['subscriber']
+                    self._unindex(self.by_id.get(subscriber['id']))
+                    self._index(subscriber)
+                    self.next_id = max(self.next_id, subscriber['id'] + 1)
+
+        if self._log_lines > 2 * len(self.by_id) + 100:
+            self.compact()
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._log_lines += 1
+
+    def compact(self):
+        """Dosyayı sadece güncel abonelerle yeniden yaz"""
+        with self._lock:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as temp_file:
+                for subscriber in self.by_id.values():
+                    temp_file.write(json.dumps({'op': 'upsert', 'subscriber': subscriber}, ensure_ascii=False) + '\n')
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+
+            reopen = hasattr(self, '_file')
+            if reopen:
+                self._file.close()
+            os.replace(temp_path, self.path)
+            if reopen:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._log_lines = len(self.by_id)
+
+    def close(self):
+        self._file.close()
+
+    # İndeksler
+    def _index(self, subscriber):
+        subscriber_id = subscriber['id']
+        self.by_id[subscriber_id] = subscriber
+        if subscriber.get('email'):
+            self.email_index[subscriber['email']] = subscriber_id
+        if subscriber.get('telegram_id'):
+            self.telegram_index[str(subscriber['telegram_id'])] = subscriber_id
+        for symbol in subscriber.get('preferences', {}).get('symbols', []):
+            self.symbol_index.setdefault(symbol, set()).add(subscriber_id)
+
+    def _unindex(self, subscriber):
+        if subscriber is None:
+            return
+        subscriber_id = subscriber['id']
+        if self.email_index.get(subscriber.get('email')) == subscriber_id:
+            del self.email_index[subscriber['email']]
+        if self.telegram_index.get(str(subscriber.get('telegram_id'))) == subscriber_id:
+            del self.telegram_index[str(subscriber['telegram_id'])]
+        for symbol in subscriber.get('preferences', {}).get('symbols', []):
+            ids = self.symbol_index.get(symbol)
+            if ids:
+                ids.discard(subscriber_id)
+                if not ids:
+                    del self.symbol_index[symbol]
+
+    # İşlemler
+    def find(self, email=None, telegram_id=None):
+        subscriber_id = self.email_index.get(email) if email else None
+        if subscriber_id is None and telegram_id:
+            subscriber_id = self.telegram_index.get(str(telegram_id))
+        return self.by_id.get(subscriber_id) if subscriber_id is not None else None
+
+    def subscribe(self, user_data):
+        """Yeni abone ekle veya mevcut aboneyi güncelle; (abone, yeni_mi) döndürür
+
+        E-posta veya telegram id başka bir aboneye aitse ValueError fırlatır.
+        """
+        with self._lock:
+            existing = self.find(user_data.get('email'), user_data.get('telegram_id'))
+            existing_id = existing['id'] if existing else None
+            email_owner = self.email_index.get(user_data.get('email'))
+            if email_owner is not None and email_owner != existing_id:
+                raise ValueError(f"E-posta başka bir aboneye kayıtlı: {user_data['email']}")
+            telegram_owner = self.telegram_index.get(str(user_data.get('telegram_id')))
+            if user_data.get('telegram_id') and telegram_owner is not None and telegram_owner != existing_id:
+                raise ValueError(f"Telegram id başka bir aboneye kayıtlı: {user_data['telegram_id']}")
+
+            if existing:
+                self._unindex(existing)
+                subscriber = dict(existing, **user_data)
+                subscriber['id'] = existing['id']
+                subscriber['updated_at'] = datetime.now().isoformat()
+            else:
+                subscriber = dict(user_data)
+                subscriber['id'] = self.next_id
+                subscriber['subscribed_at'] = datetime.now().isoformat()
+                self.next_id += 1
+
+            self._index(subscriber)
+            self._append({'op': 'upsert', 'subscriber': subscriber})
+            return subscriber, existing is None
+
+    def unsubscribe(self, email=None, telegram_id=None, subscriber_id=None):
+        with self._lock:
+            subscriber = self.by_id.get(subscriber_id) if subscriber_id is not None else self.find(email, telegram_id)
+            if subscriber is None:
+                return None
+            self._unindex(subscriber)
+            del self.by_id[subscriber['id']]
+            self._append({'op': 'delete', 'id': subscriber['id']})
+            return subscriber
+
+    def subscribers_for_symbol(self, symbol):
+        """Sembolü takip eden aboneler"""
+        with self._lock:
+            return [self.by_id[subscriber_id] for subscriber_id in self.symbol_index.get(symbol, ())]
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(list(self.by_id.values()))
+
+    def __bool__(self):
+        return bool(self.by_id)
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class TradeLedger:
+    """Ekleme-yalnız, kalıcı işlem defteri
+
+    Kayıtlar JSON satırları olarak dosyaya eklenir. Tek bir yazıcı thread'i
+    bekleyen kayıtları toplu yazar ve parti başına tek fsync yapar (group
+    commit). Açılışta dosya yeniden oynatılır; yarım kalmış son satır
+    (çökme sırasında kesilmiş yazma) atılır. Hacim, komisyon ve kayma
+    toplamları artımlı tutulur, böylece performans sorguları O(1) olur.
+    Bellekte sadece son recent_limit kayıt (records) tutulur; tüm geçmiş
+    iter_records ile dosyadan okunur.
+    """
+
+    def __init__(self, path=os.path.join('data', 'trade_ledger.jsonl'), commit_delay=0.002, recent_limit=10000):
+        self.path = path
+        self.commit_delay = commit_delay  # Partiye daha fazla kayıt toplamak için bekleme
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.records = deque(maxlen=recent_limit)  # son kayıtlar; eskileri için iter_records
+        self.sequence = 0
+        self.stats = {
+            'total_trades': 0,
+            'total_volume': 0.0,
+            'total_commission': 0.0,
+            'slippage_sum': 0.0
+        }
+        self._recover()
+
+        self._lock = threading.Lock()
+        self._commit_cond = threading.Condition(self._lock)
+        self._pending = []
+        self._written_count = 0  # Bu oturumda yazılan satır sayısı
+        self._durable_count = 0  # Bu oturumda fsync edilen satır sayısı
+        self._closed = False
+
+        self._file = open(path, 'ab')
+        self._writer = threading.Thread(target=self._writer_loop, name="TradeLedgerWriter", daemon=True)
+        self._writer.start()
+
+    def _recover(self):
+        """Defteri diskten yeniden oynat, yarım yazılmış kuyruğu kes"""
+        if not os.path.exists(self.path):
+            return
+
+        good_offset = 0
+        with open(self.path, 'rb') as ledger_file:
+            for line in ledger_file:
+                record = self._parse_line(line)
+                if record is None:
+                    break
+                good_offset += len(line)
+                self.sequence = max(self.sequence, record.get('sequence', 0))
+                self.records.append(record)
+                self._update_stats(record)
+
+        if good_offset < os.path.getsize(self.path):
+            print(f"İşlem defteri kurtarıldı: {os.path.getsize(self.path) - good_offset} byte yarım kayıt atıldı")
+            with open(self.path, 'r+b') as ledger_file:
+                ledger_file.truncate(good_offset)
+
+    @staticmethod
+    def _parse_line(line):
+        """Tam yazılmış satır -> kayıt; yarım veya bozuk satırda None"""
+        if not line.endswith(b'\n'):
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        record['execution_time'] = datetime.fromisoformat(record['execution_time'])
+        return record
+
+    def iter_records(self):
+        """Tüm kayıtlar (eskiden yeniye) dosyadan akış halinde; bekleyenler önce yazılır"""
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as ledger_file:
+            for line in ledger_file:
+                record = self._parse_line(line)
+                if record is None:
+                    return
+                yield record
+
+    def _update_stats(self, record):
+        self.stats['total_trades'] += 1
+        self.stats['total_volume'] += record['total_value']
+        self.stats['total_commission'] += record['commission']
+        self.stats['slippage_sum'] += record['slippage']
+
+    def next_trade_id(self, now=None):
+        """Monoton artan ve tekil işlem numarası"""
+        now = now or datetime.now()
+        with self._lock:
+            self.sequence += 1
+            sequence = self.sequence
+        return f"TRD_{now.strftime('%Y%m%d_%H%M%S')}_{sequence:08d}", sequence
+
+    def append(self, record, wait=True):
+        return self.append_many([record], wait)
+
+    def append_many(self, records, wait=True):
+        """Kayıtları deftere ekle; wait=True ise diske kalıcı yazılana kadar bekle"""
+        lines = []
+        for record in records:
+            if 'sequence' not in record:
+                _, record['sequence'] = self.next_trade_id()
+            serializable = dict(record, execution_time=record['execution_time'].isoformat())
+            lines.append((json.dumps(serializable, ensure_ascii=False) + '\n').encode('utf-8'))
+
+        with self._commit_cond:
+            if self._closed:
+                raise RuntimeError("İşlem defteri kapalı")
+            for record, line in zip(records, lines):
+                self.records.append(record)
+                self._update_stats(record)
+                self._pending.append(line)
+            target_count = self._written_count + len(self._pending)
+            self._commit_cond.notify_all()
+
+            if wait:
+                while self._durable_count < target_count and not self._closed:
+                    self._commit_cond.wait()
+        return target_count
+
+    def _writer_loop(self):
+        while True:
+            with self._commit_cond:
+                while not self._pending and not self._closed:
+                    self._commit_cond.wait()
+                if self._closed and not self._pending:
+                    return
+
+            # Aynı fsync'e daha fazla kayıt binsin
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+
+            with self._commit_cond:
+                batch = self._pending
+                self._pending = []
+                self._written_count += len(batch)
+                batch_count = self._written_count
+
+            self._file.write(b''.join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            with self._commit_cond:
+                self._durable_count = batch_count
+                self._commit_cond.notify_all()
+
+    def wait_durable(self, target_count):
+        """append(wait=False) dönüşündeki sayıya kadar kayıtlar kalıcı olana kadar bekle"""
+        with self._commit_cond:
+            while self._durable_count < target_count and not self._closed:
+                self._commit_cond.wait()
+
+    def flush(self):
+        """Bekleyen tüm kayıtlar kalıcı olana kadar bekle"""
+        with self._commit_cond:
+            target_count = self._written_count + len(self._pending)
+        self.wait_durable(target_count)
+
+    def close(self):
+        self.flush()
+        with self._commit_cond:
+            self._closed = True
+            self._commit_cond.notify_all()
+        self._writer.join(timeout=5)
+        self._file.close()
+
+    def get_stats(self):
+        """Artımlı toplamlar (O(1))"""
+        total_trades = self.stats['total_trades']
+        return {
+            'total_trades': total_trades,
+            'total_volume': self.stats['total_volume'],
+            'total_commission': self.stats['total_commission'],
+            'avg_slippage': self.stats['slippage_sum'] / total_trades if total_trades else 0.0
+        }
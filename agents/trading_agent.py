@@ -1,17 +1,45 @@
 import numpy as np
 from datetime import datetime, timedelta
+import threading
 import time
 from base_agent import BaseAgent
+from trade_ledger import TradeLedger
+from order_book import MatchingEngine, DEFAULT_DAILY_VOLUME
+from execution_scheduler import (ExecutionScheduler, cap_schedule, session_window, twap_schedule, vwap_schedule,
+                                 pov_schedule)
+from trigger_engine import TriggerEngine
+from price_bus import normalize_symbol, price_bus as default_price_bus
 
 class TradingAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, ledger_path=None, price_bus=None):
         super().__init__(
             name="TradingAgent",
             agent_type="trading_executor",
             capabilities=["order_management", "execution_strategy", "position_tracking", "trade_optimization"]
         )
         self.active_positions = {}
-        self.trade_history = []
+        self._execution_lock = threading.RLock()  # alt emirler zamanlayıcının thread havuzunda çalışır
+        
+        # Stop-loss / take-profit tetikleri; fiyat kanalındaki her tick ile değerlendirilir
+        self.trigger_engine = TriggerEngine(on_fire=self.handle_fired_triggers)
+        self.fired_triggers = []
+        self.notifier = None  # tetiklenen emirler için bildirim callback'i
+        
+        # Kalıcı işlem defteri: açılışta geçmiş ve pozisyonlar yeniden kurulur
+        self.trade_ledger = TradeLedger(ledger_path) if ledger_path else TradeLedger()
+        self.trade_history = self.trade_ledger.records  # son işlemler (sınırlı pencere)
+        for trade_record in self.trade_ledger.iter_records():
+            self.update_position_tracking(trade_record)
+        self.rearm_open_triggers()
+        
+        self.price_bus = price_bus or default_price_bus
+        self.price_bus.subscribe(self.trigger_engine.on_quotes)
+        
+        # Sentetik derinlikli emir defteri simülatörü
+        self.matching_engine = MatchingEngine()
+        
+        # Ana emirleri alt emirlere bölerek yürüten zamanlayıcı (ilk kullanımda başlar)
+        self.execution_scheduler = None
         self.execution_parameters = {
             'slippage_tolerance': 0.1,  # %0.1
             'max_order_size': 1000000,  # 1M TL
@@ -19,7 +47,8 @@ class TradingAgent(BaseAgent):
         }
         
     def can_handle_task(self, task):
-        trading_tasks = ['execute_trade', 'manage_position', 'calculate_trade_size', 'optimize_execution']
+        trading_tasks = ['execute_trade', 'manage_position', 'calculate_trade_size', 'optimize_execution',
+                         'execution_status']
         return task.get('type') in trading_tasks
     
     def process_task(self, task):
@@ -37,6 +66,8 @@ class TradingAgent(BaseAgent):
                 result = self.calculate_optimal_trade_size(task.get('decision_data'))
             elif task_type == 'optimize_execution':
                 result = self.optimize_trade_execution(task.get('order_params'))
+            elif task_type == 'execution_status':
+                result = self.get_execution_status(task.get('parent_id'))
             else:
                 result = {"error": "Desteklenmeyen görev tipi"}
             
@@ -64,6 +95,9 @@ class TradingAgent(BaseAgent):
                 'take_profit': 107.10
             }
         
+        # Pozisyon, tetik ve defter anahtarları fiyat kanalıyla aynı biçimde ('THYAO')
+        trade_params = dict(trade_params, symbol=normalize_symbol(trade_params['symbol']))
+        
         # Pre-execution checks
         execution_checks = self.pre_execution_validation(trade_params)
         if not execution_checks['valid']:
@@ -73,42 +107,62 @@ class TradingAgent(BaseAgent):
                 "trade_id": None
             }
         
-        # Calculate execution details
-        execution_details = self.calculate_execution_details(trade_params)
-        
-        # Simulate order execution
-        trade_id = f"TRD_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        # Market impact and slippage simulation
-        executed_price = self.simulate_market_execution(
-            trade_params['price'], 
-            trade_params['quantity'],
-            trade_params['action']
-        )
-        
-        # Create trade record
-        trade_record = {
-            'trade_id': trade_id,
-            'symbol': trade_params['symbol'],
-            'action': trade_params['action'],
-            'quantity': trade_params['quantity'],
-            'requested_price': trade_params['price'],
-            'executed_price': executed_price,
-            'total_value': trade_params['quantity'] * executed_price,
-            'commission': execution_details['commission'],
-            'net_amount': execution_details['net_amount'],
-            'slippage': abs(executed_price - trade_params['price']) / trade_params['price'] * 100,
-            'execution_time': datetime.now(),
-            'stop_loss': trade_params.get('stop_loss'),
-            'take_profit': trade_params.get('take_profit'),
-            'status': 'EXECUTED'
-        }
-        
-        # Update positions
-        self.update_position_tracking(trade_record)
-        
-        # Add to history
-        self.trade_history.append(trade_record)
+        # Defter/pozisyon güncellemesi tek seferde; diske kalıcı yazma kilit dışında beklenir
+        with self._execution_lock:
+            # Market impact and slippage simulation
+            if trade_params.get('avg_daily_volume'):
+                self.matching_engine.set_daily_volume(trade_params['symbol'], trade_params['avg_daily_volume'])
+            executed_price, filled_quantity = self.simulate_market_execution(
+                trade_params['price'], 
+                trade_params['quantity'],
+                trade_params['action'],
+                trade_params['symbol']
+            )
+            if not filled_quantity:
+                return {
+                    "success": False,
+                    "error": "Emir defterinde yeterli likidite yok",
+                    "trade_id": None
+                }
+            
+            # Sadece gerçekleşen miktar deftere yazılır; kalanı iptal olur
+            requested_quantity = trade_params['quantity']
+            execution_details = self.calculate_execution_details(dict(trade_params, quantity=filled_quantity))
+            trade_id, sequence = self.trade_ledger.next_trade_id()
+            
+            # Create trade record
+            trade_record = {
+                'trade_id': trade_id,
+                'sequence': sequence,
+                'symbol': trade_params['symbol'],
+                'action': trade_params['action'],
+                'quantity': filled_quantity,
+                'requested_quantity': requested_quantity,
+                'requested_price': trade_params['price'],
+                'executed_price': executed_price,
+                'total_value': filled_quantity * executed_price,
+                'commission': execution_details['commission'],
+                'net_amount': execution_details['net_amount'],
+                'slippage': abs(executed_price - trade_params['price']) / trade_params['price'] * 100,
+                'execution_time': datetime.now(),
+                'stop_loss': trade_params.get('stop_loss'),
+                'take_profit': trade_params.get('take_profit'),
+                'closes_trade_id': trade_params.get('closes_trade_id'),
+                'status': 'EXECUTED' if filled_quantity == requested_quantity else 'PARTIAL'
+            }
+            
+            # Update positions
+            self.update_position_tracking(trade_record)
+            
+            # Deftere yaz (group commit)
+            durable_count = self.trade_ledger.append(trade_record, wait=False)
+            
+            # Alış emrinin stop/kâr al seviyelerini kur
+            if trade_record['action'] == 'BUY':
+                self.trigger_engine.arm(trade_record['symbol'], trade_record['quantity'],
+                                        trade_record['stop_loss'], trade_record['take_profit'], trade_id)
+            
+        self.trade_ledger.wait_durable(durable_count)
         
         return {
             "success": True,
@@ -117,6 +171,8 @@ class TradingAgent(BaseAgent):
                 "symbol": trade_record['symbol'],
                 "action": trade_record['action'],
                 "quantity": trade_record['quantity'],
+                "requested_quantity": requested_quantity,
+                "status": trade_record['status'],
                 "executed_price": round(executed_price, 2),
                 "total_cost": round(trade_record['total_value'], 2),
                 "commission": round(execution_details['commission'], 2),
@@ -175,8 +231,16 @@ class TradingAgent(BaseAgent):
             'net_amount': net_amount
         }
     
-    def simulate_market_execution(self, requested_price, quantity, action):
-        """Piyasa etkisi ve kayma simülasyonu"""
+    def simulate_market_execution(self, requested_price, quantity, action, symbol=None):
+        """Piyasa etkisi ve kayma simülasyonu -> (ortalama fiyat, gerçekleşen miktar)"""
+        if symbol:
+            # Emir defterinde fiyat-zaman önceliğiyle gerçekleştir
+            execution = self.matching_engine.execute_market(symbol, action, quantity, requested_price)
+            if not execution['filled']:
+                return None, 0
+            return max(execution['avg_price'], 0.01), execution['filled']
+        
+        # Sembol yoksa basit etki formülü
         # Market impact based on order size
         market_impact_factor = min(quantity / 10000, 0.005)  # Max %0.5 impact
         
@@ -190,11 +254,11 @@ class TradingAgent(BaseAgent):
             total_impact = -(market_impact_factor + abs(random_slippage))
         
         executed_price = requested_price * (1 + total_impact)
-        return max(executed_price, 0.01)  # Minimum 1 kuruş
+        return max(executed_price, 0.01), quantity  # Minimum 1 kuruş
     
     def update_position_tracking(self, trade_record):
         """Pozisyon takibini güncelle"""
-        symbol = trade_record['symbol']
+        symbol = normalize_symbol(trade_record['symbol'])
         
         if symbol not in self.active_positions:
             self.active_positions[symbol] = {
@@ -226,14 +290,19 @@ class TradingAgent(BaseAgent):
             if position['quantity'] <= 0:
                 # Position closed
                 del self.active_positions[symbol]
+                for trigger in self.trigger_engine.armed_for(symbol):
+                    self.trigger_engine.disarm(trigger['trigger_id'])
     
     def get_position_summary(self, symbol):
         """Pozisyon özetini al"""
+        symbol = normalize_symbol(symbol)
         if symbol not in self.active_positions:
             return {"status": "No position"}
         
         position = self.active_positions[symbol]
-        current_price = np.random.uniform(80, 120)  # Mock current price
+        
+        # Fiyat kanalındaki son kotasyon; yoksa ortalama maliyet
+        current_price = self.price_bus.last_price(symbol) or position['avg_cost']
         
         current_value = position['quantity'] * current_price
         unrealized_pnl = current_value - position['total_cost']
@@ -250,6 +319,73 @@ class TradingAgent(BaseAgent):
             "holding_period_days": (datetime.now() - position['first_purchase']).days if position['first_purchase'] else 0
         }
     
+    def rearm_open_triggers(self):
+        """Defterden kurtarılan açık pozisyonların tetiklerini yeniden kur
+
+        Her alışın kalan miktarı = alış miktarı - onu kapatan (closes_trade_id)
+        satışların toplamı; kısmi çıkışlardan sonra kalan kısım için kurulur.
+        """
+        buys, closed_quantity = {}, {}
+        for record in self.trade_ledger.iter_records():
+            if record['action'] == 'BUY' and (record.get('stop_loss') or record.get('take_profit')):
+                buys[record['trade_id']] = record
+            elif record['action'] == 'SELL' and record.get('closes_trade_id'):
+                closed_quantity[record['closes_trade_id']] = \
+                    closed_quantity.get(record['closes_trade_id'], 0) + record['quantity']
+        
+        for trade_id, record in buys.items():
+            remaining = record['quantity'] - closed_quantity.get(trade_id, 0)
+            if remaining > 0 and normalize_symbol(record['symbol']) in self.active_positions:
+                self.trigger_engine.arm(record['symbol'], remaining,
+                                        record.get('stop_loss'), record.get('take_profit'), trade_id)
+    
+    def handle_fired_triggers(self, fired):
+        """Tetiklenen stop/kâr al seviyeleri için satış emri ver ve bildir
+
+        Satış gerçekleşmezse tetik aynı seviyelerle yeniden kurulur (sonraki
+        tick'te tekrar denenir); kısmi satışta kalan miktar için kurulur.
+        """
+        for trigger in fired:
+            position = self.active_positions.get(trigger['symbol'])
+            if not position:
+                continue
+            
+            quantity = min(trigger['quantity'], position['quantity'])
+            result = self.execute_trade_order({
+                'symbol': trigger['symbol'],
+                'action': 'SELL',
+                'quantity': quantity,
+                'price': trigger['trigger_price'],
+                'order_type': 'MARKET',
+                'closes_trade_id': trigger['reference']
+            })
+            
+            sold = result['execution_summary']['quantity'] if result.get('success') else 0
+            rearmed_id = None
+            if sold < quantity and trigger['symbol'] in self.active_positions:
+                rearmed_id = self.trigger_engine.arm(trigger['symbol'], quantity - sold, trigger['stop_loss'],
+                                                     trigger['take_profit'], trigger['reference'])
+            
+            event = {
+                'trigger_id': trigger['trigger_id'],
+                'symbol': trigger['symbol'],
+                'trigger_type': trigger['trigger_type'],
+                'level': trigger['stop_loss'] if trigger['trigger_type'] == 'STOP_LOSS' else trigger['take_profit'],
+                'trigger_price': trigger['trigger_price'],
+                'fired_at': trigger['fired_at'].isoformat(),
+                'order_success': result.get('success', False),
+                'trade_id': result.get('trade_id'),
+                'error': result.get('error'),
+                'rearmed_trigger_id': rearmed_id
+            }
+            self.fired_triggers.append(event)
+            
+            if self.notifier:
+                try:
+                    self.notifier(event)
+                except Exception as e:
+                    print(f"Tetik bildirimi hatası: {e}")
+    
     def suggest_next_actions(self, trade_record):
         """Sonraki eylem önerileri"""
         suggestions = []
@@ -340,15 +476,116 @@ class TradingAgent(BaseAgent):
             }
         }
     
+    def optimize_trade_execution(self, order_params):
+        """Büyük emri TWAP/VWAP/POV ile alt emirlere bölüp zamanla"""
+        if not order_params:
+            # Mock parent order
+            order_params = {
+                'symbol': 'THYAO',
+                'action': 'BUY',
+                'quantity': 20000,
+                'price': 91.50,
+                'strategy': 'VWAP',
+                'duration_minutes': 60
+            }
+        
+        order_params = dict(order_params, symbol=normalize_symbol(order_params['symbol']))
+        strategy = order_params.get('strategy', 'TWAP').upper()
+        quantity = int(order_params['quantity'])
+        price = order_params['price']
+        duration = order_params.get('duration_minutes', 60)
+        daily_volume = order_params.get('avg_daily_volume') or \
+            self.matching_engine.daily_volumes.get(order_params['symbol'], DEFAULT_DAILY_VOLUME)
+        
+        if quantity <= 0 or price <= 0:
+            return {"error": "Geçersiz miktar veya fiyat"}
+        
+        # Her alt emir tek emir limitinin altında kalmalı
+        max_child = int(self.execution_parameters['max_order_size'] // price)
+        if max_child < 1:
+            return {"error": "Tek lot bile emir büyüklüğü limitini aşıyor"}
+        min_slices = int(np.ceil(quantity / max_child))
+        slices = max(order_params.get('slices', 12), min_slices)
+        
+        now = datetime.now()
+        if strategy in ('TWAP', 'VWAP'):
+            # Seans dışında açılışa ertelenir, kapanışı aşan süre kısaltılır
+            interval = session_window(now, duration)[1] / slices
+            schedule_fn = twap_schedule if strategy == 'TWAP' else vwap_schedule
+            schedule = schedule_fn(quantity, duration, slices, start=now)
+        elif strategy == 'POV':
+            interval_minutes = order_params.get('interval_minutes', 5)
+            interval = interval_minutes * 60
+            schedule = pov_schedule(quantity, daily_volume, order_params.get('participation_rate', 0.1),
+                                    interval_minutes, start=now)
+            if not schedule:
+                return {"error": "Katılım oranıyla planlanabilecek miktar yok"}
+        else:
+            return {"error": f"Desteklenmeyen strateji: {strategy}"}
+        
+        # Profil yoğun dilimlerde limiti aşan alt emirler aralığa yayılarak bölünür
+        schedule = cap_schedule(schedule, max_child, interval)
+        scheduled_quantity = sum(child_quantity for _, child_quantity in schedule)
+        
+        # Emir defterinden kayma tahmini: tek seferde vs dilimli
+        self.matching_engine.set_daily_volume(order_params['symbol'], daily_volume)
+        single_shot = self.estimate_slippage(order_params['symbol'], order_params['action'], quantity, price)
+        largest_child = max(child_quantity for _, child_quantity in schedule)
+        per_child = self.estimate_slippage(order_params['symbol'], order_params['action'], largest_child, price)
+        
+        result = {
+            "success": True,
+            "strategy": strategy,
+            "child_orders": len(schedule),
+            "scheduled_quantity": scheduled_quantity,
+            "unscheduled_quantity": quantity - scheduled_quantity,  # POV: süre içinde katılım oranını aşacak kısım
+            "schedule": [
+                {"offset_minutes": round(offset / 60, 1), "quantity": child_quantity}
+                for offset, child_quantity in schedule
+            ],
+            "slippage_estimate": {
+                "single_order_pct": round(single_shot['slippage_pct'], 3) if single_shot['slippage_pct'] is not None else None,
+                "max_child_order_pct": round(per_child['slippage_pct'], 3) if per_child['slippage_pct'] is not None else None
+            }
+        }
+        
+        # Sadece plan döner; alt emirler açıkça execute=True ile gönderilir
+        if order_params.get('execute', False):
+            parent_params = {key: value for key, value in order_params.items()
+                             if key not in ('strategy', 'duration_minutes', 'slices', 'participation_rate',
+                                            'interval_minutes', 'execute')}
+            parent_params['quantity'] = scheduled_quantity
+            result['parent_order_id'] = self.get_execution_scheduler().submit(parent_params, schedule, strategy)
+        
+        return result
+    
+    def get_execution_scheduler(self):
+        if self.execution_scheduler is None:
+            self.execution_scheduler = ExecutionScheduler(self.execute_trade_order)
+        return self.execution_scheduler
+    
+    def get_execution_status(self, parent_id):
+        """Ana emrin yürütme durumu"""
+        status = self.execution_scheduler.get_status(parent_id) if self.execution_scheduler else None
+        if status is None:
+            return {"error": f"Ana emir bulunamadı: {parent_id}"}
+        return status
+    
+    def estimate_slippage(self, symbol, action, quantity, reference_price):
+        """Emir defterinden tahmini kayma (defteri değiştirmeden)"""
+        return self.matching_engine.estimate_slippage(symbol, action, quantity, reference_price)
+    
     def get_trading_performance(self):
         """İşlem performansını hesapla"""
-        if not self.trade_history:
+        stats = self.trade_ledger.get_stats()
+        if not stats['total_trades']:
             return {"message": "Henüz işlem yapılmamış"}
         
-        total_trades = len(self.trade_history)
-        total_value = sum(trade['total_value'] for trade in self.trade_history)
-        total_commission = sum(trade['commission'] for trade in self.trade_history)
-        avg_slippage = np.mean([trade['slippage'] for trade in self.trade_history])
+        # Defterin artımlı toplamları (O(1))
+        total_trades = stats['total_trades']
+        total_value = stats['total_volume']
+        total_commission = stats['total_commission']
+        avg_slippage = stats['avg_slippage']
         
         return {
             "trading_stats": {
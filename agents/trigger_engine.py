@@ -0,0 +1,131 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+from price_bus import normalize_symbol
+
+
+class TriggerEngine:
+    """Stop-loss / take-profit tetik motoru
+
+    Her sembol için iki heap tutulur: stop seviyeleri max-heap (fiyat
+    seviyenin altına inince), kâr al seviyeleri min-heap (fiyat seviyenin
+    üstüne çıkınca). Bir tick sadece geçilen seviyeleri heap'in tepesinden
+    çeker: O(log n + k). Stop ve kâr al aynı tetiğin iki bacağıdır (OCO);
+    biri çalışınca diğeri tembel olarak (lazy deletion) atılır.
+    """
+
+    def __init__(self, on_fire=None):
+        self.on_fire = on_fire  # tetiklenen liste ile çağrılır
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.triggers = {}  # trigger_id -> tetik bilgisi
+        self.stop_heaps = {}  # sembol -> [(-stop, trigger_id)]
+        self.target_heaps = {}  # sembol -> [(take_profit, trigger_id)]
+        self.symbol_triggers = {}  # sembol -> {trigger_id} (aktif tetik indeksi)
+        self.last_prices = {}
+
+    def arm(self, symbol, quantity, stop_loss=None, take_profit=None, reference=None):
+        """Pozisyon için stop/kâr al seviyelerini kur"""
+        if not stop_loss and not take_profit:
+            return None
+
+        symbol = normalize_symbol(symbol)
+        with self._lock:
+            trigger_id = next(self._ids)
+            self.triggers[trigger_id] = {
+                'trigger_id': trigger_id,
+                'symbol': symbol,
+                'quantity': quantity,
+                'stop_loss': stop_loss,
+                'take_profit': take_profit,
+                'reference': reference,
+                'armed_at': datetime.now()
+            }
+            if stop_loss:
+                heapq.heappush(self.stop_heaps.setdefault(symbol, []), (-stop_loss, trigger_id))
+            if take_profit:
+                heapq.heappush(self.target_heaps.setdefault(symbol, []), (take_profit, trigger_id))
+            self.symbol_triggers.setdefault(symbol, set()).add(trigger_id)
+        return trigger_id
+
+    def disarm(self, trigger_id):
+        with self._lock:
+            trigger = self.triggers.pop(trigger_id, None)
+            if trigger is None:
+                return False
+            self._unindex(trigger)
+            self._maybe_compact(trigger['symbol'])
+        return True
+
+    def _unindex(self, trigger):
+        armed = self.symbol_triggers.get(trigger['symbol'])
+        if armed is not None:
+            armed.discard(trigger['trigger_id'])
+            if not armed:
+                del self.symbol_triggers[trigger['symbol']]
+
+    def _maybe_compact(self, symbol):
+        """Silinmiş kayıtlar birikirse heap'leri yeniden kur; aktif tetik kalmadıysa heap'leri bırak"""
+        armed = len(self.symbol_triggers.get(symbol, ()))
+        for heaps in (self.stop_heaps, self.target_heaps):
+            if not armed:
+                heaps.pop(symbol, None)
+                continue
+            heap = heaps.get(symbol)
+            if heap and len(heap) > 2 * armed + 64:
+                heap[:] = [entry for entry in heap if entry[1] in self.triggers]
+                heapq.heapify(heap)
+
+    def on_price(self, symbol, price):
+        """Tek sembol fiyatını değerlendir; tetiklenenleri döndür"""
+        symbol = normalize_symbol(symbol)
+        fired = []
+        with self._lock:
+            self.last_prices[symbol] = price
+
+            stops = self.stop_heaps.get(symbol)
+            while stops and -stops[0][0] >= price:
+                _, trigger_id = heapq.heappop(stops)
+                self._fire(trigger_id, 'STOP_LOSS', price, fired)
+
+            targets = self.target_heaps.get(symbol)
+            while targets and targets[0][0] <= price:
+                _, trigger_id = heapq.heappop(targets)
+                self._fire(trigger_id, 'TAKE_PROFIT', price, fired)
+
+            if fired:
+                # Çalışan tetiklerin diğer bacakları heap'te ölü kayıt olarak kalır
+                self._maybe_compact(symbol)
+        return fired
+
+    def _fire(self, trigger_id, trigger_type, price, fired):
+        trigger = self.triggers.pop(trigger_id, None)
+        if trigger is None:  # iptal edilmiş veya diğer bacak çalışmış
+            return
+        self._unindex(trigger)
+        fired.append(dict(trigger, trigger_type=trigger_type, trigger_price=price, fired_at=datetime.now()))
+
+    def on_quotes(self, quotes):
+        """Fiyat kanalı aboneliği: {sembol: fiyat}"""
+        fired = []
+        for symbol, price in quotes.items():
+            fired.extend(self.on_price(symbol, price))
+        if fired and self.on_fire:
+            self.on_fire(fired)
+        return fired
+
+    def last_price(self, symbol):
+        return self.last_prices.get(normalize_symbol(symbol))
+
+    def armed_for(self, symbol):
+        """Sembolün aktif tetikleri (sembol indeksinden, O(k))"""
+        with self._lock:
+            return [self.triggers[trigger_id] for trigger_id in sorted(self.symbol_triggers.get(normalize_symbol(symbol), ()))]
+
+    def get_stats(self):
+        return {
+            'armed_triggers': len(self.triggers),
+            'symbols': len(self.symbol_triggers)
+        }
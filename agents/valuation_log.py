@@ -0,0 +1,192 @@
+import numpy as np
+import time
+from datetime import date
+
+
+class ValuationSeries:
+    """Tek kullanıcının ekleme-yalnız değerleme serisi
+
+    Günlük noktalar takvim günü başına yoğun dizilerde tutulur (gün sonu
+    değeri, kümülatif nakit akışı, kümülatif TWR endeksi); böylece herhangi
+    bir günün kapanışı indeks aritmetiğiyle O(1) bulunur. Gün içi noktalar
+    sabit kapasiteli halka tamponda tutulur.
+    """
+
+    def __init__(self, max_days=3650, intraday_capacity=512):
+        self.max_days = max_days
+        self.day0 = None  # ilk günün ordinal değeri
+        self.n_days = 0
+        self.close = np.zeros(64)
+        self.cum_flow = np.zeros(64)
+        self.twr_index = np.ones(64)
+
+        # Son kayıt durumu
+        self.last_value = 0.0
+        self.last_cum_flow = 0.0
+        self.last_twr = 1.0
+
+        # Gün içi halka tampon
+        self.intraday_ts = np.zeros(intraday_capacity)
+        self.intraday_value = np.zeros(intraday_capacity)
+        self.intraday_head = 0
+        self.intraday_count = 0
+
+    def record(self, value, flow=0.0, ts=None):
+        """Değerleme kaydı ekle; flow bu kayıttan hemen önceki net nakit girişi"""
+        ts = ts or time.time()
+        day = date.fromtimestamp(ts).toordinal()
+
+        # Zaman ağırlıklı getiri: akış öncesi değer / önceki değer
+        if self.last_value > 0:
+            self.last_twr *= (value - flow) / self.last_value
+        self.last_value = value
+        self.last_cum_flow += flow
+
+        if self.day0 is None:
+            self.day0 = day
+            self.n_days = 1
+        else:
+            idx = day - self.day0
+            if idx >= self.n_days:
+                self._extend_to(idx)
+
+        idx = day - self.day0
+        if idx >= 0:
+            self.close[idx] = value
+            self.cum_flow[idx] = self.last_cum_flow
+            self.twr_index[idx] = self.last_twr
+
+        # Gün içi nokta
+        capacity = len(self.intraday_ts)
+        self.intraday_ts[self.intraday_head] = ts
+        self.intraday_value[self.intraday_head] = value
+        self.intraday_head = (self.intraday_head + 1) % capacity
+        self.intraday_count = min(self.intraday_count + 1, capacity)
+
+    def _extend_to(self, idx):
+        """Boş günleri önceki kapanışla doldurarak seriyi uzat"""
+        if idx >= len(self.close):
+            new_capacity = max(len(self.close) * 2, idx + 1)
+            for column in ('close', 'cum_flow', 'twr_index'):
+                old = getattr(self, column)
+                grown = np.zeros(new_capacity)
+                grown[:self.n_days] = old[:self.n_days]
+                setattr(self, column, grown)
+
+        last = self.n_days - 1
+        self.close[self.n_days:idx + 1] = self.close[last]
+        self.cum_flow[self.n_days:idx + 1] = self.cum_flow[last]
+        self.twr_index[self.n_days:idx + 1] = self.twr_index[last]
+        self.n_days = idx + 1
+
+        # Sınırlı saklama: en eski günleri topluca at
+        if self.n_days > self.max_days:
+            drop = self.n_days - self.max_days
+            for column in ('close', 'cum_flow', 'twr_index'):
+                values = getattr(self, column)
+                values[:self.max_days] = values[drop:self.n_days]
+            self.day0 += drop
+            self.n_days = self.max_days
+
+    def compact_intraday(self, before_ts):
+        """Belirli zamandan eski gün içi noktaları at (günlük kapanışlar zaten tutuluyor)"""
+        ts, values = self.intraday_points()
+        keep = ts >= before_ts
+        ts, values = ts[keep], values[keep]
+
+        self.intraday_ts[:] = 0
+        self.intraday_value[:] = 0
+        self.intraday_ts[:len(ts)] = ts
+        self.intraday_value[:len(ts)] = values
+        self.intraday_count = len(ts)
+        self.intraday_head = len(ts) % len(self.intraday_ts)
+
+    def intraday_points(self):
+        """Gün içi noktalar (eskiden yeniye)"""
+        capacity = len(self.intraday_ts)
+        if self.intraday_count < capacity:
+            return self.intraday_ts[:self.intraday_count].copy(), self.intraday_value[:self.intraday_count].copy()
+        order = np.r_[self.intraday_head:capacity, 0:self.intraday_head]
+        return self.intraday_ts[order], self.intraday_value[order]
+
+    def _state_at_close(self, day):
+        """Günün kapanış durumu: (değer, kümülatif akış, TWR endeksi)"""
+        if self.day0 is None or day < self.day0:
+            return 0.0, 0.0, 1.0  # başlangıç öncesi
+        idx = min(day - self.day0, self.n_days - 1)
+        return self.close[idx], self.cum_flow[idx], self.twr_index[idx]
+
+    def window_stats(self, since_day, current_value=None):
+        """since_day kapanışından bugüne P&L ve zaman ağırlıklı getiri (O(1))"""
+        value_now = self.last_value if current_value is None else current_value
+        twr_now = self.last_twr
+        if current_value is not None and self.last_value > 0:
+            twr_now *= current_value / self.last_value
+
+        start_value, start_flow, start_twr = self._state_at_close(since_day)
+        pnl = (value_now - start_value) - (self.last_cum_flow - start_flow)
+        return {
+            'pnl': float(pnl),
+            'time_weighted_return_pct': float((twr_now / start_twr - 1) * 100) if start_twr > 0 else 0.0
+        }
+
+    def daily_history(self, days=30):
+        """Son günlerin kapanış değerleri"""
+        if self.day0 is None:
+            return []
+        start = max(0, self.n_days - days)
+        return [
+            {'date': date.fromordinal(self.day0 + i).isoformat(), 'value': float(self.close[i])}
+            for i in range(start, self.n_days)
+        ]
+
+
+class ValuationLog:
+    """Kullanıcı başına değerleme serilerinin kaydı"""
+
+    def __init__(self, max_days=3650, intraday_capacity=512, intraday_retention_days=2):
+        self.max_days = max_days
+        self.intraday_capacity = intraday_capacity
+        self.intraday_retention_days = intraday_retention_days
+        self.series = {}
+
+    def get_series(self, user_id, create=False):
+        series = self.series.get(user_id)
+        if series is None and create:
+            series = ValuationSeries(self.max_days, self.intraday_capacity)
+            self.series[user_id] = series
+        return series
+
+    def record(self, user_id, value, flow=0.0, ts=None):
+        self.get_series(user_id, create=True).record(value, flow, ts)
+
+    def record_many(self, user_ids, values, ts=None):
+        """Periyodik anlık görüntü: birden fazla kullanıcının değerini kaydet"""
+        ts = ts or time.time()
+        for user_id, value in zip(user_ids, values):
+            self.record(user_id, float(value), 0.0, ts)
+
+    def compact(self, now=None):
+        """Saklama süresini aşan gün içi noktaları günlük noktalara indir"""
+        now = now or time.time()
+        cutoff = now - self.intraday_retention_days * 86400
+        for series in self.series.values():
+            series.compact_intraday(cutoff)
+
+    def pnl_windows(self, user_id, current_value=None, today=None):
+        """Günlük, haftalık, aylık, YTD ve başlangıçtan bugüne P&L"""
+        series = self.get_series(user_id)
+        today = today or date.today()
+        today_ordinal = today.toordinal()
+
+        windows = {
+            'daily': today_ordinal - 1,
+            'weekly': today_ordinal - 7,
+            'monthly': today_ordinal - 30,
+            'ytd': date(today.year, 1, 1).toordinal() - 1,
+            'inception': -1
+        }
+
+        if series is None:
+            return {name: {'pnl': 0.0, 'time_weighted_return_pct': 0.0} for name in windows}
+        return {name: series.window_stats(day, current_value) for name, day in windows.items()}
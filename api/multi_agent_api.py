@@ -1,5 +1,5 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime
@@ -30,6 +30,10 @@ from portfolio_management_agent import PortfolioManagementAgent
 from personal_portfolio_agent import PersonalPortfolioAgent
 from sentiment_analysis_agent import SentimentAnalysisAgent
 from performance_agent import PerformanceAgent
+from price_bus import price_bus
+from job_scheduler import job_scheduler
+from source_router import source_router
+from fx_rates import fx_rates, to_date
 
 # Global variables
 agent_system = None
@@ -68,6 +72,21 @@ async def lifespan(app: FastAPI):
     for name, agent in agents.items():
         coordinator.register_agent(name, agent)
     
+    # Tetiklenen stop/kâr al emirleri sembolün abonelerine bildirilir
+    agents['trading_agent'].notifier = agents['notification_agent'].send_trade_trigger_alert
+    
+    # Zamanlanmış bildirimler hızlı analiz sonucunu gönderir
+    agents['notification_agent'].analysis_provider = quick_analysis
+    
+    # Kalıcı işleri geri yükle (handler'lar agent'lar tarafından kaydedildi)
+    job_scheduler.start()
+    
+    # KAP bildirimlerini dakikada bir delta olarak çek
+    agents['news_agent'].start_kap_polling()
+    
+    # Günlük bar geçmişini kapanış sonrası tamamla
+    agents['data_agent'].start_history_topup()
+    
     agent_system = {
         'coordinator': coordinator,
         'agents': agents
@@ -79,6 +98,18 @@ async def lifespan(app: FastAPI):
     yield
     
     print("🛑 Multi-Agent sistemi kapatılıyor...")
+    job_scheduler.shutdown()
+    agents['news_agent'].save_disclosure_index()
+    agents['news_agent'].disclosure_store.close()
+    fx_rates.close()
+    if agents['report_agent'].render_service:
+        agents['report_agent'].render_service.shutdown()
+    if agents['notification_agent'].dispatcher:
+        agents['notification_agent'].dispatcher.shutdown()
+    agents['notification_agent'].subscribers.close()
+    if agents['trading_agent'].execution_scheduler:
+        agents['trading_agent'].execution_scheduler.shutdown()
+    agents['trading_agent'].trade_ledger.close()
 
 app = FastAPI(
     title="🤖 Multi-Agent Finans AI Sistemi",
@@ -142,7 +173,8 @@ def root():
             "sentiment_analysis": "/sentiment/*",
             "performance_monitoring": "/performance/*",
             "agent_status": "/system/agents/status",
-            "system_health": "/system/health"
+            "system_health": "/system/health",
+            "data_sources": "/system/data-sources"
         }
     }
 # Mevcut endpoint'ler (korunuyor)
@@ -176,6 +208,11 @@ def system_health_check():
     
     return health_report
 
+@app.get("/system/data-sources")
+def data_sources_health():
+    """Veri kaynakları: devre kesici durumu, p95 gecikme, canlı/bayat/mock sayaçları"""
+    return source_router.get_stats()
+
 @app.post("/analysis/comprehensive/{symbol}")
 def comprehensive_analysis(symbol: str):
     """Kapsamlı çoklu-agent analizi"""
@@ -348,6 +385,22 @@ def rebalance_portfolio(request: dict):
     result = portfolio_agent.process_task(task)
     return result
 
+@app.post("/portfolio/rebalance/batch")
+def batch_rebalance_portfolios(request: dict):
+    """Toplu portföy dengeleme (kullanıcı x varlık matrisi)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    portfolio_agent = agent_system['agents']['portfolio_management_agent']
+    
+    task = {
+        "type": "batch_rebalance",
+        "batch_data": request.get('batch_data')
+    }
+    
+    result = portfolio_agent.process_task(task)
+    return result
+
 # YENİ PERSONAL PORTFOLIO ENDPOINTS
 @app.post("/personal-portfolio/add-position")
 def add_portfolio_position(request: dict):
@@ -377,12 +430,142 @@ def update_portfolio_prices(request: dict):
     task = {
         "type": "update_portfolio",
         "user_id": request.get('user_id'),
-        "current_prices": request.get('current_prices')
+        "current_prices": request.get('current_prices'),
+        "currency": request.get('currency', 'TRY')
+    }
+    
+    result = personal_agent.process_task(task)
+    return result
+
+@app.post("/personal-portfolio/market-prices")
+def update_market_prices(request: dict):
+    """Piyasa geneli fiyatları tüm portföylere uygula"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    personal_agent = agent_system['agents']['personal_portfolio_agent']
+    
+    task = {
+        "type": "update_market_prices",
+        "current_prices": request.get('current_prices'),
+        "currency": request.get('currency', 'TRY')
+    }
+    
+    result = personal_agent.process_task(task)
+    return result
+
+@app.post("/personal-portfolio/fx-rates")
+def update_portfolio_fx_rates(request: dict = None):
+    """Döviz cinsi pozisyonları güncel kurlarla yeniden değerle (kur verilmezse TCMB)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    personal_agent = agent_system['agents']['personal_portfolio_agent']
+    
+    task = {
+        "type": "update_fx_rates",
+        "rates": (request or {}).get('rates')
     }
     
     result = personal_agent.process_task(task)
     return result
 
+def parse_fx_date(value):
+    """Sorgu parametresindeki tarih (ISO); çözülemezse 400"""
+    if value is None:
+        return None
+    try:
+        return to_date(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Geçersiz tarih: {value} (YYYY-AA-GG bekleniyor)")
+
+@app.get("/fx/rates")
+def get_fx_rates(date: str = None):
+    """Verilen tarihte geçerli TCMB kurları (varsayılan: en son bülten)"""
+    result = fx_rates.get_rates(parse_fx_date(date))
+    
+    if not result.get('success'):
+        raise HTTPException(status_code=503, detail=result['error'])
+    
+    return result
+
+@app.get("/fx/convert")
+def convert_currency(amount: float, from_currency: str, to_currency: str = 'TRY', date: str = None):
+    """TCMB kuru ile döviz çevirme (TL üzerinden çapraz)"""
+    converted = fx_rates.convert(amount, from_currency, to_currency, parse_fx_date(date))
+    
+    if converted is None:
+        raise HTTPException(status_code=404, detail=f"{from_currency}/{to_currency} kuru bulunamadı")
+    
+    return {
+        "amount": amount,
+        "from_currency": from_currency.upper(),
+        "to_currency": to_currency.upper(),
+        "converted": round(converted, 4),
+        "date": date
+    }
+
+@app.post("/market/quotes")
+def publish_market_quotes(request: dict):
+    """Yeni kotasyonları fiyat kanalına yayınla (tüm portföyler yeniden değerlenir)
+
+    Kotasyonlar request'teki currency cinsindendir (varsayılan TRY).
+    """
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    quotes = request.get('quotes') or {}
+    currency = (request.get('currency') or 'TRY').upper()
+    published = price_bus.publish_many(quotes, source=request.get('source', 'API'), currency=currency)
+    
+    return {
+        "success": True,
+        "published_quotes": published,
+        "currency": currency
+    }
+
+@app.post("/market/history/load")
+def load_market_history(request: dict = None):
+    """Sembol evreninin eksik günlük geçmişini toplu indir"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    request = request or {}
+    data_agent = agent_system['agents']['data_agent']
+    
+    task = {
+        "type": "load_history",
+        "symbols": request.get('symbols'),
+        "start": request.get('start'),
+        "end": request.get('end')
+    }
+    
+    return data_agent.process_task(task)
+
+@app.get("/market/history/{symbol}")
+def get_market_history(symbol: str, start: str = None, end: str = None, adjusted: bool = True):
+    """Yerel bar deposundan günlük geçmiş (adjusted=false: ham barlar)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    data_agent = agent_system['agents']['data_agent']
+    result = data_agent.process_task({"type": "get_history", "symbol": symbol, "start": start, "end": end,
+                                        "adjusted": adjusted})
+    
+    if 'error' in result:
+        raise HTTPException(status_code=404, detail=result['error'])
+    
+    return result
+
+@app.get("/market/quotes/{symbol}")
+def get_market_quote(symbol: str, currency: str = "TRY"):
+    """Fiyat kanalındaki son kotasyon"""
+    quote = price_bus.get_quote(symbol, currency.upper())
+    if not quote:
+        raise HTTPException(status_code=404, detail=f"{symbol.upper()} için {currency.upper()} kotasyonu bulunamadı")
+    
+    return quote
+
 @app.get("/personal-portfolio/performance/{user_id}")
 def get_portfolio_performance(user_id: str):
     """Portföy performansını al"""
@@ -433,6 +616,22 @@ def get_personal_recommendations(request: dict):
     result = personal_agent.process_task(task)
     return result
 
+@app.post("/personal-portfolio/rebalance/batch")
+def batch_rebalance_suggestions(request: dict):
+    """Tüm kişisel portföyler için toplu rebalancing önerileri"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    personal_agent = agent_system['agents']['personal_portfolio_agent']
+    
+    task = {
+        "type": "batch_rebalance_suggestions",
+        "user_ids": request.get('user_ids')
+    }
+    
+    result = personal_agent.process_task(task)
+    return result
+
 # YENİ SENTIMENT ANALYSIS ENDPOINTS
 @app.post("/sentiment/social/{symbol}")
 def analyze_social_sentiment(symbol: str, platform: str = "twitter"):
@@ -499,6 +698,25 @@ def get_market_sentiment():
     result = sentiment_agent.process_task(task)
     return result
 
+@app.post("/sentiment/batch")
+def analyze_sentiment_batch(request: dict):
+    """Toplu sentiment: documents=[{symbol, text}] veya texts + symbols dizileri"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    sentiment_agent = agent_system['agents']['sentiment_analysis_agent']
+    
+    documents = request.get('documents')
+    if documents is None:
+        documents = {'texts': request.get('texts', []), 'symbols': request.get('symbols', [])}
+    
+    result = sentiment_agent.process_task({"type": "analyze_sentiment_batch", "documents": documents})
+    
+    if 'error' in result:
+        raise HTTPException(status_code=400, detail=result['error'])
+    
+    return result
+
 @app.post("/sentiment/signals/{symbol}")
 def get_sentiment_signals(symbol: str):
     """Sentiment bazlı sinyaller"""
@@ -533,6 +751,155 @@ def get_sentiment_trends(symbol: str, timeframe: str = "7d"):
     return result
 
 # PERFORMANCE ENDPOINTS
+@app.post("/notifications/subscribe")
+def subscribe_notifications(request: dict):
+    """Analiz bildirimlerine abone ol veya aboneliği güncelle"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    task = {
+        "type": "subscribe_user",
+        "user_data": request
+    }
+    
+    result = agent_system['agents']['notification_agent'].process_task(task)
+    
+    if not result.get('success'):
+        raise HTTPException(status_code=409, detail=result.get('error', 'Abonelik kaydedilemedi'))
+    
+    return result
+
+@app.post("/notifications/unsubscribe")
+def unsubscribe_notifications(request: dict):
+    """Aboneliği kaldır (email, telegram_id veya id ile)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    task = {
+        "type": "unsubscribe_user",
+        "user_data": request
+    }
+    
+    result = agent_system['agents']['notification_agent'].process_task(task)
+    
+    if not result.get('success'):
+        raise HTTPException(status_code=404, detail=result.get('error', 'Abone bulunamadı'))
+    
+    return result
+
+@app.post("/notifications/price-alerts")
+def create_price_alert(request: dict):
+    """Kalıcı fiyat uyarısı kur"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    notification_agent = agent_system['agents']['notification_agent']
+    
+    task = {
+        "type": "create_price_alert",
+        "alert_data": request
+    }
+    
+    result = notification_agent.process_task(task)
+    
+    if 'error' in result:
+        raise HTTPException(status_code=400, detail=result['error'])
+    
+    return result
+
+@app.get("/notifications/price-alerts/{user_id}")
+def list_price_alerts(user_id: str):
+    """Kullanıcının fiyat uyarıları"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    return agent_system['agents']['notification_agent'].list_price_alerts(user_id)
+
+@app.delete("/notifications/price-alerts/{alert_id}")
+def remove_price_alert(alert_id: int):
+    """Fiyat uyarısını sil"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    result = agent_system['agents']['notification_agent'].remove_price_alert(alert_id)
+    
+    if 'error' in result:
+        raise HTTPException(status_code=404, detail=result['error'])
+    
+    return result
+
+@app.get("/notifications/batches/{batch_id}")
+def get_delivery_status(batch_id: str):
+    """Kuyruğa alınan bildirim gönderiminin durumu"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    result = agent_system['agents']['notification_agent'].get_delivery_status(batch_id)
+    
+    if 'error' in result:
+        raise HTTPException(status_code=404, detail=result['error'])
+    
+    return result
+
+@app.get("/news/search")
+def search_news(q: str, company: str = None, since: str = None, until: str = None, limit: int = 20):
+    """KAP bildirimlerinde tam metin arama"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    news_agent = agent_system['agents']['news_agent']
+    
+    result = news_agent.process_task({
+        "type": "search_news",
+        "query": q,
+        "company_code": company,
+        "since": since,
+        "until": until,
+        "limit": limit
+    })
+    
+    if 'error' in result:
+        raise HTTPException(status_code=400, detail=result['error'])
+    
+    return result
+
+@app.get("/news/company/{company_code}")
+def get_company_news(company_code: str, limit: int = 50):
+    """Şirketin KAP bildirimleri (yerel depodan)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    news_agent = agent_system['agents']['news_agent']
+    
+    result = news_agent.process_task({"type": "company_news", "company_code": company_code, "limit": limit})
+    
+    if 'error' in result:
+        raise HTTPException(status_code=400, detail=result['error'])
+    
+    return result
+
+@app.get("/scheduler/jobs")
+def list_scheduled_jobs(handler: str = None):
+    """Kalıcı zamanlanmış işler (bildirim ve rapor)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    return {
+        "jobs": job_scheduler.list_jobs(handler),
+        "stats": job_scheduler.get_stats()
+    }
+
+@app.delete("/scheduler/jobs/{job_id}")
+def remove_scheduled_job(job_id: str):
+    """Zamanlanmış işi sil"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    if not job_scheduler.remove_job(job_id):
+        raise HTTPException(status_code=404, detail=f"İş bulunamadı: {job_id}")
+    
+    return {"success": True, "job_id": job_id}
+
 @app.get("/performance/dashboard")
 def get_performance_dashboard():
     """Performance dashboard verilerini al"""
@@ -709,77 +1076,203 @@ def execute_trade(trade_params: dict):
     
     return result
 
+@app.post("/trading/optimize-execution")
+def optimize_trade_execution(order_params: dict):
+    """Büyük emri TWAP/VWAP/POV ile dilimle (execute=true verilirse yürüt)"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    trading_agent = agent_system['agents']['trading_agent']
+    
+    task = {
+        "type": "optimize_execution",
+        "order_params": order_params
+    }
+    
+    result = trading_agent.process_task(task)
+    
+    if not result.get('success'):
+        raise HTTPException(status_code=400, detail=result.get('error', 'Emir planlanamadı'))
+    
+    return result
+
+@app.get("/trading/executions/{parent_id}")
+def get_execution_status(parent_id: str):
+    """Dilimlenmiş ana emrin durumu"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    result = agent_system['agents']['trading_agent'].get_execution_status(parent_id)
+    
+    if 'error' in result:
+        raise HTTPException(status_code=404, detail=result['error'])
+    
+    return result
+
+@app.get("/trading/triggers")
+def get_trading_triggers():
+    """Kurulu stop/kâr al tetikleri ve son tetiklenenler"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    trading_agent = agent_system['agents']['trading_agent']
+    return {
+        "stats": trading_agent.trigger_engine.get_stats(),
+        "recent_fired": trading_agent.fired_triggers[-50:]
+    }
+
+def build_report_data(symbol):
+    """Finansal ve teknik agent sonuçlarından rapor verisi"""
+    agents = agent_system['agents']
+    
+    financial_result = agents['financial_agent'].process_task({"type": "calculate_ratios", "company_code": symbol})
+    technical_result = agents['technical_agent'].process_task({"type": "generate_signals", "price_data": None})
+    
+    return {
+        'symbol': symbol.upper(),
+        'analysis_date': datetime.now().isoformat(),
+        'recommendation': technical_result.get('overall_signal', 'BEKLE'),
+        'confidence': financial_result.get('investment_score', 75),
+        'financial_score': financial_result.get('investment_score', 75),
+        'technical_score': abs(technical_result.get('technical_score', 2)) * 20 + 40,
+        'news_sentiment': 'Pozitif',
+        'current_price': 91.50,
+        'target_price': 105.50,
+        'stop_loss': 85.40,
+        'risk_level': 'Orta',
+        'agent_analysis': {
+            'financial_agent': {
+                'score': financial_result.get('investment_score', 75),
+                'status': 'Güçlü' if financial_result.get('investment_score', 75) > 70 else 'Orta'
+            },
+            'technical_agent': {
+                'score': abs(technical_result.get('technical_score', 2)) * 20 + 40,
+                'status': 'Pozitif' if technical_result.get('technical_score', 0) > 0 else 'Negatif'
+            },
+            'news_agent': {'score': 75, 'status': 'İyi'},
+            'data_agent': {'score': 80, 'status': 'Stabil'}
+        }
+    }
+
 @app.post("/reports/generate")
 def generate_analysis_report(symbol: str = "THYAO"):
-    """Analiz raporu oluştur"""
+    """Analiz raporu oluştur (süreç havuzunda; iş kimliği hemen döner)"""
     if not agent_system:
         raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
     
     report_agent = agent_system['agents']['report_agent']
     
     try:
-        agents = agent_system['agents']
-        
-        financial_result = agents['financial_agent'].process_task({"type": "calculate_ratios", "company_code": symbol})
-        technical_result = agents['technical_agent'].process_task({"type": "generate_signals", "price_data": None})
-        
-        report_data = {
-            'symbol': symbol.upper(),
-            'analysis_date': datetime.now().isoformat(),
-            'recommendation': technical_result.get('overall_signal', 'BEKLE'),
-            'confidence': financial_result.get('investment_score', 75),
-            'financial_score': financial_result.get('investment_score', 75),
-            'technical_score': abs(technical_result.get('technical_score', 2)) * 20 + 40,
-            'news_sentiment': 'Pozitif',
-            'current_price': 91.50,
-            'target_price': 105.50,
-            'stop_loss': 85.40,
-            'risk_level': 'Orta',
-            'agent_analysis': {
-                'financial_agent': {
-                    'score': financial_result.get('investment_score', 75),
-                    'status': 'Güçlü' if financial_result.get('investment_score', 75) > 70 else 'Orta'
-                },
-                'technical_agent': {
-                    'score': abs(technical_result.get('technical_score', 2)) * 20 + 40,
-                    'status': 'Pozitif' if technical_result.get('technical_score', 0) > 0 else 'Negatif'
-                },
-                'news_agent': {'score': 75, 'status': 'İyi'},
-                'data_agent': {'score': 80, 'status': 'Stabil'}
-            }
-        }
-        
-        task = {"type": "generate_pdf_report", "report_data": report_data}
-        result = report_agent.process_task(task)
+        result = report_agent.process_task({"type": "submit_pdf_reports", "reports": [build_report_data(symbol)]})
         
         if result.get('success'):
+            job_id = result['job_ids'][0]
             return {
                 "success": True,
-                "message": "Rapor başarıyla oluşturuldu",
-                "report_info": result,
-                "download_ready": True
+                "message": "Rapor kuyruğa alındı",
+                "job_id": job_id,
+                "status_url": f"/reports/jobs/{job_id}",
+                "file_url": f"/reports/jobs/{job_id}/file"
             }
         else:
             raise HTTPException(status_code=500, detail=result.get('error', 'Rapor oluşturulamadı'))
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Rapor oluşturma hatası: {str(e)}")
 
-from fastapi.responses import FileResponse
+@app.post("/reports/batch")
+def generate_batch_reports(request: dict):
+    """İzlenen semboller için toplu rapor (sabah raporları); tüm çekirdekleri kullanır"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    symbols = request.get('symbols', [])
+    if not symbols:
+        raise HTTPException(status_code=400, detail="symbols listesi gerekli")
+    
+    reports = [build_report_data(symbol) for symbol in symbols]
+    result = agent_system['agents']['report_agent'].process_task({
+        "type": "submit_pdf_reports",
+        "reports": reports,
+        "report_type": request.get('report_type', 'analysis')
+    })
+    
+    if 'error' in result:
+        raise HTTPException(status_code=500, detail=result['error'])
+    
+    return dict(result, symbols=[symbol.upper() for symbol in symbols])
+
+@app.get("/reports/jobs/{job_id}")
+def get_report_job(job_id: str):
+    """Rapor işinin durumu"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    result = agent_system['agents']['report_agent'].get_report_job(job_id)
+    
+    if 'error' in result and 'job_id' not in result:
+        raise HTTPException(status_code=404, detail=result['error'])
+    
+    return result
+
+@app.get("/reports/jobs/{job_id}/file")
+def download_report_job(job_id: str):
+    """Hazır olan rapor dosyasını gönder; hazır değilse 202 döner"""
+    if not agent_system:
+        raise HTTPException(status_code=503, detail="Sistem başlatılmadı")
+    
+    job = agent_system['agents']['report_agent'].get_report_job(job_id)
+    
+    if 'job_id' not in job:
+        raise HTTPException(status_code=404, detail=job['error'])
+    if job['status'] in ('queued', 'running'):
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job['status']})
+    if job['status'] == 'failed' or job['kind'] != 'pdf':
+        raise HTTPException(status_code=409, detail=job.get('error') or "İşin dosya çıktısı yok")
+    
+    return FileResponse(
+        path=job['result']['report_path'],
+        filename=job['result']['filename'],
+        media_type='application/pdf'
+    )
+
+from fastapi.responses import FileResponse, JSONResponse, Response
 import os
 
 @app.get("/reports/download/{filename}")
-def download_report(filename: str):
-    """PDF raporu indir"""
-    file_path = os.path.join('reports', filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Rapor dosyası bulunamadı")
+def download_report(filename: str, request: Request):
+    """Rapor/grafik dosyasını indir (ETag ile koşullu GET)"""
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Geçersiz dosya adı")
+    
+    # İçerik adresli önbellek; yoksa eski zaman damgalı raporlar
+    cache = agent_system['agents']['report_agent'].get_render_service().cache if agent_system else None
+    file_path = cache.get(filename) if cache else None
+    if file_path:
+        etag = f'"{os.path.splitext(filename)[0]}"'
+        cache_control = "public, max-age=86400, immutable"
+    else:
+        file_path = os.path.join('reports', filename)
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="Rapor dosyası bulunamadı")
+        stat = os.stat(file_path)
+        etag = f'"{int(stat.st_mtime)}-{stat.st_size}"'
+        cache_control = "no-cache"
+    
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if '*' in candidates or etag in candidates:
+            return Response(status_code=304, headers=headers)
     
     return FileResponse(
         path=file_path,
         filename=filename,
-        media_type='application/pdf'
+        media_type='image/png' if filename.endswith('.png') else 'application/pdf',
+        headers=headers
     )
 
 @app.get("/learning/performance")
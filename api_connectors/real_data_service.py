@@ -1,7 +1,6 @@
 
 import requests
 import json
-import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 import time
 import asyncio
@@ -9,6 +8,31 @@ import aiohttp
 from typing import Dict, List, Optional
 import yfinance as yf
 import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agents'))
+from fx_rates import fx_rates
+from bar_store import bar_store
+from history_loader import HistoryLoader
+from price_bus import normalize_symbol
+
+# Tarihsel veri periyotları -> gün (None: tüm geçmiş; 'ytd' yıl başından)
+HISTORY_PERIOD_DAYS = {'1d': 7, '5d': 7, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731, '5y': 1827,
+                       '10y': 3653, 'ytd': None, 'max': None}
+# Sadece son N işlem günü dönen periyotlar
+HISTORY_PERIOD_BARS = {'1d': 1}
+# Seans içindeki (açık) günün barı sembol başına en sık bu aralıkla yeniden indirilir (saniye)
+OPEN_DAY_REFRESH_INTERVAL = 15 * 60
+
+
+def history_start(period, now=None):
+    """Periyodun başlangıç günü ('YYYY-AA-GG'); tüm geçmiş için None"""
+    now = now or datetime.now()
+    if period == 'ytd':
+        return f"{now.year}-01-01"
+    days = HISTORY_PERIOD_DAYS[period]
+    return (now - timedelta(days=days)).strftime('%Y-%m-%d') if days else None
 
 class RealAPIService:
     def __init__(self):
@@ -20,57 +44,25 @@ class RealAPIService:
         })
 
 class TCMBService:
-    """TCMB Döviz Kurları API"""
+    """TCMB Döviz Kurları API (kalıcı önbellekli kur servisi üzerinden)"""
     
-    def __init__(self):
-        self.base_url = "https://www.tcmb.gov.tr/kurlar"
+    def __init__(self, fx_service=None):
+        self.fx_service = fx_service or fx_rates
         
     async def get_exchange_rates(self, date=None):
-        """TCMB'den güncel döviz kurlarını al"""
+        """TCMB'den verilen tarihte geçerli (en son yayımlanmış) döviz kurlarını al
+        
+        İş günü takvimiyle sınırlı sayıda geriye gidilir; günlük bültenler
+        kalıcı önbellekte tutulduğu için geçmiş günler tekrar indirilmez.
+        """
         try:
-            if not date:
-                date = datetime.now()
-            
-            date_str = date.strftime('%d%m%Y')
-            url = f"{self.base_url}/{date.strftime('%Y%m')}/{date_str}.xml"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        xml_content = await response.text()
-                        return self._parse_tcmb_xml(xml_content)
-                    else:
-                        # Önceki gün verilerini dene
-                        prev_date = date - timedelta(days=1)
-                        return await self.get_exchange_rates(prev_date)
-                        
+            result = await asyncio.to_thread(self.fx_service.get_rates, date)
+            if result.get('success'):
+                result['timestamp'] = datetime.now().isoformat()
+                return result
         except Exception as e:
             print(f"TCMB API hatası: {e}")
-            return self._get_fallback_rates()
-    
-    def _parse_tcmb_xml(self, xml_content):
-        """TCMB XML'ini parse et"""
-        try:
-            root = ET.fromstring(xml_content)
-            rates = {}
-            
-            for currency in root.findall('Currency'):
-                code = currency.get('CurrencyCode')
-                forex_selling = currency.find('ForexSelling')
-                
-                if forex_selling is not None and forex_selling.text:
-                    rates[f"{code}_TRY"] = float(forex_selling.text)
-            
-            return {
-                'success': True,
-                'rates': rates,
-                'source': 'TCMB',
-                'timestamp': datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            print(f"TCMB XML parse hatası: {e}")
-            return self._get_fallback_rates()
+        return self._get_fallback_rates()
     
     def _get_fallback_rates(self):
         """Fallback döviz kurları"""
@@ -170,8 +162,11 @@ class KAPService:
 class YahooFinanceService:
     """Yahoo Finance API (yfinance kullanarak)"""
     
-    def __init__(self):
+    def __init__(self, open_day_refresh_interval=OPEN_DAY_REFRESH_INTERVAL):
         self.session = requests.Session()
+        self.history_loader = HistoryLoader(bar_store=bar_store)
+        self.open_day_refresh_interval = open_day_refresh_interval
+        self._open_day_refreshed = {}  # sembol -> açık günün son indirilme zamanı
         
     async def get_stock_data(self, symbol, period='1d', interval='1m'):
         """Hisse verisini al"""
@@ -223,32 +218,52 @@ class YahooFinanceService:
         return results
     
     async def get_historical_data(self, symbol, period='1mo'):
-        """Tarihsel veri al"""
+        """Tarihsel veri al (yerel bar deposundan; sadece eksik günler indirilir)
+
+        Depo bugünü hiçbir zaman kapsanmış saymaz; kapanmış günlerde eksik
+        yoksa bugünün barı her çağrıda değil, sembol başına en fazla
+        open_day_refresh_interval'da bir indirilir (düzenli tamamlama
+        HISTORY_TOPUP işinin görevidir).
+        """
         try:
-            if not symbol.endswith('.IS') and len(symbol) <= 5:
-                symbol = f"{symbol}.IS"
+            if period not in HISTORY_PERIOD_DAYS:
+                return {'success': False, 'error': f'Desteklenmeyen periyot: {period}'}
             
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
+            start = history_start(period)
+            key = normalize_symbol(symbol)
+            needs_history = bool(bar_store.missing_ranges(symbol, start, datetime.now().date() - timedelta(days=1)))
+            open_day_due = (bool(bar_store.missing_ranges(symbol, start)) and
+                            time.time() - self._open_day_refreshed.get(key, 0) >= self.open_day_refresh_interval)
+            load = {'loaded_bars': 0}
+            if needs_history or open_day_due:
+                load = await asyncio.to_thread(self.history_loader.load, [symbol], start)
+                if not load['errors']:
+                    self._open_day_refreshed[key] = time.time()
+            # Temettü/bölünme düzeltmeli seri (yf.Ticker.history ile aynı)
+            hist = bar_store.read(symbol, start, adjusted=True)
+            if period in HISTORY_PERIOD_BARS:
+                hist = hist.tail(HISTORY_PERIOD_BARS[period])
             
             if not hist.empty:
                 # DataFrame'i dict'e çevir
                 data = []
-                for date, row in hist.iterrows():
+                for date, row in zip(hist.index, hist.itertuples(index=False)):
                     data.append({
                         'date': date.strftime('%Y-%m-%d'),
-                        'open': float(row['Open']),
-                        'high': float(row['High']),
-                        'low': float(row['Low']),
-                        'close': float(row['Close']),
-                        'volume': int(row['Volume']) if 'Volume' in row else 0
+                        'open': float(row.open),
+                        'high': float(row.high),
+                        'low': float(row.low),
+                        'close': float(row.close),
+                        'volume': int(row.volume)
                     })
                 
                 return {
                     'success': True,
                     'symbol': symbol,
                     'data': data,
-                    'source': 'YAHOO_FINANCE'
+                    'downloaded_bars': load['loaded_bars'],
+                    'adjusted': True,
+                    'source': 'BAR_STORE'
                 }
             else:
                 return {'success': False, 'error': 'No historical data found'}
@@ -0,0 +1,41 @@
+import json
+import sys
+
+# Agent modüllerini import et
+sys.path.append('agents')
+from bar_store import bar_store
+from history_loader import BIST30, HistoryLoader
+
+
+def load_history():
+    """Kullanım: python load_history.py [SEMBOL,SEMBOL,... | sembol_dosyası.txt] [başlangıç] [bitiş]
+
+    Sembol verilmezse BIST 30 yüklenir. İlk çalışmada tüm geçmiş, sonraki
+    çalışmalarda sadece eksik günler indirilir (data/bars).
+    """
+    symbols = BIST30
+    if len(sys.argv) > 1:
+        if sys.argv[1].endswith('.txt'):
+            with open(sys.argv[1], encoding='utf-8') as symbols_file:
+                symbols = [line.strip() for line in symbols_file if line.strip()]
+        else:
+            symbols = [symbol.strip() for symbol in sys.argv[1].split(',') if symbol.strip()]
+    start = sys.argv[2] if len(sys.argv) > 2 else None
+    end = sys.argv[3] if len(sys.argv) > 3 else None
+
+    loader = HistoryLoader(bar_store=bar_store)
+    plan = loader.plan(symbols, start, end)
+    print(f"🚀 {len(symbols)} sembol, {sum(len(group) for group in plan.values())} eksik aralık, {len(plan)} grup")
+
+    result = loader.load(symbols, start, end)
+    print(f"📥 {result['requests']} istek, {result['loaded_bars']} bar, {len(result['updated_symbols'])} sembol güncellendi ({result['duration']}s)")
+    if result['empty_symbols']:
+        print(f"⚠️ Veri gelmeyen semboller: {', '.join(result['empty_symbols'])}")
+    for error in result['errors']:
+        print(f"❌ {error}")
+
+    print(json.dumps(bar_store.get_stats(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    load_history()
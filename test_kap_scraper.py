@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+KAP Scraper Test
+Kazıma hattını fixtures/kap altındaki kayıtlı HTML sayfalarına karşı,
+yerelde açılan bir HTTP sunucusu üzerinden test eder
+"""
+
+import sys
+import os
+import hashlib
+import shutil
+import tempfile
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# Add paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+agents_path = os.path.join(current_dir, 'agents')
+sys.path.insert(0, current_dir)
+sys.path.insert(0, agents_path)
+
+from kap_scraper import KapScraper, parse_detail, parse_listing
+
+FIXTURES_DIR = os.path.join(current_dir, 'fixtures', 'kap')
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """/tr/bildirimler?page=N -> listing_pageN.html, /tr/Bildirim/ID -> detail_ID.html (ETag destekli)"""
+
+    requested = []
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path == '/tr/bildirimler':
+            name = f"listing_page{query.split('=')[-1]}.html"
+        elif path.startswith('/tr/Bildirim/'):
+            name = f"detail_{path.rsplit('/', 1)[-1]}.html"
+        else:
+            name = None
+        file_path = os.path.join(FIXTURES_DIR, name) if name else None
+        if not file_path or not os.path.exists(file_path):
+            self.send_error(404)
+            return
+        FixtureHandler.requested.append(self.path)
+
+        with open(file_path, 'rb') as fixture:
+            body = fixture.read()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def create_demo_scraper(base_url):
+    """Geçici doğrulayıcı dosyası olan kazıyıcı (data/ kirlenmez)"""
+    demo_dir = tempfile.mkdtemp(prefix='kap_scraper_test_')
+    return KapScraper(base_url=base_url, concurrency=4, timeout=5,
+                      validators_path=os.path.join(demo_dir, 'kap_http_cache.json'))
+
+
+def close_demo_scraper(scraper):
+    shutil.rmtree(os.path.dirname(scraper.validators_path), ignore_errors=True)
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as fixture:
+        return fixture.read()
+
+
+def test_parsers():
+    print("🧪 Liste ve detay ayrıştırma...")
+    listed = parse_listing(read_fixture('listing_page1.html'), 'https://www.kap.org.tr')
+    assert [item['id'] for item in listed] == ['1001', '1002', '1003']  # 1003 id'si linkten
+    assert listed[0]['company_code'] == 'THYAO'
+    assert listed[0]['url'] == 'https://www.kap.org.tr/tr/Bildirim/1001'
+
+    assert 'kod paylaşımı anlaşması' in parse_detail(read_fixture('detail_1001.html'))
+    assert 'Kamuyu Aydınlatma' not in parse_detail(read_fixture('detail_1001.html'))
+    assert '%18 artmıştır' in parse_detail(read_fixture('detail_1002.html'))
+    assert 'kar payı' in parse_detail(read_fixture('detail_1004.html'))
+    print("✅ Ayrıştırıcılar doğru")
+
+
+def test_scrape_pipeline():
+    print("🧪 Kazıma hattı (yerel fikstür sunucusu)...")
+    server, base_url = start_fixture_server()
+    scraper = create_demo_scraper(base_url)
+    try:
+        FixtureHandler.requested = []
+        chunks = []
+        result = scraper.scrape(pages=2, sink=lambda chunk: chunks.append(list(chunk)))
+
+        # Sayfalar arası tekrar (1002) tek sayılır; boş detay (1003) sadece kendini düşürür
+        assert result['listed'] == 4, result
+        assert result['fetched'] == 3, result
+        assert len(result['errors']) == 1 and '1003' in result['errors'][0], result['errors']
+        contents = {item['id']: item['content'] for item in result['disclosures']}
+        assert 'kar payı' in contents['1004']
+        assert sum(len(chunk) for chunk in chunks) == 3
+        print(f"✅ {result['fetched']} bildirim, {len(result['errors'])} hata")
+
+        # Bilinen bildirimlerin detayı istenmez
+        FixtureHandler.requested = []
+        result = scraper.scrape(pages=2, known_ids=lambda ids: {'1001', '1002', '1003'} & set(ids))
+        assert result['skipped_known'] == 3 and result['fetched'] == 1, result
+        assert not any('/tr/Bildirim/100' + digit in path for path in FixtureHandler.requested for digit in '123')
+        print("✅ Bilinen bildirimler atlandı")
+
+        # Hatasız çalışmadan sonra değişmemiş liste sayfaları 304 alır
+        result = scraper.scrape(pages=2, known_ids=lambda ids: set(ids))
+        assert result['not_modified_pages'] == 2 and result['listed'] == 0, result
+        print("✅ Koşullu istekler: değişmemiş sayfalar tekrar indirilmedi")
+    finally:
+        server.shutdown()
+        server.server_close()
+        close_demo_scraper(scraper)
+
+
+if __name__ == "__main__":
+    print("🚀 KAP Scraper Test Başlıyor...")
+    print("=" * 60)
+    test_parsers()
+    test_scrape_pipeline()
+    print("=" * 60)
+    print("🎉 Tüm testler tamamlandı")
@@ -6,6 +6,10 @@ Bu script Notification Agent'ın tüm özelliklerini test eder
 
 import sys
 import os
+import shutil
+import socketserver
+import tempfile
+import threading
 import time
 
 # Add paths
@@ -15,13 +19,100 @@ sys.path.insert(0, current_dir)
 sys.path.insert(0, agents_path)
 
 from notification_agent import NotificationAgent
+from notification_dispatcher import NotificationDispatcher, PermanentDeliveryError, SMTPConnectionPool
+from job_scheduler import JobScheduler
+from price_bus import PriceBus
+from trading_agent import TradingAgent
+
+def create_demo_agent():
+    """Geçici dizinde zamanlayıcı ve abone kaydı olan agent (data/ kirlenmez)"""
+    demo_dir = tempfile.mkdtemp(prefix='notification_test_')
+    return NotificationAgent(
+        subscribers_path=os.path.join(demo_dir, 'subscribers.jsonl'),
+        job_scheduler=JobScheduler(path=os.path.join(demo_dir, 'jobs.db'))
+    )
+
+def close_demo_agent(agent):
+    agent.job_scheduler.shutdown()
+    agent.subscribers.close()
+    shutil.rmtree(os.path.dirname(agent.subscribers.path), ignore_errors=True)
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    """Test için en küçük SMTP sunucusu: mesajları server.messages'a yazar
+
+    'reject' ile başlayan alıcılara RCPT aşamasında 550 döner.
+    """
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost test SMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'AUTH':
+                self.server.logins += 1
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if address.startswith('reject'):
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b'.\r\n':
+                        break
+                    lines.append(data_line)
+                with self.server.lock:
+                    self.server.messages.append((recipients, b''.join(lines)))
+                self.reply('250 Queued')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+def start_local_smtp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), LocalSMTPHandler)
+    server.daemon_threads = True
+    server.messages = []
+    server.connections = 0
+    server.logins = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
 
 def test_notification_agent():
     print("🚀 Notification Agent Test Başlıyor...")
     print("=" * 60)
     
     # Agent'ı başlat
-    agent = NotificationAgent()
+    agent = create_demo_agent()
     print(f"✅ {agent.name} başarıyla oluşturuldu")
     print(f"📋 Yetenekler: {', '.join(agent.capabilities)}")
     print()
@@ -221,6 +312,7 @@ def test_notification_agent():
     print("💡 Gerçek kullanım için SMTP ve Telegram ayarları yapılmalı")
     print()
     
+    close_demo_agent(agent)
     return True
 
 def test_email_template_features():
@@ -228,7 +320,7 @@ def test_email_template_features():
     print("🎨 E-mail Template Detaylı Test")
     print("=" * 40)
     
-    agent = NotificationAgent()
+    agent = create_demo_agent()
     
     # Farklı senaryolar test et
     scenarios = [
@@ -267,8 +359,95 @@ def test_email_template_features():
             status = "✅" if result else "❌"
             print(f"   {status} {check_name}")
     
+    close_demo_agent(agent)
     print("\n🎯 Template testleri tamamlandı!")
 
+def test_trade_trigger_notification():
+    """Tetiklenen stop-loss emri sembol abonelerine teslim hattından gönderilir"""
+    print("🛑 Stop-loss Tetik Bildirimi Testi")
+    print("=" * 40)
+    
+    agent = create_demo_agent()
+    agent.email_config.update({'enabled': True, 'sender_email': 'alerts@example.com', 'sender_password': 'demo',
+                               'smtp_server': '127.0.0.1', 'smtp_port': 9, 'use_tls': False})
+    agent.dispatcher = NotificationDispatcher(agent.email_config, agent.telegram_config, max_retries=0)
+    agent.subscribe_user({'email': 'holder@example.com', 'preferences': {'symbols': ['THYAO']}})
+    agent.subscribe_user({'email': 'other@example.com', 'preferences': {'symbols': ['GARAN']}})
+    
+    price_bus = PriceBus()
+    trader = TradingAgent(ledger_path=os.path.join(os.path.dirname(agent.subscribers.path), 'ledger.jsonl'),
+                          price_bus=price_bus)
+    trader.notifier = agent.send_trade_trigger_alert
+    try:
+        order = trader.execute_trade_order({'symbol': 'THYAO', 'action': 'BUY', 'quantity': 100, 'price': 300,
+                                            'order_type': 'MARKET', 'stop_loss': 280})
+        assert order.get('success'), order
+        
+        price_bus.publish('THYAO', 275)
+        assert trader.fired_triggers and trader.fired_triggers[0]['trigger_type'] == 'STOP_LOSS'
+        
+        record = agent.notification_history[-1]
+        assert record['type'] == 'trade_trigger' and record['notifications_sent'] == 1, record
+        status = agent.get_delivery_status(record['batch_id'])
+        assert status['total'] == 1, status
+        print(f"✅ Tetik bildirimi kuyruğa alındı: {record['batch_id']}")
+    finally:
+        trader.trade_ledger.close()
+        agent.dispatcher.shutdown(timeout=5)
+        close_demo_agent(agent)
+
+def test_smtp_broadcast_local_server():
+    """Broadcast yerel SMTP sunucusuna havuzdaki bağlantılarla teslim edilir"""
+    print("📨 Yerel SMTP Broadcast Testi")
+    print("=" * 40)
+    
+    smtp_server = start_local_smtp_server()
+    agent = create_demo_agent()
+    agent.email_config.update({'enabled': True, 'sender_email': 'alerts@example.com', 'sender_password': 'secret',
+                               'smtp_server': '127.0.0.1', 'smtp_port': smtp_server.server_address[1],
+                               'use_tls': False})
+    agent.dispatcher = NotificationDispatcher(agent.email_config, agent.telegram_config,
+                                              smtp_pool_size=2, max_retries=0)
+    try:
+        recipients = 25
+        for index in range(recipients):
+            agent.subscribe_user({'email': f'user{index}@example.com', 'preferences': {'symbols': ['THYAO']}})
+        
+        result = agent.broadcast_analysis_result({'symbol': 'THYAO', 'recommendation': 'AL', 'confidence': 80})
+        assert result['sent_count'] == recipients, result
+        assert agent.dispatcher.drain(timeout=30)
+        
+        status = agent.get_delivery_status(result['batch_id'])
+        assert status['sent'] == recipients and status['failed'] == 0, status
+        assert len(smtp_server.messages) == recipients
+        assert sorted(to[0] for to, _ in smtp_server.messages) == sorted(f'user{i}@example.com' for i in range(recipients))
+        # Her mesaj için yeni bağlantı açılmaz: en fazla havuz boyutu kadar
+        assert smtp_server.connections <= 2 and agent.dispatcher.smtp_pool.connections_opened <= 2
+        assert smtp_server.logins == smtp_server.connections
+        print(f"✅ {recipients} mesaj, {smtp_server.connections} SMTP bağlantısı")
+        
+        # 5xx yanıtı kalıcı hatadır: tekrar denenmez
+        pool = SMTPConnectionPool('127.0.0.1', smtp_server.server_address[1], use_tls=False, size=1)
+        try:
+            pool.send('alerts@example.com', ['reject@example.com'], b'Subject: x\r\n\r\nx')
+            assert False, "5xx kalıcı hata olarak yükseltilmeliydi"
+        except PermanentDeliveryError as e:
+            print(f"✅ 5xx kalıcı hata: {e}")
+        finally:
+            pool.close()
+        
+        retried = agent.dispatcher.stats['retried']
+        batch_id = agent.dispatcher.submit([{'channel': 'email', 'to': ['reject@example.com'],
+                                             'body': b'Subject: x\r\n\r\nx'}])
+        assert agent.dispatcher.drain(timeout=10)
+        status = agent.get_delivery_status(batch_id)
+        assert status['failed'] == 1 and agent.dispatcher.stats['retried'] == retried, status
+    finally:
+        agent.dispatcher.shutdown(timeout=5)
+        close_demo_agent(agent)
+        smtp_server.shutdown()
+        smtp_server.server_close()
+
 if __name__ == "__main__":
     print("🤖 Multi-Agent Notification System")
     print("🔧 Comprehensive Test Suite")
@@ -283,6 +462,16 @@ if __name__ == "__main__":
         # Template testleri
         test_email_template_features()
         
+        print("\n" + "=" * 60)
+        
+        # Stop-loss tetik bildirimi
+        test_trade_trigger_notification()
+        
+        print("\n" + "=" * 60)
+        
+        # Yerel SMTP sunucusuna broadcast
+        test_smtp_broadcast_local_server()
+        
         print("\n🏆 TÜM TESTLER BAŞARIYLA TAMAMLANDI!")
         print("🚀 Notification Agent kullanıma hazır!")
         
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Personal Portfolio Test
+Aynı sembolün TL ve döviz cinsi lotlarının fiyat tick'lerinde
+kendi para birimlerindeki kotasyonlarla değerlendiğini test eder
+"""
+
+import sys
+import os
+
+# Add paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+agents_path = os.path.join(current_dir, 'agents')
+sys.path.insert(0, current_dir)
+sys.path.insert(0, agents_path)
+
+from personal_portfolio_agent import PersonalPortfolioAgent
+from position_store import PositionStore
+from price_bus import PriceBus
+
+
+def add_mixed_lots(store, user_id='u'):
+    """THYAO: 10 lot TL (300) + 1 lot USD (10$, kur 30)"""
+    store.add_position(user_id, 'THYAO', 10, 300)
+    store.add_position(user_id, 'THYAO', 1, 10, currency='USD', cost_rate=30, fx_rate=30)
+
+
+def test_store_tick_by_currency():
+    print("🧪 Depo: kotasyon sadece kendi para birimindeki satırlara...")
+    store = PositionStore()
+    add_mixed_lots(store)
+    assert store.user_totals('u') == (3300.0, 3300.0)
+
+    # TL tick USD satırına yazılmaz (eskiden 310 * 30 ile değerleniyordu)
+    updated = store.update_prices({'THYAO': 310})
+    assert len(updated) == 1 and store.row_currency[updated[0]] == 'TRY'
+    assert store.user_totals('u')[1] == 3100 + 300
+
+    # USD tick sadece USD satırını günceller
+    store.update_prices({'THYAO': 11}, currency='USD')
+    assert store.user_totals('u')[1] == 3100 + 330
+    assert store.last_price[store.find_row('u', 'THYAO')] == 310
+    assert store.last_price[store.find_row('u', 'THYAO', 'USD')] == 11
+
+    # Portföyde olmayan para birimindeki tick hiçbir satıra dokunmaz
+    assert len(store.update_prices({'THYAO': 9}, currency='EUR')) == 0
+    assert store.user_totals('u')[1] == 3430
+    print("✅ TL ve USD lotları ayrı değerlendi")
+
+
+def test_price_bus_tick_by_currency():
+    print("🧪 Fiyat kanalı: yayın para birimi portföylere taşınır...")
+    price_bus = PriceBus()
+    agent = PersonalPortfolioAgent(price_bus=price_bus)
+    result = agent.add_portfolio_position('u', {'symbol': 'THYAO', 'quantity': 10, 'purchase_price': 300})
+    assert result.get('success'), result
+    agent.position_store.add_position('u', 'THYAO', 1, 10, currency='USD', cost_rate=30, fx_rate=30)
+
+    price_bus.publish('THYAO.IS', 310)
+    assert agent.position_store.user_totals('u')[1] == 3400
+    price_bus.publish('THYAO', 12, currency='USD')
+    assert agent.position_store.user_totals('u')[1] == 3100 + 360
+    assert price_bus.last_price('THYAO') == 310 and price_bus.last_price('THYAO', 'USD') == 12
+
+    # Sadece TL aboneleri döviz kotasyonlarını görmez
+    seen = []
+    price_bus.subscribe(seen.append)
+    price_bus.publish('THYAO', 13, currency='USD')
+    assert seen == [] and agent.position_store.user_totals('u')[1] == 3100 + 390
+    print("✅ Yayınlar para birimine göre uygulandı")
+
+    # Fiyat verilmeden güncelleme: her satır kendi para birimindeki son kotasyonla
+    agent.position_store.update_prices({'THYAO': 1}, currency='USD')
+    result = agent.update_portfolio_prices('u', None)
+    assert result.get('success'), result
+    assert agent.position_store.user_totals('u')[1] == 3100 + 390
+    print("✅ Son kotasyonlar para birimi bazında uygulandı")
+
+
+if __name__ == "__main__":
+    print("🚀 Personal Portfolio Test Başlıyor...")
+    print("=" * 60)
+    test_store_tick_by_currency()
+    test_price_bus_tick_by_currency()
+    print("=" * 60)
+    print("🎉 Tüm testler tamamlandı")
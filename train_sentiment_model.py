@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Agent modüllerini import et
+sys.path.append('agents')
+from sentiment_model import DEFAULT_MODEL_PATH, HashedNgramModel, LexiconBackend
+from sentiment_analysis_agent import SentimentAnalysisAgent, SENTIMENT_WEIGHTS
+
+
+def load_labeled_texts(path):
+    """JSONL: her satır {"text": ..., "label": -1..1}"""
+    texts, labels = [], []
+    with open(path, encoding='utf-8') as labeled_file:
+        for line in labeled_file:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record['text'])
+                labels.append(float(record['label']))
+    return texts, labels
+
+
+def lexicon_labeled_texts(agent, count=20000):
+    """Etiketli veri yoksa: mock postları sözlük skorlarıyla etiketle"""
+    texts = []
+    for symbol in ['THYAO', 'AKBNK', 'BIMAS', 'ASELS', 'SISE', 'GARAN']:
+        texts.extend(post['text'] for post in agent.get_mock_social_data(symbol, 'twitter', count // 6))
+    lexicon = LexiconBackend(agent.keyword_matcher, SENTIMENT_WEIGHTS)
+    return texts, lexicon.predict_batch(texts)
+
+
+def train_sentiment_model():
+    print("🚀 Sentiment modeli eğitimi başlıyor...")
+    agent = SentimentAnalysisAgent()
+
+    if len(sys.argv) > 1:
+        texts, labels = load_labeled_texts(sys.argv[1])
+        print(f"📄 {len(texts)} etiketli metin yüklendi: {sys.argv[1]}")
+    else:
+        texts, labels = lexicon_labeled_texts(agent)
+        print(f"📄 Etiketli veri verilmedi, {len(texts)} metin sözlükle etiketlendi")
+
+    split = int(len(texts) * 0.9)
+    start = time.time()
+    model = HashedNgramModel.fit(texts[:split], labels[:split])
+    print(f"⏱️ Eğitim süresi: {time.time() - start:.1f}s")
+
+    if split < len(texts):
+        predictions = model.predict_batch(texts[split:])
+        error = np.mean(np.abs(predictions - np.asarray(labels[split:])))
+        print(f"📊 Doğrulama ortalama mutlak hata: {error:.3f}")
+
+    start = time.time()
+    model.predict_batch(texts)
+    print(f"⚡ Çıkarım: {len(texts) / max(time.time() - start, 1e-9):.0f} metin/sn (tek çekirdek)")
+
+    output_path = os.getenv('SENTIMENT_MODEL_PATH', DEFAULT_MODEL_PATH)
+    model.save(output_path)
+    print(f"💾 Model kaydedildi: {output_path}")
+
+
+if __name__ == "__main__":
+    train_sentiment_model()